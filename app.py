@@ -1,22 +1,46 @@
 import os
+import gzip
 
-import boto3
 from chalice import Chalice
 from chalice import CognitoUserPoolAuthorizer
+from chalice import CORSConfig
+from chalice import Response
 from chalice.app import BadRequestError
 
 from chalicelib import db
-from chalicelib.validates import Validates
+from chalicelib.connection import todo_table
+from chalicelib.cache import CachedDynamoDBTodo, TTLCache, DEFAULT_CACHE_MAX_SIZE, DEFAULT_CACHE_TTL
+from chalicelib.compression import (
+    accepts_binary, compress_response, COMPRESSED_JSON_CONTENT_TYPE, DEFAULT_COMPRESSION_MIN_BYTES)
+from chalicelib.cursor import Cursor
+from chalicelib.exceptions import PreconditionFailedError, RetryableError
+from chalicelib.idempotency import DEFAULT_IDEMPOTENCY_TTL
+from chalicelib.item_cache import item_store, DEFAULT_ITEM_CACHE_MAX_SIZE, DEFAULT_ITEM_CACHE_TTL
+from chalicelib.export import NDJSON
+from chalicelib.metrics import MetricsRecorder, DEFAULT_METRICS_NAMESPACE
+from chalicelib.retry import RetryPolicy
+from chalicelib.sync import DEFAULT_TOMBSTONE_TTL
+from chalicelib.uid import parse_timestamp
+from chalicelib.validates import Validates, TODO_CREATE_SCHEMA, TODO_UPDATE_SCHEMA
 
 
 _DB = None
+DEFAULT_PAGE_LIMIT = 100
+EXPORT_MAX_BYTES = 2 * 1024 * 1024
 
 
 app = Chalice(app_name='serverless-todo-backend')
 app.debug = True
+app.api.binary_types.append(NDJSON.GZIP_CONTENT_TYPE)
+app.api.binary_types.append(COMPRESSED_JSON_CONTENT_TYPE)
+METRICS = MetricsRecorder(namespace=os.environ.get('METRICS_NAMESPACE', DEFAULT_METRICS_NAMESPACE))
 authorizer = CognitoUserPoolAuthorizer(
     'ToDoAppUserPool', provider_arns=[os.environ.get('USER_POOL_ARN')]
 )
+export_cors_config = CORSConfig(expose_headers=['X-Next-Cursor'])
+todo_cors_config = CORSConfig(
+    allow_headers=['If-Match', 'If-None-Match'], expose_headers=['ETag'])
+todos_cors_config = CORSConfig(allow_headers=['Idempotency-Key'])
 
 
 def get_authorized_username(current_request):
@@ -26,13 +50,125 @@ def get_authorized_username(current_request):
         str: cognito:username を返します
         None: cognito:username がない場合 None を返します
     """
-    try:
-        username = current_request.context['authorizer']['claims']["cognito:username"]
-    except KeyError:
-        username = None
+    with METRICS.timer('AuthTime'):
+        try:
+            username = current_request.context['authorizer']['claims']["cognito:username"]
+        except KeyError:
+            username = None
     return username
 
 
+def get_int_query_param(params, key, default=None):
+    """クエリパラメータを int に変換して取得します
+
+    Return:
+        int: 変換したクエリパラメータの値を返します
+        default: クエリパラメータがない場合 default を返します
+
+    Raises:
+        BadRequestError: int に変換できないケースで例外が発生します
+
+    """
+    value = params.get(key)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequestError(
+            f"{key} type (Your Request: {value}) "
+            f"REQUIRED: {int}")
+
+
+def get_timestamp_query_param(params, key):
+    """Unix 時刻 (ミリ秒) または ISO 8601 形式のクエリパラメータを、Unix 時刻 (ミリ秒) として取得します
+
+    Return:
+        int: 変換したクエリパラメータの値を返します
+        None: クエリパラメータがない場合 None を返します
+
+    Raises:
+        BadRequestError: 変換できないケースで例外が発生します
+
+    """
+    value = params.get(key)
+    if value is None:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise BadRequestError(
+            f"{key} format (Your Request: {value}) "
+            f"REQUIRED: unix time in milliseconds or ISO 8601")
+
+
+def get_bool_env(key, default=False):
+    """環境変数を bool として取得します (true, 1, yes を True とします)"""
+    value = os.environ.get(key)
+    if value is None:
+        return default
+    return value.strip().lower() in ('true', '1', 'yes')
+
+
+def get_fields_query_param(params):
+    """?fields をカンマ区切りの属性名のリストとして取得します
+
+    FIELDS_ENABLED が true でない場合、または ?fields の指定がない場合は None を返します。
+    """
+    if not get_bool_env('FIELDS_ENABLED') or 'fields' not in params:
+        return None
+    fields = [field for field in params['fields'].split(',') if field]
+    Validates.fields(fields)
+    return fields
+
+
+def format_etag(version):
+    """version から ETag を生成します"""
+    return f'"{version}"'
+
+
+def parse_if_none_match(current_request):
+    """If-None-Match ヘッダーから ETag のリストを取得します
+
+    弱い比較を行うため、W/ プレフィックスは取り除きます。
+
+    Return:
+        list: ETag のリストを返します ('*' を含むことがあります)
+        None: If-None-Match ヘッダーがない場合 None を返します
+
+    """
+    value = current_request.headers.get('if-none-match')
+    if value is None:
+        return None
+    etags = [etag.strip() for etag in value.split(',')]
+    return [etag[2:] if etag.startswith('W/') else etag for etag in etags]
+
+
+def parse_if_match(current_request):
+    """If-Match ヘッダーから期待する version を取得します
+
+    If-Match は強い比較を行うため、W/ プレフィックスつきの ETag は一致しません。
+
+    Raises:
+        PreconditionFailedError:
+            この API が発行した ETag の形式でないケースで例外が発生します。
+            (どの version とも一致しないため)
+
+    Return:
+        int: 期待する version を返します
+        None: If-Match ヘッダーがない場合、または '*' の場合 None を返します
+
+    """
+    value = current_request.headers.get('if-match')
+    if value is None or value.strip() == '*':
+        return None
+    etag = value.strip()
+    if not (len(etag) > 2 and etag[0] == etag[-1] == '"' and etag[1:-1].isdigit()):
+        raise PreconditionFailedError(
+            f"If-Match does not match. (Your Request: {value})")
+    return int(etag[1:-1])
+
+
 def get_app_db():
     """DynamoDBTodo インスタンスを取得します
 
@@ -47,6 +183,54 @@ def get_app_db():
             この環境変数が存在しない場合は、「呼び出し環境のcredentialsと同一の
             AWSアカウント/リージョンに属するDynamoDB」がエンドポイントとなります。
         APP_TABLE_NAME: 接続する DynamoDB のテーブル名
+        SCAN_TOTAL_SEGMENTS:
+            テーブル全体をスキャンする際の並列スキャンのセグメント数
+            この環境変数が存在しない場合は逐次スキャンを行います。
+        SEARCH_INDEX_ENABLED:
+            true の場合は転置索引を更新し、検索に使用します
+            既存のデータがある場合は、有効にする前に
+            `python ddb_maintenance.py rebuild-search-index` で索引を構築してください。
+        STATS_ENABLED:
+            true の場合は書き込みと同じトランザクションで、ユーザーごとの件数の集計アイテムを更新します
+            既存のデータがある場合は、有効にする前後に
+            `python ddb_maintenance.py reconcile-stats` で集計アイテムを構築してください。
+        CACHE_ENABLED:
+            true の場合は get_item, list_items, list_items_page の結果をコンテナ内でキャッシュします
+        CACHE_MAX_SIZE: キャッシュするエントリ数の上限 (デフォルト: DEFAULT_CACHE_MAX_SIZE)
+        CACHE_TTL_SECONDS: キャッシュの有効期限 (秒) (デフォルト: DEFAULT_CACHE_TTL)
+        DDB_CONNECT_TIMEOUT, DDB_READ_TIMEOUT, DDB_MAX_POOL_CONNECTIONS, DDB_MAX_ATTEMPTS:
+            DynamoDB クライアントの設定 chalicelib.connection.client_config を参照してください
+        DB_BACKEND:
+            resource (デフォルト) の場合は boto3.resource.Table を、
+            client の場合は低レベルクライアントの ClientTable を使用します
+            dax の場合は DYNAMO_DB_ENDPOINT の DAX クラスターを使用します (amazondax が必要です)
+        ITEM_CACHE_BACKEND:
+            memory または redis の場合は、テーブルの get_item の結果をキャッシュします
+            (chalicelib.item_cache.ItemCacheTable を参照、デフォルトの none の場合はキャッシュしません)
+            メソッドごとの整合性は ItemCacheTable の Docstring を参照してください
+        ITEM_CACHE_TTL_SECONDS: キャッシュの有効期限 (秒) (デフォルト: DEFAULT_ITEM_CACHE_TTL)
+        ITEM_CACHE_MAX_SIZE: memory の場合のエントリ数の上限 (デフォルト: DEFAULT_ITEM_CACHE_MAX_SIZE)
+        ITEM_CACHE_URL: redis の場合に接続する Redis の URL (例: redis://localhost:6379/0)
+        STARTUP_OPTIMIZED:
+            true の場合は app のモジュールの読み込み時 (Lambda の初期化フェーズ) に
+            DynamoDBTodo インスタンスを生成します
+        METRICS_ENABLED:
+            true の場合はリクエストごとの計測値を EMF のログとして出力します (record_request_metrics を参照)
+        METRICS_NAMESPACE: CloudWatch メトリクスの名前空間 (デフォルト: DEFAULT_METRICS_NAMESPACE)
+        RETRY_POLICY_ENABLED:
+            true の場合はスロットリングと一時的な障害を、コンテナごとの再試行の予算と
+            サーキットブレーカーの範囲で再試行します (chalicelib.retry.RetryPolicy を参照)
+            再試行できなかった場合は Retry-After ヘッダー付きの 429 / 503 を返します
+            再試行が重ならないよう、DynamoDB クライアントの試行回数は DDB_MAX_ATTEMPTS によらず 1 回にします
+        FIELDS_ENABLED:
+            true の場合は GET /todos の ?fields で取得する属性を指定できます (get_todos を参照)
+        COMPRESSION_ENABLED, COMPRESSION_MIN_BYTES:
+            レスポンスの圧縮の設定 compress_json_response を参照してください
+        IDEMPOTENCY_TTL_SECONDS:
+            POST /todos の Idempotency-Key の記録を保持する秒数 (デフォルト: DEFAULT_IDEMPOTENCY_TTL)
+        TOMBSTONE_TTL_SECONDS:
+            削除した Todo の記録を保持する秒数 (デフォルト: DEFAULT_TOMBSTONE_TTL)
+            GET /todos/changes の since はこの期間より古い場合 410 になります
 
     Return:
         DynamoDBTodo(instance):
@@ -54,6 +238,7 @@ def get_app_db():
 
     Examples:
         get_app_db().list_items()   username と query に基づいて Todo を取得します
+        get_app_db().list_items_page() username と query に基づいて Todo を 1 ページ分取得します
         get_app_db().get_item()    特定の Todo を取得します
         get_app_db().add_item()    Todo を新規登録します
         get_app_db().update_item() Todo を更新します
@@ -64,15 +249,105 @@ def get_app_db():
     if _DB is None:
         endpoint = os.environ.get('DYNAMO_DB_ENDPOINT')
         tablename = os.environ['APP_TABLE_NAME']
+        scan_total_segments = int(os.environ.get(
+            'SCAN_TOTAL_SEGMENTS', db.DEFAULT_SCAN_TOTAL_SEGMENTS))
+        retry_policy = RetryPolicy() if get_bool_env('RETRY_POLICY_ENABLED') else None
         _DB = db.DynamoDBTodo(
-            boto3.resource('dynamodb', endpoint_url=endpoint).Table(tablename)
+            todo_table(tablename, endpoint_url=endpoint,
+                       backend=os.environ.get('DB_BACKEND', 'resource'),
+                       max_attempts=None if retry_policy is None else 1,
+                       item_store=item_store(
+                           os.environ.get('ITEM_CACHE_BACKEND', 'none'),
+                           ttl=float(os.environ.get('ITEM_CACHE_TTL_SECONDS', DEFAULT_ITEM_CACHE_TTL)),
+                           maxsize=int(os.environ.get('ITEM_CACHE_MAX_SIZE', DEFAULT_ITEM_CACHE_MAX_SIZE)),
+                           url=os.environ.get('ITEM_CACHE_URL'))),
+            scan_total_segments=scan_total_segments,
+            search_index=get_bool_env('SEARCH_INDEX_ENABLED'),
+            stats=get_bool_env('STATS_ENABLED'),
+            metrics=METRICS if get_bool_env('METRICS_ENABLED') else None,
+            retry_policy=retry_policy,
+            idempotency_ttl=int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', DEFAULT_IDEMPOTENCY_TTL)),
+            tombstone_ttl=int(os.environ.get('TOMBSTONE_TTL_SECONDS', DEFAULT_TOMBSTONE_TTL))
         )
+        if get_bool_env('CACHE_ENABLED'):
+            _DB = CachedDynamoDBTodo(_DB, TTLCache(
+                maxsize=int(os.environ.get('CACHE_MAX_SIZE', DEFAULT_CACHE_MAX_SIZE)),
+                ttl=float(os.environ.get('CACHE_TTL_SECONDS', DEFAULT_CACHE_TTL))))
     return _DB
 
 
-@app.route('/todos', methods=['GET'], cors=True, authorizer=authorizer)
+@app.middleware('http')
+def record_request_metrics(event, get_response):
+    """リクエストごとの計測値を CloudWatch Embedded Metric Format のログとして出力します
+
+    METRICS_ENABLED が true の場合のみ計測します。
+    ハンドラー全体、トークンからの username の取得、DynamoDB の呼び出しごとの所要時間と、
+    消費キャパシティ、読み取った件数 (ScannedCount) と返された件数 (Count)、コールドスタートを
+    Method と Route のディメンションで出力します。(chalicelib.metrics.MetricsRecorder を参照)
+
+    """
+    if not get_bool_env('METRICS_ENABLED'):
+        return get_response(event)
+    METRICS.start()
+    status_code = 500
+    try:
+        response = get_response(event)
+        status_code = response.status_code
+        return response
+    finally:
+        METRICS.finish({
+            'Method': event.method,
+            'Route': event.context.get('resourcePath', event.path),
+            'StatusCode': status_code,
+            'RequestId': event.context.get('requestId'),
+        })
+
+
+@app.middleware('http')
+def handle_retryable_error(event, get_response):
+    """スロットリングと一時的な障害 (RetryableError) を Retry-After ヘッダー付きのレスポンスに変換します
+
+    ChaliceViewError はステータスコードのみのレスポンスになるため、
+    RetryableError はミドルウェアまで送出し、ここで Retry-After ヘッダーを付与します。
+    record_request_metrics の内側で実行されるため、計測値のステータスコードは 429 / 503 になります。
+
+    """
+    try:
+        return get_response(event)
+    except RetryableError as e:
+        return Response(
+            body={'Code': e.__class__.__name__, 'Message': str(e)},
+            status_code=e.STATUS_CODE,
+            headers={'Retry-After': str(e.retry_after)})
+
+
+@app.middleware('http')
+def compress_json_response(event, get_response):
+    """JSON のレスポンスを Accept-Encoding に従い br または gzip で圧縮します
+
+    COMPRESSION_ENABLED が true の場合のみ、本文が COMPRESSION_MIN_BYTES
+    (デフォルト: DEFAULT_COMPRESSION_MIN_BYTES) 以上のレスポンスを圧縮します。
+    br は brotli パッケージがインストールされている場合のみ使用します。
+    (chalicelib.compression.compress_response を参照)
+
+    圧縮した本文は Content-Type が COMPRESSED_JSON_CONTENT_TYPE の isBase64Encoded のレスポンスとして返します。
+    API Gateway (REST API) は Accept ヘッダーがバイナリメディアタイプに一致する場合のみ base64 をデコードするため、
+    Accept ヘッダーの最初のメディアタイプが app.api.binary_types に一致するリクエストのみ圧縮します。
+    (クライアントは Accept: COMPRESSED_JSON_CONTENT_TYPE を指定します Accept: application/json などは圧縮しません)
+
+    """
+    response = get_response(event)
+    if not get_bool_env('COMPRESSION_ENABLED') or \
+            not accepts_binary(event.headers.get('accept'), app.api.binary_types):
+        return response
+    return compress_response(
+        response, event.headers.get('accept-encoding'),
+        int(os.environ.get('COMPRESSION_MIN_BYTES', DEFAULT_COMPRESSION_MIN_BYTES)))
+
+
+@app.route('/todos', methods=['GET'], cors=todos_cors_config, authorizer=authorizer)
 def get_todos():
-    """クエリに基づき、Todo のリストを取得する DynamoDBTodo.list_items をコールします
+    """クエリに基づき、Todo のリストを 1 ページ分取得する DynamoDBTodo.list_items_page をコールします
 
     リクエストに含まれる Amazon Cognito の トークンを参照し、
     username ごとに DynamoDB テーブルから Todo オブジェクトを取得し、リストを返します。
@@ -80,33 +355,156 @@ def get_todos():
     このとき検索クエリが指定されている場合は、
     Todo の subject, description キーの値に、検索クエリが含まれているものを取得します。
 
-    取得のため、DynamoDBTodo.list_items をコールします。
+    1 回のリクエストで評価するアイテム数は limit で制限され、
+    続きのページが存在する場合は next_cursor を返します。
+    next_cursor を ?cursor に指定して再度リクエストすることで、続きのページを取得できます。
+
+    取得のため、DynamoDBTodo.list_items_page をコールします。
 
     Query Params:
         ?q, ?s, ?search (str): 検索クエリ
         上記の 3 つの params はすべて検索クエリです。
         先頭から順に検索クエリの存在を確認し、見つかった場合は残りの検索クエリは無視します。
+
+        ?limit (int): 1 ページで評価するアイテム数の上限 (デフォルト: DEFAULT_PAGE_LIMIT)
+        ?cursor (str): 前のページのレスポンスに含まれる next_cursor
+
+        ?order (str): asc (作成日時の昇順) または desc (作成日時の降順、最新の Todo から)
+        ?since, ?until (str): 作成日時の範囲 (Unix 時刻のミリ秒 または ISO 8601)
+        order, since, until のいずれかを指定した場合は、作成日時の順序で取得します。
+        このとき uid が UUIDv7 でない (作成日時の分からない) 既存の Todo は含まれません。
+
+        ?state (str): 指定したステータスの Todo のみを取得します (Validates.STATE_ENUM)
+
+        ?ids (str): カンマ区切りの uid
+        ids を指定した場合は検索クエリ、limit、cursor は無視し、
+        指定した uid の Todo を DynamoDBTodo.get_items でまとめて取得します。
+
+        ?fields (str): カンマ区切りの取得する属性名 (Validates.FIELDS_ENUM)
+        FIELDS_ENABLED が true の場合のみ有効です。
+        DynamoDB の ProjectionExpression で uid と指定した属性のみを取得します。
+        (一覧の表示に uid,subject,state のみを取得する場合など)
     
         クエリの指定のサンプル
-        `$ http POST <ENDPOINT_URI>/todos?q=<QUERY>`
+        `$ http GET <ENDPOINT_URI>/todos?q=<QUERY>&limit=20&cursor=<CURSOR>`
         (* 上記のコマンドは httpie パッケージを使用しています)
 
+    Raises:
+        BadRequestError: limit, cursor, order, since, until, state または fields が不正なケースで例外が発生します
+
     Return:
-        list: Todo オブジェクトのリストを返します
+        dict: 以下のキーを持つ dict を返します
+            items (list): Todo オブジェクトのリスト
+            next_cursor (str): 続きのページのカーソル 最後のページの場合は None
+        dict: ids を指定した場合は DynamoDBTodo.get_items の戻り値を返します
 
     """
     username = get_authorized_username(app.current_request)
     query = ''
-    params = app.current_request.query_params
-    if params is not None:
-        for key in 'q', 's', 'search':
-            if key in params:
-                query = params[key]
-                break
-    return get_app_db().list_items(query=query, username=username)
+    params = app.current_request.query_params or {}
+    fields = get_fields_query_param(params)
+    if 'ids' in params:
+        ids = [uid for uid in params['ids'].split(',') if uid]
+        Validates.ids(ids)
+        return get_app_db().get_items(ids, username=username, fields=fields)
+    for key in 'q', 's', 'search':
+        if key in params:
+            query = params[key]
+            break
+    limit = get_int_query_param(params, 'limit', DEFAULT_PAGE_LIMIT)
+    Validates.limit(limit)
+    order = params.get('order')
+    Validates.order(order)
+    since = get_timestamp_query_param(params, 'since')
+    until = get_timestamp_query_param(params, 'until')
+    Validates.time_range(since, until)
+    state = params.get('state')
+    Validates.state(state) if state is not None else None
+    start_key = Cursor.decode(params.get('cursor'), username, Cursor.LIST)
+    items, last_key = get_app_db().list_items_page(
+        query=query, username=username,
+        limit=limit, exclusive_start_key=start_key,
+        order=order, since=since, until=until, state=state, fields=fields)
+    return {'items': items, 'next_cursor': Cursor.encode(last_key, username, Cursor.LIST)}
+
+
+@app.route('/todos/counts', methods=['GET'], cors=True, authorizer=authorizer)
+def get_todo_counts():
+    """ステータスごとの Todo の件数を取得する DynamoDBTodo.count_items_by_state をコールします
+
+    Return:
+        dict: Validates.STATE_ENUM のステータスごとの件数を返します
+
+    """
+    username = get_authorized_username(app.current_request)
+    return get_app_db().count_items_by_state(username=username)
+
+
+@app.route('/todos/changes', methods=['GET'], cors=True, authorizer=authorizer)
+def get_todo_changes():
+    """前回の同期以降に変更された Todo を 1 ページ分取得する DynamoDBTodo.list_changes をコールします
+
+    レスポンスの next_token を次回の ?since に指定することで、
+    その間に追加、更新された Todo と、削除された Todo の uid のみを取得できます。
+    has_more が true の場合は、next_token を ?since に指定して続きのページを取得してください。
+    直近の変更 (CHANGES_OVERLAP_MS) は次回も重複して返るため、クライアントは uid と version で取り除いてください。
+
+    トークンは Cursor で署名した不透明な文字列で、前回の同期の時刻 (since) と、
+    続きのページの場合は LastEvaluatedKey を含みます。
+
+    Query Params:
+        ?since (str): 前回のレスポンスの next_token
+                      指定がない場合は、すべての Todo と保持期間内に削除された uid を返します
+        ?limit (int): 1 ページで評価するアイテム数の上限 (デフォルト: DEFAULT_PAGE_LIMIT)
+
+    Raises:
+        BadRequestError: since, limit が不正なケースで例外が発生します
+        GoneError: since が削除の記録の保持期間 (TOMBSTONE_TTL_SECONDS) より古いケースで例外が発生します
+                   (410 の場合は ?since を指定せずに全件を取得し直してください)
+
+    Return:
+        dict: 以下のキーを持つ dict を返します
+            items (list): 追加、更新された Todo オブジェクトのリスト
+            deleted (list): 削除された Todo の uid のリスト
+            next_token (str): 次回の ?since に指定するトークン
+            has_more (bool): 続きのページが存在するか
 
+    """
+    username = get_authorized_username(app.current_request)
+    params = app.current_request.query_params or {}
+    limit = get_int_query_param(params, 'limit', DEFAULT_PAGE_LIMIT)
+    Validates.limit(limit)
+    token = Cursor.decode(params.get('since'), username, Cursor.CHANGES) or {}
+    result = get_app_db().list_changes(
+        username=username, since=token.get('since'), limit=limit,
+        exclusive_start_key=token.get('key'), next_since=token.get('next'))
+    if result['last_key'] is None:
+        next_token = {'since': result['since']}
+    else:
+        next_token = {'since': token.get('since'), 'next': result['since'], 'key': result['last_key']}
+    return {
+        'items': result['items'],
+        'deleted': result['deleted'],
+        'next_token': Cursor.encode(next_token, username, Cursor.CHANGES),
+        'has_more': result['last_key'] is not None,
+    }
+
+
+@app.route('/todos/stats', methods=['GET'], cors=True, authorizer=authorizer)
+def get_todo_stats():
+    """ユーザーの Todo の件数を取得する DynamoDBTodo.get_stats をコールします
+
+    集計アイテムが有効な場合 (STATS_ENABLED) は、1 回の GetItem で取得します。
+
+    Return:
+        dict: total と、Validates.STATE_ENUM のステータスごとの件数を返します
 
-@app.route('/todos', methods=['POST'], cors=True, authorizer=authorizer)
+    """
+    username = get_authorized_username(app.current_request)
+    return get_app_db().get_stats(username=username)
+
+
+@app.route('/todos', methods=['POST'], cors=todos_cors_config, authorizer=authorizer)
 def add_new_todo():
     """Todo を新規追加する DynamoDBTodo.add_item をコールします
 
@@ -114,10 +512,16 @@ def add_new_todo():
     DynamoDB テーブルに特定のユーザーの Todo オブジェクトを追加するため、
     DynamoDBTodo.add_item をコールします。
 
+    Idempotency-Key ヘッダーを指定した場合は、同じキーで再送されたリクエストに
+    Todo を追加せず、最初に追加した Todo の uid を返します。
+    (キーは IDEMPOTENCY_TTL_SECONDS の間保持します)
+
     Raises:
         BadRequestError:
             json_body が存在しないケースで例外が発生します。
             バリデーションに失敗したケースで例外が発生します。
+        UnprocessableEntityError:
+            同じ Idempotency-Key で異なる内容のリクエストが送られたケースで例外が発生します。
 
     Return:
         str: 登録に成功した Todo の uid を返します
@@ -127,58 +531,115 @@ def add_new_todo():
     if body is None:
         raise BadRequestError('current_request.json_body is None.')
 
-    subject = body.get('subject')
-    description = body.get('description')
+    TODO_CREATE_SCHEMA.validate(body)
     username = get_authorized_username(app.current_request)
+    idempotency_key = app.current_request.headers.get('idempotency-key')
 
-    Validates.subject(subject)
-    Validates.description(description) if description is not None else None
     Validates.username(username)
+    Validates.idempotency_key(idempotency_key)
 
     return get_app_db().add_item(
-        subject=subject,
-        description=description,
-        username=username
+        subject=body['subject'],
+        description=body.get('description'),
+        username=username,
+        idempotency_key=idempotency_key
     )
 
 
-@app.route('/todos/{uid}', methods=['GET'], cors=True, authorizer=authorizer)
+@app.route('/todos:batch', methods=['POST'], cors=True, authorizer=authorizer)
+def batch_todos():
+    """複数の Todo の追加、更新、削除をまとめて行う DynamoDBTodo.batch_write をコールします
+
+    リクエストの json_body の operations に含まれるすべての操作を先にバリデーションし、
+    いずれかの操作が不正な場合は、どの操作も実行せずに例外を発生させます。
+
+    Request Body:
+        operations (list): 操作のリスト (最大 Validates.BATCH_MAX_OPERATIONS 件)
+            {"op": "create", "subject": ..., "description": ...}
+            {"op": "update", "uid": ..., "subject": ..., "description": ..., "state": ..., "expected_version": ...}
+            {"op": "delete", "uid": ..., "expected_version": ...}
+
+    Raises:
+        BadRequestError:
+            json_body が存在しないケースで例外が発生します。
+            バリデーションに失敗したケースで例外が発生します。
+
+    Return:
+        dict: results に操作と同じ順序で、操作ごとの結果 {op, uid, status[, error]} のリストを返します
+
+    """
+    body = app.current_request.json_body
+    if body is None:
+        raise BadRequestError('current_request.json_body is None.')
+
+    operations = body.get('operations')
+    username = get_authorized_username(app.current_request)
+
+    Validates.batch_operations(operations)
+    Validates.username(username)
+
+    return {'results': get_app_db().batch_write(operations, username=username)}
+
+
+@app.route('/todos/{uid}', methods=['GET'], cors=todo_cors_config, authorizer=authorizer)
 def get_todo(uid):
     """特定の Todo オブジェクトを取得する DynamoDBTodo.get_item をコールします
 
     DynamoDB テーブルから特定のユーザー、uid の Todo オブジェクトを取得するため、
     DynamoDBTodo.get_item をコールします。
 
+    Todo オブジェクトの version を ETag ヘッダーとして返します。
+    If-None-Match ヘッダーの ETag と一致する場合は、本文を返さずに 304 を返します。
+
     Args:
         uid (str): 取得する uid を指定します
 
+    Raises:
+        BadRequestError: uid が不正 (管理用のアイテムの接頭辞 # で始まるなど) なケースで例外が発生します
+
     Return:
-        dict: 特定の Todo オブジェクトを返します
+        Response: 特定の Todo オブジェクトと ETag ヘッダーを返します
+                  (If-None-Match と一致する場合は 304 Not Modified)
 
     """
     username = get_authorized_username(app.current_request)
-    return get_app_db().get_item(uid=uid, username=username)
+    Validates.uid(uid)
+    item = get_app_db().get_item(uid=uid, username=username)
+    etag = format_etag(db.DynamoDBTodo.get_version(item))
+    if_none_match = parse_if_none_match(app.current_request)
+    if if_none_match is not None and ('*' in if_none_match or etag in if_none_match):
+        return Response(body='', headers={'ETag': etag}, status_code=304)
+    return Response(body=item, headers={'ETag': etag})
 
 
-@app.route('/todos/{uid}', methods=['DELETE'], cors=True, authorizer=authorizer)
+@app.route('/todos/{uid}', methods=['DELETE'], cors=todo_cors_config, authorizer=authorizer)
 def delete_todo(uid):
     """特定の Todo オブジェクトを削除する DynamoDBTodo.delete_item をコールします
 
     DynamoDB テーブルから特定のユーザー、uid の Todo オブジェクトを削除するため、
     DynamoDBTodo.delete_item をコールします。
 
+    If-Match ヘッダーを指定した場合は、ETag が一致する場合のみ削除します。
+
     Args:
         uid (str): 削除する Todo の uid を指定します
 
+    Raises:
+        BadRequestError: uid が不正 (管理用のアイテムの接頭辞 # で始まるなど) なケースで例外が発生します
+        PreconditionFailedError: If-Match ヘッダーの ETag が一致しないケースで例外が発生します
+
     Return:
         uid: (str): 正常に削除された Todo の uid を返します
 
     """
     username = get_authorized_username(app.current_request)
-    return get_app_db().delete_item(uid=uid, username=username)
+    expected_version = parse_if_match(app.current_request)
+    Validates.uid(uid)
+    return get_app_db().delete_item(
+        uid=uid, username=username, expected_version=expected_version)
 
 
-@app.route('/todos/{uid}', methods=['PUT'], cors=True, authorizer=authorizer)
+@app.route('/todos/{uid}', methods=['PUT'], cors=todo_cors_config, authorizer=authorizer)
 def update_todo(uid):
     """特定の Todo オブジェクトを更新する DynamoDBTodo.update_item をコールします
 
@@ -187,10 +648,13 @@ def update_todo(uid):
     DynamoDB テーブルから特定のユーザー、uid の Todo オブジェクトを更新するため、
     DynamoDBTodo.update_item をコールします。
 
+    If-Match ヘッダーを指定した場合は、ETag が一致する場合のみ更新します。
+
     Raises:
         BadRequestError:
             json_body が存在しないケースで例外が発生します。
             バリデーションに失敗したケースで例外が発生します。
+        PreconditionFailedError: If-Match ヘッダーの ETag が一致しないケースで例外が発生します
 
     Return:
         uid: (str): 正常に更新された Todo の uid を返す
@@ -200,22 +664,19 @@ def update_todo(uid):
     if body is None:
         raise BadRequestError("json_body is None.")
 
-    subject = body.get('subject')
-    description = body.get('description')
-    state = body.get('state')
+    TODO_UPDATE_SCHEMA.validate(body)
     username = get_authorized_username(app.current_request)
 
-    Validates.subject(subject) if subject is not None else None
-    Validates.description(description) if description is not None else None
-    Validates.state(state) if state is not None else None
     Validates.username(username)
+    Validates.uid(uid)
 
     return get_app_db().update_item(
         uid=uid,
-        subject=subject,
-        description=description,
-        state=state,
-        username=username
+        subject=body.get('subject'),
+        description=body.get('description'),
+        state=body.get('state'),
+        username=username,
+        expected_version=parse_if_match(app.current_request)
     )
 
 
@@ -225,7 +686,83 @@ def get_index():
     return {'message': 'Welcome to serverless-todo api!'}
 
 
-@app.route('/all_todos', methods=['GET'], cors=True)
-def get_index():
-    """ページネーションの試用"""
-    return get_app_db().list_all_items()
\ No newline at end of file
+@app.route('/all_todos', methods=['GET'], cors=export_cors_config)
+def get_all_todos():
+    """ページネーションの試用
+
+    ?format=ndjson を指定した場合はエクスポートモードとなり、export_all_todos を返します。
+
+    Query Params:
+        ?segments (int): 並列スキャンのセグメント数
+            指定がない場合は環境変数 SCAN_TOTAL_SEGMENTS の値を使用します。
+        ?format (str): ndjson を指定した場合はエクスポートモードになります
+
+    """
+    params = app.current_request.query_params or {}
+    if params.get('format') == 'ndjson':
+        return export_all_todos(params)
+    segments = get_int_query_param(params, 'segments')
+    Validates.segments(segments)
+    return get_app_db().list_all_items(total_segments=segments)
+
+
+def export_all_todos(params):
+    """すべての Todo を NDJSON としてエクスポートします
+
+    テーブルをページごとにスキャンして NDJSON にエンコードし、
+    エンコード後のサイズが EXPORT_MAX_BYTES に達したページで打ち切ります。
+    Lambda のレスポンスサイズの上限に収まるよう、1 回のレスポンスのサイズを制限するため、
+    テーブルのサイズによらずメモリ使用量は一定に保たれます。
+
+    続きが存在する場合はレスポンスヘッダー X-Next-Cursor にチェックポイントのカーソルを返します。
+    X-Next-Cursor を ?cursor に指定して再度リクエストすることで、続きからエクスポートを再開できます。
+
+    Query Params:
+        ?limit (int): 1 ページで評価するアイテム数の上限 (デフォルト: DEFAULT_PAGE_LIMIT)
+        ?cursor (str): 前のレスポンスの X-Next-Cursor
+        ?compress (str): gzip を指定した場合は gzip で圧縮し、application/gzip として返します
+
+    Raises:
+        BadRequestError: limit、cursor、compress が不正なケースで例外が発生します
+
+    Return:
+        Response: NDJSON のレスポンスを返します
+
+    """
+    limit = get_int_query_param(params, 'limit', DEFAULT_PAGE_LIMIT)
+    Validates.limit(limit)
+    compress = params.get('compress')
+    if compress not in (None, 'gzip'):
+        raise BadRequestError(
+            f"compress (Your Request: {compress}) "
+            f"REQUIRED: gzip")
+    start_key = Cursor.decode(params.get('cursor'), None, Cursor.EXPORT)
+
+    chunks = []
+    size = 0
+    last_key = None
+    for items, last_key in get_app_db().iter_scan_pages(
+            limit=limit, exclusive_start_key=start_key):
+        chunk = NDJSON.dumps(items)
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= EXPORT_MAX_BYTES:
+            break
+    body = b''.join(chunks)
+
+    headers = {'Content-Type': NDJSON.CONTENT_TYPE}
+    if compress == 'gzip':
+        body = gzip.compress(body)
+        headers['Content-Type'] = NDJSON.GZIP_CONTENT_TYPE
+    else:
+        body = body.decode('utf-8')
+    next_cursor = Cursor.encode(last_key, None, Cursor.EXPORT)
+    if next_cursor is not None:
+        headers['X-Next-Cursor'] = next_cursor
+    return Response(body=body, headers=headers)
+
+
+# STARTUP_OPTIMIZED が true の場合は、Lambda の初期化フェーズ (ハンドラーの外) で
+# DynamoDB のクライアントを生成し、初回リクエストのレイテンシーからサービスモデルの読み込みを除きます
+if get_bool_env('STARTUP_OPTIMIZED'):
+    get_app_db()
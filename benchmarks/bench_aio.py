@@ -0,0 +1,115 @@
+"""同期の DynamoDBTodo と AsyncDynamoDBTodo のファンアウトの所要時間を比較します
+
+benchmarks.datagen で生成したデータセットを登録したあと、以下の 3 つの操作を比較します。
+
+    users : --users 人のユーザーの list_items (同期は 1 人ずつ、非同期は list_items_by_users)
+    counts: count_items_by_state (同期はステータスごとに 1 回ずつ、非同期は並行に Query)
+    scan  : list_all_items (同期は逐次スキャン、非同期はセグメントごとのスキャンを並行に実行)
+
+非同期は --concurrency の値ごとに計測し、結果が同期と一致することを確認します。
+
+--endpoint-url を指定した場合は DynamoDB Local などの実テーブルを使用し、
+指定しない場合は moto.mock_dynamodb2 をローカルの代替として使用します。
+moto は Segment/TotalSegments を無視するため tests.mock.dynamo_db.MockSegmentedTable で再現し、
+--latency-ms で呼び出し 1 回あたりのネットワーク往復時間を tests.mock.dynamo_db.MockLatencyTable で再現します。
+(moto はプロセス内で動作するため、往復時間がない場合は並行化の効果は測定できません)
+
+    $ python -m benchmarks.bench_aio --users 50 --todos-per-user 20 --latency-ms 20 --concurrency 4 16
+"""
+import os
+import time
+import uuid
+import asyncio
+import argparse
+from contextlib import nullcontext
+
+import boto3
+
+from benchmarks import datagen
+from chalicelib.aio import AsyncDynamoDBTodo
+from chalicelib.bulk_load import BulkLoader
+from chalicelib.db import DynamoDBTodo
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+from tests.mock.dynamo_db import MockLatencyTable, MockSegmentedTable
+
+
+def operations(usernames, total_segments):
+    """操作ごとの (同期の関数, 非同期の関数, 結果を比較できる形に変換する関数) を返します"""
+    def _uids(items):
+        return sorted(item['uid'] for item in items)
+    return {
+        'users': (
+            lambda todo: {username: todo.list_items(username=username) for username in usernames},
+            lambda db: db.list_items_by_users(usernames),
+            lambda result: {username: _uids(items) for username, items in result.items()}),
+        'counts': (
+            lambda todo: [todo.count_items_by_state(username=username) for username in usernames],
+            lambda db: _gather_counts(db, usernames),
+            lambda result: result),
+        'scan': (
+            lambda todo: todo.list_all_items(total_segments=1),
+            lambda db: db.list_all_items(total_segments=total_segments),
+            _uids),
+    }
+
+
+async def _gather_counts(db, usernames):
+    # ユーザーごとの呼び出しは順に行い、ステータスごとの Query のみを並行に行います
+    return [await db.count_items_by_state(username=username) for username in usernames]
+
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(args):
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = ddb.create_table(**dict(MOCK_DDB_SCHEMA, TableName=f"bench-aio-{uuid.uuid4()}"))
+    try:
+        todos = list(datagen.todos_from_args(args))
+        BulkLoader(DynamoDBTodo(table)).load(todos)
+        usernames = sorted({todo['username'] for todo in todos})
+        if args.endpoint_url is None:
+            table = MockLatencyTable(MockSegmentedTable(table), args.latency_ms / 1000)
+        todo = DynamoDBTodo(table)
+        for name, (sync, run_async, normalize) in operations(usernames, args.segments).items():
+            if name not in args.operations:
+                continue
+            elapsed, expected = measure(lambda: sync(todo))
+            print(f"{name:>7} {'sync':>16} {elapsed:8.3f}s")
+            for concurrency in args.concurrency:
+                async def _main():
+                    async with AsyncDynamoDBTodo(todo, concurrency=concurrency) as db:
+                        return await run_async(db)
+                elapsed, actual = measure(lambda: asyncio.run(_main()))
+                assert normalize(actual) == normalize(expected), f"{name} result mismatch"
+                print(f"{name:>7} {f'concurrency={concurrency}':>16} {elapsed:8.3f}s")
+    finally:
+        ddb.Table(table.name).delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    datagen.add_arguments(parser)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--segments', type=int, default=16, help='非同期の scan のセグメント数')
+    parser.add_argument('--operations', nargs='+', choices=['users', 'counts', 'scan'],
+                        default=['users', 'counts', 'scan'])
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
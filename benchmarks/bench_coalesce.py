@@ -0,0 +1,103 @@
+"""エディターのキー入力ごとの更新を、DynamoDBTodo と CoalescingDynamoDBTodo で書き込んだ場合を比較します
+
+--todos 件の Todo の description を、Todo ごとに --keystrokes 回、--interval-ms 間隔で 1 文字ずつ更新します。
+(キー入力の時刻は擬似的な時計で進めるため、実際には待機しません)
+更新のあとに get_item で内容を読み取り、どちらも最後の更新の内容を返すことを確認します。
+
+DynamoDB の呼び出し回数、消費したキャパシティユニット (ReturnConsumedCapacity=TOTAL)、所要時間を表示します。
+
+--endpoint-url を指定した場合は DynamoDB Local などの実テーブルを使用し、
+指定しない場合は moto.mock_dynamodb2 をローカルの代替として使用します。
+
+    $ python -m benchmarks.bench_coalesce --todos 20 --keystrokes 50 --interval-ms 150 --window 1
+"""
+import os
+import time
+import uuid
+import argparse
+from contextlib import nullcontext
+
+import boto3
+
+from benchmarks.bench_routes import CapacityRecorder
+from chalicelib.coalesce import CoalescingDynamoDBTodo
+from chalicelib.db import DynamoDBTodo
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+
+USERNAME = 'bench-user'
+
+
+class Clock:
+    """キー入力の時刻を進める擬似的な時計です"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CallCounter:
+    """botocore のイベントで DynamoDB の操作ごとの呼び出し回数を数えます"""
+
+    def __init__(self, session):
+        self.calls = {}
+        session.events.register('after-call.dynamodb', self._after_call)
+
+    def _after_call(self, model, **__):
+        self.calls[model.name] = self.calls.get(model.name, 0) + 1
+
+
+def type_keystrokes(db, clock, uids, keystrokes, interval):
+    """Todo ごとに 1 文字ずつ description を更新し、最後に get_item で読み取ります"""
+    for uid in uids:
+        for n in range(1, keystrokes + 1):
+            clock.now += interval
+            db.update_item(uid, description='a' * n, username=USERNAME)
+        assert db.get_item(uid, username=USERNAME)['description'] == 'a' * keystrokes
+
+
+def run(args):
+    boto3.setup_default_session()
+    recorder = CapacityRecorder(boto3.DEFAULT_SESSION)
+    counter = CallCounter(boto3.DEFAULT_SESSION)
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = ddb.create_table(**dict(MOCK_DDB_SCHEMA, TableName=f"bench-coalesce-{uuid.uuid4()}"))
+    try:
+        todo = DynamoDBTodo(table)
+        uids = [todo.add_item(subject=f"todo {n}", username=USERNAME) for n in range(args.todos)]
+        clock = Clock()
+        for name, db in [('direct', todo),
+                         (f"window={args.window}s", CoalescingDynamoDBTodo(todo, window=args.window, clock=clock))]:
+            counter.calls.clear()
+            recorded = recorder.units
+            start = time.perf_counter()
+            type_keystrokes(db, clock, uids, args.keystrokes, args.interval_ms / 1000)
+            elapsed = time.perf_counter() - start
+            calls = ', '.join(f"{operation}={count}" for operation, count in sorted(counter.calls.items()))
+            print(f"{name:>16} {elapsed:8.3f}s {recorder.units - recorded:8.1f} CU  {calls}")
+    finally:
+        table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--todos', type=int, default=20)
+    parser.add_argument('--keystrokes', type=int, default=50, help='Todo ごとの更新の回数')
+    parser.add_argument('--interval-ms', type=float, default=150, help='更新の間隔 (ミリ秒)')
+    parser.add_argument('--window', type=float, default=1.0, help='CoalescingDynamoDBTodo の window (秒)')
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""DynamoDB のレスポンスのアイテムを Python の値に変換する時間を、1 アイテムあたりで比較します
+
+boto3 は resource の Table でレスポンスのアイテムを TypeDeserializer で変換します。
+(実際にはモデルを辿る TransformationInjector の処理も加わります)
+ClientTable は Todo のスキーマに特化した TodoSerializer で変換します。
+
+    $ python -m benchmarks.bench_deserialize --sizes 1000 10000
+"""
+import json
+import time
+import uuid
+import argparse
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from chalicelib.client_table import TodoSerializer
+from chalicelib.export import NDJSON
+
+
+def response_items(count):
+    return [TodoSerializer.serialize_item({
+        'uid': str(uuid.uuid4()),
+        'subject': f"subject {i}",
+        'description': 'x' * 200,
+        'state': 'unstarted',
+        'username': 'bench',
+        'version': i % 10 + 1,
+    }) for i in range(count)]
+
+
+def type_deserializer(items):
+    deserializer = TypeDeserializer()
+    return [{key: deserializer.deserialize(value) for key, value in item.items()}
+            for item in items]
+
+
+def todo_serializer(items):
+    return [TodoSerializer.deserialize_item(item) for item in items]
+
+
+DECODERS = {
+    'TypeDeserializer': type_deserializer,
+    'TodoSerializer': todo_serializer,
+}
+
+
+def best(func, repeat):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        items = response_items(size)
+        for name, decode in DECODERS.items():
+            elapsed, decoded = best(lambda: decode(items), args.repeat)
+            encoded, _ = best(
+                lambda: json.dumps(decoded, default=NDJSON.json_default), args.repeat)
+            print(f"{size:>6} {name:>18} decode {elapsed / size * 1e6:6.2f}us/item"
+                  f"  json {encoded / size * 1e6:6.2f}us/item")
+
+
+if __name__ == '__main__':
+    main()
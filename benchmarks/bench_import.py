@@ -0,0 +1,66 @@
+"""モジュールの import と DynamoDB クライアントの生成にかかる時間を計測します
+
+計測はコールドスタートを再現するため、毎回新しい Python プロセスで行います。
+import の時間は `python -X importtime` の出力を、パッケージ (トップレベルのモジュール名) ごとに
+self 時間を合計して集計します。
+
+    $ python -m benchmarks.bench_import --module app --top 15
+"""
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+
+CREATE_CLIENT = {
+    'resource': "import boto3; boto3.resource('dynamodb', region_name='ap-northeast-1').Table('bench')",
+    'client': "import boto3; boto3.client('dynamodb', region_name='ap-northeast-1')",
+    'connection.dynamodb_table': (
+        "from chalicelib.connection import dynamodb_table; dynamodb_table('bench')"),
+    'connection.dynamodb_client': (
+        "from chalicelib.connection import dynamodb_client; dynamodb_client()"),
+}
+
+
+def import_times(module):
+    """モジュールの import にかかる時間を、パッケージごとの self 時間 (マイクロ秒) として返します"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        stderr=subprocess.PIPE, check=True, universal_newlines=True).stderr
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return totals
+
+
+def elapsed(statement, repeat):
+    """新しいプロセスで statement を実行し、最小の所要時間 (秒) を返します"""
+    code = (f"import time; start = time.perf_counter(); {statement}; "
+            f"print(time.perf_counter() - start)")
+    return min(float(subprocess.run(
+        [sys.executable, '-c', code], stdout=subprocess.PIPE,
+        check=True, universal_newlines=True).stdout) for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    totals = import_times(args.module)
+    print(f"import {args.module}: {sum(totals.values()) / 1000:.1f}ms")
+    for name, self_us in sorted(totals.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:>24} {self_us / 1000:8.1f}ms")
+
+    print('create client (including import):')
+    for name, statement in CREATE_CLIENT.items():
+        print(f"{name:>28} {elapsed(statement, args.repeat) * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""ItemCacheTable の有無による、よく読み取られる Todo の get_item の所要時間を比較します
+
+--items 件の Todo を登録したあと、Zipf 分布に近い偏りで選んだ uid を --reads 回 get_item で読み取り、
+1 回あたりの所要時間 (マイクロ秒) と、DynamoDB を呼び出した回数を表示します。
+
+    direct: キャッシュなし (ITEM_CACHE_BACKEND=none)
+    memory: コンテナ内の TTLCache (ITEM_CACHE_BACKEND=memory)
+    redis : --redis-url を指定した場合のみ、RedisItemStore (ITEM_CACHE_BACKEND=redis)
+
+--endpoint-url を指定した場合は DynamoDB Local などの実テーブルを使用し、
+指定しない場合は moto.mock_dynamodb2 をローカルの代替として使用します。
+--latency-ms で呼び出し 1 回あたりのネットワーク往復時間を tests.mock.dynamo_db.MockLatencyTable で再現します。
+
+    $ python -m benchmarks.bench_item_cache --items 1000 --reads 5000 --latency-ms 5
+"""
+import os
+import time
+import uuid
+import random
+import argparse
+from contextlib import nullcontext
+
+import boto3
+
+from chalicelib.db import DynamoDBTodo
+from chalicelib.item_cache import ItemCacheTable, item_store
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+from tests.mock.dynamo_db import MockLatencyTable
+
+USERNAME = 'bench-user'
+
+
+class CountingTable:
+    """get_item の呼び出し回数を数える boto3.resource.Table のラッパーです"""
+
+    def __init__(self, table):
+        self._table = table
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+    def get_item(self, **kwargs):
+        self.calls += 1
+        return self._table.get_item(**kwargs)
+
+
+def hot_uids(uids, reads, seed):
+    """順位の逆数に比例する重みで uid を選びます (一部の Todo に読み取りが集中します)"""
+    rand = random.Random(seed)
+    return rand.choices(uids, weights=[1 / rank for rank in range(1, len(uids) + 1)], k=reads)
+
+
+def run(args):
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = ddb.create_table(**dict(MOCK_DDB_SCHEMA, TableName=f"bench-item-cache-{uuid.uuid4()}"))
+    try:
+        todo = DynamoDBTodo(table)
+        uids = [todo.add_item(subject=f"todo {n}", username=USERNAME) for n in range(args.items)]
+        reads = hot_uids(uids, args.reads, args.seed)
+        backends = ['none', 'memory'] + (['redis'] if args.redis_url else [])
+        for backend in backends:
+            counting = CountingTable(MockLatencyTable(table, args.latency_ms / 1000))
+            store = item_store(backend, ttl=args.ttl, url=args.redis_url)
+            db = DynamoDBTodo(counting if store is None else ItemCacheTable(counting, store))
+            start = time.perf_counter()
+            for uid in reads:
+                db.get_item(uid, username=USERNAME)
+            elapsed = time.perf_counter() - start
+            name = 'direct' if backend == 'none' else backend
+            print(f"{name:>7} {elapsed / args.reads * 1000000:10.1f}us/read {counting.calls:8d} GetItem")
+    finally:
+        table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--reads', type=int, default=5000)
+    parser.add_argument('--ttl', type=float, default=60, help='キャッシュの有効期限 (秒)')
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""app.py のルートを Chalice のテストクライアントから呼び出し、ルートごとのレイテンシーと消費キャパシティを計測します
+
+benchmarks.datagen で生成したデータセットを chalicelib.bulk_load.BulkLoader で登録したあと、
+ルートごとに --requests 回リクエストし、p50/p95/p99 のレイテンシー、1 秒あたりのリクエスト数、
+消費したキャパシティユニット (ReturnConsumedCapacity=TOTAL) を集計します。
+結果は --output の JSON に保存し、実行ごとに比較できます。
+
+リクエストは chalice.test.Client が .chalice/config.json と同じ形式の一時的なステージ bench で実行します。
+--env で SEARCH_INDEX_ENABLED, STATS_ENABLED, CACHE_ENABLED, DB_BACKEND などの設定を指定できます。
+リクエストには Accept: COMPRESSED_JSON_CONTENT_TYPE と Accept-Encoding: gzip, br を付与するため、COMPRESSION_ENABLED=true の場合は
+圧縮後のレスポンスのサイズ (mean_response_bytes、圧縮した本文は base64 のサイズ) を比較できます。
+(get_todos_fields は FIELDS_ENABLED=true の場合のみ属性を絞り込みます)
+get_todo_changes はユーザーごとに前回の next_token を ?since に指定するため、
+2 回目以降は直近の変更のみを読み取る差分同期のコストを計測します。
+Authorization ヘッダーには cognito:username を含む署名のない JWT を渡し、
+chalice local と同じくトークンのクレームからユーザーを決定します。
+
+--endpoint-url を指定した場合は DynamoDB Local などの実テーブルを使用し、
+指定しない場合は moto.mock_dynamodb2 をローカルの代替として使用します。
+(moto のレイテンシーはプロセス内の処理時間のみで、ネットワークの往復時間は含みません)
+
+    $ python -m benchmarks.bench_routes --users 20 --todos-per-user 200 --requests 200 \\
+        --env STATS_ENABLED=true --output results.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import tempfile
+import argparse
+import warnings
+import datetime
+from contextlib import nullcontext
+
+import boto3
+
+import app
+from benchmarks import datagen
+from chalicelib.bulk_load import BulkLoader
+from chalicelib.compression import COMPRESSED_JSON_CONTENT_TYPE
+from chalicelib.db import DynamoDBTodo
+from chalicelib.validates import Validates
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+
+STAGE = 'bench'
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """ソート済みの values の p パーセンタイルを返します (nearest-rank 法)"""
+    if not values:
+        return None
+    return values[max(0, -(-len(values) * p // 100) - 1)]
+
+
+def authorization(username):
+    """cognito:username を含む署名のない JWT を返します"""
+    def _encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii').rstrip('=')
+    return '.'.join((_encode({'alg': 'none'}), _encode({'cognito:username': username}), ''))
+
+
+class CapacityRecorder:
+    """botocore のイベントで ReturnConsumedCapacity を付与し、消費したキャパシティユニットを集計します
+
+    イベントは boto3 のデフォルトセッションに登録するため、
+    登録したあとに app.get_app_db が生成するクライアントにも適用されます。
+    """
+
+    def __init__(self, session):
+        self.units = 0.0
+        session.events.register('before-parameter-build.dynamodb', self._provide_params)
+        session.events.register('after-call.dynamodb', self._after_call)
+
+    @staticmethod
+    def _provide_params(params, model, **__):
+        if 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _after_call(self, parsed, **__):
+        consumed = parsed.get('ConsumedCapacity', [])
+        for capacity in consumed if isinstance(consumed, list) else [consumed]:
+            self.units += capacity.get('CapacityUnits', 0)
+
+
+class Scenarios:
+    """ルートごとのリクエスト (method, path, body) を生成します
+
+    書き込みのルートは登録済みのデータセットの uid を使用し、
+    DELETE は POST で作成した Todo を削除するため、データセットの件数は一定に保たれます。
+    """
+
+    def __init__(self, todos, seed):
+        self._rand = random.Random(seed)
+        self._uids = {}
+        for todo in todos:
+            self._uids.setdefault(todo['username'], []).append(todo['uid'])
+        self._usernames = sorted(self._uids)
+        self._created = []
+        self._tokens = {}
+
+    def user(self):
+        return self._rand.choice(self._usernames)
+
+    def uid(self, username):
+        return self._rand.choice(self._uids[username])
+
+    def get_todos(self, username):
+        return 'GET', '/todos?limit=50', None
+
+    def get_todos_desc(self, username):
+        return 'GET', '/todos?limit=50&order=desc', None
+
+    def get_todos_fields(self, username):
+        return 'GET', '/todos?limit=50&fields=subject,state', None
+
+    def get_todos_query(self, username):
+        return 'GET', f"/todos?q={self._rand.choice(datagen.JAPANESE_WORDS)}", None
+
+    def get_todos_state(self, username):
+        return 'GET', '/todos?state=started', None
+
+    def get_todo(self, username):
+        return 'GET', f"/todos/{self.uid(username)}", None
+
+    def get_todo_counts(self, username):
+        return 'GET', '/todos/counts', None
+
+    def get_todo_stats(self, username):
+        return 'GET', '/todos/stats', None
+
+    def get_todo_changes(self, username):
+        token = self._tokens.get(username)
+        return 'GET', '/todos/changes' + (f"?since={token}" if token else ''), None
+
+    def add_new_todo(self, username):
+        return 'POST', '/todos', {'subject': 'bench', 'description': 'ベンチマーク'}
+
+    def update_todo(self, username):
+        state = self._rand.choice(Validates.STATE_ENUM)
+        return 'PUT', f"/todos/{self.uid(username)}", {'state': state}
+
+    def delete_todo(self, username):
+        return 'DELETE', f"/todos/{self._created.pop()}", None
+
+    def created(self, response):
+        # add_new_todo は uid をそのまま本文として返します
+        if response.status_code == 200:
+            self._created.append(response.body.decode('utf-8'))
+
+    def synced(self, username, response):
+        # 圧縮したレスポンスの場合は次回も since を指定せずにリクエストします
+        if response.status_code == 200 and 'content-encoding' not in response.headers:
+            self._tokens[username] = json.loads(response.body)['next_token']
+
+
+ROUTES = [
+    'get_todos', 'get_todos_desc', 'get_todos_fields', 'get_todos_query', 'get_todos_state', 'get_todo',
+    'get_todo_counts', 'get_todo_stats', 'get_todo_changes', 'add_new_todo', 'update_todo', 'delete_todo']
+
+
+def measure(client, scenarios, recorder, route, requests, warmup):
+    """1 つのルートを requests 回リクエストし、集計結果を返します"""
+    build = getattr(scenarios, route)
+    latencies = []
+    errors = 0
+    units = 0.0
+    elapsed = 0.0
+    body_bytes = 0
+    for attempt in range(warmup + requests):
+        username = scenarios.user()
+        if route == 'delete_todo':
+            # 削除する Todo は計測の対象外のリクエストで作成します
+            scenarios.created(_request(client, scenarios.add_new_todo(username), username))
+        method, path, body = build(username)
+        recorded = recorder.units
+        start = time.perf_counter()
+        response = _request(client, (method, path, body), username)
+        latency = time.perf_counter() - start
+        if route == 'add_new_todo':
+            scenarios.created(response)
+        elif route == 'get_todo_changes':
+            scenarios.synced(username, response)
+        if attempt < warmup:
+            continue
+        latencies.append(latency)
+        elapsed += latency
+        units += recorder.units - recorded
+        body_bytes += len(response.body)
+        errors += response.status_code >= 400
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES},
+        'mean_ms': round(elapsed / requests * 1000, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'consumed_capacity_units': round(units, 1),
+        'consumed_capacity_units_per_request': round(units / requests, 3),
+        'mean_response_bytes': round(body_bytes / requests),
+    }
+
+
+def _request(client, request, username):
+    method, path, body = request
+    headers = {'authorization': authorization(username),
+               'accept': COMPRESSED_JSON_CONTENT_TYPE, 'accept-encoding': 'gzip, br'}
+    if body is None:
+        return client.request(method, path, headers=headers)
+    headers['content-type'] = 'application/json'
+    return client.request(method, path, headers=headers, body=json.dumps(body).encode('utf-8'))
+
+
+def stage_config(tablename, endpoint_url, env):
+    """テストクライアントに渡す一時的なプロジェクトの .chalice/config.json を作成します"""
+    project_dir = tempfile.mkdtemp(prefix='bench-routes-')
+    os.makedirs(os.path.join(project_dir, '.chalice'))
+    environment = {'APP_TABLE_NAME': tablename, 'CURSOR_SECRET': 'bench-cursor-secret', **env}
+    if endpoint_url is not None:
+        environment['DYNAMO_DB_ENDPOINT'] = endpoint_url
+    with open(os.path.join(project_dir, '.chalice', 'config.json'), 'w') as f:
+        json.dump({'version': '2.0', 'app_name': app.app.app_name,
+                   'stages': {STAGE: {'environment_variables': environment}}}, f)
+    return project_dir
+
+
+def run(args):
+    from chalice.test import Client
+
+    # chalice local は JWT を検証しない旨の警告を、リクエストごとに表示しないようにします
+    warnings.filterwarnings('ignore', message='CognitoUserPoolAuthorizer')
+    env = dict(pair.split('=', 1) for pair in args.env)
+    boto3.setup_default_session()
+    recorder = CapacityRecorder(boto3.DEFAULT_SESSION)
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = ddb.create_table(**dict(MOCK_DDB_SCHEMA, TableName=f"bench-routes-{uuid.uuid4()}"))
+    try:
+        todos = list(datagen.todos_from_args(args))
+        loaded = BulkLoader(DynamoDBTodo(
+            table,
+            search_index=env.get('SEARCH_INDEX_ENABLED') == 'true',
+            stats=env.get('STATS_ENABLED') == 'true')).load(todos)
+        scenarios = Scenarios(todos, args.seed)
+        app._DB = None
+        results = {}
+        with Client(app.app, stage_name=STAGE,
+                    project_dir=stage_config(table.name, args.endpoint_url, env)) as client:
+            for route in args.routes:
+                results[route] = measure(
+                    client.http, scenarios, recorder, route, args.requests, args.warmup)
+                print(f"{route:>16} {results[route]['p50_ms']:8.2f}ms p50 "
+                      f"{results[route]['p95_ms']:8.2f}ms p95 {results[route]['p99_ms']:8.2f}ms p99 "
+                      f"{results[route]['requests_per_second']:8.1f} req/s "
+                      f"{results[route]['consumed_capacity_units']:8.1f} CU "
+                      f"{results[route]['mean_response_bytes']:8d} B", file=sys.stderr)
+    finally:
+        app._DB = None
+        table.delete()
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'backend': 'moto' if args.endpoint_url is None else args.endpoint_url,
+        'env': env,
+        'dataset': {
+            'users': args.users, 'todos_per_user': args.todos_per_user,
+            'description_length': args.description_length, 'distribution': args.distribution,
+            'japanese_ratio': args.japanese_ratio, 'seed': args.seed, 'loaded': loaded['loaded']},
+        'routes': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    datagen.add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=100, help='ルートごとのリクエスト数')
+    parser.add_argument('--warmup', type=int, default=5, help='計測から除くルートごとの最初のリクエスト数')
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=ROUTES)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='ステージの環境変数 (例: STATS_ENABLED=true)')
+    parser.add_argument('--output', default=None, help='結果を保存する JSON のファイル')
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        result = run(args)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""逐次スキャンと並列スキャン (Segment/TotalSegments) の所要時間を比較します
+
+--endpoint-url を指定した場合は DynamoDB Local などの実テーブルを使用し、
+指定しない場合は moto.mock_dynamodb2 をローカルの代替として使用します。
+
+moto は Segment/TotalSegments を無視するため tests.mock.dynamo_db.MockSegmentedTable で
+セグメント分割を再現し、--latency-ms で scan 1 回あたりのネットワーク往復時間を再現します。
+(moto はプロセス内で動作するため、往復時間がない場合は並列化の効果は測定できません)
+
+    $ python -m benchmarks.bench_scan --items 5000 --page-size 100 --latency-ms 20
+"""
+import os
+import time
+import uuid
+import argparse
+from contextlib import nullcontext
+
+import boto3
+
+from chalicelib.db import DynamoDBTodo
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+from tests.mock.dynamo_db import MockSegmentedTable
+
+
+def seed(table, count):
+    with table.batch_writer() as batch:
+        for i in range(count):
+            batch.put_item(Item={
+                'uid': str(uuid.uuid4()),
+                'subject': f"subject {i}",
+                'description': 'x' * 200,
+                'state': 'unstarted',
+                'username': f"user{i % 100}"
+            })
+
+
+def measure(func):
+    start = time.perf_counter()
+    count = sum(1 for _ in func())
+    return time.perf_counter() - start, count
+
+
+def run(args):
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    table = ddb.create_table(**dict(
+        MOCK_DDB_SCHEMA, TableName=f"bench-scan-{uuid.uuid4()}"))
+    try:
+        seed(table, args.items)
+        todo = DynamoDBTodo(MockSegmentedTable(table, latency=args.latency_ms / 1000)
+                            if args.endpoint_url is None else table)
+        elapsed, count = measure(
+            lambda: todo.get_pagenated_items(Limit=args.page_size))
+        print(f"{'sequential':>12} {elapsed:8.3f}s {count:>8} items")
+        for segments in args.segments:
+            elapsed, count = measure(
+                lambda: todo.parallel_scan(segments, Limit=args.page_size))
+            print(f"{f'segments={segments}':>12} {elapsed:8.3f}s {count:>8} items")
+    finally:
+        table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--segments', type=int, nargs='+', default=[2, 4, 8, 16])
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""クエリによる Todo の検索で、FilterExpression と転置索引の読み取り件数と所要時間を比較します
+
+filter は username のすべての Todo を読み取り FilterExpression で絞り込みます。
+index は chalicelib.search.SearchIndex のポスティングから候補を絞り込み、候補の Todo のみを読み取ります。
+読み取り件数は botocore の after-call イベントで、Query のレスポンスの件数と
+BatchGetItem/GetItem で取得したアイテム数を集計します。
+
+moto は Query の ScannedCount にテーブル全体の件数を返すため、filter はポスティングのない
+別のテーブルで計測し、index は FilterExpression を使わないため Count を読み取り件数とします。
+
+    $ python -m benchmarks.bench_search --items 5000 --query "subject 42"
+"""
+import os
+import time
+import uuid
+import random
+import argparse
+from contextlib import nullcontext
+
+import boto3
+
+from chalicelib.db import DynamoDBTodo
+from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
+
+USERNAME = 'bench'
+WORDS = ['買い物', '掃除', 'cat', 'tower', 'レポート', 'meeting', '洗濯', 'ハンバーガー']
+
+
+class ReadCounter:
+    """botocore のイベントで DynamoDB から読み取ったアイテム数を集計します"""
+
+    def __init__(self, client, key):
+        self.count = 0
+        self._key = key
+        client.meta.events.register('after-call.dynamodb', self._after_call)
+
+    def _after_call(self, parsed, **__):
+        if self._key in parsed:
+            self.count += parsed[self._key]
+        elif 'Responses' in parsed:
+            self.count += sum(len(items) for items in parsed['Responses'].values())
+        elif 'Item' in parsed:
+            self.count += 1
+
+
+def seed(todo, count):
+    rand = random.Random(0)
+    for start in range(0, count, 100):
+        todo.batch_write([{
+            'op': 'create',
+            'subject': f"subject {i} {rand.choice(WORDS)}",
+            'description': ' '.join(rand.sample(WORDS, 3)),
+        } for i in range(start, min(start + 100, count))], username=USERNAME)
+
+
+def measure(name, todo, key, query):
+    counter = ReadCounter(todo._table.meta.client, key)
+    start = time.perf_counter()
+    count = len(todo.list_items(query=query, username=USERNAME))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8} {elapsed:8.3f}s {count:>8} hits {counter.count:>8} items read")
+
+
+def run(args):
+    ddb = boto3.resource('dynamodb', endpoint_url=args.endpoint_url)
+    tables = [ddb.create_table(**dict(
+        MOCK_DDB_SCHEMA, TableName=f"bench-search-{uuid.uuid4()}")) for _ in range(2)]
+    try:
+        todo = DynamoDBTodo(tables[0])
+        indexed = DynamoDBTodo(tables[1], search_index=True)
+        seed(todo, args.items)
+        seed(indexed, args.items)
+        measure('filter', todo, 'ScannedCount', args.query)
+        measure('index', indexed, 'Count', args.query)
+    finally:
+        for table in tables:
+            table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--query', default='ハンバーガー')
+    parser.add_argument('--endpoint-url', default=None)
+    args = parser.parse_args()
+
+    if args.endpoint_url is None:
+        from moto import mock_dynamodb2
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+        mock = mock_dynamodb2()
+    else:
+        mock = nullcontext()
+    with mock:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
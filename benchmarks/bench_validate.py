@@ -0,0 +1,100 @@
+"""Todo の追加、更新のリクエストごとのバリデーションの所要時間を比較します
+
+以下の 2 つの方法で、正しい本文と不正な本文 (subject が空、description が数値) をそれぞれ検証します。
+
+    legacy: app.py と DynamoDBTodo の両方で Validates.subject/description/state/username を呼び出す
+            (以前の実装、不正な本文は最初のエラーで BadRequestError を発生させます)
+    schema: TODO_CREATE_SCHEMA/TODO_UPDATE_SCHEMA で 1 回だけ検証し、すべてのエラーを集める
+
+結果は 1 リクエストあたりのマイクロ秒で表示します。DynamoDB は呼び出しません。
+(不正な本文の schema は最初のエラーで止めずにすべてのエラーを集めるため、legacy より時間がかかります)
+
+    $ python -m benchmarks.bench_validate --number 100000
+"""
+import timeit
+import argparse
+
+from chalice import BadRequestError
+
+from chalicelib.validates import Validates, TODO_CREATE_SCHEMA, TODO_UPDATE_SCHEMA
+
+USERNAME = 'bench-user'
+BODIES = {
+    'create': {
+        'valid': {'subject': 'ベンチマーク', 'description': '説明' * 50},
+        'invalid': {'subject': '', 'description': 1}},
+    'update': {
+        'valid': {'subject': 'ベンチマーク', 'description': '説明' * 50, 'state': 'completed'},
+        'invalid': {'subject': '', 'description': 1, 'state': 'unknown_state'}},
+}
+
+
+def legacy_create(body):
+    # app.add_new_todo
+    subject = body.get('subject')
+    description = body.get('description')
+    Validates.subject(subject)
+    Validates.description(description) if description is not None else None
+    Validates.username(USERNAME)
+    # DynamoDBTodo.add_item (_new_item)
+    Validates.subject(subject)
+    Validates.description(description)
+    Validates.state('unstarted')
+    Validates.username(USERNAME)
+
+
+def legacy_update(body):
+    # app.update_todo
+    subject, description, state = body.get('subject'), body.get('description'), body.get('state')
+    Validates.subject(subject) if subject is not None else None
+    Validates.description(description) if description is not None else None
+    Validates.state(state) if state is not None else None
+    Validates.username(USERNAME)
+    # DynamoDBTodo.update_item
+    Validates.username(USERNAME)
+    Validates.subject(subject) if subject is not None else None
+    Validates.description(description) if description is not None else None
+    Validates.state(state) if state is not None else None
+
+
+def schema_create(body):
+    TODO_CREATE_SCHEMA.validate(body)
+    Validates.username(USERNAME)
+
+
+def schema_update(body):
+    TODO_UPDATE_SCHEMA.validate(body)
+    Validates.username(USERNAME)
+
+
+VALIDATORS = {
+    'create': {'legacy': legacy_create, 'schema': schema_create},
+    'update': {'legacy': legacy_update, 'schema': schema_update},
+}
+
+
+def measure(validator, body, number):
+    """validator(body) を number 回呼び出し、1 回あたりのマイクロ秒を返します"""
+    def _call():
+        try:
+            validator(body)
+        except BadRequestError:
+            pass
+    return timeit.timeit(_call, number=number) / number * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000, help='計測ごとの呼び出し回数')
+    parser.add_argument('--operations', nargs='+', choices=list(VALIDATORS), default=list(VALIDATORS))
+    args = parser.parse_args()
+
+    for operation in args.operations:
+        for case, body in BODIES[operation].items():
+            for name, validator in VALIDATORS[operation].items():
+                elapsed = measure(validator, body, args.number)
+                print(f"{operation:>7} {case:>8} {name:>7} {elapsed:8.3f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""ベンチマーク用の Todo のデータセットを生成します
+
+ユーザー数 × ユーザーごとの Todo 数のデータセットを、再現可能な乱数 (--seed) で生成します。
+description の文字数は fixed (常に平均), uniform (0 から平均の 2 倍), lognormal (平均の周りに裾の長い分布)
+から選択でき、--japanese-ratio の割合で日本語のテキストになります。
+uid は作成日時が過去 --days 日に分散した UUIDv7 です。
+
+出力は ddb_bulk_load.py で読み込める JSONL です。
+
+    $ python -m benchmarks.datagen --users 100 --todos-per-user 1000 -o todos.jsonl
+    $ python ddb_bulk_load.py todos.jsonl -t <TABLE> --workers 8
+"""
+import sys
+import json
+import math
+import time
+import random
+import argparse
+
+from chalicelib.uid import UUIDv7
+from chalicelib.validates import Validates
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+STATE_WEIGHTS = [5, 2, 3]
+JAPANESE_WORDS = [
+    '買い物', '掃除', '洗濯', 'レポート', '会議', 'ハンバーガー', '友達', '迎えに行く', '予約する',
+    '資料を作る', '猫', 'タワー', '海', 'イルカ', '週末', '旅行', '病院', '銀行', '電話する', '確認する']
+ENGLISH_WORDS = [
+    'buy', 'milk', 'clean', 'room', 'report', 'meeting', 'cat', 'tower', 'call', 'bank',
+    'review', 'deploy', 'book', 'flight', 'dentist', 'laundry', 'weekend', 'trip', 'fix', 'bug']
+
+
+def description_length(rand, mean, distribution):
+    """分布に従い description の文字数を返します (Validates.DESCRIPTION_MAX_LEN を上限とします)"""
+    if distribution == 'fixed':
+        length = mean
+    elif distribution == 'uniform':
+        length = rand.randint(0, mean * 2)
+    else:
+        # 平均が mean になるよう、sigma = 1 の対数正規分布の mu を調整します
+        length = int(rand.lognormvariate(math.log(max(mean, 1)) - 0.5, 1.0))
+    return min(length, Validates.DESCRIPTION_MAX_LEN)
+
+
+def text(rand, length, japanese):
+    """length 文字のテキストを単語の組み合わせで生成します"""
+    words = JAPANESE_WORDS if japanese else ENGLISH_WORDS
+    separator = '、' if japanese else ' '
+    parts = []
+    size = 0
+    while size < length:
+        word = rand.choice(words)
+        parts.append(word)
+        size += len(word) + len(separator)
+    return separator.join(parts)[:length]
+
+
+def generate_todos(users, todos_per_user, mean_description_length=200,
+                   distribution='lognormal', japanese_ratio=0.5, days=30, seed=0):
+    """Todo オブジェクトを 1 件ずつ返すジェネレータです
+
+    Args:
+        users (int): ユーザー数が渡ってきます (username は user0000 の形式になります)
+        todos_per_user (int): ユーザーごとの Todo 数が渡ってきます
+        mean_description_length (int): description の平均の文字数が渡ってきます
+        distribution (str): DISTRIBUTIONS のいずれかが渡ってきます
+        japanese_ratio (float): 日本語のテキストにする割合が渡ってきます
+        days (int): uid の作成日時を分散させる日数が渡ってきます
+        seed (int): 乱数のシードが渡ってきます
+
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(
+            f"distribution (Your Request: {distribution}) REQUIRED: {', '.join(DISTRIBUTIONS)}")
+    rand = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    for user in range(users):
+        username = f"user{user:04d}"
+        for _ in range(todos_per_user):
+            japanese = rand.random() < japanese_ratio
+            yield {
+                'uid': UUIDv7.generate(now_ms - rand.randint(0, days * 24 * 60 * 60 * 1000)),
+                'subject': text(rand, rand.randint(8, 40), japanese),
+                'description': text(
+                    rand, description_length(rand, mean_description_length, distribution), japanese),
+                'state': rand.choices(Validates.STATE_ENUM, STATE_WEIGHTS)[0],
+                'username': username,
+            }
+
+
+def add_arguments(parser):
+    """データセットの引数を追加します (bench_routes と共通です)"""
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--todos-per-user', type=int, default=100)
+    parser.add_argument('--description-length', type=int, default=200,
+                        help='description の平均の文字数')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--japanese-ratio', type=float, default=0.5)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def todos_from_args(args):
+    return generate_todos(
+        args.users, args.todos_per_user, args.description_length,
+        args.distribution, args.japanese_ratio, args.days, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument('-o', '--output', default=None,
+                        help='出力先のファイル 指定がない場合は標準出力に書き出します')
+    args = parser.parse_args()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for todo in todos_from_args(args):
+            out.write(json.dumps(todo, ensure_ascii=False) + '\n')
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
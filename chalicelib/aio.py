@@ -0,0 +1,150 @@
+import asyncio
+import inspect
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from chalicelib.connection import DEFAULT_MAX_POOL_CONNECTIONS
+from chalicelib.db import DEFAULT_USERNAME
+from chalicelib.validates import Validates
+
+
+DEFAULT_AIO_CONCURRENCY = DEFAULT_MAX_POOL_CONNECTIONS
+
+
+async def gather_bounded(awaitables, limit=DEFAULT_AIO_CONCURRENCY, return_exceptions=False):
+    """awaitable のリストを、同時に実行する数を limit 以下に制限して並行に実行します
+
+    asyncio.gather と同じく、結果を awaitables と同じ順序のリストで返します。
+    実行を待っている awaitable は開始しないため、DynamoDB への同時リクエスト数も limit 以下になります。
+
+    Args:
+        awaitables (iterable): コルーチンなどの awaitable が渡ってきます
+        limit (int): 同時に実行する数の上限が渡ってきます
+        return_exceptions (bool): True の場合は例外も結果として返します (asyncio.gather を参照)
+
+    Return:
+        list: awaitable ごとの結果のリストを返します
+
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+    return await asyncio.gather(
+        *(_bounded(awaitable) for awaitable in awaitables), return_exceptions=return_exceptions)
+
+
+class AsyncDynamoDBTodo:
+    """DynamoDBTodo と同じメソッドを asyncio のコルーチンとして提供します
+
+    boto3 の呼び出しはブロックするため、各メソッドをスレッドプールの executor で実行し、
+    イベントループは待機中に他のコルーチンを進めます。
+    (aiobotocore などの非同期クライアントは依存パッケージを増やすため使用しません
+    boto3 の低レベルクライアントはスレッドセーフで、parallel_scan と同じく 1 つのテーブルを共有します)
+
+    ラップした DynamoDBTodo のメソッドは await で呼び出し、
+    ジェネレータのメソッド (iter_all_items など) は async for で 1 件ずつ取得します。
+    ユーザーやステータス、セグメントごとの呼び出しを gather_bounded で並行に行うメソッドを追加で提供します。
+
+    同時に実行する呼び出しは executor のスレッド数 (concurrency) 以下になります。
+    DynamoDB クライアントの接続プール (DDB_MAX_POOL_CONNECTIONS) より大きくすると
+    接続の空きを待つため、同じ値にしてください。
+
+    constructer:
+        Args:
+            todo (DynamoDBTodo): ラップする DynamoDBTodo (または CachedDynamoDBTodo) が渡ってきます
+            concurrency (int): 同時に実行する呼び出しの上限が渡ってきます
+            executor (concurrent.futures.Executor): 指定した場合はこの executor で実行します
+
+    """
+
+    def __init__(self, todo, concurrency=DEFAULT_AIO_CONCURRENCY, executor=None):
+        self._todo = todo
+        self.concurrency = concurrency
+        self._executor = executor or ThreadPoolExecutor(max_workers=concurrency)
+
+    def __getattr__(self, name):
+        attr = getattr(self._todo, name)
+        if not callable(attr):
+            return attr
+        if inspect.isgeneratorfunction(attr):
+            return functools.partial(self._iterate, attr)
+        return functools.partial(self._run, attr)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _iterate(self, func, *args, **kwargs):
+        """ジェネレータのメソッドを executor で 1 件ずつ進める async ジェネレータです"""
+        done = object()
+        generator = func(*args, **kwargs)
+        try:
+            while True:
+                item = await self._run(next, generator, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            await self._run(generator.close)
+
+    def close(self):
+        """executor のスレッドを終了します"""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def count_items_by_state(self, username=DEFAULT_USERNAME):
+        """ステータスごとの Todo の件数を、ステータスごとの GSI の Query を並行に行い取得します"""
+        counts = await gather_bounded(
+            [self._run(self._todo.count_items, username, state) for state in Validates.STATE_ENUM],
+            self.concurrency)
+        return dict(zip(Validates.STATE_ENUM, counts))
+
+    async def list_items_by_states(self, states, username=DEFAULT_USERNAME, **kwargs):
+        """複数のステータスの Todo のリストを、ステータスごとの GSI の Query を並行に行い取得します
+
+        Return:
+            dict: ステータスごとの Todo オブジェクトのリストを返します
+
+        """
+        results = await gather_bounded(
+            [self.list_items(username=username, state=state, **kwargs) for state in states],
+            self.concurrency)
+        return dict(zip(states, results))
+
+    async def list_items_by_users(self, usernames, **kwargs):
+        """複数のユーザーの Todo のリストを、ユーザーごとの Query を並行に行い取得します (管理用)
+
+        Args:
+            usernames (list): ユーザー名のリストが渡ってきます (重複は取り除きます)
+            kwargs: list_items に渡す引数が渡ってきます
+
+        Return:
+            dict: ユーザーごとの Todo オブジェクトのリストを返します
+
+        """
+        usernames = list(dict.fromkeys(usernames))
+        results = await gather_bounded(
+            [self.list_items(username=username, **kwargs) for username in usernames],
+            self.concurrency)
+        return dict(zip(usernames, results))
+
+    async def list_all_items(self, total_segments=None):
+        """すべての Todo オブジェクトを、Segment/TotalSegments のセグメントごとのスキャンを並行に行い取得します
+
+        total_segments の指定がない場合は concurrency をセグメント数とします。
+        アイテムの順序は保証されません。
+        """
+        total_segments = total_segments or self.concurrency
+        segments = await gather_bounded(
+            [self._run(lambda segment=segment: list(self._todo.get_pagenated_items(
+                Segment=segment, TotalSegments=total_segments)))
+             for segment in range(total_segments)],
+            self.concurrency)
+        return [item for segment in segments for item in segment]
@@ -0,0 +1,250 @@
+import csv
+import json
+import math
+import time
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from chalice import BadRequestError
+
+from chalicelib.db import DEFAULT_USERNAME, BATCH_WRITE_CHUNK_SIZE, INITIAL_VERSION
+from chalicelib.uid import UUIDv7
+from chalicelib.validates import Validates
+
+
+DEFAULT_WORKERS = 4
+INPUT_FORMATS = ('jsonl', 'csv')
+WRITE_UNIT_BYTES = 1024
+
+
+class TokenBucket:
+    """1 秒あたり rate 個のトークンを補充するトークンバケットです
+
+    acquire は必要なトークンを先に予約し、不足分が補充されるまで待機します。
+    予約はロックの中で行い、待機はロックの外で行うため、複数のスレッドから呼び出しても
+    全体の消費量は rate に収まり、各スレッドは予約した順に書き込みます。
+    バケットの容量より多いトークンも、容量を超えた分の補充を待って取得できます。
+
+    constructer:
+        Args:
+            rate (float): 1 秒あたりに補充するトークン数が渡ってきます
+            capacity (float): バケットの容量が渡ってきます 指定がない場合は rate と同じになります
+            clock (callable): 現在時刻 (秒) を返す関数 (テストでの差し替え用)
+            sleep (callable): 待機に使用する関数 (テストでの差し替え用)
+
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """トークンを取得します 不足している場合は補充されるまで待機します
+
+        Return:
+            float: 待機した時間 (秒) を返します
+
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            delay = max(0.0, -self._tokens / self.rate)
+        if delay:
+            self._sleep(delay)
+        return delay
+
+
+def read_rows(stream, input_format='jsonl'):
+    """JSONL または CSV のストリームから、行を 1 件ずつ dict として返すジェネレータです
+
+    ファイル全体を読み込まずに 1 行ずつ処理するため、ファイルのサイズによらずメモリ使用量は一定です。
+    JSONL の空行と JSON として不正な行も行として数え、空の dict または元の文字列を返します。
+    (いずれも build_item で不正な行になります)
+    CSV は 1 行目をヘッダーとして扱い、ヘッダーの行は数えません。
+
+    Args:
+        stream (io.TextIOBase): 入力のテキストストリームが渡ってきます
+        input_format (str): INPUT_FORMATS のいずれかが渡ってきます
+
+    Raises:
+        ValueError: input_format が INPUT_FORMATS に含まれないケースで例外が発生します
+
+    """
+    if input_format == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            try:
+                yield json.loads(line) if line else {}
+            except ValueError:
+                yield line
+    elif input_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+    else:
+        raise ValueError(
+            f"input_format (Your Request: {input_format}) REQUIRED: {', '.join(INPUT_FORMATS)}")
+
+
+def build_item(row, username=DEFAULT_USERNAME):
+    """入力の行から Todo オブジェクトを生成し、Validates でバリデーションを行います
+
+    uid がない行は UUIDv7 を生成し、state がない行は unstarted、username がない行は username を使用します。
+    version は行の値を整数として使用し、ない場合は INITIAL_VERSION になります。
+
+    Raises:
+        BadRequestError: バリデーションに失敗したケースで例外が発生します
+
+    Return:
+        dict: Todo オブジェクトを返します
+
+    """
+    row_type = type(row)
+    if row_type is not dict:
+        raise BadRequestError(
+            f"row type (Your Request: {row_type}) "
+            f"REQUIRED: {dict}")
+
+    item = {
+        'uid': row.get('uid') or UUIDv7.generate(),
+        'subject': row.get('subject'),
+        'description': row.get('description', ''),
+        'state': row.get('state', 'unstarted'),
+        'username': row.get('username', username),
+        'version': row.get('version', INITIAL_VERSION),
+    }
+    Validates.uid(item['uid'])
+    Validates.subject(item['subject'])
+    Validates.description(item['description'])
+    Validates.state(item['state'])
+    Validates.username(item['username'])
+    try:
+        item['version'] = int(item['version'])
+    except (TypeError, ValueError):
+        raise BadRequestError(
+            f"version type (Your Request: {type(item['version'])}) "
+            f"REQUIRED: {int}")
+    Validates.expected_version(item['version'])
+    return item
+
+
+def write_units(item):
+    """Todo オブジェクトの書き込みに消費する WCU の概算を返します (1 KB ごとに 1 WCU)"""
+    size = len(json.dumps(item, ensure_ascii=False).encode('utf-8'))
+    return max(1, math.ceil(size / WRITE_UNIT_BYTES))
+
+
+class BulkLoader:
+    """入力の行をバリデーションし、DynamoDBTodo.import_items で並列にまとめて書き込みます
+
+    行を batch_size 件ずつのバッチに分け、スレッドプールの各スレッドで書き込みます。
+    実行中のバッチは workers * 2 件までに制限するため、入力が大きくてもメモリ使用量は一定です。
+    wcu_per_second を指定した場合は、書き込みの前に TokenBucket から消費する WCU を取得し、
+    テーブル全体の書き込みを指定した WCU/秒 に抑えます。
+
+    バッチは並列に完了するため、offset は「その行までのすべてのバッチが完了した」位置を表します。
+    中断した場合は、最後に報告された offset から再開すれば行の取りこぼしはありません。
+    (offset 以降に完了していたバッチは再度書き込まれますが、同じ uid の上書きになります)
+
+    constructer:
+        Args:
+            todo_db (DynamoDBTodo): 書き込み先の DynamoDBTodo が渡ってきます
+            workers (int): 書き込みのスレッド数が渡ってきます
+            wcu_per_second (float): 書き込みの WCU/秒 の上限が渡ってきます 指定がない場合は制限しません
+            batch_size (int): 1 バッチの行数が渡ってきます
+            username (str): username を持たない行に使用するユーザー名が渡ってきます
+            on_progress (callable): バッチが完了するたびに、集計 (load の返り値と同じ dict) を渡して呼び出します
+            on_error (callable): 不正な行、書き込めなかった行があるたびに、(offset, message) を渡して呼び出します
+
+    """
+
+    def __init__(self, todo_db, workers=DEFAULT_WORKERS, wcu_per_second=None,
+                 batch_size=BATCH_WRITE_CHUNK_SIZE, username=DEFAULT_USERNAME,
+                 on_progress=None, on_error=None):
+        self._todo_db = todo_db
+        self._workers = workers
+        self._bucket = TokenBucket(wcu_per_second) if wcu_per_second else None
+        self._batch_size = batch_size
+        self._username = username
+        self._on_progress = on_progress or (lambda progress: None)
+        self._on_error = on_error or (lambda offset, message: None)
+
+    def _batches(self, rows, offset):
+        """(開始の offset, 終了の offset, Todo オブジェクトのリスト) を返すジェネレータです
+
+        BatchWriteItem は同じキーを複数含むリクエストを受け付けないため、
+        同じバッチに同じ (username, uid) の行がある場合は最後の行のみを書き込み、
+        前の行は不正な行として on_error に報告します。
+        """
+        start = end = offset
+        items = {}
+        for end, row in enumerate(islice(rows, offset, None), offset + 1):
+            try:
+                item = build_item(row, self._username)
+            except BadRequestError as e:
+                self._on_error(end - 1, str(e))
+            else:
+                key = (item['username'], item['uid'])
+                if key in items:
+                    self._on_error(
+                        items[key][0],
+                        f"Duplicated uid in the same batch, overwritten by offset {end - 1}. (uid: {item['uid']})")
+                items[key] = (end - 1, item)
+            if end - start == self._batch_size:
+                yield start, end, [item for _, item in items.values()]
+                start, items = end, {}
+        if end > start:
+            yield start, end, [item for _, item in items.values()]
+
+    def _write(self, start, items):
+        if self._bucket is not None and items:
+            self._bucket.acquire(sum(write_units(item) for item in items))
+        unprocessed = self._todo_db.import_items(items) if items else []
+        for item in unprocessed:
+            self._on_error(start, f"Unprocessed by DynamoDB. (uid: {item['uid']})")
+        return len(items), len(unprocessed)
+
+    def load(self, rows, offset=0):
+        """行を読み込み、すべて書き込むまで待機します
+
+        Args:
+            rows (iterable): read_rows が返す行のイテレータが渡ってきます
+            offset (int): 再開する位置 (先頭から読み飛ばす行数) が渡ってきます
+
+        Return:
+            dict: 読み込んだ行数 rows, 書き込んだ件数 loaded, 不正な行数 invalid,
+                  書き込めなかった件数 unprocessed, 再開に使用する位置 offset を返します
+
+        """
+        progress = {'rows': 0, 'loaded': 0, 'invalid': 0, 'unprocessed': 0, 'offset': offset}
+        completed = {}
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            running = {}
+
+            def _collect(futures):
+                for future in futures:
+                    start, end, size = running.pop(future)
+                    written, unprocessed = future.result()
+                    progress['rows'] += end - start
+                    progress['loaded'] += written - unprocessed
+                    progress['invalid'] += end - start - size
+                    progress['unprocessed'] += unprocessed
+                    completed[start] = end
+                while progress['offset'] in completed:
+                    progress['offset'] = completed.pop(progress['offset'])
+                self._on_progress(dict(progress))
+
+            for start, end, items in self._batches(iter(rows), offset):
+                if len(running) >= self._workers * 2:
+                    _collect(wait(running, return_when=FIRST_COMPLETED).done)
+                running[executor.submit(self._write, start, items)] = (start, end, len(items))
+            while running:
+                _collect(wait(running, return_when=FIRST_COMPLETED).done)
+        return progress
@@ -0,0 +1,211 @@
+import copy
+import time
+import itertools
+import threading
+from collections import OrderedDict
+
+from chalicelib.db import DEFAULT_USERNAME
+
+
+DEFAULT_CACHE_MAX_SIZE = 1024
+DEFAULT_CACHE_TTL = 5.0
+
+
+class TTLCache:
+    """エントリごとの有効期限 (TTL) を持つ、サイズ上限つきの LRU キャッシュです
+
+    エントリ数が maxsize を超えた場合は、最も長く参照されていないエントリから削除します。
+    有効期限を過ぎたエントリは、参照したときにミスとして扱い削除します。
+
+    constructer:
+        Args:
+            maxsize (int): 保持するエントリ数の上限
+            ttl (float): エントリの有効期限 (秒)
+            clock (callable): 現在時刻を返す関数 (テストでの差し替え用)
+
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=DEFAULT_CACHE_MAX_SIZE, ttl=DEFAULT_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """キーのエントリを返し、ヒット/ミスを記録します
+
+        Return:
+            object: 有効期限内のエントリの値を返します
+            default: エントリが存在しない、または有効期限を過ぎている場合 default を返します
+
+        """
+        with self._lock:
+            value, expires_at = self._entries.get(key, (self._MISSING, None))
+            if value is not self._MISSING and expires_at <= self.clock():
+                del self._entries[key]
+                value = self._MISSING
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """キーのエントリを登録し、上限を超えたエントリを LRU で削除します"""
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ヒット/ミスの回数などの統計を返します"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+        }
+
+
+class CachedDynamoDBTodo:
+    """DynamoDBTodo の読み取りを TTLCache でキャッシュするラッパーです
+
+    get_item は (username, uid)、list_items と list_items_page は (username, query) ごとにキャッシュします。
+    (limit, exclusive_start_key, order, since, until, state もキーに含めます)
+    count_items_by_state, get_stats もリストと同じく username ごとにキャッシュします。
+    キャッシュしていないメソッドは、ラップした DynamoDBTodo にそのまま委譲します。
+
+    同じコンテナの add_item, update_item, delete_item, batch_write は
+    対象の Todo と、そのユーザーのリストのキャッシュを無効化します。
+    リストのキャッシュはユーザーごとの世代番号をキーに含め、書き込みのたびに新しい世代番号にして無効化します。
+    (古い世代のエントリは参照されなくなり、LRU で削除されます)
+    世代番号もキャッシュと同じ maxsize の TTLCache に保持するため、ユーザーが増えてもメモリは増え続けません。
+    世代番号はコンテナ内で一意の連番のため、LRU で削除されたユーザーに新しい世代番号を割り当てても
+    古い世代のエントリを返すことはありません。
+
+    他のコンテナからの書き込みでは無効化されないため、最大で ttl 秒古い結果を返すことがあります。
+    ConditionalCheckFailed などで書き込みが失敗した場合も、念のためキャッシュを無効化します。
+
+    constructer:
+        Args:
+            todo (DynamoDBTodo): ラップする DynamoDBTodo インスタンスが渡ってきます
+            cache (TTLCache): 使用するキャッシュが渡ってきます
+
+    """
+
+    def __init__(self, todo, cache=None):
+        self._todo = todo
+        self.cache = TTLCache() if cache is None else cache
+        self._generations = TTLCache(maxsize=self.cache.maxsize, ttl=float('inf'))
+        self._next_generation = itertools.count()
+
+    def __getattr__(self, name):
+        return getattr(self._todo, name)
+
+    def _generation(self, username):
+        generation = self._generations.get(username)
+        if generation is None:
+            generation = next(self._next_generation)
+            self._generations.set(username, generation)
+        return generation
+
+    def _list_key(self, username, *args):
+        return ('list', username, self._generation(username)) + args
+
+    def _cached(self, key, load):
+        value = self.cache.get(key, TTLCache._MISSING)
+        if value is TTLCache._MISSING:
+            value = load()
+            self.cache.set(key, value)
+        return copy.deepcopy(value)
+
+    def invalidate(self, username, uids=()):
+        """ユーザーのリストのキャッシュと、指定した uid の Todo のキャッシュを無効化します"""
+        self._generations.set(username, next(self._next_generation))
+        for uid in uids:
+            self.cache.delete(('item', username, uid))
+
+    def get_item(self, uid, username=DEFAULT_USERNAME):
+        return self._cached(
+            ('item', username, uid),
+            lambda: self._todo.get_item(uid=uid, username=username))
+
+    def list_items(self, query='', username=DEFAULT_USERNAME,
+                   order=None, limit=None, since=None, until=None, state=None, fields=None):
+        return self._cached(
+            self._list_key(username, query, order, limit, since, until, state,
+                           tuple(fields) if fields is not None else None),
+            lambda: self._todo.list_items(
+                query=query, username=username,
+                order=order, limit=limit, since=since, until=until, state=state, fields=fields))
+
+    def list_items_page(self, query='', username=DEFAULT_USERNAME, limit=None, exclusive_start_key=None,
+                        order=None, since=None, until=None, state=None, fields=None):
+        start_key = tuple(sorted(exclusive_start_key.items())) if exclusive_start_key else None
+        return self._cached(
+            self._list_key(username, query, limit, start_key, order, since, until, state,
+                           tuple(fields) if fields is not None else None),
+            lambda: self._todo.list_items_page(
+                query=query, username=username,
+                limit=limit, exclusive_start_key=exclusive_start_key,
+                order=order, since=since, until=until, state=state, fields=fields))
+
+    def count_items_by_state(self, username=DEFAULT_USERNAME):
+        return self._cached(
+            self._list_key(username, 'count_items_by_state'),
+            lambda: self._todo.count_items_by_state(username=username))
+
+    def get_stats(self, username=DEFAULT_USERNAME):
+        return self._cached(
+            self._list_key(username, 'get_stats'),
+            lambda: self._todo.get_stats(username=username))
+
+    def add_item(self, subject, description='', username=DEFAULT_USERNAME, idempotency_key=None):
+        try:
+            return self._todo.add_item(subject=subject, description=description, username=username,
+                                       idempotency_key=idempotency_key)
+        finally:
+            self.invalidate(username)
+
+    def update_item(self, uid, subject=None, description=None, state=None,
+                    username=DEFAULT_USERNAME, expected_version=None):
+        try:
+            return self._todo.update_item(
+                uid=uid, subject=subject, description=description, state=state,
+                username=username, expected_version=expected_version)
+        finally:
+            self.invalidate(username, [uid])
+
+    def delete_item(self, uid, username=DEFAULT_USERNAME, expected_version=None):
+        try:
+            return self._todo.delete_item(
+                uid=uid, username=username, expected_version=expected_version)
+        finally:
+            self.invalidate(username, [uid])
+
+    def batch_write(self, operations, username=DEFAULT_USERNAME):
+        try:
+            return self._todo.batch_write(operations, username=username)
+        finally:
+            self.invalidate(username, [operation['uid'] for operation in operations
+                                       if 'uid' in operation])
@@ -0,0 +1,161 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+
+class TodoSerializer:
+    """Todo のスキーマに特化した、DynamoDB の AttributeValue との高速な変換を行います
+
+    Todo オブジェクトの属性は version を除きすべて文字列 (S) のため、
+    S と N を先に判定し、それ以外の型のみ boto3 の TypeSerializer/TypeDeserializer に委譲します。
+    N は整数の場合 Decimal ではなく int に変換するため、JSON へのエンコードも高速になります。
+    (整数でない数値は boto3 と同じく Decimal に変換します)
+
+    """
+
+    _serializer = TypeSerializer()
+    _deserializer = TypeDeserializer()
+
+    @classmethod
+    def serialize(cls, value):
+        """Python の値を AttributeValue に変換します"""
+        if isinstance(value, str):
+            return {'S': value}
+        if isinstance(value, bool):
+            return {'BOOL': value}
+        if isinstance(value, (int, Decimal)):
+            return {'N': str(value)}
+        return cls._serializer.serialize(value)
+
+    @classmethod
+    def deserialize(cls, attribute_value):
+        """AttributeValue を Python の値に変換します"""
+        if 'S' in attribute_value:
+            return attribute_value['S']
+        if 'N' in attribute_value:
+            number = attribute_value['N']
+            if number.lstrip('-').isdigit():
+                return int(number)
+            return Decimal(number)
+        return cls._deserializer.deserialize(attribute_value)
+
+    @classmethod
+    def serialize_item(cls, item):
+        return {key: cls.serialize(value) for key, value in item.items()}
+
+    @classmethod
+    def deserialize_item(cls, item):
+        deserialize = cls.deserialize
+        return {key: value['S'] if 'S' in value else deserialize(value)
+                for key, value in item.items()}
+
+
+class ClientTable:
+    """boto3.resource.Table と同じ呼び出し方で、DynamoDB の低レベルクライアントを使用します
+
+    DynamoDBTodo と SearchIndex が使用する操作 (query, scan, get_item, put_item, update_item,
+    delete_item と、meta.client の batch_get_item, batch_write_item, transact_write_items) のみを実装し、
+    パラメータとレスポンスのアイテムを TodoSerializer で変換します。
+    boto3.dynamodb.conditions の条件は ConditionExpressionBuilder で式に変換します。
+
+    constructer:
+        Args:
+            client (botocore.client.DynamoDB): DynamoDB の低レベルクライアントが渡ってきます
+            name (str): テーブル名が渡ってきます
+
+    """
+
+    _CONDITIONS = (
+        ('KeyConditionExpression', True),
+        ('FilterExpression', False),
+        ('ConditionExpression', False),
+    )
+
+    def __init__(self, client, name):
+        self.name = name
+        self._client = client
+        # boto3.resource.Table と同じく、バッチ操作は meta.client から呼び出します
+        self.meta = SimpleNamespace(client=self, events=client.meta.events)
+
+    def _params(self, kwargs):
+        """resource の形式のパラメータを、低レベルクライアントの形式に変換します"""
+        params = dict(kwargs, TableName=self.name)
+        builder = ConditionExpressionBuilder()
+        names = dict(params.get('ExpressionAttributeNames', {}))
+        values = dict(params.get('ExpressionAttributeValues', {}))
+        for key, is_key_condition in self._CONDITIONS:
+            if isinstance(params.get(key), ConditionBase):
+                built = builder.build_expression(params[key], is_key_condition=is_key_condition)
+                params[key] = built.condition_expression
+                names.update(built.attribute_name_placeholders)
+                values.update(built.attribute_value_placeholders)
+        if names:
+            params['ExpressionAttributeNames'] = names
+        if values:
+            params['ExpressionAttributeValues'] = TodoSerializer.serialize_item(values)
+        for key in 'Key', 'Item', 'ExclusiveStartKey':
+            if key in params:
+                params[key] = TodoSerializer.serialize_item(params[key])
+        return params
+
+    @staticmethod
+    def _response(response):
+        """低レベルクライアントのレスポンスのアイテムを、Python の値に変換します"""
+        if 'Items' in response:
+            response['Items'] = [TodoSerializer.deserialize_item(item) for item in response['Items']]
+        for key in 'Item', 'Attributes', 'LastEvaluatedKey':
+            if key in response:
+                response[key] = TodoSerializer.deserialize_item(response[key])
+        return response
+
+    def query(self, **kwargs):
+        return self._response(self._client.query(**self._params(kwargs)))
+
+    def scan(self, **kwargs):
+        return self._response(self._client.scan(**self._params(kwargs)))
+
+    def get_item(self, **kwargs):
+        return self._response(self._client.get_item(**self._params(kwargs)))
+
+    def put_item(self, **kwargs):
+        return self._response(self._client.put_item(**self._params(kwargs)))
+
+    def update_item(self, **kwargs):
+        return self._response(self._client.update_item(**self._params(kwargs)))
+
+    def delete_item(self, **kwargs):
+        return self._response(self._client.delete_item(**self._params(kwargs)))
+
+    @staticmethod
+    def _write_request(request, convert):
+        if 'PutRequest' in request:
+            return {'PutRequest': {'Item': convert(request['PutRequest']['Item'])}}
+        return {'DeleteRequest': {'Key': convert(request['DeleteRequest']['Key'])}}
+
+    def batch_get_item(self, RequestItems):
+        response = self._client.batch_get_item(RequestItems={
+            name: dict(request, Keys=[TodoSerializer.serialize_item(key) for key in request['Keys']])
+            for name, request in RequestItems.items()})
+        response['Responses'] = {
+            name: [TodoSerializer.deserialize_item(item) for item in items]
+            for name, items in response['Responses'].items()}
+        response['UnprocessedKeys'] = {
+            name: dict(request, Keys=[TodoSerializer.deserialize_item(key) for key in request['Keys']])
+            for name, request in response.get('UnprocessedKeys', {}).items()}
+        return response
+
+    def batch_write_item(self, RequestItems):
+        response = self._client.batch_write_item(RequestItems={
+            name: [self._write_request(request, TodoSerializer.serialize_item) for request in requests]
+            for name, requests in RequestItems.items()})
+        response['UnprocessedItems'] = {
+            name: [self._write_request(request, TodoSerializer.deserialize_item) for request in requests]
+            for name, requests in response.get('UnprocessedItems', {}).items()}
+        return response
+
+    def transact_write_items(self, TransactItems):
+        return self._client.transact_write_items(TransactItems=[
+            {action: self._params(params) for action, params in transact_item.items()}
+            for transact_item in TransactItems])
@@ -0,0 +1,284 @@
+import copy
+import time
+import inspect
+import itertools
+import threading
+from collections import OrderedDict
+
+from chalice import NotFoundError
+
+from chalicelib.db import DEFAULT_USERNAME
+
+
+DEFAULT_COALESCE_WINDOW = 1.0
+UPDATE_ATTRIBUTES = ('subject', 'description', 'state')
+
+
+class InMemoryQueue:
+    """SQS と同じ受信、削除、可視性の操作を持つ、プロセス内のキューです
+
+    CoalescingDynamoDBTodo が書き込みを待つ更新を保持するキューのローカルの代替です。
+    プロセスが停止すると保持したメッセージは失われるため、永続的なキューの代わりにはなりません。
+    SQS や DynamoDB Streams のコンシューマーと同じく、受信したメッセージは delete するまで
+    他の receive からは見えなくなり、release すると再び受信できるようになります。
+    (同じ send, receive, delete, release を持つクラスであれば、SQS などのキューに差し替えられます)
+
+    メッセージは送信した順に受信します。
+
+    """
+
+    def __init__(self):
+        self._messages = OrderedDict()
+        self._in_flight = {}
+        self._receipts = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """受信できるメッセージの件数を返します (受信済みで削除していないメッセージは含みません)"""
+        return len(self._messages)
+
+    def send(self, message):
+        """メッセージを送信します (メッセージはコピーして保持します)"""
+        with self._lock:
+            self._messages[next(self._receipts)] = copy.deepcopy(message)
+
+    def receive(self, max_messages=None):
+        """メッセージを受信し、delete または release するまで見えなくします
+
+        Return:
+            list: (受信ハンドル, メッセージ) のリストを送信した順に返します
+
+        """
+        with self._lock:
+            receipts = list(itertools.islice(self._messages, max_messages))
+            received = [(receipt, self._messages.pop(receipt)) for receipt in receipts]
+            self._in_flight.update(received)
+            return received
+
+    def delete(self, receipts):
+        """処理が終わったメッセージを削除します"""
+        with self._lock:
+            for receipt in receipts:
+                self._in_flight.pop(receipt, None)
+
+    def release(self, receipts):
+        """処理しなかったメッセージを、再び受信できるようにします"""
+        with self._lock:
+            for receipt in receipts:
+                if receipt in self._in_flight:
+                    self._messages[receipt] = self._in_flight.pop(receipt)
+            # 送信した順に受信できるよう、受信ハンドル (送信の連番) の順に並べ直します
+            for receipt in sorted(self._messages):
+                self._messages.move_to_end(receipt)
+
+
+def coalesce_updates(received):
+    """受信した更新のメッセージを (username, uid) ごとにまとめます
+
+    属性ごとに最後に送信された値を使用します (last-writer-wins)。
+    送信の順序は enqueued_at、同じ時刻の場合は seq で決めます。
+
+    Args:
+        received (list): InMemoryQueue.receive が返す (受信ハンドル, メッセージ) のリストが渡ってきます
+
+    Return:
+        dict: (username, uid) ごとに以下のキーを持つ dict を返します
+            changes (dict): まとめた属性の値
+            receipts (list): まとめたメッセージの受信ハンドル
+            enqueued_at (float): 最も古いメッセージの送信時刻
+
+    """
+    groups = {}
+    ordered = sorted(received, key=lambda pair: (pair[1]['enqueued_at'], pair[1]['seq']))
+    for receipt, message in ordered:
+        group = groups.setdefault((message['username'], message['uid']), {
+            'changes': {}, 'receipts': [], 'enqueued_at': message['enqueued_at']})
+        group['changes'].update(message['changes'])
+        group['receipts'].append(receipt)
+    return groups
+
+
+class CoalescingDynamoDBTodo:
+    """短い間隔で続く同じ Todo への update_item を、1 回の書き込みにまとめるラッパーです
+
+    update_item は DynamoDB に書き込まず、更新する属性をメッセージとしてキューに送信して uid を返します。
+    メッセージは (username, uid) ごとに属性単位の last-writer-wins でまとめ (coalesce_updates)、
+    最初のメッセージから window 秒が経過したあとの呼び出しで、DynamoDBTodo.update_item の
+    1 回の条件付き書き込み (uid の存在と version の加算) で書き込みます。
+    エディターがキー入力ごとに送信する PUT /todos/{uid} の書き込みを、window 秒あたり 1 回に減らします。
+
+    update_item は書き込んでいない更新がない Todo の場合のみ get_item で存在を確認し、
+    存在しない uid は NotFoundError となります。(window 内の 2 回目以降の更新は確認しません)
+
+    同じコンテナの読み取りは、自分の書き込みを必ず返します (read-your-writes)。
+    get_item は対象の Todo に書き込んでいない更新がある場合、その Todo の更新を先に書き込んでから読み取ります。
+    その他の読み取りと書き込み (list_items, delete_item, batch_write など) は、
+    呼び出したユーザー (username) の書き込んでいない更新を書き込んでからラップした DynamoDBTodo に委譲します。
+    (username を持たないテーブル全体のメソッドは、すべてのユーザーの更新を書き込みます)
+    (delete_item の対象の Todo の更新は、expected_version の指定がない場合は書き込まずに破棄します)
+    expected_version (If-Match) を指定した update_item と、更新する属性のない update_item は、
+    対象の Todo の更新を書き込んでから、まとめずにそのまま書き込みます。
+    他のユーザーの更新は、window 秒が経過したものだけを呼び出しのついでに書き込みます。
+
+    書き込みを遅らせるため、以下の違いがあります。
+        - update_item は DynamoDB に書き込む前に uid を返します (書き込みの永続化は保証しません)
+        - 確認のあとに削除された uid の更新は、書き込み時に NotFoundError となり dropped に数えます
+        - 書き込みは同じインスタンスへの次の呼び出しでのみ行われ、呼び出しの間には書き込みません
+          次の呼び出しがない限り、他のコンテナは古い内容を読み取り続けます (古さに上限はありません)
+        - デフォルトの InMemoryQueue はプロセス内のキューのため、書き込む前にプロセスが停止
+          (Lambda のコンテナの凍結や破棄を含みます) した場合、返した更新は失われます
+
+    そのため get_app_db では使用しません。ベンチマークやローカルでの検証で明示的に使用してください。
+    本番で使用する場合は、SQS などの永続的なキューと、window 秒ごとに flush するコンシューマーが必要です。
+
+    書き込みが NotFoundError 以外で失敗した場合は failed に数え、メッセージをキューに戻して次の flush で再び書き込みます。
+    例外は呼び出したユーザー自身の更新 (key, username を指定した flush) の場合のみ送出し、
+    他のユーザーのリクエストには送出しません。
+
+    constructer:
+        Args:
+            todo (DynamoDBTodo): ラップする DynamoDBTodo (または CachedDynamoDBTodo) が渡ってきます
+            queue (InMemoryQueue): 更新のメッセージを保持するキューが渡ってきます
+            window (float): 更新をまとめる秒数が渡ってきます
+            clock (callable): 現在時刻 (Unix 時刻の秒) を返す関数 (テストでの差し替え用)
+
+    """
+
+    def __init__(self, todo, queue=None, window=DEFAULT_COALESCE_WINDOW, clock=time.time):
+        self._todo = todo
+        self.queue = InMemoryQueue() if queue is None else queue
+        self.window = window
+        self._clock = clock
+        self._seq = itertools.count()
+        self._pending = set()
+        self._lock = threading.RLock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._todo, name)
+        if not callable(attr):
+            return attr
+
+        def _flushed(*args, **kwargs):
+            username = _bound_username(attr, args, kwargs)
+            with self._lock:
+                if username is None:
+                    self.flush(force=True)
+                else:
+                    self.flush(force=True, username=username)
+                    self.flush()
+            return attr(*args, **kwargs)
+        return _flushed
+
+    def stats(self):
+        """キューに送信した更新の件数、書き込んだ回数、破棄した更新の回数、失敗した書き込みの回数を返します"""
+        return {
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': len(self._pending),
+        }
+
+    def flush(self, force=False, key=None, username=None, discard=False):
+        """キューの更新をまとめて書き込みます
+
+        書き込みに失敗した更新はキューに戻します。
+
+        Args:
+            force (bool): True の場合は window 秒が経過していない更新も書き込みます
+            key (tuple): 指定した場合は (username, uid) の更新のみを書き込みます
+            username (str): 指定した場合はそのユーザーの更新のみを書き込みます
+            discard (bool): True の場合は書き込まずに破棄します
+
+        Raises:
+            Exception: key または username を指定し、書き込みに失敗したケースで最後の例外を送出します
+
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            received = self.queue.receive()
+            due = self._clock() - self.window
+            release = []
+            error = None
+            try:
+                for group_key, group in coalesce_updates(received).items():
+                    if ((key is not None and group_key != key)
+                            or (username is not None and group_key[0] != username)
+                            or (not force and group['enqueued_at'] > due)):
+                        release.extend(group['receipts'])
+                        continue
+                    if not discard:
+                        try:
+                            self._write(group_key, group)
+                        except Exception as e:
+                            error = e
+                            release.extend(group['receipts'])
+                            continue
+                    self.queue.delete(group['receipts'])
+                    self._pending.discard(group_key)
+            except Exception:
+                self.queue.release([receipt for receipt, _ in received])
+                raise
+            self.queue.release(release)
+            if error is not None and (key is not None or username is not None):
+                raise error
+
+    def _write(self, key, group):
+        username, uid = key
+        try:
+            self._todo.update_item(uid=uid, username=username, **group['changes'])
+            self.written += 1
+        except NotFoundError:
+            self.dropped += 1
+        except Exception:
+            self.failed += 1
+            raise
+
+    def update_item(self, uid, subject=None, description=None, state=None,
+                    username=DEFAULT_USERNAME, expected_version=None):
+        with self._lock:
+            changes = {name: value for name, value in zip(UPDATE_ATTRIBUTES, (subject, description, state))
+                       if value is not None}
+            if expected_version is not None or not changes:
+                self.flush(force=True, key=(username, uid))
+                return self._todo.update_item(
+                    uid=uid, username=username, expected_version=expected_version, **changes)
+            if (username, uid) not in self._pending:
+                self._todo.get_item(uid=uid, username=username)
+            self.queue.send({
+                'username': username, 'uid': uid, 'changes': changes,
+                'enqueued_at': self._clock(), 'seq': next(self._seq)})
+            self._pending.add((username, uid))
+            self.enqueued += 1
+            self.flush()
+            return uid
+
+    def get_item(self, uid, username=DEFAULT_USERNAME):
+        with self._lock:
+            self.flush(force=True, key=(username, uid))
+            self.flush()
+        return self._todo.get_item(uid=uid, username=username)
+
+    def delete_item(self, uid, username=DEFAULT_USERNAME, expected_version=None):
+        with self._lock:
+            self.flush(force=True, key=(username, uid), discard=expected_version is None)
+            self.flush(force=True, username=username)
+            self.flush()
+        return self._todo.delete_item(uid=uid, username=username, expected_version=expected_version)
+
+
+def _bound_username(method, args, kwargs):
+    """委譲するメソッドの呼び出しから username 引数の値を返します (username を持たない場合は None を返します)"""
+    try:
+        bound = inspect.signature(method).bind_partial(*args, **kwargs)
+    except (TypeError, ValueError):
+        return None
+    if 'username' not in bound.signature.parameters:
+        return None
+    bound.apply_defaults()
+    return bound.arguments['username']
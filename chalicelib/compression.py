@@ -0,0 +1,145 @@
+import gzip
+import json
+
+from chalice import Response
+from chalice.app import handle_extra_types
+
+try:
+    import brotli
+except ImportError:
+    # brotli は任意の依存パッケージです インストールされていない場合は gzip のみを使用します
+    brotli = None
+
+
+DEFAULT_COMPRESSION_MIN_BYTES = 1024
+# 圧縮した JSON のレスポンスの Content-Type です app.api.binary_types に登録し、
+# クライアントは Accept ヘッダーにこのメディアタイプを指定して圧縮したレスポンスを受け取ります
+COMPRESSED_JSON_CONTENT_TYPE = 'application/vnd.serverless-todo+json'
+GZIP_COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """使用できる Content-Encoding を優先する順に返します"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """Accept-Encoding ヘッダーを、エンコーディングと q 値の dict に変換します
+
+    Args:
+        header (str): Accept-Encoding ヘッダーの値が渡ってきます (例: 'gzip;q=0.8, br')
+
+    Return:
+        dict: 小文字のエンコーディングと q 値 (float) の dict を返します q 値が不正なものは 0 とします
+
+    """
+    weights = {}
+    for part in (header or '').split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    return weights
+
+
+def select_encoding(header, encodings=None):
+    """Accept-Encoding ヘッダーが許可するエンコーディングのうち、q 値の最も大きいものを返します
+
+    q 値が同じ場合は encodings の順序 (br, gzip) を優先します。
+    明示されていないエンコーディングは `*` の q 値で判定します。
+
+    Args:
+        header (str): Accept-Encoding ヘッダーの値が渡ってきます
+        encodings (tuple): 候補のエンコーディングが渡ってきます 指定がない場合は available_encodings です
+
+    Return:
+        str: 選択したエンコーディングを返します 圧縮しない場合は None を返します
+
+    """
+    weights = parse_accept_encoding(header)
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in encodings or available_encodings():
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def accepts_binary(accept, binary_types):
+    """Accept ヘッダーの最初のメディアタイプが、バイナリメディアタイプのいずれかに一致するかを返します
+
+    API Gateway (REST API) は Accept ヘッダーの最初のメディアタイプが API のバイナリメディアタイプに
+    一致する場合のみ、isBase64Encoded のレスポンスをデコードして返すため、2 つ目以降は判定しません。
+
+    Args:
+        accept (str): Accept ヘッダーの値が渡ってきます
+        binary_types (list): 登録したバイナリメディアタイプ (app.api.binary_types) が渡ってきます
+
+    Return:
+        bool: 一致する場合は True を返します
+
+    """
+    media_type = (accept or '').split(',')[0].split(';')[0].strip().lower()
+    if not media_type:
+        return False
+    for binary_type in binary_types:
+        binary_type = binary_type.lower()
+        if binary_type in (media_type, '*/*') or (
+                binary_type.endswith('/*') and media_type.startswith(binary_type[:-1])):
+            return True
+    return False
+
+
+def compress(body, encoding):
+    """バイト列を encoding (br または gzip) で圧縮します"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+
+
+def compress_response(response, accept_encoding, min_bytes=DEFAULT_COMPRESSION_MIN_BYTES):
+    """JSON のレスポンスを、Accept-Encoding が許可するエンコーディングで圧縮します
+
+    本文が min_bytes 未満の場合、すでにバイト列 (エクスポートの gzip など) の場合、
+    Content-Encoding が設定済みの場合は圧縮せずにそのまま返します。
+
+    圧縮したレスポンスの Content-Type は COMPRESSED_JSON_CONTENT_TYPE とし、本文はバイト列で返します。
+    (Chalice は Content-Type が app.api.binary_types に含まれるバイト列を base64 に変換し、isBase64Encoded を付与します)
+
+    Args:
+        response (chalice.Response): ビュー関数のレスポンスが渡ってきます
+        accept_encoding (str): リクエストの Accept-Encoding ヘッダーの値が渡ってきます
+        min_bytes (int): 圧縮する本文の最小のバイト数が渡ってきます
+
+    Return:
+        chalice.Response: 圧縮した場合は本文を圧縮したレスポンスを返します
+
+    """
+    headers = {key.lower() for key in response.headers}
+    if isinstance(response.body, bytes) or 'content-encoding' in headers:
+        return response
+    encoding = select_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    body = response.body
+    if not isinstance(body, str):
+        body = json.dumps(body, separators=(',', ':'), default=handle_extra_types)
+    body = body.encode('utf-8')
+    if len(body) < min_bytes:
+        return response
+    headers = {key: value for key, value in response.headers.items() if key.lower() != 'content-type'}
+    return Response(
+        body=compress(body, encoding),
+        headers={**headers, 'Content-Type': COMPRESSED_JSON_CONTENT_TYPE,
+                 'Content-Encoding': encoding, 'Vary': 'Accept, Accept-Encoding'},
+        status_code=response.status_code)
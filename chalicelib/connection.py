@@ -0,0 +1,123 @@
+import os
+
+
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_READ_TIMEOUT = 3.0
+DEFAULT_MAX_POOL_CONNECTIONS = 16
+DEFAULT_MAX_ATTEMPTS = 5
+DB_BACKENDS = ('resource', 'client', 'dax')
+
+
+def client_config(max_attempts=None):
+    """DynamoDB のクライアントに使用する botocore.config.Config を生成します
+
+    Lambda の実行時間に合わせて、botocore のデフォルト (connect/read とも 60 秒) より短い
+    タイムアウトを設定し、スロットリングに追従する adaptive モードでリトライします。
+    HTTP の接続は botocore の接続プールで keep-alive され、
+    並列スキャンのスレッド数に合わせて max_pool_connections を設定します。
+
+    envs:
+        DDB_CONNECT_TIMEOUT: 接続のタイムアウト (秒) (デフォルト: DEFAULT_CONNECT_TIMEOUT)
+        DDB_READ_TIMEOUT: 読み取りのタイムアウト (秒) (デフォルト: DEFAULT_READ_TIMEOUT)
+        DDB_MAX_POOL_CONNECTIONS: 接続プールの上限 (デフォルト: DEFAULT_MAX_POOL_CONNECTIONS)
+        DDB_MAX_ATTEMPTS: 初回を含む試行回数の上限 (デフォルト: DEFAULT_MAX_ATTEMPTS)
+
+    Args:
+        max_attempts (int): 指定した場合は DDB_MAX_ATTEMPTS の代わりに試行回数の上限とします
+            (chalicelib.retry.RetryPolicy で再試行する場合は 1 を指定し、再試行が重ならないようにします)
+
+    Return:
+        botocore.config.Config: クライアントの設定を返します
+
+    """
+    from botocore.config import Config
+
+    options = {
+        'connect_timeout': float(os.environ.get('DDB_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        'read_timeout': float(os.environ.get('DDB_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+        'max_pool_connections': int(os.environ.get(
+            'DDB_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+        'retries': {
+            'mode': 'adaptive',
+            # max_attempts は初回を含まない再試行の回数のため、初回を含む total_max_attempts を指定します
+            'total_max_attempts': int(os.environ.get('DDB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+            if max_attempts is None else max_attempts,
+        },
+    }
+    # TCP keep-alive は botocore 1.27 以降のみ指定できます
+    if 'tcp_keepalive' in Config.OPTION_DEFAULTS:
+        options['tcp_keepalive'] = True
+    return Config(**options)
+
+
+def dynamodb_client(endpoint_url=None, max_attempts=None):
+    """チューニングした設定で DynamoDB の低レベルクライアントを生成します
+
+    boto3 は import に時間がかかるため、呼び出されたときに import します。
+
+    Args:
+        endpoint_url (str): 接続する DynamoDB のエンドポイントが渡ってきます
+        max_attempts (int): 試行回数の上限が渡ってきます (client_config を参照)
+
+    Return:
+        botocore.client.DynamoDB: 低レベルクライアントを返します
+
+    """
+    import boto3
+
+    return boto3.client('dynamodb', endpoint_url=endpoint_url, config=client_config(max_attempts))
+
+
+def dynamodb_table(tablename, endpoint_url=None, max_attempts=None):
+    """チューニングした設定で DynamoDB の Table リソースを生成します
+
+    Args:
+        tablename (str): テーブル名が渡ってきます
+        endpoint_url (str): 接続する DynamoDB のエンドポイントが渡ってきます
+        max_attempts (int): 試行回数の上限が渡ってきます (client_config を参照)
+
+    Return:
+        boto3.resource.Table: Table リソースを返します
+
+    """
+    import boto3
+
+    return boto3.resource(
+        'dynamodb', endpoint_url=endpoint_url, config=client_config(max_attempts)).Table(tablename)
+
+
+def todo_table(tablename, endpoint_url=None, backend='resource', item_store=None, max_attempts=None):
+    """DynamoDBTodo に渡すテーブルを、指定したバックエンドで生成します
+
+    Args:
+        tablename (str): テーブル名が渡ってきます
+        endpoint_url (str): 接続する DynamoDB (dax の場合は DAX クラスター) のエンドポイントが渡ってきます
+        backend (str): DB_BACKENDS のいずれかが渡ってきます
+            resource: boto3.resource.Table を使用します
+            client: 低レベルクライアントと TodoSerializer による ClientTable を使用します
+            dax: DAX クライアント (amazondax、任意の依存パッケージ) の Table を使用します
+        item_store (TTLCache): 指定した場合はテーブルを ItemCacheTable で包み、
+            get_item の結果をキャッシュします (chalicelib.item_cache.item_store を参照)
+        max_attempts (int): resource, client の場合の試行回数の上限が渡ってきます (client_config を参照)
+
+    Raises:
+        ValueError: backend が DB_BACKENDS に含まれないケースで例外が発生します
+
+    Return:
+        boto3.resource.Table, ClientTable または ItemCacheTable を返します
+
+    """
+    if backend == 'resource':
+        table = dynamodb_table(tablename, endpoint_url=endpoint_url, max_attempts=max_attempts)
+    elif backend == 'client':
+        from chalicelib.client_table import ClientTable
+        table = ClientTable(dynamodb_client(endpoint_url=endpoint_url, max_attempts=max_attempts), tablename)
+    elif backend == 'dax':
+        from amazondax import AmazonDaxClient
+        table = AmazonDaxClient.resource(endpoint_url=endpoint_url).Table(tablename)
+    else:
+        raise ValueError(f"backend (Your Request: {backend}) REQUIRED: {', '.join(DB_BACKENDS)}")
+    if item_store is None:
+        return table
+    from chalicelib.item_cache import ItemCacheTable
+    return ItemCacheTable(table, item_store)
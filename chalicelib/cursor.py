@@ -0,0 +1,136 @@
+import os
+import hmac
+import json
+import base64
+import hashlib
+from decimal import Decimal
+
+from chalice import BadRequestError
+
+from chalicelib.exceptions import CursorSecretError
+
+
+class Cursor:
+    """DynamoDB の ExclusiveStartKey を改ざん検知つきの不透明な文字列に変換します
+
+    カーソルは `<payload>.<signature>` の形式で、payload は LastEvaluatedKey と
+    username、発行したエンドポイントの用途 (purpose) を JSON にしたものを base64url でエンコードした文字列、
+    signature は payload の HMAC-SHA256 を base64url でエンコードした文字列です。
+
+    username を署名の対象に含めるため、他のユーザーのカーソルを流用することはできません。
+    purpose も署名の対象に含めるため、別のエンドポイントが発行したカーソル
+    (例: GET /todos/changes の next_token を GET /todos の ?cursor に指定) は 400 になります。
+
+    envs:
+        CURSOR_SECRET:
+            署名に使用する秘密鍵 (ローカルの stage などで直接指定する場合)
+        CURSOR_SECRET_PARAMETER:
+            CURSOR_SECRET がない場合に、秘密鍵を取得する SSM パラメータストアのパラメータ名
+            (SecureString を復号して取得し、コンテナごとに 1 回だけ取得します)
+        どちらも存在しない場合は、公開されている値 (APP_TABLE_NAME など) を鍵にせず
+        CursorSecretError を発生させます。
+
+    """
+
+    SEPARATOR = '.'
+    LIST = 'list'
+    CHANGES = 'changes'
+    EXPORT = 'export'
+    _parameters = {}
+
+    @classmethod
+    def _secret(cls):
+        secret = os.environ.get('CURSOR_SECRET')
+        if not secret:
+            name = os.environ.get('CURSOR_SECRET_PARAMETER')
+            if not name:
+                raise CursorSecretError(
+                    'CURSOR_SECRET or CURSOR_SECRET_PARAMETER is not set.')
+            secret = cls._parameter(name)
+        return secret.encode('utf-8')
+
+    @classmethod
+    def _parameter(cls, name):
+        """SSM パラメータストアからパラメータの値を復号して取得します (取得した値はコンテナ内で再利用します)"""
+        if name not in cls._parameters:
+            import boto3
+            from chalicelib.connection import client_config
+
+            response = boto3.client('ssm', config=client_config()).get_parameter(
+                Name=name, WithDecryption=True)
+            cls._parameters[name] = response['Parameter']['Value']
+        return cls._parameters[name]
+
+    @staticmethod
+    def _b64encode(raw):
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+    @staticmethod
+    def _b64decode(text):
+        return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj == obj.to_integral_value() else str(obj)
+        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+    @classmethod
+    def _sign(cls, payload):
+        digest = hmac.new(cls._secret(), payload.encode('ascii'), hashlib.sha256).digest()
+        return cls._b64encode(digest)
+
+    @classmethod
+    def encode(cls, key, username, purpose):
+        """LastEvaluatedKey をカーソル文字列に変換します
+
+        Args:
+            key (dict): DynamoDB のレスポンスに含まれる LastEvaluatedKey が渡ってきます
+            username (str): カーソルを発行するユーザー名が渡ってきます
+            purpose (str): カーソルを発行するエンドポイントの用途 (LIST, CHANGES, EXPORT) が渡ってきます
+
+        Return:
+            str: カーソル文字列を返します
+            None: key が None の場合 (最後のページの場合) None を返します
+
+        """
+        if key is None:
+            return None
+        raw = json.dumps({'k': key, 'u': username, 'p': purpose},
+                         default=cls._default, separators=(',', ':'), sort_keys=True)
+        payload = cls._b64encode(raw.encode('utf-8'))
+        return f"{payload}{cls.SEPARATOR}{cls._sign(payload)}"
+
+    @classmethod
+    def decode(cls, cursor, username, purpose):
+        """カーソル文字列を検証し、ExclusiveStartKey に変換します
+
+        Args:
+            cursor (str): クライアントから渡ってきたカーソル文字列
+            username (str): リクエストしたユーザー名が渡ってきます
+            purpose (str): カーソルを受け取るエンドポイントの用途 (LIST, CHANGES, EXPORT) が渡ってきます
+
+        Raises:
+            BadRequestError: カーソルの形式が不正、署名が一致しない、
+                             または別のユーザー、別の用途で発行したカーソルのケースで例外が発生します
+
+        Return:
+            dict: ExclusiveStartKey を返します
+            None: cursor が None または空文字の場合 None を返します
+
+        """
+        if not cursor:
+            return None
+        try:
+            payload, signature = cursor.split(cls.SEPARATOR)
+            if not hmac.compare_digest(signature, cls._sign(payload)):
+                raise ValueError('signature mismatch')
+            data = json.loads(cls._b64decode(payload).decode('utf-8'))
+            key, owner, issued_for = data['k'], data['u'], data['p']
+        except (ValueError, KeyError, TypeError, UnicodeError):
+            raise BadRequestError(
+                f"cursor is invalid. (Your Request: {cursor})")
+        if owner != username or issued_for != purpose or not isinstance(key, dict):
+            raise BadRequestError(
+                f"cursor is invalid. (Your Request: {cursor})")
+        return key
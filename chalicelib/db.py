@@ -1,22 +1,207 @@
-from uuid import uuid4
+import time
+import queue
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from botocore.exceptions import EndpointConnectionError
+from botocore.exceptions import ClientError, EndpointConnectionError
 from boto3.dynamodb.conditions import Key, Attr
-from chalice import NotFoundError
+from chalice import ChaliceViewError, ConflictError, NotFoundError, UnprocessableEntityError
 
-from chalicelib.validates import Validates
-from chalicelib.exceptions import DatabaseConnectionError
+from chalicelib.idempotency import IdempotencyKeys, DEFAULT_IDEMPOTENCY_TTL
+from chalicelib.retry import Backoff, RetryingTable, retryable_error
+from chalicelib.search import SearchIndex, Tokenizer
+from chalicelib.stats import UserStats
+from chalicelib.sync import Tombstones, DEFAULT_TOMBSTONE_TTL, CHANGES_OVERLAP_MS, now_ms
+from chalicelib.uid import UUIDv7, CLOCK_SKEW_MS
+from chalicelib.validates import Validates, TODO_CREATE_SCHEMA, TODO_UPDATE_SCHEMA
+from chalicelib.exceptions import DatabaseConnectionError, GoneError, PreconditionFailedError, RetryableError
 
 
 DEFAULT_USERNAME = 'default'
+DEFAULT_SCAN_TOTAL_SEGMENTS = 1
+TODO_FILTER = Attr('record_type').not_exists()
+BATCH_WRITE_CHUNK_SIZE = 25
+BATCH_GET_CHUNK_SIZE = 100
+INITIAL_VERSION = 1
+STATE_INDEX_NAME = 'state-index'
+STATE_KEY_ATTRIBUTE = 'username_state'
+UPDATED_INDEX_NAME = 'updated-index'
+UPDATED_AT_ATTRIBUTE = 'updated_at'
+UID_MAX_ATTEMPTS = 3
+NEW_ITEM_CONDITION = 'attribute_not_exists(uid)'
+# ユーザーのパーティションの管理用のアイテム (#tombstone#<uid>) を除く、ソートキー (uid) の下限です
+# (Validates.RESERVED_PREFIX で始まる uid はすべてこの値より前に並びます)
+TODO_UID_LOWER_BOUND = chr(ord(Validates.RESERVED_PREFIX) + 1)
+
+
+def build_state_key(username, state):
+    """state-index のパーティションキー `<username>#<state>` を生成します"""
+    return f"{username}#{state}"
+
+
+def build_update_expression(changes, increments=None):
+    """属性名と値の dict から UpdateItem の SET 式と ADD 式を生成します
+
+    属性名は予約語と衝突しないよう、すべてプレースホルダーに置き換えます。
+
+    Args:
+        changes (dict): SET で更新する属性名と値が渡ってきます
+        increments (dict): ADD で加算する属性名と加算する値が渡ってきます
+
+    Return:
+        dict: UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues を返します
+
+    """
+    increments = increments or {}
+    clauses = []
+    if changes:
+        clauses.append('SET ' + ', '.join(f"#{name} = :{name}" for name in changes))
+    if increments:
+        clauses.append('ADD ' + ', '.join(f"#{name} :{name}" for name in increments))
+    attributes = {**changes, **increments}
+    return {
+        'UpdateExpression': ' '.join(clauses),
+        'ExpressionAttributeNames': {f"#{name}": name for name in attributes},
+        'ExpressionAttributeValues': {f":{name}": value for name, value in attributes.items()},
+    }
+
+
+def build_version_condition(expected_version):
+    """uid の存在と、version が期待する値であることを確認する ConditionExpression を生成します
+
+    version 属性を持たない既存の Todo オブジェクトは version 0 として扱います。
+    record_type 属性を持つ管理用のアイテム (集計アイテムなど) は、Todo として書き込まないよう除外します。
+
+    Args:
+        expected_version (int): 期待する version が渡ってきます None の場合は uid の存在のみを確認します
+
+    Return:
+        dict: ConditionExpression と、必要に応じて ExpressionAttributeValues を返します
+
+    """
+    if expected_version is None:
+        return {'ConditionExpression': 'attribute_exists(uid) AND attribute_not_exists(record_type)'}
+    if expected_version == 0:
+        return {
+            'ConditionExpression': (
+                'attribute_exists(uid) AND attribute_not_exists(record_type) AND attribute_not_exists(#version)'),
+            'ExpressionAttributeNames': {'#version': 'version'},
+        }
+    return {
+        'ConditionExpression': (
+            'attribute_exists(uid) AND attribute_not_exists(record_type) AND #version = :expected_version'),
+        'ExpressionAttributeNames': {'#version': 'version'},
+        'ExpressionAttributeValues': {':expected_version': expected_version},
+    }
+
+
+def merge_expressions(*expressions):
+    """build_update_expression などが生成した引数の dict をマージします"""
+    merged = {}
+    for expression in expressions:
+        for key, value in expression.items():
+            if isinstance(value, dict):
+                merged.setdefault(key, {}).update(value)
+            else:
+                merged[key] = value
+    return merged
+
+
+def build_projection(fields):
+    """取得する属性名のリストから ProjectionExpression を生成します
+
+    属性名は予約語 (state など) と衝突しないよう、すべてプレースホルダーに置き換えます。
+    uid はページングと作成日時の判定に使用するため、常に取得します。
+
+    Args:
+        fields (list): 取得する属性名のリストが渡ってきます (Validates.FIELDS_ENUM)
+
+    Return:
+        dict: ProjectionExpression と ExpressionAttributeNames を返します
+
+    """
+    names = list(dict.fromkeys(['uid', *fields]))
+    return {
+        'ProjectionExpression': ', '.join(f"#f{i}" for i in range(len(names))),
+        'ExpressionAttributeNames': {f"#f{i}": name for i, name in enumerate(names)},
+    }
+
+
+def todo_item_or_not_found(response, uid):
+    """GetItem のレスポンスから Todo オブジェクトを取り出します
+
+    record_type 属性を持つ管理用のアイテム (集計アイテム、削除の記録など) は Todo として返しません。
+
+    Raises:
+        NotFoundError: アイテムが存在しない、または管理用のアイテムのケースで例外が発生します
+
+    """
+    item = response.get('Item')
+    if item is None or 'record_type' in item:
+        raise NotFoundError(f"Todo not found. (id: {uid})")
+    return item
+
+
+def project_item(item, fields):
+    """Todo オブジェクトから uid と fields の属性のみを取り出します (fields が None の場合はそのまま返します)"""
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key == 'uid' or key in fields}
+
+
+def build_state_condition(state, expected_version=None):
+    """build_version_condition の条件に、state が読み取った値のままであることの確認を加えます"""
+    condition = build_version_condition(expected_version)
+    return merge_expressions(condition, {
+        'ConditionExpression': f"{condition['ConditionExpression']} AND #state = :old_state",
+        'ExpressionAttributeNames': {'#state': 'state'},
+        'ExpressionAttributeValues': {':old_state': state},
+    })
+
+
+def is_conditional_check_failed(error):
+    """ClientError が条件付き書き込みの失敗によるものか判定します"""
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def is_transaction_canceled(error):
+    """ClientError が TransactWriteItems の条件の不一致や競合によるキャンセルか判定します"""
+    return error.response['Error']['Code'] in (
+        'TransactionCanceledException', 'TransactionConflictException')
 
 
 def except_endpoint_connection_error(func):
+    """DynamoDB への接続の失敗とスロットリングなどを、API のエラーレスポンスになる例外に変換します
+
+    RetryingTable が再試行したあとの例外 (RetryableError) はそのまま送出します。
+    """
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def _generator_wrapper(*args, **kwargs):
+            try:
+                yield from func(*args, **kwargs)
+            except EndpointConnectionError:
+                raise DatabaseConnectionError('Failed to connect to database.')
+            except ClientError as e:
+                error = retryable_error(e)
+                if error is None:
+                    raise
+                raise error from e
+        return _generator_wrapper
+
+    @functools.wraps(func)
     def _wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except EndpointConnectionError:
             raise DatabaseConnectionError('Failed to connect to database.')
+        except ClientError as e:
+            error = retryable_error(e)
+            if error is None:
+                raise
+            raise error from e
     return _wrapper
 
 
@@ -25,39 +210,244 @@ class DynamoDBTodo():
 
     self.methods:
         list_all_items : すべての Todo オブジェクトをスキャンします
+        iter_all_items : すべての Todo オブジェクトをスキャンし、ストリームとして返します
+        parallel_scan  : Segment/TotalSegments を使い、テーブルを並列にスキャンします
+        scan_page      : テーブルを 1 ページ分スキャンします
+        iter_scan_pages: 指定した位置からテーブルをページごとにスキャンします
         list_items     : username と query に基づき、Todo オブジェクトのリストを取得します
+        list_items_page: username と query に基づき、Todo オブジェクトのリストを 1 ページ分取得します
         add_item       : Todo オブジェクトを新規に追加します
         get_item       : 特定の Todo オブジェクトを取得します
+        get_items      : 複数の uid の Todo オブジェクトをまとめて取得します
         delete_item    : 特定の Todo オブジェクトを削除します
         update_item    : 特定の Todo オブジェクトを更新します
+        batch_write    : 複数の Todo オブジェクトの追加、更新、削除をまとめて行います
+        import_items   : 検証済みの Todo オブジェクトを、uid を保持したまままとめて書き込みます
+        list_changes   : 指定した時刻以降に更新、削除された Todo を取得します (差分同期)
+        search_page    : 転置索引を使い、検索クエリを含む Todo オブジェクトを 1 ページ分取得します
+        count_items_by_state: ステータスごとの Todo オブジェクトの件数を取得します
+        count_items    : 1 つのステータスの Todo オブジェクトの件数を取得します
+        get_stats      : ユーザーの Todo の件数 (合計とステータスごと) を取得します
+        reconcile_stats: すべての Todo をスキャンし、集計アイテムを再構築します
+        backfill_state_index: 既存の Todo オブジェクトに state-index の属性を追加します
+        backfill_updated_at: 既存の Todo オブジェクトに updated-index の属性を追加します
+        rebuild_search_index: 既存のデータから転置索引を再構築します
+        enable_ttl     : 冪等キーと削除の記録を削除する TTL をテーブルに設定します
 
     constructer: 
         Args: 
             table_resource (boto3.resource.Table): 
                 リソースとエンドポイントとテーブルを指定済みの boto3.resource.Table インスタンス
+            scan_total_segments (int):
+                テーブル全体をスキャンする際のセグメント数 1 の場合は逐次スキャンを行います
+            backoff (Backoff):
+                BatchWriteItem などの未処理のアイテムをリトライする際のバックオフ
+            search_index (bool):
+                True の場合は書き込みのたびに転置索引 (SearchIndex) を更新し、検索に使用します
+            stats (bool):
+                True の場合は書き込みと同じトランザクションで集計アイテム (UserStats) を更新します
+            metrics (MetricsRecorder):
+                指定した場合は DynamoDB の呼び出しごとの所要時間、消費キャパシティ、読み取り件数を記録します
+            retry_policy (RetryPolicy):
+                指定した場合はテーブルを RetryingTable で包み、スロットリングと一時的な障害を再試行します
+            idempotency_ttl (int):
+                add_item の冪等キーの記録を保持する秒数
+            tombstone_ttl (int):
+                削除した Todo の記録 (Tombstones) を保持する秒数 list_changes の since の期限になります
+            validate (bool):
+                True の場合は add_item, update_item, batch_write で渡された値をバリデーションします
+                (app.py はリクエストの本文を TODO_CREATE_SCHEMA などで 1 回バリデーションしてから呼び出すため、
+                二重に検証しないよう既定では行いません 検証されていない値を渡す場合に指定してください)
 
     self:
         _table (boto3.resource.Table):
             特定の DynamoDB テーブルを指定済みの boto3.resource.Table インスタンスを格納します。
+        _scan_total_segments (int):
+            list_all_items, iter_all_items が使用するセグメント数を格納します。
+        _backoff (Backoff):
+            未処理のアイテムをリトライする際のバックオフを格納します。
+        _search_index (SearchIndex):
+            転置索引を格納します。search_index が False の場合は None を格納します。
+        _stats (UserStats):
+            集計アイテムを格納します。stats が False の場合は None を格納します。
+        _idempotency (IdempotencyKeys):
+            add_item の冪等キーの記録を格納します。
+        _tombstones (Tombstones):
+            削除した Todo の記録を格納します。
+        _validate (bool):
+            書き込みの前にバリデーションを行うかどうかを格納します。
+
+    テーブルには Todo オブジェクトのほかに、record_type 属性を持つ管理用のアイテム
+    (転置索引のポスティングなど) が保存されます。テーブルのスキャンでは TODO_FILTER で除外します。
+
+    Todo オブジェクトの追加、更新、削除では UPDATED_AT_ATTRIBUTE (Unix 時刻のミリ秒) を設定し、
+    削除では削除の記録 (Tombstones) を書き込みます。(list_changes を参照)
 
     """
 
-    def __init__(self, table_resource):
+    def __init__(self, table_resource, scan_total_segments=DEFAULT_SCAN_TOTAL_SEGMENTS,
+                 backoff=None, search_index=False, stats=False, metrics=None, retry_policy=None,
+                 idempotency_ttl=DEFAULT_IDEMPOTENCY_TTL, tombstone_ttl=DEFAULT_TOMBSTONE_TTL,
+                 validate=False):
+        if metrics is not None:
+            metrics.instrument(table_resource)
+        if retry_policy is not None:
+            table_resource = RetryingTable(table_resource, retry_policy)
         self._table = table_resource
+        self._scan_total_segments = scan_total_segments
+        self._backoff = backoff or Backoff()
+        self._search_index = SearchIndex(table_resource) if search_index else None
+        self._stats = UserStats(table_resource) if stats else None
+        self._idempotency = IdempotencyKeys(table_resource, ttl=idempotency_ttl)
+        self._tombstones = Tombstones(table_resource, ttl=tombstone_ttl)
+        self._validate = validate
 
-    def get_pagenated_items(self, **kwargs):
+    def get_pagenated_pages(self, **kwargs):
+        """LastEvaluatedKey を辿りながらスキャンし、ページごとのアイテムのリストを返すジェネレータです
+
+        FilterExpression の指定がない場合は TODO_FILTER で Todo オブジェクトのみを返します。
+        """
+        kwargs.setdefault('FilterExpression', TODO_FILTER)
         while True:
             response = self._table.scan(**kwargs)
-            for item in response['Items']:
-                yield item
+            yield response['Items']
             if 'LastEvaluatedKey' not in response:
                 break
             kwargs.update(ExclusiveStartKey=response['LastEvaluatedKey'])
 
+    def get_pagenated_items(self, **kwargs):
+        for page in self.get_pagenated_pages(**kwargs):
+            yield from page
+
+    def parallel_scan(self, total_segments, max_workers=None, **kwargs):
+        """Segment/TotalSegments を使い、テーブルを並列にスキャンします
+
+        セグメントごとにスレッドを割り当ててスキャンし、
+        各スレッドが取得したページを到着順にマージしてアイテムを 1 件ずつ返すジェネレータです。
+        (アイテムの順序は保証されません)
+
+        スレッドとの受け渡しには上限つきのキューを使用するため、
+        呼び出し側の消費が遅い場合は各スレッドのスキャンも待機し、メモリ使用量は一定に保たれます。
+        呼び出し側がジェネレータを途中で閉じた場合、各スレッドは次のページを取得せずに終了します。
+
+        boto3.resource.Table のアクションはリソースの属性を読み取るのみで、
+        実際の通信はスレッドセーフな低レベルクライアントが行うため、各スレッドで self._table を共有します。
+
+        Args:
+            total_segments (int): セグメント数が渡ってきます
+            max_workers (int): スレッド数の上限が渡ってきます 指定がない場合はセグメント数と同じになります
+            kwargs: scan に渡す追加の引数が渡ってきます
+
+        Return:
+            generator: アイテムを 1 件ずつ返します
+
+        """
+        pages = queue.Queue(maxsize=total_segments * 2)
+        stopped = threading.Event()
+        done = object()
+
+        def _put(value):
+            while not stopped.is_set():
+                try:
+                    pages.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _scan_segment(segment):
+            try:
+                for page in self.get_pagenated_pages(
+                        Segment=segment, TotalSegments=total_segments, **kwargs):
+                    if not _put(page):
+                        return
+            except Exception as e:
+                _put(e)
+            finally:
+                _put(done)
+
+        with ThreadPoolExecutor(max_workers=max_workers or total_segments) as executor:
+            for segment in range(total_segments):
+                executor.submit(_scan_segment, segment)
+            try:
+                remaining = total_segments
+                while remaining:
+                    page = pages.get()
+                    if page is done:
+                        remaining -= 1
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield from page
+            finally:
+                stopped.set()
+
+    @except_endpoint_connection_error
+    def scan_page(self, limit=None, exclusive_start_key=None):
+        """テーブルを 1 ページ分スキャンします
+
+        Args:
+            limit (int): 1 ページで評価するアイテム数の上限が渡ってきます
+            exclusive_start_key (dict): 前のページの LastEvaluatedKey が渡ってきます
+
+        Return:
+            tuple: (Todo オブジェクトのリスト, LastEvaluatedKey) を返します
+                   最後のページの場合 LastEvaluatedKey は None になります
+
+        """
+        kwargs = {'FilterExpression': TODO_FILTER}
+        if limit is not None:
+            kwargs['Limit'] = limit
+        if exclusive_start_key is not None:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+        response = self._table.scan(**kwargs)
+        return response['Items'], response.get('LastEvaluatedKey')
+
     @except_endpoint_connection_error
-    def list_all_items(self):
+    def iter_scan_pages(self, limit=None, exclusive_start_key=None):
+        """指定した位置からテーブルをページごとにスキャンします
+
+        各ページの LastEvaluatedKey をチェックポイントとして返すため、
+        中断した場合もチェックポイントを exclusive_start_key に指定して再開できます。
+
+        Args:
+            limit (int): 1 ページで評価するアイテム数の上限が渡ってきます
+            exclusive_start_key (dict): 再開するチェックポイントが渡ってきます
+
+        Return:
+            generator: (Todo オブジェクトのリスト, LastEvaluatedKey) をページごとに返します
+
+        """
+        while True:
+            items, exclusive_start_key = self.scan_page(
+                limit=limit, exclusive_start_key=exclusive_start_key)
+            yield items, exclusive_start_key
+            if exclusive_start_key is None:
+                return
+
+    @except_endpoint_connection_error
+    def iter_all_items(self, total_segments=None):
+        """すべての Todo オブジェクトをスキャンし、ストリームとして返します
+
+        total_segments が 2 以上の場合は parallel_scan を、1 の場合は逐次スキャンを行います。
+
+        Args:
+            total_segments (int): セグメント数が渡ってきます 指定がない場合は self._scan_total_segments を使用します
+
+        Return:
+            generator: Todo オブジェクトを 1 件ずつ返します
+
+        """
+        total_segments = total_segments or self._scan_total_segments
+        if total_segments > 1:
+            yield from self.parallel_scan(total_segments)
+        else:
+            yield from self.get_pagenated_items()
+
+    @except_endpoint_connection_error
+    def list_all_items(self, total_segments=None):
         """すべての Todo オブジェクトをスキャンします(ページネーション試用)"""
-        records = self.get_pagenated_items()
+        records = self.iter_all_items(total_segments)
         return list(records)
 
     # @except_endpoint_connection_error
@@ -67,66 +457,592 @@ class DynamoDBTodo():
     #     return response['Items']
 
     @except_endpoint_connection_error
-    def list_items(self, query='', username=DEFAULT_USERNAME):
+    def list_items(self, query='', username=DEFAULT_USERNAME,
+                   order=None, limit=None, since=None, until=None, state=None, fields=None):
         """username と query に基づき、Todo オブジェクトのリストを取得します
 
         DynamoDB テーブルに登録されている特定のユーザーの Todo オブジェクトから、
         subject、description いずれかに検索クエリを含む Todo オブジェクトのリストを取得します。
+        レスポンスが 1MB を超える場合も LastEvaluatedKey を辿り、すべてのページを取得します。
+
+        order, since, until, state, fields の扱いは list_items_page を参照してください。
 
         Args:
             query (str): 検索クエリが渡ってきます クエリがない場合空文字を指定します
             username (str): Todo のユーザー名が渡ってきます
+            order (str): 'asc' (作成日時の昇順) または 'desc' (作成日時の降順) が渡ってきます
+            limit (int): 取得する Todo オブジェクトの上限が渡ってきます
+            since (int): 作成日時の下限 (Unix 時刻のミリ秒) が渡ってきます
+            until (int): 作成日時の上限 (Unix 時刻のミリ秒) が渡ってきます
+            state (str): 取得する Todo のステータスが渡ってきます
+            fields (list): 取得する属性名のリストが渡ってきます
 
         Return:
             list: Todo オブジェクトのリストを返します
 
         """
-        response = self._table.query(
-            KeyConditionExpression=Key('username').eq(username),
-            FilterExpression=(
+        items = []
+        start_key = None
+        while True:
+            page, start_key = self.list_items_page(
+                query=query, username=username, exclusive_start_key=start_key,
+                order=order, since=since, until=until, state=state, fields=fields)
+            items.extend(page)
+            if limit is not None and len(items) >= limit:
+                return items[:limit]
+            if start_key is None:
+                return items
+
+    @staticmethod
+    def _uid_range(since=None, until=None):
+        """作成日時の範囲から、UUIDv7 の uid の範囲 (下限, 上限) を返します
+
+        until の指定がない場合は、現在時刻に CLOCK_SKEW_MS を加えた時刻を上限とします。
+        (uuid4 で生成した既存の uid の大部分が範囲外となり、読み取るアイテムが減ります)
+        """
+        if until is None:
+            until = int(time.time() * 1000) + CLOCK_SKEW_MS
+        return UUIDv7.lower_bound(since or 0), UUIDv7.upper_bound(until)
+
+    @except_endpoint_connection_error
+    def list_items_page(self, query='', username=DEFAULT_USERNAME,
+                        limit=None, exclusive_start_key=None,
+                        order=None, since=None, until=None, state=None, fields=None):
+        """username と query に基づき、Todo オブジェクトのリストを 1 ページ分取得します
+
+        list_items と同じ条件で DynamoDB に 1 回だけ Query を行います。
+        limit は DynamoDB が評価するアイテム数の上限のため、
+        検索クエリを指定した場合は limit より少ないアイテムが返ることがあります。
+        (このとき次のページが存在すれば LastEvaluatedKey が返ります)
+
+        order, since, until のいずれかを指定した場合は、作成日時の順序で取得します。
+        uid (UUIDv7) の範囲を KeyConditionExpression に、順序を ScanIndexForward に指定するため、
+        範囲外のアイテムは読み取りません。
+        このとき uuid4 で生成した既存の Todo オブジェクトは作成日時が分からないため、結果から除外します。
+        (ソートキーの条件は FilterExpression に指定できないため、読み取り後に除外します)
+        指定しない場合は、既存の Todo オブジェクトを含め uid の順序で取得します。
+
+        state を指定した場合は、パーティションキー `<username>#<state>` の GSI (STATE_INDEX_NAME) を
+        Query するため、他のステータスの Todo オブジェクトは読み取りません。
+        (GSI のソートキーも uid のため、order, since, until と組み合わせることができます)
+        STATE_KEY_ATTRIBUTE を持たない既存の Todo オブジェクトは GSI に含まれないため、
+        `python ddb_maintenance.py backfill-state-index` で属性を追加してください。
+
+        ユーザーのパーティションに保存する削除の記録 (Tombstones) は、uid が '#' で始まり
+        Todo オブジェクトより前に並ぶため、KeyConditionExpression の uid の下限 (TODO_UID_LOWER_BOUND) で除外します。
+        (Limit は FilterExpression の前に適用されるため、TODO_FILTER だけでは削除の記録の件数分ページが短くなり、
+        読み取りキャパシティも消費します)
+
+        転置索引が有効で、検索クエリが Tokenizer.NGRAM 文字以上の場合は search_page で検索します。
+        (作成日時の順序、またはステータスを指定して取得する場合は、転置索引を使用しません)
+
+        fields を指定した場合は ProjectionExpression で uid と指定した属性のみを取得します。
+        (検索クエリの FilterExpression は射影の前に評価されるため、description を含めなくても検索できます)
+        DynamoDB から Lambda への転送量とデシリアライズの時間が減りますが、
+        読み取りキャパシティはアイテム全体のサイズ分消費します。
+        転置索引で検索する場合は、Todo 本体を確認したあとに属性を取り出します。
+
+        Args:
+            query (str): 検索クエリが渡ってきます クエリがない場合空文字を指定します
+            username (str): Todo のユーザー名が渡ってきます
+            limit (int): 1 ページで評価するアイテム数の上限が渡ってきます
+            exclusive_start_key (dict): 前のページの LastEvaluatedKey が渡ってきます
+            order (str): 'asc' (作成日時の昇順) または 'desc' (作成日時の降順) が渡ってきます
+            since (int): 作成日時の下限 (Unix 時刻のミリ秒) が渡ってきます
+            until (int): 作成日時の上限 (Unix 時刻のミリ秒) が渡ってきます
+            state (str): 取得する Todo のステータスが渡ってきます
+            fields (list): 取得する属性名のリストが渡ってきます 指定がない場合はすべての属性を取得します
+
+        Return:
+            tuple: (Todo オブジェクトのリスト, LastEvaluatedKey) を返します
+                   最後のページの場合 LastEvaluatedKey は None になります
+
+        """
+        time_ordered = order is not None or since is not None or until is not None
+        if self._search_index is not None and query and not time_ordered and state is None:
+            tokens = Tokenizer.query_tokens(query)
+            if tokens is not None:
+                items, last_key = self.search_page(query, tokens, username, limit, exclusive_start_key)
+                return [project_item(item, fields) for item in items], last_key
+
+        if state is None:
+            key_condition = Key('username').eq(username)
+        else:
+            key_condition = Key(STATE_KEY_ATTRIBUTE).eq(build_state_key(username, state))
+        if time_ordered:
+            key_condition &= Key('uid').between(*self._uid_range(since, until))
+        elif state is None:
+            key_condition &= Key('uid').gte(TODO_UID_LOWER_BOUND)
+        kwargs = {
+            'KeyConditionExpression': key_condition,
+            'FilterExpression': (
                 Attr('subject').contains(query) |
                 Attr('description').contains(query)
-            )
-        )
-        return response['Items']
+            ) & TODO_FILTER
+        }
+        if state is not None:
+            kwargs['IndexName'] = STATE_INDEX_NAME
+        if fields is not None:
+            kwargs.update(build_projection(fields))
+        if order == 'desc':
+            kwargs['ScanIndexForward'] = False
+        if limit is not None:
+            kwargs['Limit'] = limit
+        if exclusive_start_key is not None:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+        response = self._table.query(**kwargs)
+        items = response['Items']
+        if time_ordered:
+            items = [item for item in items if UUIDv7.is_time_ordered(item['uid'])]
+        return items, response.get('LastEvaluatedKey')
+
+    @except_endpoint_connection_error
+    def count_items_by_state(self, username=DEFAULT_USERNAME):
+        """ステータスごとの Todo オブジェクトの件数を取得します
+
+        ステータスごとに GSI (STATE_INDEX_NAME) を Select='COUNT' で Query するため、
+        アイテムの本体は返されませんが、読み取りキャパシティはアイテムのサイズ分消費します。
+
+        Args:
+            username (str): Todo のユーザー名が渡ってきます
+
+        Return:
+            dict: Validates.STATE_ENUM のステータスごとの件数を返します
+
+        """
+        return {state: self.count_items(username, state) for state in Validates.STATE_ENUM}
+
+    @except_endpoint_connection_error
+    def count_items(self, username, state):
+        """1 つのステータスの Todo オブジェクトの件数を、GSI (STATE_INDEX_NAME) の Query で取得します"""
+        kwargs = {
+            'IndexName': STATE_INDEX_NAME,
+            'KeyConditionExpression': Key(STATE_KEY_ATTRIBUTE).eq(build_state_key(username, state)),
+            'Select': 'COUNT',
+        }
+        count = 0
+        while True:
+            response = self._table.query(**kwargs)
+            count += response['Count']
+            if 'LastEvaluatedKey' not in response:
+                return count
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    @except_endpoint_connection_error
+    def list_changes(self, username=DEFAULT_USERNAME, since=None, limit=None,
+                     exclusive_start_key=None, next_since=None):
+        """since 以降に追加、更新、削除された Todo を 1 ページ分取得します (差分同期)
+
+        パーティションキー username、ソートキー UPDATED_AT_ATTRIBUTE の GSI (UPDATED_INDEX_NAME) を
+        `updated_at >= since` で Query するため、変更のない Todo は読み取りません。
+        同じパーティションの削除の記録 (Tombstones) も同じ Query で取得し、deleted として返します。
+
+        次回の since (戻り値の since) は、現在時刻から CHANGES_OVERLAP_MS を引いた時刻とします。
+        GSI への反映の遅延と、Lambda のコンテナ間の時刻のずれにより、
+        現在時刻より前の updated_at の書き込みが後から Query の結果に現れることがあるためです。
+        そのため直近 CHANGES_OVERLAP_MS の変更は次回も重複して返ります。
+        (クライアントは uid と version で重複を取り除いてください)
+
+        since が削除の記録の保持期間 (tombstone_ttl) より古い場合は、削除を取りこぼすため
+        GoneError を発生させます。クライアントは since を指定せずに全件を取得し直してください。
+        UPDATED_AT_ATTRIBUTE を持たない既存の Todo オブジェクトは GSI に含まれないため、
+        `python ddb_maintenance.py backfill-updated-at` で属性を追加してください。
+
+        Args:
+            username (str): Todo のユーザー名が渡ってきます
+            since (int): 前回の同期で返した since (Unix 時刻のミリ秒) が渡ってきます
+                         指定がない場合は、すべての Todo と保持期間内の削除の記録を返します
+            limit (int): 1 ページで評価するアイテム数の上限が渡ってきます
+            exclusive_start_key (dict): 前のページの LastEvaluatedKey が渡ってきます
+            next_since (int): 前のページで返した since が渡ってきます (続きのページを取得する場合)
+
+        Raises:
+            GoneError: since が削除の記録の保持期間より古いケースで例外が発生します
+
+        Return:
+            dict: 以下のキーを持つ dict を返します
+                items (list): 追加、更新された Todo オブジェクトのリスト (updated_at の昇順)
+                deleted (list): 削除された Todo の uid のリスト
+                since (int): 次回の同期に指定する since
+                last_key (dict): LastEvaluatedKey 最後のページの場合は None
+
+        """
+        Validates.username(username)
+        if since is not None and since < self._tombstones.oldest_since():
+            raise GoneError(
+                f"since is older than the tombstone retention. (Your Request: {since}) "
+                f"REQUIRED: full resync without since")
+        if next_since is None:
+            next_since = max(since or 0, now_ms() - CHANGES_OVERLAP_MS)
+        key_condition = Key('username').eq(username)
+        if since is not None:
+            key_condition &= Key(UPDATED_AT_ATTRIBUTE).gte(since)
+        kwargs = {'IndexName': UPDATED_INDEX_NAME, 'KeyConditionExpression': key_condition}
+        if limit is not None:
+            kwargs['Limit'] = limit
+        if exclusive_start_key is not None:
+            kwargs['ExclusiveStartKey'] = exclusive_start_key
+        response = self._table.query(**kwargs)
+        items, deleted = [], []
+        for item in response['Items']:
+            if Tombstones.is_tombstone(item):
+                deleted.append(item['deleted_uid'])
+            elif 'record_type' not in item:
+                items.append(item)
+        return {
+            'items': items,
+            'deleted': deleted,
+            'since': next_since,
+            'last_key': response.get('LastEvaluatedKey'),
+        }
+
+    @except_endpoint_connection_error
+    def backfill_state_index(self):
+        """STATE_KEY_ATTRIBUTE を持たない既存の Todo オブジェクトに属性を追加します
+
+        条件付きの UpdateItem で追加するため、実行中に更新された Todo オブジェクトの値は上書きしません。
+
+        Return:
+            dict: 属性を追加した Todo オブジェクトの件数 updated を返します
+
+        """
+        updated = 0
+        for item in self.get_pagenated_items(
+                FilterExpression=TODO_FILTER & Attr(STATE_KEY_ATTRIBUTE).not_exists()):
+            try:
+                self._table.update_item(
+                    Key={'username': item['username'], 'uid': item['uid']},
+                    **merge_expressions(
+                        build_update_expression(
+                            {STATE_KEY_ATTRIBUTE: build_state_key(item['username'], item['state'])}),
+                        {
+                            'ConditionExpression': '#state = :state',
+                            'ExpressionAttributeNames': {'#state': 'state'},
+                            'ExpressionAttributeValues': {':state': item['state']},
+                        }))
+                updated += 1
+            except ClientError as e:
+                if not is_conditional_check_failed(e):
+                    raise
+        return {'updated': updated}
+
+    @except_endpoint_connection_error
+    def backfill_updated_at(self):
+        """UPDATED_AT_ATTRIBUTE を持たない既存の Todo オブジェクトに属性を追加します
+
+        uid が UUIDv7 の場合は作成日時を、uuid4 の場合は現在時刻を設定します。
+        条件付きの UpdateItem で追加するため、実行中に更新された Todo オブジェクトの値は上書きしません。
+
+        Return:
+            dict: 属性を追加した Todo オブジェクトの件数 updated を返します
+
+        """
+        updated = 0
+        for item in self.get_pagenated_items(
+                FilterExpression=TODO_FILTER & Attr(UPDATED_AT_ATTRIBUTE).not_exists()):
+            uid = item['uid']
+            updated_at = UUIDv7.timestamp_ms(uid) if UUIDv7.is_time_ordered(uid) else now_ms()
+            try:
+                self._table.update_item(
+                    Key={'username': item['username'], 'uid': uid},
+                    **merge_expressions(
+                        build_update_expression({UPDATED_AT_ATTRIBUTE: updated_at}),
+                        {
+                            'ConditionExpression': 'attribute_exists(uid) AND attribute_not_exists(#updated_at)',
+                            'ExpressionAttributeNames': {'#updated_at': UPDATED_AT_ATTRIBUTE},
+                        }))
+                updated += 1
+            except ClientError as e:
+                if not is_conditional_check_failed(e):
+                    raise
+        return {'updated': updated}
+
+    def search_page(self, query, tokens, username, limit=None, exclusive_start_key=None):
+        """転置索引を使い、検索クエリを含む Todo オブジェクトのリストを 1 ページ分取得します
+
+        トークンのポスティングから候補の uid を求め、uid の昇順に limit 件ずつ BatchGetItem で取得し、
+        Todo 本体が正規化した検索クエリを含むことを確認します。
+        (索引による検索では、大文字/小文字、全角/半角を区別しません)
+
+        候補のうち Todo 本体が存在しないものは、読み取ったポスティングを削除します。
+
+        Args:
+            query (str): 検索クエリが渡ってきます
+            tokens (list): 検索クエリのトークンが渡ってきます
+            username (str): Todo のユーザー名が渡ってきます
+            limit (int): 1 ページで取得する候補の上限が渡ってきます
+            exclusive_start_key (dict): 前のページの LastEvaluatedKey が渡ってきます
+
+        Return:
+            tuple: (Todo オブジェクトのリスト, LastEvaluatedKey) を返します
+
+        """
+        uids = self._search_index.find_uids(username, tokens)
+        if exclusive_start_key is not None:
+            uids = [uid for uid in uids if uid > exclusive_start_key['uid']]
+        page = uids[:limit] if limit is not None else uids
+        last_key = None
+        if len(page) < len(uids):
+            last_key = {'username': username, 'uid': page[-1]}
+        if not page:
+            return [], last_key
+
+        result = self.get_items(page, username=username)
+        stale_tokens = set(tokens[:SearchIndex.MAX_QUERY_TOKENS])
+        self._batch_write_requests([
+            request for uid in result['missing']
+            for request in self._search_index.delete_requests(
+                {'username': username, 'uid': uid}, stale_tokens)])
+        items = [item for item in result['items'] if SearchIndex.matches(item, query)]
+        return items, last_key
 
     @except_endpoint_connection_error
-    def add_item(self, subject, description='', username=DEFAULT_USERNAME):
+    def add_item(self, subject, description='', username=DEFAULT_USERNAME, idempotency_key=None):
         """Todo オブジェクトを新規に追加します
 
         DynamoDB テーブルに特定のユーザーの Todo オブジェクトを追加します。
-        uid は uuid4 で新規に生成します。*1
-        state は 初期値に 'unstarted' が設定されます。
-        subject, description, state, username キーの値にバリデーションを行います。
+        uid は作成日時の順序に並ぶ UUIDv7 で新規に生成します。
+        state は 初期値に 'unstarted' が、version は初期値に INITIAL_VERSION が、
+        updated_at には現在時刻 (Unix 時刻のミリ秒) が設定されます。
+        validate が True の場合は subject, description, username キーの値にバリデーションを行います。
+
+        書き込みは NEW_ITEM_CONDITION (attribute_not_exists(uid)) を条件に行うため、
+        uid が衝突した場合も既存の Todo オブジェクトを上書きせず、uid を生成し直して再試行します。
 
-        (*1 同一ユーザーの Todo オブジェクトにおける uuid4 の衝突は今回の仕様では考慮しません。)
+        idempotency_key を指定した場合は、Todo の Put と冪等キーの記録 (IdempotencyKeys) を
+        1 つの TransactWriteItems で書き込みます。
+        同じ冪等キーで再送されたリクエストは Todo を追加せず、最初に追加した Todo の uid を返します。
 
         Args:
             subject (str): Todo のタイトルが渡ってきます
             description (str): Todo の説明 が渡ってきます 指定がない場合空文字を指定します
             username (str): Todo のユーザー名が渡ってきます
+            idempotency_key (str): クライアントが指定した冪等キーが渡ってきます
 
         Raises:
-            BadRequestError: バリデーションに失敗したケースで例外が発生します
+            BadRequestError: validate が True で、バリデーションに失敗したケースで例外が発生します
+            UnprocessableEntityError: 同じ冪等キーで異なる内容のリクエストが送られたケースで例外が発生します
+            ConflictError: UID_MAX_ATTEMPTS 回再試行しても書き込めなかったケースで例外が発生します
+                           (同じ冪等キーのリクエストを並行して処理しているケースなど)
 
         Return:
             str: 登録に成功した Todo オブジェクトの uid を返します
 
         """
+        if self._validate:
+            TODO_CREATE_SCHEMA.validate({'subject': subject, 'description': description})
+            Validates.username(username)
+        item = self._new_item(subject, description, username)
+        fingerprint = None
+        if idempotency_key is not None:
+            fingerprint = IdempotencyKeys.fingerprint(subject, description)
+        for _ in range(UID_MAX_ATTEMPTS):
+            try:
+                self._put_new_item(item, idempotency_key, fingerprint)
+                break
+            except ClientError as e:
+                if not (is_conditional_check_failed(e) or is_transaction_canceled(e)):
+                    raise
+            if idempotency_key is not None:
+                record = self._idempotency.get(username, idempotency_key)
+                if record is not None:
+                    if record['fingerprint'] != fingerprint:
+                        raise UnprocessableEntityError(
+                            f"Idempotency-Key is already used for another request. "
+                            f"(Your Request: {idempotency_key})")
+                    return record['todo_uid']
+            item = {**item, 'uid': UUIDv7.generate()}
+        else:
+            raise ConflictError(f"Failed to add todo. (attempts: {UID_MAX_ATTEMPTS})")
+        if self._search_index is not None:
+            self._batch_write_requests(self._search_index.put_requests(item))
+        return item['uid']
+
+    def _put_new_item(self, item, idempotency_key=None, fingerprint=None):
+        """uid が存在しない場合のみ Todo オブジェクトを書き込みます
+
+        冪等キーの記録、または集計アイテムを更新する場合は TransactWriteItems で書き込みます。
+        """
+        transact_items = []
+        if idempotency_key is not None:
+            transact_items.append({'Put': self._idempotency.put(
+                item['username'], idempotency_key, item['uid'], fingerprint)})
+        if self._stats is not None:
+            transact_items.append({'Update': self._stats.update(
+                item['username'], UserStats.deltas(None, item['state']))})
+        if not transact_items:
+            self._table.put_item(Item=item, ConditionExpression=NEW_ITEM_CONDITION)
+            return
+        self._table.meta.client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': self._table.name, 'Item': item,
+                     'ConditionExpression': NEW_ITEM_CONDITION}},
+            *transact_items])
+
+    @staticmethod
+    def _new_item(subject, description, username):
+        """新規に追加する Todo オブジェクトを生成します"""
         item = {
-            'uid': str(uuid4()),
+            'uid': UUIDv7.generate(),
             'subject': subject,
             'description': description,
             'state': 'unstarted',
-            'username': username
+            'username': username,
+            'version': INITIAL_VERSION,
+            UPDATED_AT_ATTRIBUTE: now_ms(),
         }
-        Validates.subject(item['subject'])
-        Validates.description(item['description'])
-        Validates.state(item['state'])
-        Validates.username(item['username'])
+        item[STATE_KEY_ATTRIBUTE] = build_state_key(username, item['state'])
+        return item
 
-        self._table.put_item(Item=item, ReturnValues='ALL_OLD')
-        return item['uid']
+    @staticmethod
+    def get_version(item):
+        """Todo オブジェクトの version を取得します
+
+        version 属性を持たない既存の Todo オブジェクトは version 0 として扱います。
+
+        Return:
+            int: version を返します
+
+        """
+        return int(item.get('version', 0))
+
+    def _get_latest_item(self, uid, username):
+        """書き込みの前の確認のため、特定の Todo オブジェクトを強い整合性の読み込み (ConsistentRead) で取得します
+
+        テーブルが ItemCacheTable の場合も、キャッシュを使わずに DynamoDB から読み取ります。
+
+        Raises:
+            NotFoundError: uid が存在しないケースで例外が発生します
+
+        Return:
+            dict: 特定の Todo オブジェクトを返します
+
+        """
+        response = self._table.get_item(
+            Key={'username': username, 'uid': uid}, ConsistentRead=True)
+        return todo_item_or_not_found(response, uid)
+
+    def _raise_condition_failed(self, uid, username):
+        """条件付き書き込みの失敗の原因を確認し、対応する例外を発生させます
+
+        原因は強い整合性の読み込み (_get_latest_item) で確認します。
+
+        Raises:
+            NotFoundError: uid が存在しないケースで例外が発生します
+            PreconditionFailedError: uid は存在するが、version が一致しないケースで例外が発生します
+
+        """
+        item = self._get_latest_item(uid, username)
+        raise PreconditionFailedError(
+            f"Todo has been modified. (id: {uid}, version: {self.get_version(item)})")
+
+    def _transact_with_stats(self, uid, username, expected_version, build, extra_items=None):
+        """Todo オブジェクトの書き込みと集計アイテムの更新を、1 つの TransactWriteItems で行います
+
+        書き込みの前に Todo オブジェクトを強い整合性の読み込み (_get_latest_item) で読み取り、
+        読み取った state を条件に書き込むため、
+        並行してステータスが変更された場合はトランザクションがキャンセルされます。
+        このときは self._backoff に従い、読み取りからやり直します。
+
+        Args:
+            uid (str): 書き込む Todo の uid が渡ってきます
+            username (str): 書き込む Todo のユーザー名が渡ってきます
+            expected_version (int): 期待する version (If-Match) が渡ってきます
+            build (callable): 読み取った Todo オブジェクトから、
+                              (Todo の TransactWriteItem, 集計に加算する値の dict) を返す関数が渡ってきます
+            extra_items (callable): 同じトランザクションで書き込む TransactWriteItem のリストを返す関数が渡ってきます
+                                    (削除の記録など 読み取りからやり直すたびに呼び出します)
+
+        Raises:
+            NotFoundError: uid が存在しないケースで例外が発生します
+            PreconditionFailedError: version が一致しない、またはリトライの上限に達したケースで例外が発生します
+
+        Return:
+            dict: 書き込む前の Todo オブジェクトを返します
+
+        """
+        for _ in self._backoff.attempts():
+            old_item = self._get_latest_item(uid, username)
+            if expected_version is not None and self.get_version(old_item) != expected_version:
+                self._raise_condition_failed(uid, username)
+            transact_item, deltas = build(old_item)
+            transact_items = [transact_item, *(extra_items() if extra_items is not None else [])]
+            if deltas:
+                transact_items.append({'Update': self._stats.update(username, deltas)})
+            try:
+                self._table.meta.client.transact_write_items(TransactItems=transact_items)
+                return old_item
+            except ClientError as e:
+                if not is_transaction_canceled(e):
+                    raise
+        self._raise_condition_failed(uid, username)
+
+    @except_endpoint_connection_error
+    def get_stats(self, username=DEFAULT_USERNAME):
+        """ユーザーの Todo の件数 (合計とステータスごと) を取得します
+
+        集計アイテムが有効な場合は、1 回の GetItem で取得します。
+        無効な場合は count_items_by_state で GSI から集計します。
+
+        Args:
+            username (str): Todo のユーザー名が渡ってきます
+
+        Return:
+            dict: total と、Validates.STATE_ENUM のステータスごとの件数を返します
+
+        """
+        if self._stats is None:
+            counts = self.count_items_by_state(username=username)
+            return {'total': sum(counts.values()), **counts}
+        response = self._table.get_item(Key=UserStats.key(username))
+        return UserStats.counts(response.get('Item'))
+
+    @except_endpoint_connection_error
+    def reconcile_stats(self):
+        """すべての Todo オブジェクトをスキャンし、集計アイテムを再構築します
+
+        ユーザーごとの件数を数え直し、集計アイテムを上書きします。
+        Todo オブジェクトがなくなったユーザーの集計アイテムは 0 で上書きします。
+        スキャン中の書き込みによる加算は上書きで失われることがあるため、書き込みの少ない時間帯に実行してください。
+
+        Return:
+            dict: 再構築した集計アイテムの件数 users を返します
+
+        """
+        stats = self._stats or UserStats(self._table)
+        counts = {}
+        for item in self.iter_all_items():
+            user_counts = counts.setdefault(item['username'], {})
+            for name in UserStats.deltas(None, item['state']):
+                user_counts[name] = user_counts.get(name, 0) + 1
+        for item in self.get_pagenated_items(
+                FilterExpression=Attr('record_type').eq(UserStats.RECORD_TYPE)):
+            counts.setdefault(item['owner'], {})
+        self._batch_write_requests([
+            stats.put_request(username, user_counts)
+            for username, user_counts in counts.items()])
+        return {'users': len(counts)}
+
+    @except_endpoint_connection_error
+    def enable_ttl(self):
+        """冪等キーの記録 (IdempotencyKeys) と削除の記録 (Tombstones) を削除する TTL をテーブルに設定します
+
+        どちらの記録も同じ TTL_ATTRIBUTE を使用します。
+
+        TTL が設定済み (または設定中) の場合は何もしません。
+
+        Return:
+            dict: TTL の属性名 attribute と、設定を変更したか updated を返します
+
+        """
+        client = self._table.meta.client
+        description = client.describe_time_to_live(
+            TableName=self._table.name)['TimeToLiveDescription']
+        if description.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+            return {'attribute': description.get('AttributeName'), 'updated': False}
+        client.update_time_to_live(
+            TableName=self._table.name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': IdempotencyKeys.TTL_ATTRIBUTE})
+        return {'attribute': IdempotencyKeys.TTL_ATTRIBUTE, 'updated': True}
 
     @except_endpoint_connection_error
     def get_item(self, uid, username=DEFAULT_USERNAME):
@@ -139,7 +1055,8 @@ class DynamoDBTodo():
             username (str): 取得する Todo のユーザー名が渡ってきます
 
         Raises:
-            NotFoundError: DynamoDB のレスポンスに Item キーがないケースで例外が発生します
+            NotFoundError: DynamoDB のレスポンスに Item キーがないケース、
+                           または record_type 属性を持つ管理用のアイテムのケースで例外が発生します
 
         Return:
             dict: 特定の Todo オブジェクトを返します
@@ -150,78 +1067,413 @@ class DynamoDBTodo():
                 'username': username,
                 'uid': uid
             })
-        try:
-            res = response['Item']
-        except KeyError:
-            raise NotFoundError(f"Todo not found. (id: {uid})")
-        return res
+        return todo_item_or_not_found(response, uid)
 
     @except_endpoint_connection_error
-    def delete_item(self, uid, username=DEFAULT_USERNAME):
+    def get_items(self, uids, username=DEFAULT_USERNAME, fields=None):
+        """複数の uid の Todo オブジェクトをまとめて取得します
+
+        BatchGetItem で 100 件ずつまとめて取得し、
+        DynamoDB が処理しなかった UnprocessedKeys は self._backoff に従いリトライします。
+        存在しない uid があっても例外は発生させず、missing として返します。
+        (record_type 属性を持つ管理用のアイテムも missing として返します)
+
+        Args:
+            uids (list): 取得する uid のリストが渡ってきます (重複は取り除きます)
+            username (str): 取得する Todo のユーザー名が渡ってきます
+            fields (list): 取得する属性名のリストが渡ってきます (build_projection を参照)
+
+        Return:
+            dict: 以下のキーを持つ dict を返します
+                items (list): 指定した uid の順序に並べた Todo オブジェクトのリスト
+                missing (list): 存在しなかった uid のリスト
+                unprocessed (list): リトライの上限に達しても取得できなかった uid のリスト
+
+        """
+        uids = list(dict.fromkeys(uids))
+        client = self._table.meta.client
+        projection = build_projection([*fields, 'record_type']) if fields is not None else {}
+        found = {}
+        unprocessed = []
+        for start in range(0, len(uids), BATCH_GET_CHUNK_SIZE):
+            request = {self._table.name: {'Keys': [
+                {'username': username, 'uid': uid}
+                for uid in uids[start:start + BATCH_GET_CHUNK_SIZE]], **projection}}
+            for _ in self._backoff.attempts():
+                response = client.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self._table.name, []):
+                    if 'record_type' not in item:
+                        found[item['uid']] = project_item(item, fields)
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    break
+            if request:
+                unprocessed.extend(key['uid'] for key in request[self._table.name]['Keys'])
+        return {
+            'items': [found[uid] for uid in uids if uid in found],
+            'missing': [uid for uid in uids if uid not in found and uid not in unprocessed],
+            'unprocessed': unprocessed,
+        }
+
+    @except_endpoint_connection_error
+    def delete_item(self, uid, username=DEFAULT_USERNAME, expected_version=None):
         """特定の Todo オブジェクトを削除します
 
         DynamoDB テーブルから特定のユーザー、uid の Todo オブジェクトを削除します。
+        expected_version を指定した場合は、version が一致する場合のみ削除します。
+
+        差分同期 (list_changes) のため、Todo の Delete と削除の記録 (Tombstones) の Put を
+        1 つの TransactWriteItems で書き込みます。(集計アイテムが有効な場合は集計アイテムの更新も含みます)
+        トランザクションは削除前の内容を返さないため、書き込みの前に GetItem で読み取ります。
 
         Args:
             uid (str): 削除する uid
             username (str): 削除する Todo のユーザー名
+            expected_version (int): 期待する version (If-Match)
 
         Raises:
-            NotFoundError: DynamoDB のレスポンスの Attributes の中に uid キーがないケースで例外が発生します
+            NotFoundError: uid が存在しないケースで例外が発生します
+            PreconditionFailedError: version が一致しないケースで例外が発生します
 
         Return:
             dict: 削除された Todo オブジェクトの uid を返します
 
         """
         Validates.username(username)
-        response = self._table.delete_item(
-            Key={
-                'username': username,
-                'uid': uid,
-            },
-            ReturnValues='ALL_OLD')
-        try:
-            res = response['Attributes']['uid']
-        except KeyError:
-            raise NotFoundError(f"Todo not found. (id: {uid})")
-        return res
+        old_item = self._transact_with_stats(
+            uid, username, expected_version,
+            lambda old_item: ({'Delete': {
+                'TableName': self._table.name,
+                'Key': {'username': username, 'uid': uid},
+                **build_state_condition(old_item['state'], expected_version)}},
+                UserStats.deltas(old_item['state'], None) if self._stats is not None else None),
+            extra_items=lambda: [{'Put': self._tombstones.put(username, uid, now_ms())}])
+        if self._search_index is not None:
+            self._batch_write_requests(self._search_index.delete_requests(old_item))
+        return old_item['uid']
 
     @except_endpoint_connection_error
     def update_item(self, uid, subject=None, description=None,
-                    state=None, username=DEFAULT_USERNAME):
+                    state=None, username=DEFAULT_USERNAME, expected_version=None):
         """特定の Todo オブジェクトを更新します
 
         DynamoDB テーブルから特定のユーザー、uid の Todo オブジェクトを更新します。
-        subject, description, state, username キーの値にバリデーションを行います。
+        validate が True の場合は subject, description, state, username キーの値にバリデーションを行います。
+
+        指定された属性のみを UpdateExpression で更新するため、1 回の UpdateItem で完結します。
+        ConditionExpression で uid の存在を確認するため、存在しない Todo を作成することはありません。
+        (更新する属性の指定がない場合は、GetItem で存在のみを確認します
+         expected_version を指定した場合は強い整合性の読み込みで確認します)
+        転置索引が有効で subject, description を更新する場合は、
+        ポスティングの差分を求めるため ReturnValues に ALL_OLD を指定します。
+
+        更新のたびに version を 1 加算し、updated_at を現在時刻に更新します。
+        expected_version を指定した場合は、version が一致する場合のみ更新します。
 
         Args:
             subject (str): Todo のタイトルが渡ってきます
             description (str): Todo の説明が渡ってきます
             username (str): Todo のユーザー名が渡ってきます
             state (str): Todo のステータスが渡ってきます
+            expected_version (int): 期待する version (If-Match) が渡ってきます
 
         Raises:
-            BadRequestError: バリデーションに失敗したケースで例外が発生します
-            NotFoundError: DynamoDB のレスポンスの Attributes の中に uid キーがないケースで例外が発生します
+            BadRequestError: validate が True で、バリデーションに失敗したケースで例外が発生します
+            NotFoundError: uid が存在せず、条件付き書き込みに失敗したケースで例外が発生します
+            PreconditionFailedError: version が一致しないケースで例外が発生します
 
         Return:
             str: 更新に成功した Todo オブジェクトの uid を返します
 
         """
-        Validates.username(username)
-        item = self.get_item(uid, username)
+        if self._validate:
+            TODO_UPDATE_SCHEMA.validate(
+                {'subject': subject, 'description': description, 'state': state})
+            Validates.username(username)
+        changes = {}
         if subject is not None:
-            Validates.subject(subject)
-            item['subject'] = subject
+            changes['subject'] = subject
         if description is not None:
-            Validates.description(description)
-            item['description'] = description
+            changes['description'] = description
         if state is not None:
-            Validates.state(state)
-            item['state'] = state
-        response = self._table.put_item(Item=item, ReturnValues='ALL_OLD')
+            changes['state'] = state
+            changes[STATE_KEY_ATTRIBUTE] = build_state_key(username, state)
+        if not changes:
+            if expected_version is None:
+                item = self.get_item(uid, username)
+            else:
+                item = self._get_latest_item(uid, username)
+            if expected_version is not None and self.get_version(item) != expected_version:
+                self._raise_condition_failed(uid, username)
+            return item['uid']
+        changes[UPDATED_AT_ATTRIBUTE] = now_ms()
+
+        reindex = self._search_index is not None and (
+            'subject' in changes or 'description' in changes)
+        if self._stats is not None and state is not None:
+            update_expression = build_update_expression(changes, {'version': 1})
+            old_item = self._transact_with_stats(
+                uid, username, expected_version,
+                lambda old_item: ({'Update': {
+                    'TableName': self._table.name,
+                    'Key': {'username': username, 'uid': uid},
+                    **merge_expressions(
+                        update_expression,
+                        build_state_condition(old_item['state'], expected_version))}},
+                    UserStats.deltas(old_item['state'], state)))
+            if reindex:
+                self._batch_write_requests(
+                    self._search_index.diff_requests(old_item, {**old_item, **changes}))
+            return uid
+
+        try:
+            response = self._table.update_item(
+                Key={
+                    'username': username,
+                    'uid': uid
+                },
+                ReturnValues='ALL_OLD' if reindex else 'UPDATED_NEW',
+                **merge_expressions(
+                    build_update_expression(changes, {'version': 1}),
+                    build_version_condition(expected_version)))
+        except ClientError as e:
+            if not is_conditional_check_failed(e):
+                raise
+            self._raise_condition_failed(uid, username)
+        if reindex:
+            old_item = response['Attributes']
+            self._batch_write_requests(
+                self._search_index.diff_requests(old_item, {**old_item, **changes}))
+        return uid
+
+    @except_endpoint_connection_error
+    def batch_write(self, operations, username=DEFAULT_USERNAME):
+        """複数の Todo オブジェクトの追加、更新、削除をまとめて行います
+
+        create と delete は BatchWriteItem で 25 件ずつまとめて書き込みます。
+        BatchWriteItem は属性の部分更新と条件付き書き込みができないため、
+        update と expected_version を指定した delete は 1 件ずつ update_item, delete_item で書き込みます。
+
+        DynamoDB が処理しなかった UnprocessedItems は self._backoff に従いリトライし、
+        リトライの上限に達しても処理されなかった操作は status 503 として返します。
+        スロットリングなどで RetryableError となった操作も、バッチ全体を失敗させずに
+        その操作の status (429 / 503) として返します。(書き込めた操作の結果は失われません)
+
+        Validates.batch_operations は update, delete で同じ uid を複数回指定したバッチを拒否するため、
+        1 件ずつ書き込む操作と BatchWriteItem でまとめる操作の順序が入れ替わっても、結果は変わりません。
+        BatchWriteItem の delete は存在しない uid を指定しても失敗しません。
+        (削除前の内容がわからないため、転置索引のポスティングは検索時、または rebuild_search_index で削除します)
+        BatchWriteItem で削除した uid の削除の記録 (Tombstones) は、削除のあとにまとめて書き込みます。
+        (存在しなかった uid の記録も書き込まれますが、クライアントは知らない uid として無視できます)
+
+        集計アイテムが有効な場合、delete は削除前のステータスを確認するため 1 件ずつ delete_item で書き込み、
+        create は書き込めた件数をまとめて 1 回の UpdateItem で集計アイテムに加算します。
+        (この加算は create と同じトランザクションではないため、ずれは reconcile_stats で修正します)
+
+        Args:
+            operations (list): 操作のリストが渡ってきます (validate が False の場合は Validates.batch_operations でバリデーション済み)
+                op (str): create, update, delete のいずれか
+                uid (str): update, delete の対象の uid
+                subject, description, state (str): create, update の属性
+                expected_version (int): update, delete の期待する version
+            username (str): Todo のユーザー名が渡ってきます
+
+        Raises:
+            BadRequestError: validate が True で、バリデーションに失敗したケースで例外が発生します
+
+        Return:
+            list: operations と同じ順序で、操作ごとの結果 {op, uid, status[, error]} のリストを返します
+
+        """
+        if self._validate:
+            Validates.batch_operations(operations)
+            Validates.username(username)
+        results = [None] * len(operations)
+        requests = {}
+        for index, operation in enumerate(operations):
+            op = operation['op']
+            if op == 'create':
+                item = self._new_item(
+                    operation['subject'], operation.get('description', ''), username)
+                requests[item['uid']] = (index, {'PutRequest': {'Item': item}})
+                results[index] = {'op': op, 'uid': item['uid'], 'status': 201}
+            elif (op == 'delete' and operation.get('expected_version') is None
+                  and self._stats is None):
+                uid = operation['uid']
+                requests[uid] = (index, {'DeleteRequest': {
+                    'Key': {'username': username, 'uid': uid}}})
+                results[index] = {'op': op, 'uid': uid, 'status': 200}
+            else:
+                results[index] = self._write_one(operation, username)
+
+        failed = []
+        unprocessed = self._batch_write_requests(
+            [request for _, request in requests.values()], errors=failed)
+        unprocessed_or_failed = unprocessed + [request for request, _ in failed]
+        if self._stats is not None:
+            created = [request['PutRequest']['Item'] for _, request in requests.values()
+                       if 'PutRequest' in request and request not in unprocessed_or_failed]
+            if created:
+                deltas = {'total': len(created)}
+                for item in created:
+                    deltas[item['state']] = deltas.get(item['state'], 0) + 1
+                update = self._stats.update(username, deltas)
+                del update['TableName']
+                self._table.update_item(**update)
+        if self._search_index is not None:
+            self._batch_write_requests([
+                posting for _, request in requests.values()
+                if 'PutRequest' in request and request not in unprocessed_or_failed
+                for posting in self._search_index.put_requests(request['PutRequest']['Item'])])
+        deleted_at = now_ms()
+        self._batch_write_requests([
+            self._tombstones.put_request(username, request['DeleteRequest']['Key']['uid'], deleted_at)
+            for _, request in requests.values()
+            if 'DeleteRequest' in request and request not in unprocessed_or_failed])
+        for request in unprocessed:
+            index, _ = requests[self._request_uid(request)]
+            results[index] = dict(
+                results[index], status=503, error='Unprocessed by DynamoDB.')
+        for request, error in failed:
+            index, _ = requests[self._request_uid(request)]
+            results[index] = dict(
+                results[index], status=error.STATUS_CODE, error=str(error))
+        return results
+
+    @staticmethod
+    def _request_uid(request):
+        """WriteRequest (PutRequest または DeleteRequest) の uid を返します"""
+        return (request.get('PutRequest', {}).get('Item')
+                or request['DeleteRequest']['Key'])['uid']
+
+    @except_endpoint_connection_error
+    def import_items(self, items):
+        """検証済みの Todo オブジェクトを、uid を保持したまま BatchWriteItem でまとめて書き込みます
+
+        バルクロード (ddb_bulk_load.py) 用のメソッドです。
+        batch_write の create と異なり、uid, state, version を渡された値のまま書き込みます。
+        state-index の属性と、updated_at を持たない場合は現在時刻の updated_at を付与し、
+        転置索引、集計アイテムが有効な場合はあわせて更新します。
+        既存の uid を上書きした場合、集計アイテムは二重に加算されるため reconcile_stats で修正してください。
+        BatchWriteItem は同じキーを複数含むリクエストを受け付けないため、
+        同じ (username, uid) の Todo が複数ある場合は最後の Todo のみを書き込みます。
+
+        Args:
+            items (list): Todo オブジェクトのリストが渡ってきます (bulk_load.build_item でバリデーション済み)
+
+        Return:
+            list: リトライの上限に達しても書き込めなかった Todo オブジェクトのリストを返します
+
+        """
+        updated_at = now_ms()
+        items = [{UPDATED_AT_ATTRIBUTE: updated_at, **item,
+                  STATE_KEY_ATTRIBUTE: build_state_key(item['username'], item['state'])}
+                 for item in {(item['username'], item['uid']): item for item in items}.values()]
+        unprocessed = [request['PutRequest']['Item'] for request in self._batch_write_requests(
+            [{'PutRequest': {'Item': item}} for item in items])]
+        written = [item for item in items if item not in unprocessed]
+        if self._stats is not None:
+            deltas = {}
+            for item in written:
+                user_deltas = deltas.setdefault(item['username'], {'total': 0})
+                user_deltas['total'] += 1
+                user_deltas[item['state']] = user_deltas.get(item['state'], 0) + 1
+            for username, user_deltas in deltas.items():
+                update = self._stats.update(username, user_deltas)
+                del update['TableName']
+                self._table.update_item(**update)
+        if self._search_index is not None:
+            self._batch_write_requests([
+                posting for item in written
+                for posting in self._search_index.put_requests(item)])
+        return unprocessed
+
+    def _write_one(self, operation, username):
+        """batch_write の update と条件付き delete を 1 件ずつ書き込み、結果を返します"""
+        op = operation['op']
+        uid = operation['uid']
         try:
-            res = response['Attributes']['uid']
-        except KeyError:
-            raise NotFoundError(f"Todo not found. (id: {uid})")
-        return res
+            if op == 'update':
+                self.update_item(
+                    uid,
+                    subject=operation.get('subject'),
+                    description=operation.get('description'),
+                    state=operation.get('state'),
+                    username=username,
+                    expected_version=operation.get('expected_version'))
+            else:
+                self.delete_item(
+                    uid, username=username,
+                    expected_version=operation.get('expected_version'))
+        except (ChaliceViewError, RetryableError) as e:
+            return {'op': op, 'uid': uid, 'status': e.STATUS_CODE, 'error': str(e)}
+        return {'op': op, 'uid': uid, 'status': 200}
+
+    def _batch_write_requests(self, requests, errors=None):
+        """WriteRequest を 25 件ずつ BatchWriteItem で書き込みます
+
+        Args:
+            requests (list): WriteRequest のリストが渡ってきます
+            errors (list): 指定した場合は RetryableError を送出せず、書き込めなかった
+                           (WriteRequest, 例外) を追加して続きのチャンクを書き込みます
+
+        Return:
+            list: リトライの上限に達しても処理されなかった WriteRequest のリストを返します
+
+        """
+        client = self._table.meta.client
+        unprocessed = []
+        for start in range(0, len(requests), BATCH_WRITE_CHUNK_SIZE):
+            pending = requests[start:start + BATCH_WRITE_CHUNK_SIZE]
+            try:
+                for _ in self._backoff.attempts():
+                    response = client.batch_write_item(
+                        RequestItems={self._table.name: pending})
+                    pending = response.get('UnprocessedItems', {}).get(self._table.name, [])
+                    if not pending:
+                        break
+            except RetryableError as e:
+                if errors is None:
+                    raise
+                errors.extend((request, e) for request in pending)
+                continue
+            unprocessed.extend(pending)
+        return unprocessed
+
+    @except_endpoint_connection_error
+    def rebuild_search_index(self):
+        """既存のデータから転置索引を再構築します
+
+        すべての Todo オブジェクトのポスティングを登録したあと、
+        すべてのポスティングをスキャンし、Todo オブジェクトの現在の内容と一致しないものを削除します。
+        再構築中も検索は継続して行うことができます。
+
+        Return:
+            dict: 登録したポスティング数 written と、削除したポスティング数 deleted を返します
+
+        """
+        search_index = self._search_index or SearchIndex(self._table)
+        written = 0
+        for items in self.get_pagenated_pages():
+            requests = [request for item in items
+                        for request in search_index.put_requests(item)]
+            self._batch_write_requests(requests)
+            written += len(requests)
+
+        deleted = 0
+        for postings in self.get_pagenated_pages(
+                FilterExpression=Attr('record_type').eq(SearchIndex.RECORD_TYPE)):
+            owners = {}
+            for posting in postings:
+                owners.setdefault(posting['owner'], []).append(posting['uid'])
+            found = {
+                (item['username'], item['uid']): item
+                for owner, uids in owners.items()
+                for item in self.get_items(uids, username=owner)['items']}
+            requests = [
+                {'DeleteRequest': {'Key': {'username': posting['username'], 'uid': posting['uid']}}}
+                for posting in postings
+                if search_index.is_stale(posting, found.get((posting['owner'], posting['uid'])))]
+            self._batch_write_requests(requests)
+            deleted += len(requests)
+        return {'written': written, 'deleted': deleted}
@@ -1,4 +1,43 @@
 from chalice import ChaliceViewError
+from chalice.app import ChaliceUnhandledError
 
 class DatabaseConnectionError(ChaliceViewError):
-    STATUS_CODE = 501
\ No newline at end of file
+    STATUS_CODE = 501
+
+
+class PreconditionFailedError(ChaliceViewError):
+    STATUS_CODE = 412
+
+
+class RetryableError(ChaliceUnhandledError):
+    """時間をおいて再試行できるエラーです
+
+    ChaliceViewError はミドルウェアを通らずにレスポンスに変換されるため、
+    ChaliceUnhandledError を継承し、app.py の handle_retryable_error で
+    STATUS_CODE と Retry-After ヘッダー (秒) のレスポンスに変換します。
+    """
+    STATUS_CODE = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TooManyRequestsError(RetryableError):
+    STATUS_CODE = 429
+
+
+class ServiceUnavailableError(RetryableError):
+    STATUS_CODE = 503
+
+
+class GoneError(ChaliceViewError):
+    STATUS_CODE = 410
+
+
+class CursorSecretError(ChaliceUnhandledError):
+    """カーソルの署名に使用する秘密鍵が設定されていないエラーです
+
+    公開されている値で署名するとカーソルを偽造できるため、設定の誤りとして 500 のレスポンスにします。
+    """
+    STATUS_CODE = 500
@@ -0,0 +1,55 @@
+import gzip
+import json
+from decimal import Decimal
+
+
+class NDJSON:
+    """Todo オブジェクトを改行区切りの JSON (NDJSON) にエンコードします
+
+    1 行に 1 つの Todo オブジェクトを JSON として書き出します。
+    エンコードはページ単位で行うため、テーブル全体をメモリに保持する必要はありません。
+
+    """
+
+    CONTENT_TYPE = 'application/x-ndjson'
+    GZIP_CONTENT_TYPE = 'application/gzip'
+
+    @staticmethod
+    def json_default(obj):
+        if isinstance(obj, Decimal):
+            return int(obj) if obj == obj.to_integral_value() else float(obj)
+        if isinstance(obj, set):
+            return sorted(obj)
+        raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+    @classmethod
+    def dumps(cls, items):
+        """Todo オブジェクトのリストを NDJSON のバイト列にエンコードします
+
+        Args:
+            items (list): Todo オブジェクトのリストが渡ってきます
+
+        Return:
+            bytes: 各行が改行で終わる NDJSON のバイト列を返します
+
+        """
+        return b''.join(
+            json.dumps(item, ensure_ascii=False, separators=(',', ':'),
+                       default=cls.json_default).encode('utf-8') + b'\n'
+            for item in items)
+
+    @classmethod
+    def dumps_gzip(cls, items):
+        """Todo オブジェクトのリストを gzip で圧縮した NDJSON のバイト列にエンコードします
+
+        戻り値は完結した 1 つの gzip メンバーのため、ページごとの戻り値を連結しても
+        有効な gzip ストリームになります。(中断したエクスポートの再開に使用します)
+
+        Args:
+            items (list): Todo オブジェクトのリストが渡ってきます
+
+        Return:
+            bytes: gzip で圧縮した NDJSON のバイト列を返します
+
+        """
+        return gzip.compress(cls.dumps(items))
@@ -0,0 +1,78 @@
+import json
+import time
+import hashlib
+
+
+DEFAULT_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+
+class IdempotencyKeys:
+    """Todo の追加に使用した冪等キーを、追加した uid とともに記録します
+
+    冪等キーの記録はパーティションキー `#idempotency#<username>`、ソートキー `<冪等キー>` のアイテムとして
+    Todo と同じテーブルに保存します。(owner 属性に元の username を保持します)
+    記録は record_type 属性を持つため、Todo のスキャンからは除外されます。
+
+    記録は Todo の Put と同じ TransactWriteItems の中で、記録が存在しない (または期限切れの)
+    場合のみ書き込むため、同じ冪等キーで Todo が 2 件追加されることはありません。
+    記録には TTL_ATTRIBUTE (Unix 時刻の秒) を設定し、DynamoDB の TTL で削除します。
+    TTL による削除は期限から遅れることがあるため、期限切れの記録は存在しないものとして扱います。
+    (`python ddb_maintenance.py enable-ttl` でテーブルの TTL を有効にしてください)
+
+    constructer:
+        Args:
+            table_resource (boto3.resource.Table): Todo と同じテーブルが渡ってきます
+            ttl (int): 記録を保持する秒数が渡ってきます
+            clock (callable): 現在時刻 (Unix 時刻の秒) を返す関数 (テストでの差し替え用)
+
+    """
+
+    KEY_PREFIX = '#idempotency#'
+    RECORD_TYPE = 'idempotency'
+    TTL_ATTRIBUTE = 'expires_at'
+
+    def __init__(self, table_resource, ttl=DEFAULT_IDEMPOTENCY_TTL, clock=time.time):
+        self._table = table_resource
+        self._ttl = ttl
+        self._clock = clock
+
+    @classmethod
+    def key(cls, username, idempotency_key):
+        return {'username': f"{cls.KEY_PREFIX}{username}", 'uid': idempotency_key}
+
+    @staticmethod
+    def fingerprint(subject, description):
+        """リクエストの内容のハッシュを返します (同じ冪等キーで異なる内容が送られたことを検出します)"""
+        payload = json.dumps([subject, description], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def put(self, username, idempotency_key, uid, fingerprint):
+        """冪等キーの記録を、存在しない (または期限切れの) 場合のみ書き込む TransactWriteItem の Put を返します"""
+        now = int(self._clock())
+        return {
+            'TableName': self._table.name,
+            'Item': {
+                **self.key(username, idempotency_key),
+                'record_type': self.RECORD_TYPE,
+                'owner': username,
+                'todo_uid': uid,
+                'fingerprint': fingerprint,
+                self.TTL_ATTRIBUTE: now + self._ttl,
+            },
+            'ConditionExpression': 'attribute_not_exists(uid) OR #expires_at < :now',
+            'ExpressionAttributeNames': {'#expires_at': self.TTL_ATTRIBUTE},
+            'ExpressionAttributeValues': {':now': now},
+        }
+
+    def get(self, username, idempotency_key):
+        """冪等キーの記録を強い整合性で読み取ります
+
+        Return:
+            dict: 冪等キーの記録を返します 存在しない、または期限切れの場合は None を返します
+
+        """
+        item = self._table.get_item(
+            Key=self.key(username, idempotency_key), ConsistentRead=True).get('Item')
+        if item is None or item[self.TTL_ATTRIBUTE] < int(self._clock()):
+            return None
+        return item
@@ -0,0 +1,205 @@
+import copy
+import json
+from types import SimpleNamespace
+
+from chalicelib.cache import TTLCache
+
+
+ITEM_CACHE_BACKENDS = ('none', 'memory', 'redis')
+DEFAULT_ITEM_CACHE_MAX_SIZE = 10000
+DEFAULT_ITEM_CACHE_TTL = 60.0
+KEY_ATTRIBUTES = ('username', 'uid')
+
+
+class RedisItemStore:
+    """ItemCacheTable のアイテムを Redis (または memcached などの同じ get/set/delete を持つクライアント) に保存します
+
+    コンテナ間でキャッシュを共有するため、他のコンテナの書き込みによる無効化も反映されます。
+    アイテムは DynamoDB JSON (AttributeValue) の文字列で保存し、
+    読み取ったアイテムの数値は boto3.resource.Table と同じく Decimal になります。
+    redis は任意の依存パッケージのため、item_store で redis を指定した場合のみ import します。
+
+    constructer:
+        Args:
+            client (redis.Redis): get(name), set(name, value, ex=秒), delete(name) を持つクライアントが渡ってきます
+            ttl (float): エントリの有効期限 (秒) が渡ってきます
+            prefix (str): Redis のキーの接頭辞が渡ってきます
+
+    """
+
+    def __init__(self, client, ttl=DEFAULT_ITEM_CACHE_TTL, prefix='todo-item:'):
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+        self._client = client
+        self._ttl = max(1, int(ttl))
+        self._prefix = prefix
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def _name(self, key):
+        return self._prefix + json.dumps(key, ensure_ascii=False)
+
+    def get(self, key, default=None):
+        value = self._client.get(self._name(key))
+        if value is None:
+            return default
+        return {name: self._deserializer.deserialize(attribute_value)
+                for name, attribute_value in json.loads(value).items()}
+
+    def set(self, key, value):
+        self._client.set(self._name(key), json.dumps(
+            {name: self._serializer.serialize(attribute) for name, attribute in value.items()},
+            ensure_ascii=False), ex=self._ttl)
+
+    def delete(self, key):
+        self._client.delete(self._name(key))
+
+
+def item_store(backend, ttl=DEFAULT_ITEM_CACHE_TTL, maxsize=DEFAULT_ITEM_CACHE_MAX_SIZE, url=None):
+    """ItemCacheTable に渡すアイテムの保存先を、指定したバックエンドで生成します
+
+    Args:
+        backend (str): ITEM_CACHE_BACKENDS のいずれかが渡ってきます
+            none: キャッシュしません (None を返します)
+            memory: コンテナ内の TTLCache に保存します
+            redis: url の Redis に保存します (RedisItemStore)
+        ttl (float): エントリの有効期限 (秒) が渡ってきます
+        maxsize (int): memory の場合に保持するエントリ数の上限が渡ってきます
+        url (str): redis の場合に接続する Redis の URL が渡ってきます
+
+    Raises:
+        ValueError: backend が ITEM_CACHE_BACKENDS に含まれないケースで例外が発生します
+
+    Return:
+        TTLCache または RedisItemStore を返します none の場合は None を返します
+
+    """
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if backend == 'redis':
+        import redis
+        return RedisItemStore(redis.Redis.from_url(url), ttl=ttl)
+    raise ValueError(f"backend (Your Request: {backend}) REQUIRED: {', '.join(ITEM_CACHE_BACKENDS)}")
+
+
+class ItemCacheTable:
+    """DynamoDB Accelerator (DAX) のアイテムキャッシュと同じく、get_item の結果をキャッシュするテーブルのラッパーです
+
+    boto3.resource.Table (または ClientTable) と同じ呼び出し方で、DynamoDBTodo の下に差し込みます。
+    アイテムはテーブル名とキー (KEY_ATTRIBUTES) ごとに store に保存します。
+    store は get(key, default), set(key, value), delete(key) を持つオブジェクトで、
+    コンテナ内の TTLCache と、コンテナ間で共有する RedisItemStore を使用できます。
+
+    読み取りと書き込みの整合性は以下のとおりです。
+        get_item (結果整合性): store にある場合は DynamoDB を呼び出さずに返します (ヒット)
+            ない場合は DynamoDB から読み取り、存在するアイテムのみを store に保存します
+        get_item (ConsistentRead=True, ProjectionExpression などを指定した場合):
+            DAX と同じく store を使わずに DynamoDB から読み取り、結果も保存しません
+        put_item: DynamoDB に書き込んだあと、書き込んだアイテムを store に保存します (write-through)
+        update_item, delete_item: DynamoDB に書き込んだあと、store のアイテムを削除します
+        meta.client の transact_write_items, batch_write_item:
+            DynamoDB に書き込んだあと、このテーブルの書き込んだキーのアイテムを store から削除します
+        query, scan, meta.client の batch_get_item: キャッシュせず、そのまま DynamoDB から読み取ります
+        (書き込みが失敗した場合も、念のため store のアイテムを削除します)
+
+    このため DynamoDBTodo のメソッドの整合性は以下のようになります。
+        get_item, get_stats: 最大で ttl 秒古い内容を返すことがあります
+            同じ store を使うコンテナの書き込みは、書き込みのあとの読み取りに反映されます (read-your-writes)
+            memory は同じコンテナのみ、redis はすべてのコンテナの書き込みが反映されます
+            (ItemCacheTable を経由しない書き込みは、ttl 秒が経過するまで反映されません)
+        update_item, delete_item などの書き込みの条件 (version の確認など):
+            書き込みの前の読み取りと、条件付き書き込みの失敗の原因の確認は ConsistentRead=True で行い、
+            DynamoDB の ConditionExpression で確認するため、キャッシュの内容によらず正しく判定します
+        list_items, list_items_page, get_items, list_changes などの Query, Scan, BatchGetItem:
+            キャッシュの影響を受けません
+        add_item の冪等キーの確認: ConsistentRead=True のため、キャッシュの影響を受けません
+
+    読み取ったアイテムを保存する前に他の書き込みが削除を行った場合は、
+    古いアイテムが ttl 秒まで残ることがあります。(DAX のアイテムキャッシュと同じです)
+
+    constructer:
+        Args:
+            table (boto3.resource.Table): ラップするテーブル (または ClientTable) が渡ってきます
+            store (TTLCache): アイテムの保存先が渡ってきます
+
+    """
+
+    def __init__(self, table, store):
+        self._table = table
+        self.store = store
+        self.meta = SimpleNamespace(client=_ItemCacheClient(self, table.meta.client))
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+    def cache_key(self, key):
+        """テーブル名とキーの属性の値から、store のキーを返します"""
+        return (self._table.name, *(key[name] for name in KEY_ATTRIBUTES))
+
+    def get_item(self, **kwargs):
+        if set(kwargs) != {'Key'}:
+            return self._table.get_item(**kwargs)
+        cache_key = self.cache_key(kwargs['Key'])
+        item = self.store.get(cache_key)
+        if item is not None:
+            return {'Item': copy.deepcopy(item)}
+        response = self._table.get_item(**kwargs)
+        if 'Item' in response:
+            self.store.set(cache_key, copy.deepcopy(response['Item']))
+        return response
+
+    def put_item(self, **kwargs):
+        cache_key = self.cache_key(kwargs['Item'])
+        try:
+            response = self._table.put_item(**kwargs)
+        except Exception:
+            self.store.delete(cache_key)
+            raise
+        self.store.set(cache_key, copy.deepcopy(kwargs['Item']))
+        return response
+
+    def update_item(self, **kwargs):
+        try:
+            return self._table.update_item(**kwargs)
+        finally:
+            self.store.delete(self.cache_key(kwargs['Key']))
+
+    def delete_item(self, **kwargs):
+        try:
+            return self._table.delete_item(**kwargs)
+        finally:
+            self.store.delete(self.cache_key(kwargs['Key']))
+
+    def invalidate(self, keys):
+        """キー (または Put のアイテム) のリストの、store のアイテムを削除します"""
+        for key in keys:
+            self.store.delete(self.cache_key(key))
+
+
+class _ItemCacheClient:
+
+    def __init__(self, table, client):
+        self._table = table
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        try:
+            return self._client.transact_write_items(TransactItems=TransactItems, **kwargs)
+        finally:
+            self._table.invalidate([
+                operation.get('Item') or operation['Key']
+                for transact_item in TransactItems for operation in transact_item.values()
+                if operation['TableName'] == self._table.name])
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        try:
+            return self._client.batch_write_item(RequestItems=RequestItems, **kwargs)
+        finally:
+            self._table.invalidate([
+                request['PutRequest']['Item'] if 'PutRequest' in request else request['DeleteRequest']['Key']
+                for request in RequestItems.get(self._table.name, [])])
@@ -0,0 +1,156 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+DEFAULT_METRICS_NAMESPACE = 'ServerlessTodo'
+METRIC_DIMENSIONS = [['Method', 'Route']]
+METRIC_UNITS = {
+    'HandlerTime': 'Milliseconds',
+    'AuthTime': 'Milliseconds',
+    'DynamoDBTime': 'Milliseconds',
+    'DynamoDBCalls': 'Count',
+    'ConsumedCapacity': 'Count',
+    'ItemsScanned': 'Count',
+    'ItemsReturned': 'Count',
+    'ColdStart': 'Count',
+}
+
+
+class RequestMetrics:
+    """1 回のリクエストの計測値を保持します
+
+    DynamoDB の呼び出しは並列スキャンのスレッドからも記録されるため、ロックの中で加算します。
+    """
+
+    def __init__(self, cold_start):
+        self.started = time.perf_counter()
+        self.values = {name: 0 for name in METRIC_UNITS}
+        self.values['ColdStart'] = int(cold_start)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            self.values[name] += value
+
+    def add_call(self, operation, elapsed_ms, response):
+        """DynamoDB の 1 回の呼び出しの所要時間、消費キャパシティ、読み取り件数を記録します"""
+        consumed = response.get('ConsumedCapacity', [])
+        units = sum(capacity.get('CapacityUnits', 0)
+                    for capacity in (consumed if isinstance(consumed, list) else [consumed]))
+        if 'Responses' in response:
+            returned = sum(len(items) for items in response['Responses'].values())
+        elif 'Count' in response:
+            returned = response['Count']
+        else:
+            returned = int('Item' in response)
+        scanned = response.get('ScannedCount', returned)
+        with self._lock:
+            self.values['DynamoDBTime'] += elapsed_ms
+            self.values['DynamoDBCalls'] += 1
+            self.values['ConsumedCapacity'] += units
+            self.values['ItemsScanned'] += scanned
+            self.values['ItemsReturned'] += returned
+            self.calls.append({
+                'Operation': operation, 'Time': round(elapsed_ms, 3), 'CapacityUnits': units,
+                'ScannedCount': scanned, 'Count': returned})
+
+
+class MetricsRecorder:
+    """リクエストごとの計測値を CloudWatch Embedded Metric Format (EMF) のログとして出力します
+
+    app.py のミドルウェアが start, finish でリクエストを囲み、
+    DynamoDBTodo は instrument で登録した botocore のイベントで DynamoDB の呼び出しを記録します。
+    before-call と after-call の間を DynamoDB の呼び出しの所要時間とし (リトライを含みます)、
+    ReturnConsumedCapacity=TOTAL を付与してレスポンスの ConsumedCapacity を集計します。
+
+    Lambda のコンテナは同時に 1 つのリクエストのみを処理するため、計測中のリクエストは 1 つのみ保持します。
+    最初のリクエストを ColdStart として記録します。
+
+    constructer:
+        Args:
+            namespace (str): CloudWatch メトリクスの名前空間が渡ってきます
+            emit (callable): EMF の 1 行の JSON 文字列を渡して呼び出す関数が渡ってきます
+                             指定がない場合は標準出力 (Lambda では CloudWatch Logs) に出力します
+            clock (callable): EMF の Timestamp (ミリ秒) を返す関数 (テストでの差し替え用)
+
+    """
+
+    def __init__(self, namespace=DEFAULT_METRICS_NAMESPACE, emit=print,
+                 clock=lambda: int(time.time() * 1000)):
+        self.namespace = namespace
+        self._emit = emit
+        self._clock = clock
+        self._cold_start = True
+        self._current = None
+        self._calls = threading.local()
+
+    def instrument(self, table_resource):
+        """Table の botocore のイベントに、DynamoDB の呼び出しを記録するフックを登録します"""
+        events = table_resource.meta.client.meta.events
+        events.register('before-parameter-build.dynamodb', self._return_consumed_capacity)
+        events.register('before-call.dynamodb', self._before_call)
+        events.register('after-call.dynamodb', self._after_call)
+
+    def _return_consumed_capacity(self, params, model, **__):
+        if self._current is not None and 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _before_call(self, **__):
+        self._calls.started = time.perf_counter()
+
+    def _after_call(self, parsed, model, **__):
+        current = self._current
+        started = getattr(self._calls, 'started', None)
+        if current is None or started is None:
+            return
+        current.add_call(model.name, (time.perf_counter() - started) * 1000, parsed)
+
+    def start(self):
+        """リクエストの計測を開始します"""
+        self._current = RequestMetrics(self._cold_start)
+        self._cold_start = False
+        return self._current
+
+    @contextmanager
+    def timer(self, name):
+        """with の中の所要時間 (ミリ秒) を name の計測値に加算します 計測中でない場合は何もしません"""
+        current = self._current
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if current is not None:
+                current.add(name, (time.perf_counter() - started) * 1000)
+
+    def finish(self, properties=None):
+        """リクエストの計測を終了し、EMF のログを出力します
+
+        Args:
+            properties (dict): Method, Route のディメンションと、StatusCode などのログのみの属性が渡ってきます
+
+        Return:
+            dict: 出力した EMF のオブジェクトを返します 計測中でない場合は None を返します
+
+        """
+        current, self._current = self._current, None
+        if current is None:
+            return None
+        current.values['HandlerTime'] = (time.perf_counter() - current.started) * 1000
+        record = {
+            '_aws': {
+                'Timestamp': self._clock(),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': METRIC_DIMENSIONS,
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in METRIC_UNITS.items()],
+                }],
+            },
+            **(properties or {}),
+            **{name: round(value, 3) for name, value in current.values.items()},
+            'DynamoDBCallDetails': current.calls,
+        }
+        self._emit(json.dumps(record, default=str))
+        return record
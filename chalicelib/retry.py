@@ -0,0 +1,273 @@
+import math
+import time
+import random
+import functools
+import threading
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from chalicelib.exceptions import ServiceUnavailableError, TooManyRequestsError
+
+
+class Backoff:
+    """指数バックオフとジッターによる待機時間を生成します
+
+    attempt 回目の待機時間は 0 から min(cap, base * 2 ** attempt) までの一様乱数です。(Full Jitter)
+    複数のクライアントが同時にリトライしても、リトライのタイミングが分散されます。
+
+    constructer:
+        Args:
+            base (float): 初回の待機時間の上限 (秒)
+            cap (float): 待機時間の上限 (秒)
+            max_attempts (int): リトライの最大回数
+            sleep (callable): 待機に使用する関数 (テストでの差し替え用)
+
+    """
+
+    def __init__(self, base=0.05, cap=2.0, max_attempts=8, sleep=time.sleep):
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+
+    def delays(self):
+        """リトライごとの待機時間を返すジェネレータです"""
+        for attempt in range(self.max_attempts):
+            yield random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def attempts(self):
+        """リトライの前に待機し、リトライの回数を返すジェネレータです
+
+        初回の試行の前には待機しません。
+        """
+        yield 0
+        for attempt, delay in enumerate(self.delays(), 1):
+            self.sleep(delay)
+            yield attempt
+
+
+class DecorrelatedJitter(Backoff):
+    """Decorrelated Jitter による待機時間を生成します
+
+    attempt 回目の待機時間は base から前回の待機時間の 3 倍までの一様乱数です。(上限は cap)
+    Full Jitter と比べて待機時間が前回の値に応じて伸びるため、
+    スロットリングが続く場合も短い待機時間の再試行が集中しにくくなります。
+    """
+
+    def delays(self):
+        delay = self.base
+        for _ in range(self.max_attempts):
+            delay = min(self.cap, random.uniform(self.base, delay * 3))
+            yield delay
+
+
+class RetryBudget:
+    """コンテナごとの再試行の予算です
+
+    成功した呼び出しごとに ratio 個のトークンを加算し、再試行ごとに 1 個のトークンを消費します。
+    トークンが不足している場合は再試行しないため、スロットリングが続いても
+    再試行の回数は成功した呼び出しの ratio 倍程度に抑えられ、負荷の増幅を防ぎます。
+
+    constructer:
+        Args:
+            ratio (float): 成功した呼び出し 1 回あたりに加算するトークン数
+            capacity (float): トークンの上限 (初期値も capacity です)
+
+    """
+
+    def __init__(self, ratio=0.1, capacity=10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """トークンを 1 個消費します 不足している場合は False を返します"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """連続した失敗の回数で DynamoDB の呼び出しを遮断するサーキットブレーカーです
+
+    再試行しても失敗した呼び出しが failure_threshold 回続くと open になり、
+    reset_timeout 秒の間は呼び出しを行わずに失敗させます。
+    reset_timeout 秒が経過すると half-open になり、1 回の試行が成功すれば closed に戻ります。
+
+    constructer:
+        Args:
+            failure_threshold (int): open にする連続した失敗の回数
+            reset_timeout (float): open を継続する時間 (秒)
+            clock (callable): 現在時刻 (秒) を返す関数 (テストでの差し替え用)
+
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """呼び出しを行えるか判定します half-open の場合は 1 回の試行のみ許可します"""
+        with self._lock:
+            state = self.state
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return state == self.CLOSED
+
+    def retry_after(self):
+        """half-open になるまでの時間 (秒) を返します"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+THROTTLING_ERROR_CODES = (
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+UNAVAILABLE_ERROR_CODES = ('InternalServerError', 'ServiceUnavailable')
+
+
+def error_code(error):
+    return error.response.get('Error', {}).get('Code')
+
+
+def retryable_error(error, retry_after=1):
+    """スロットリングは TooManyRequestsError (429) に、一時的な障害は ServiceUnavailableError (503) に変換します
+
+    Return:
+        RetryableError: 再試行できないエラーの場合は None を返します
+
+    """
+    code = error_code(error)
+    retry_after = max(1, math.ceil(retry_after))
+    if code in THROTTLING_ERROR_CODES:
+        return TooManyRequestsError(f"Database is throttling requests. ({code})", retry_after)
+    if code in UNAVAILABLE_ERROR_CODES:
+        return ServiceUnavailableError(f"Database is temporarily unavailable. ({code})", retry_after)
+    return None
+
+
+class RetryPolicy:
+    """スロットリングと一時的な障害を、予算とサーキットブレーカーの範囲で再試行します
+
+    botocore のリトライ (chalicelib.connection.client_config) は 1 回の呼び出しの中で行われるため、
+    このポリシーの再試行はその外側で行われます。app.get_app_db はこのポリシーを使用する場合、
+    試行回数が掛け合わされないよう、クライアントを max_attempts=1 (botocore のリトライなし) で生成します。
+
+    constructer:
+        Args:
+            backoff (Backoff): 再試行の待機時間 (デフォルト: DecorrelatedJitter)
+            budget (RetryBudget): コンテナごとの再試行の予算
+            breaker (CircuitBreaker): コンテナごとのサーキットブレーカー
+
+    """
+
+    def __init__(self, backoff=None, budget=None, breaker=None):
+        self.backoff = backoff or DecorrelatedJitter(base=0.025, cap=1.0, max_attempts=3)
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+
+    def call(self, func, *args, **kwargs):
+        """func を呼び出し、再試行できるエラーの場合は待機して再試行します
+
+        Raises:
+            ServiceUnavailableError: サーキットブレーカーが open のケース、
+                                     または一時的な障害で再試行できなくなったケースで例外が発生します
+            TooManyRequestsError: スロットリングで再試行できなくなったケースで例外が発生します
+
+        """
+        if not self.breaker.allow():
+            raise ServiceUnavailableError(
+                'Database is temporarily unavailable. (circuit open)', self.breaker.retry_after())
+        delays = self.backoff.delays()
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except ClientError as e:
+                error = retryable_error(e)
+                if error is None:
+                    self.breaker.record_success()
+                    raise
+                delay = next(delays, None)
+                if delay is None or not self.budget.withdraw():
+                    self.breaker.record_failure()
+                    error.retry_after = max(1, math.ceil(delay or self.backoff.cap))
+                    raise error from e
+                self.backoff.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.budget.deposit()
+            return result
+
+
+class RetryingTable:
+    """boto3.resource.Table (または ClientTable) の呼び出しを RetryPolicy で再試行するラッパーです
+
+    DynamoDBTodo が使用する操作と meta.client のバッチ操作、トランザクションのみを再試行し、
+    それ以外の属性 (name, meta.client.meta.events など) は元のテーブルに委譲します。
+    """
+
+    OPERATIONS = ('query', 'scan', 'get_item', 'put_item', 'update_item', 'delete_item')
+    CLIENT_OPERATIONS = ('batch_get_item', 'batch_write_item', 'transact_write_items')
+
+    def __init__(self, table, policy):
+        self._table = table
+        self._policy = policy
+        self.meta = SimpleNamespace(client=_RetryingClient(table.meta.client, policy))
+
+    def __getattr__(self, name):
+        attr = getattr(self._table, name)
+        if name in self.OPERATIONS:
+            return functools.partial(self._policy.call, attr)
+        return attr
+
+
+class _RetryingClient:
+
+    def __init__(self, client, policy):
+        self._client = client
+        self._policy = policy
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in RetryingTable.CLIENT_OPERATIONS:
+            return functools.partial(self._policy.call, attr)
+        return attr
@@ -0,0 +1,170 @@
+import unicodedata
+
+from boto3.dynamodb.conditions import Key
+
+
+class Tokenizer:
+    """検索のためにテキストを正規化し、n-gram のトークンに分割します
+
+    日本語のように単語を空白で区切らないテキストも検索できるよう、
+    形態素解析ではなく文字単位の n-gram (NGRAM 文字ごと) でトークンに分割します。
+    正規化には NFKC と casefold を使用するため、全角/半角、大文字/小文字を区別しません。
+
+    """
+
+    NGRAM = 2
+
+    @staticmethod
+    def normalize(text):
+        """テキストを NFKC で正規化し、casefold します"""
+        return unicodedata.normalize('NFKC', text).casefold()
+
+    @classmethod
+    def ngrams(cls, text):
+        """正規化済みのテキストを n-gram のトークンに分割します
+
+        NGRAM 文字未満のテキストは、テキスト全体を 1 つのトークンとします。
+        """
+        if len(text) < cls.NGRAM:
+            return [text] if text else []
+        return [text[i:i + cls.NGRAM] for i in range(len(text) - cls.NGRAM + 1)]
+
+    @classmethod
+    def tokens(cls, *texts):
+        """Todo のテキストから索引に登録するトークンの集合を返します
+
+        トークンはテキストごとに生成し、テキストをまたぐトークンは生成しません。
+        """
+        tokens = set()
+        for text in texts:
+            if text:
+                tokens.update(cls.ngrams(cls.normalize(text)))
+        return tokens
+
+    @classmethod
+    def query_tokens(cls, query):
+        """検索クエリから検索に使用するトークンのリストを出現順に返します
+
+        Return:
+            list: トークンのリストを返します
+            None: 正規化したクエリが NGRAM 文字未満で、索引を使って検索できない場合 None を返します
+
+        """
+        query = cls.normalize(query)
+        if len(query) < cls.NGRAM:
+            return None
+        return list(dict.fromkeys(cls.ngrams(query)))
+
+
+class SearchIndex:
+    """Todo の subject, description の転置索引を Todo と同じテーブルに保持します
+
+    トークンごとのポスティングを、パーティションキー `#search#<username>#<token>`、
+    ソートキー uid のアイテムとして保存します。
+    (ポスティングの owner, token 属性に、元の username とトークンを保持します)
+    ポスティングは record_type 属性を持つため、Todo のスキャンからは除外されます。
+
+    索引は候補を絞り込むために使用し、最終的な一致は Todo 本体で確認するため、
+    古いポスティングが残っていても検索結果が誤ることはありません。
+
+    constructer:
+        Args:
+            table_resource (boto3.resource.Table): Todo と同じテーブルが渡ってきます
+
+    """
+
+    KEY_PREFIX = '#search#'
+    RECORD_TYPE = 'posting'
+    MAX_QUERY_TOKENS = 8
+
+    def __init__(self, table_resource):
+        self._table = table_resource
+
+    @classmethod
+    def partition_key(cls, username, token):
+        return f"{cls.KEY_PREFIX}{username}#{token}"
+
+    @staticmethod
+    def item_tokens(item):
+        return Tokenizer.tokens(item.get('subject'), item.get('description'))
+
+    def _put_request(self, username, uid, token):
+        return {'PutRequest': {'Item': {
+            'username': self.partition_key(username, token),
+            'uid': uid,
+            'record_type': self.RECORD_TYPE,
+            'owner': username,
+            'token': token}}}
+
+    def _delete_request(self, username, uid, token):
+        return {'DeleteRequest': {'Key': {
+            'username': self.partition_key(username, token),
+            'uid': uid}}}
+
+    def put_requests(self, item):
+        """Todo オブジェクトのポスティングを登録する WriteRequest のリストを返します"""
+        return [self._put_request(item['username'], item['uid'], token)
+                for token in sorted(self.item_tokens(item))]
+
+    def delete_requests(self, item, tokens=None):
+        """Todo オブジェクトのポスティングを削除する WriteRequest のリストを返します"""
+        tokens = self.item_tokens(item) if tokens is None else tokens
+        return [self._delete_request(item['username'], item['uid'], token)
+                for token in sorted(tokens)]
+
+    def diff_requests(self, old_item, new_item):
+        """更新前後の Todo オブジェクトから、増減したポスティングの WriteRequest のリストを返します"""
+        old_tokens = self.item_tokens(old_item)
+        new_tokens = self.item_tokens(new_item)
+        return (
+            [self._put_request(new_item['username'], new_item['uid'], token)
+             for token in sorted(new_tokens - old_tokens)] +
+            [self._delete_request(old_item['username'], old_item['uid'], token)
+             for token in sorted(old_tokens - new_tokens)])
+
+    def _query_uids(self, username, token):
+        kwargs = {
+            'KeyConditionExpression': Key('username').eq(self.partition_key(username, token)),
+            'ProjectionExpression': 'uid',
+        }
+        while True:
+            response = self._table.query(**kwargs)
+            yield from (item['uid'] for item in response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def find_uids(self, username, tokens):
+        """トークンのポスティングを読み取り、すべてのトークンを含む候補の uid を返します
+
+        読み取るトークンは MAX_QUERY_TOKENS 個までとし、
+        候補がなくなった時点で残りのトークンは読み取りません。
+
+        Return:
+            list: 候補の uid を昇順に並べたリストを返します
+
+        """
+        candidates = None
+        for token in tokens[:self.MAX_QUERY_TOKENS]:
+            uids = set(self._query_uids(username, token))
+            candidates = uids if candidates is None else candidates & uids
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def is_stale(self, posting, item):
+        """ポスティングが、Todo オブジェクトの現在の内容と一致しないか判定します
+
+        Args:
+            posting (dict): ポスティングが渡ってきます
+            item (dict): ポスティングの Todo オブジェクトが渡ってきます 存在しない場合は None が渡ってきます
+
+        """
+        return item is None or posting['token'] not in self.item_tokens(item)
+
+    @staticmethod
+    def matches(item, query):
+        """Todo オブジェクトの subject, description が、正規化した検索クエリを含むか判定します"""
+        query = Tokenizer.normalize(query)
+        return any(query in Tokenizer.normalize(item.get(key) or '')
+                   for key in ('subject', 'description'))
@@ -0,0 +1,86 @@
+from chalicelib.validates import Validates
+
+
+class UserStats:
+    """ユーザーごとの Todo の件数 (合計とステータスごと) を集計アイテムとして保持します
+
+    集計アイテムはパーティションキー `#stats#<username>`、ソートキー `#stats` のアイテムとして
+    Todo と同じテーブルに保存します。(owner 属性に元の username を保持します)
+    集計アイテムは record_type 属性を持つため、Todo のスキャンからは除外されます。
+
+    件数は Todo の書き込みと同じ TransactWriteItems の中で ADD により加算するため、
+    Todo と集計アイテムが食い違うことはありません。
+    (BatchWriteItem による書き込みなど、トランザクションを使わない経路で生じたずれは
+    DynamoDBTodo.reconcile_stats で修正します)
+
+    constructer:
+        Args:
+            table_resource (boto3.resource.Table): Todo と同じテーブルが渡ってきます
+
+    """
+
+    KEY_PREFIX = '#stats#'
+    SORT_KEY = '#stats'
+    RECORD_TYPE = 'stats'
+    COUNTERS = ['total'] + Validates.STATE_ENUM
+
+    def __init__(self, table_resource):
+        self._table = table_resource
+
+    @classmethod
+    def key(cls, username):
+        return {'username': f"{cls.KEY_PREFIX}{username}", 'uid': cls.SORT_KEY}
+
+    @classmethod
+    def deltas(cls, old_state=None, new_state=None):
+        """ステータスの遷移から、集計アイテムに加算する値の dict を返します
+
+        Args:
+            old_state (str): 変更前のステータスが渡ってきます 追加の場合は None が渡ってきます
+            new_state (str): 変更後のステータスが渡ってきます 削除の場合は None が渡ってきます
+
+        """
+        deltas = {}
+        if old_state is None:
+            deltas['total'] = 1
+        if new_state is None:
+            deltas['total'] = -1
+        if old_state is not None:
+            deltas[old_state] = deltas.get(old_state, 0) - 1
+        if new_state is not None:
+            deltas[new_state] = deltas.get(new_state, 0) + 1
+        return {name: delta for name, delta in deltas.items() if delta}
+
+    def update(self, username, deltas):
+        """集計アイテムに ADD で加算する UpdateItem のパラメータを返します
+
+        TransactWriteItems の Update、または Table.update_item のパラメータとして使用します。
+        集計アイテムが存在しない場合は、0 から加算して作成します。
+        """
+        return {
+            'TableName': self._table.name,
+            'Key': self.key(username),
+            'UpdateExpression': (
+                'SET #record_type = :record_type, #owner = :owner ADD ' +
+                ', '.join(f"#{name} :{name}" for name in deltas)),
+            'ExpressionAttributeNames': {
+                '#record_type': 'record_type', '#owner': 'owner',
+                **{f"#{name}": name for name in deltas}},
+            'ExpressionAttributeValues': {
+                ':record_type': self.RECORD_TYPE, ':owner': username,
+                **{f":{name}": delta for name, delta in deltas.items()}},
+        }
+
+    def put_request(self, username, counts):
+        """集計アイテムを counts で上書きする WriteRequest を返します"""
+        return {'PutRequest': {'Item': {
+            **self.key(username),
+            'record_type': self.RECORD_TYPE,
+            'owner': username,
+            **{name: counts.get(name, 0) for name in self.COUNTERS}}}}
+
+    @classmethod
+    def counts(cls, item):
+        """集計アイテムから件数の dict を返します 存在しない場合はすべて 0 を返します"""
+        item = item or {}
+        return {name: int(item.get(name, 0)) for name in cls.COUNTERS}
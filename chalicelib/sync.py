@@ -0,0 +1,74 @@
+import time
+
+from chalicelib.idempotency import IdempotencyKeys
+from chalicelib.uid import CLOCK_SKEW_MS
+
+
+DEFAULT_TOMBSTONE_TTL = 30 * 24 * 60 * 60
+CHANGES_OVERLAP_MS = CLOCK_SKEW_MS
+
+
+def now_ms():
+    """現在時刻を Unix 時刻のミリ秒で返します (updated_at に使用します)"""
+    return time.time_ns() // 1000000
+
+
+class Tombstones:
+    """削除した Todo の uid を、差分同期 (DynamoDBTodo.list_changes) のために一定期間記録します
+
+    削除の記録 (トゥームストーン) はパーティションキー `<username>`、ソートキー `#tombstone#<uid>` の
+    アイテムとして Todo と同じパーティションに保存し、updated_at 属性に削除した時刻を設定します。
+    そのため updated-index の Query で、更新された Todo と削除の記録をまとめて取得できます。
+    記録は record_type 属性を持つため、Todo のスキャンからは除外されます。
+    ソートキーは Todo の uid より前に並ぶため、DynamoDBTodo.list_items_page の Query は
+    uid の下限 (TODO_UID_LOWER_BOUND) または作成日時の範囲で除外し、記録を読み取りません。
+
+    記録には IdempotencyKeys と同じ TTL_ATTRIBUTE (Unix 時刻の秒) を設定し、DynamoDB の TTL で削除します。
+    TTL より古い時点からの差分は削除を取りこぼすため、list_changes は 410 Gone を返します。
+
+    constructer:
+        Args:
+            table_resource (boto3.resource.Table): Todo と同じテーブルが渡ってきます
+            ttl (int): 記録を保持する秒数が渡ってきます
+            clock (callable): 現在時刻 (Unix 時刻の秒) を返す関数 (テストでの差し替え用)
+
+    """
+
+    KEY_PREFIX = '#tombstone#'
+    RECORD_TYPE = 'tombstone'
+    TTL_ATTRIBUTE = IdempotencyKeys.TTL_ATTRIBUTE
+
+    def __init__(self, table_resource, ttl=DEFAULT_TOMBSTONE_TTL, clock=time.time):
+        self._table = table_resource
+        self.ttl = ttl
+        self._clock = clock
+
+    @classmethod
+    def key(cls, username, uid):
+        return {'username': username, 'uid': f"{cls.KEY_PREFIX}{uid}"}
+
+    @classmethod
+    def is_tombstone(cls, item):
+        return item.get('record_type') == cls.RECORD_TYPE
+
+    def item(self, username, uid, updated_at):
+        """削除の記録のアイテムを返します"""
+        return {
+            **self.key(username, uid),
+            'record_type': self.RECORD_TYPE,
+            'deleted_uid': uid,
+            'updated_at': updated_at,
+            self.TTL_ATTRIBUTE: int(self._clock()) + self.ttl,
+        }
+
+    def put(self, username, uid, updated_at):
+        """削除の記録を書き込む TransactWriteItem の Put を返します"""
+        return {'TableName': self._table.name, 'Item': self.item(username, uid, updated_at)}
+
+    def put_request(self, username, uid, updated_at):
+        """削除の記録を書き込む BatchWriteItem の WriteRequest を返します"""
+        return {'PutRequest': {'Item': self.item(username, uid, updated_at)}}
+
+    def oldest_since(self):
+        """削除の記録が残っていることを保証できる、最も古い時刻 (Unix 時刻のミリ秒) を返します"""
+        return (int(self._clock()) - self.ttl) * 1000
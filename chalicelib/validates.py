@@ -1,5 +1,7 @@
 from chalice import BadRequestError
 
+from chalicelib.uid import MAX_TIMESTAMP_MS
+
 
 class Validates:
 
@@ -9,6 +11,26 @@ class Validates:
     USERNAME_MIN_LEN = 2
     USERNAME_MAX_LEN = 128
     STATE_ENUM = ["unstarted", "started", "completed"]
+    STATE_SET = frozenset(STATE_ENUM)
+    LIMIT_MIN_VALUE = 1
+    LIMIT_MAX_VALUE = 1000
+    SEGMENTS_MIN_VALUE = 1
+    SEGMENTS_MAX_VALUE = 64
+    UID_MIN_LEN = 1
+    UID_MAX_LEN = 128
+    BATCH_MAX_OPERATIONS = 100
+    BATCH_OP_ENUM = ["create", "update", "delete"]
+    BATCH_OP_SET = frozenset(BATCH_OP_ENUM)
+    BATCH_GET_MAX_IDS = 500
+    ORDER_ENUM = ["asc", "desc"]
+    ORDER_SET = frozenset(ORDER_ENUM)
+    FIELDS_ENUM = ["uid", "subject", "description", "state", "username", "version"]
+    FIELDS_SET = frozenset(FIELDS_ENUM)
+    IDEMPOTENCY_KEY_MIN_LEN = 1
+    IDEMPOTENCY_KEY_MAX_LEN = 255
+    # 集計アイテムなどの管理用のアイテムのキーの接頭辞 (#stats#, #tombstone# など) と衝突しないよう、
+    # username と uid の先頭には使用できません
+    RESERVED_PREFIX = '#'
 
     @classmethod
     def subject(cls, subject):
@@ -60,7 +82,7 @@ class Validates:
                 f"state type (Your Request: {state_type}) "
                 f"REQUIRED: {str}")
 
-        if not state in cls.STATE_ENUM:
+        if state not in cls.STATE_SET:
             raise BadRequestError(
                 f"state enum (Your Request: {state}) "
                 f"REQUIRED: {', '.join(cls.STATE_ENUM)}")
@@ -85,3 +107,328 @@ class Validates:
                 f"REQUIRED: greater than or equal to {cls.USERNAME_MIN_LEN}, "
                 f"less than {cls.USERNAME_MAX_LEN}")
 
+        if username.startswith(cls.RESERVED_PREFIX):
+            raise BadRequestError(
+                f"username prefix (Your Request: {username}) "
+                f"REQUIRED: not starting with {cls.RESERVED_PREFIX}")
+
+    @classmethod
+    def limit(cls, limit):
+        if limit is None:
+            return
+
+        limit_type = type(limit)
+        if limit_type is not int:
+            raise BadRequestError(
+                f"limit type (Your Request: {limit_type}) "
+                f"REQUIRED: {int}")
+
+        if not cls.LIMIT_MIN_VALUE <= limit <= cls.LIMIT_MAX_VALUE:
+            raise BadRequestError(
+                f"limit value (Your Request: {limit}) "
+                f"REQUIRED: greater than or equal to {cls.LIMIT_MIN_VALUE}, "
+                f"less than or equal to {cls.LIMIT_MAX_VALUE}")
+
+    @classmethod
+    def segments(cls, segments):
+        if segments is None:
+            return
+
+        segments_type = type(segments)
+        if segments_type is not int:
+            raise BadRequestError(
+                f"segments type (Your Request: {segments_type}) "
+                f"REQUIRED: {int}")
+
+        if not cls.SEGMENTS_MIN_VALUE <= segments <= cls.SEGMENTS_MAX_VALUE:
+            raise BadRequestError(
+                f"segments value (Your Request: {segments}) "
+                f"REQUIRED: greater than or equal to {cls.SEGMENTS_MIN_VALUE}, "
+                f"less than or equal to {cls.SEGMENTS_MAX_VALUE}")
+
+    @classmethod
+    def order(cls, order):
+        if order is None:
+            return
+
+        if order not in cls.ORDER_SET:
+            raise BadRequestError(
+                f"order enum (Your Request: {order}) "
+                f"REQUIRED: {', '.join(cls.ORDER_ENUM)}")
+
+    @classmethod
+    def time_range(cls, since, until):
+        for key, value in ('since', since), ('until', until):
+            if value is not None and not 0 <= value <= MAX_TIMESTAMP_MS:
+                raise BadRequestError(
+                    f"{key} value (Your Request: {value}) "
+                    f"REQUIRED: greater than or equal to 0, "
+                    f"less than or equal to {MAX_TIMESTAMP_MS}")
+
+        if since is not None and until is not None and since > until:
+            raise BadRequestError(
+                f"since (Your Request: {since}) "
+                f"REQUIRED: less than or equal to until ({until})")
+
+    @classmethod
+    def uid(cls, uid):
+        if uid is None:
+            raise BadRequestError(
+                f"there is no uid. (Your Request: {None}) "
+                f"REQUIRED: uid is required.")
+
+        uid_type = type(uid)
+        if uid_type is not str:
+            raise BadRequestError(
+                f"uid type (Your Request: {uid_type}) "
+                f"REQUIRED: {str}")
+
+        uid_length = len(uid)
+        if not cls.UID_MIN_LEN <= uid_length <= cls.UID_MAX_LEN:
+            raise BadRequestError(
+                f"uid length (Your Request: {uid_length}) "
+                f"REQUIRED: greater than or equal to {cls.UID_MIN_LEN}, "
+                f"less than or equal to {cls.UID_MAX_LEN}")
+
+        if uid.startswith(cls.RESERVED_PREFIX):
+            raise BadRequestError(
+                f"uid prefix (Your Request: {uid}) "
+                f"REQUIRED: not starting with {cls.RESERVED_PREFIX}")
+
+    @classmethod
+    def expected_version(cls, expected_version):
+        if expected_version is None:
+            return
+
+        expected_version_type = type(expected_version)
+        if expected_version_type is not int:
+            raise BadRequestError(
+                f"expected_version type (Your Request: {expected_version_type}) "
+                f"REQUIRED: {int}")
+
+        if expected_version < 0:
+            raise BadRequestError(
+                f"expected_version value (Your Request: {expected_version}) "
+                f"REQUIRED: greater than or equal to 0")
+
+    @classmethod
+    def batch_operations(cls, operations):
+        """バッチ操作のリストをすべてバリデーションします
+
+        すべての操作を 1 回ずつ確認し、失敗したすべての操作のエラーを操作のインデックスつきでまとめ、
+        どの操作も実行しないよう例外を発生させます。
+        update, delete で同じ uid を複数回指定することはできません。
+        """
+        operations_type = type(operations)
+        if operations_type is not list:
+            raise BadRequestError(
+                f"operations type (Your Request: {operations_type}) "
+                f"REQUIRED: {list}")
+
+        operations_length = len(operations)
+        if not 1 <= operations_length <= cls.BATCH_MAX_OPERATIONS:
+            raise BadRequestError(
+                f"operations length (Your Request: {operations_length}) "
+                f"REQUIRED: greater than or equal to 1, "
+                f"less than or equal to {cls.BATCH_MAX_OPERATIONS}")
+
+        errors = []
+        uids = set()
+        for index, operation in enumerate(operations):
+            operation_errors = cls.batch_operation_errors(operation)
+            errors.extend(f"operations[{index}]: {error}" for error in operation_errors)
+            if operation_errors or operation['op'] == 'create':
+                continue
+            if operation['uid'] in uids:
+                errors.append(
+                    f"operations[{index}]: duplicated uid (Your Request: {operation['uid']}) "
+                    f"REQUIRED: each uid appears at most once.")
+            uids.add(operation['uid'])
+        if errors:
+            raise BadRequestError(Schema.SEPARATOR.join(errors))
+
+    @classmethod
+    def batch_operation(cls, operation):
+        errors = cls.batch_operation_errors(operation)
+        if errors:
+            raise BadRequestError(Schema.SEPARATOR.join(errors))
+
+    @classmethod
+    def batch_operation_errors(cls, operation):
+        """バッチ操作の 1 件を op ごとのスキーマ (BATCH_SCHEMAS) で確認し、エラーのリストを返します"""
+        operation_type = type(operation)
+        if operation_type is not dict:
+            return [
+                f"operation type (Your Request: {operation_type}) "
+                f"REQUIRED: {dict}"]
+
+        op = operation.get('op')
+        if op not in cls.BATCH_OP_SET:
+            return [
+                f"op enum (Your Request: {op}) "
+                f"REQUIRED: {', '.join(cls.BATCH_OP_ENUM)}"]
+        return BATCH_SCHEMAS[op].errors(operation)
+
+    @classmethod
+    def ids(cls, ids):
+        ids_length = len(ids)
+        if not 1 <= ids_length <= cls.BATCH_GET_MAX_IDS:
+            raise BadRequestError(
+                f"ids length (Your Request: {ids_length}) "
+                f"REQUIRED: greater than or equal to 1, "
+                f"less than or equal to {cls.BATCH_GET_MAX_IDS}")
+
+        for uid in ids:
+            cls.uid(uid)
+
+    @classmethod
+    def fields(cls, fields):
+        if fields is None:
+            return
+
+        if not fields:
+            raise BadRequestError(
+                f"fields length (Your Request: {len(fields)}) "
+                f"REQUIRED: greater than or equal to 1")
+
+        for field in fields:
+            if field not in cls.FIELDS_SET:
+                raise BadRequestError(
+                    f"fields enum (Your Request: {field}) "
+                    f"REQUIRED: {', '.join(cls.FIELDS_ENUM)}")
+
+    @classmethod
+    def idempotency_key(cls, idempotency_key):
+        if idempotency_key is None:
+            return
+
+        key_length = len(idempotency_key)
+        if not cls.IDEMPOTENCY_KEY_MIN_LEN <= key_length <= cls.IDEMPOTENCY_KEY_MAX_LEN:
+            raise BadRequestError(
+                f"Idempotency-Key length (Your Request: {key_length}) "
+                f"REQUIRED: greater than or equal to {cls.IDEMPOTENCY_KEY_MIN_LEN}, "
+                f"less than or equal to {cls.IDEMPOTENCY_KEY_MAX_LEN}")
+
+        if not (idempotency_key.isascii() and idempotency_key.isprintable()):
+            raise BadRequestError(
+                f"Idempotency-Key characters (Your Request: {idempotency_key}) "
+                f"REQUIRED: printable ASCII characters")
+
+
+class Field:
+    """リクエストの本文の 1 つの属性の検証ルールです
+
+    生成時に検証ルールを 1 つの関数 (check) にコンパイルし、エラーメッセージの固定部分もあらかじめ組み立てます。
+    check は属性が正しい場合は None を、不正な場合はエラーメッセージを返します。(例外は発生させません)
+    None は属性が存在しないものとして扱います。
+
+    constructer:
+        Args:
+            name (str): 属性名が渡ってきます
+            kind (type): 属性の型が渡ってきます (サブクラスは許可しません)
+            required (bool): 必須の属性かどうかが渡ってきます
+            min_len, max_len (int): 文字列の長さの範囲が渡ってきます
+            min_value (int): 数値の最小値が渡ってきます
+            enum (list): 許可する値のリストが渡ってきます
+            reserved_prefix (str): 文字列の先頭に使用できない接頭辞が渡ってきます
+
+    """
+
+    def __init__(self, name, kind=str, required=False, min_len=None, max_len=None,
+                 min_value=None, enum=None, reserved_prefix=None):
+        self.name = name
+        self.required = required
+        self.check = self._compile(name, kind, required, min_len, max_len, min_value, enum, reserved_prefix)
+
+    @staticmethod
+    def _compile(name, kind, required, min_len, max_len, min_value, enum, reserved_prefix):
+        type_required = f"REQUIRED: {kind}"
+        length_required = "REQUIRED: " + ", ".join(
+            bound for bound in (
+                None if min_len is None else f"greater than or equal to {min_len}",
+                None if max_len is None else f"less than or equal to {max_len}")
+            if bound is not None)
+        value_required = f"REQUIRED: greater than or equal to {min_value}"
+        enum_set = None if enum is None else frozenset(enum)
+        enum_required = None if enum is None else f"REQUIRED: {', '.join(enum)}"
+        prefix_required = f"REQUIRED: not starting with {reserved_prefix}"
+        min_len = 0 if min_len is None else min_len
+        max_len = float('inf') if max_len is None else max_len
+
+        def check(value):
+            if value is None:
+                if required:
+                    return f"There is no {name} (Your Request: {value}) REQUIRED: {name} is required."
+                return None
+            if type(value) is not kind:
+                return f"{name} type (Your Request: {type(value)}) {type_required}"
+            if kind is str and not min_len <= len(value) <= max_len:
+                return f"{name} length (Your Request: {len(value)}) {length_required}"
+            if reserved_prefix is not None and value.startswith(reserved_prefix):
+                return f"{name} prefix (Your Request: {value}) {prefix_required}"
+            if min_value is not None and value < min_value:
+                return f"{name} value (Your Request: {value}) {value_required}"
+            if enum_set is not None and value not in enum_set:
+                return f"{name} enum (Your Request: {value}) {enum_required}"
+            return None
+        return check
+
+
+class Schema:
+    """リクエストの本文 (dict) の検証ルールです
+
+    すべての属性を 1 回ずつ確認し、最初のエラーで止めずにすべてのエラーを集めます。
+    ルールは Field の生成時にコンパイル済みのため、リクエストごとの処理は属性ごとの check の呼び出しのみです。
+
+    constructer:
+        Args:
+            fields (list): Field のリストが渡ってきます
+
+    """
+
+    SEPARATOR = '; '
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self._checks = tuple((field.name, field.check) for field in fields)
+
+    def errors(self, body):
+        """本文のエラーメッセージのリストを返します (正しい場合は空のリスト)"""
+        if type(body) is not dict:
+            return [f"body type (Your Request: {type(body)}) REQUIRED: {dict}"]
+        errors = []
+        for name, check in self._checks:
+            error = check(body.get(name))
+            if error is not None:
+                errors.append(error)
+        return errors
+
+    def validate(self, body):
+        """本文をバリデーションします
+
+        Raises:
+            BadRequestError: すべてのエラーメッセージを SEPARATOR でつないだ例外を発生させます
+
+        """
+        errors = self.errors(body)
+        if errors:
+            raise BadRequestError(self.SEPARATOR.join(errors))
+
+
+SUBJECT_FIELD = Field(
+    'subject', required=True, min_len=Validates.SUBJECT_MIN_LEN, max_len=Validates.SUBJECT_MAX_LEN)
+DESCRIPTION_FIELD = Field('description', max_len=Validates.DESCRIPTION_MAX_LEN)
+STATE_FIELD = Field('state', enum=Validates.STATE_ENUM)
+UID_FIELD = Field('uid', required=True, min_len=Validates.UID_MIN_LEN, max_len=Validates.UID_MAX_LEN,
+                  reserved_prefix=Validates.RESERVED_PREFIX)
+EXPECTED_VERSION_FIELD = Field('expected_version', kind=int, min_value=0)
+
+TODO_CREATE_SCHEMA = Schema(SUBJECT_FIELD, DESCRIPTION_FIELD)
+TODO_UPDATE_SCHEMA = Schema(
+    Field('subject', min_len=Validates.SUBJECT_MIN_LEN, max_len=Validates.SUBJECT_MAX_LEN),
+    DESCRIPTION_FIELD, STATE_FIELD)
+BATCH_SCHEMAS = {
+    'create': TODO_CREATE_SCHEMA,
+    'update': Schema(UID_FIELD, EXPECTED_VERSION_FIELD, *TODO_UPDATE_SCHEMA.fields),
+    'delete': Schema(UID_FIELD, EXPECTED_VERSION_FIELD),
+}
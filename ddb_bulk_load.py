@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from chalicelib.bulk_load import BulkLoader, DEFAULT_WORKERS, INPUT_FORMATS, read_rows
+from chalicelib.connection import dynamodb_table
+from chalicelib.db import DynamoDBTodo, DEFAULT_USERNAME
+
+
+def load_checkpoint(path):
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f)['offset']
+
+
+def save_checkpoint(path, offset):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'offset': offset}, f)
+    os.replace(tmp, path)
+
+
+def input_format(path, input_format=None):
+    """--format の指定がない場合は、ファイルの拡張子から入力の形式を判定します"""
+    if input_format is not None:
+        return input_format
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='JSONL/CSV の Todo を DynamoDB テーブルにまとめて登録します')
+    parser.add_argument('input', help='入力のファイル - の場合は標準入力から読み込みます')
+    parser.add_argument('-t', '--table', default=os.environ.get('APP_TABLE_NAME'))
+    parser.add_argument('--format', choices=INPUT_FORMATS, default=None,
+                        help='入力の形式 指定がない場合は拡張子から判定します (標準入力は jsonl)')
+    parser.add_argument('--username', default=DEFAULT_USERNAME,
+                        help='username を持たない行に使用するユーザー名')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--wcu', type=float, default=None,
+                        help='書き込みの WCU/秒 の上限 指定がない場合は制限しません')
+    parser.add_argument('--offset', type=int, default=None,
+                        help='先頭から読み飛ばす行数 (--checkpoint より優先します)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='チェックポイントのファイル 存在する場合は続きから再開します')
+    parser.add_argument('--search-index', action='store_true',
+                        help='転置索引のポスティングもあわせて登録します')
+    parser.add_argument('--stats', action='store_true',
+                        help='集計アイテムにもあわせて加算します')
+    parser.add_argument('--endpoint-url', default=os.environ.get('DYNAMO_DB_ENDPOINT'))
+    args = parser.parse_args()
+
+    todo_db = DynamoDBTodo(
+        dynamodb_table(args.table, endpoint_url=args.endpoint_url),
+        search_index=args.search_index, stats=args.stats)
+    offset = args.offset if args.offset is not None else load_checkpoint(args.checkpoint)
+    started = time.monotonic()
+
+    def on_progress(progress):
+        if args.checkpoint is not None:
+            save_checkpoint(args.checkpoint, progress['offset'])
+        elapsed = time.monotonic() - started
+        print(f"\rloaded {progress['loaded']} items, offset {progress['offset']} "
+              f"({progress['loaded'] / elapsed if elapsed else 0:.0f} items/s)",
+              end='', file=sys.stderr)
+
+    def on_error(row_offset, message):
+        print(f"\nrow {row_offset}: {message}", file=sys.stderr)
+
+    loader = BulkLoader(todo_db, workers=args.workers, wcu_per_second=args.wcu,
+                        username=args.username, on_progress=on_progress, on_error=on_error)
+    if args.input == '-':
+        result = loader.load(read_rows(sys.stdin, args.format or 'jsonl'), offset=offset)
+    else:
+        with open(args.input, newline='', encoding='utf-8') as f:
+            result = loader.load(
+                read_rows(f, input_format(args.input, args.format)), offset=offset)
+    print(file=sys.stderr)
+    print(json.dumps(result))
+    if args.checkpoint is not None and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,11 +10,41 @@ TABLE = {
         'prefix': 'serverless-todo-backend',
         'env_var': 'APP_TABLE_NAME',
         'hash_key': 'username',
-        'range_key': 'uid'
+        'range_key': 'uid',
+        'ttl_attribute': 'expires_at',
+        'global_secondary_indexes': [
+            {
+                'name': 'state-index',
+                'hash_key': 'username_state',
+                'range_key': 'uid'
+            },
+            {
+                'name': 'updated-index',
+                'hash_key': 'username',
+                'range_key': 'updated_at',
+                'range_key_type': 'N'
+            }
+        ]
 }
 
 
-def create_table(table_name_prefix, hash_key, range_key=None):
+def global_secondary_index(name, hash_key, range_key=None, range_key_type='S'):
+    key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key is not None:
+        key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return {
+        'IndexName': name,
+        'KeySchema': key_schema,
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5,
+        }
+    }
+
+
+def create_table(table_name_prefix, hash_key, range_key=None,
+                 global_secondary_indexes=None, ttl_attribute=None):
     client = boto3.client('dynamodb')
     table_name = '%s-%s' % (table_name_prefix, str(uuid.uuid4()))
     key_schema = [
@@ -37,14 +67,30 @@ def create_table(table_name_prefix, hash_key, range_key=None):
         key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
         attribute_definitions.append(
             {'AttributeName': range_key, 'AttributeType': 'S'})
+    kwargs = {}
+    if global_secondary_indexes:
+        kwargs['GlobalSecondaryIndexes'] = [
+            global_secondary_index(**index) for index in global_secondary_indexes]
+        defined = {definition['AttributeName'] for definition in attribute_definitions}
+        for index in global_secondary_indexes:
+            keys = ((index['hash_key'], 'S'), (index.get('range_key'), index.get('range_key_type', 'S')))
+            for key, key_type in keys:
+                if key is not None and key not in defined:
+                    attribute_definitions.append({'AttributeName': key, 'AttributeType': key_type})
+                    defined.add(key)
     client.create_table(
         TableName=table_name,
         KeySchema=key_schema,
         AttributeDefinitions=attribute_definitions,
-        ProvisionedThroughput=provisioned_throughput
+        ProvisionedThroughput=provisioned_throughput,
+        **kwargs
     )
     waiter = client.get_waiter('table_exists')
     waiter.wait(TableName=table_name, WaiterConfig={'Delay': 1})
+    if ttl_attribute is not None:
+        client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': ttl_attribute})
     return table_name
 
 
@@ -67,7 +113,9 @@ def main():
     table_name = create_table(
         table_config['prefix'],
         table_config['hash_key'],
-        table_config.get('range_key')
+        table_config.get('range_key'),
+        table_config.get('global_secondary_indexes'),
+        table_config.get('ttl_attribute')
     )
     record_as_env_var(table_config['env_var'], table_name, args.stage)
 
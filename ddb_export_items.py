@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import argparse
+
+from chalicelib.connection import dynamodb_table
+from chalicelib.db import DynamoDBTodo
+from chalicelib.export import NDJSON
+
+
+def load_checkpoint(path):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, key, offset):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'key': key, 'offset': offset}, f, default=NDJSON.json_default)
+    os.replace(tmp, path)
+
+
+def export(todo_db, out, checkpoint_path=None, start_key=None, limit=None, compress=False):
+    """テーブルをページごとに NDJSON で書き出し、ページごとにチェックポイントを保存します
+
+    チェックポイントには次のページの ExclusiveStartKey と、書き込み済みのバイト数を保存します。
+    gzip の場合はページごとに完結した gzip メンバーとして書き出すため、
+    再開時に書き込み済みのバイト数で出力を切り詰めれば、連結した出力も有効な gzip になります。
+    """
+    dumps = NDJSON.dumps_gzip if compress else NDJSON.dumps
+    count = 0
+    for items, last_key in todo_db.iter_scan_pages(
+            limit=limit, exclusive_start_key=start_key):
+        out.write(dumps(items))
+        out.flush()
+        count += len(items)
+        if checkpoint_path is not None:
+            if last_key is not None:
+                save_checkpoint(checkpoint_path, last_key, out.tell())
+            elif os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='DynamoDB テーブルの Todo を NDJSON としてエクスポートします')
+    parser.add_argument('-t', '--table', default=os.environ.get('APP_TABLE_NAME'))
+    parser.add_argument('-o', '--output', default=None,
+                        help='出力先のファイル 指定がない場合は標準出力に書き出します')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='1 ページで評価するアイテム数の上限')
+    parser.add_argument('--checkpoint', default=None,
+                        help='チェックポイントのファイル 存在する場合は続きから再開します (--output が必要)')
+    parser.add_argument('--endpoint-url', default=os.environ.get('DYNAMO_DB_ENDPOINT'))
+    args = parser.parse_args()
+    if args.checkpoint is not None and args.output is None:
+        parser.error('--checkpoint requires --output')
+
+    todo_db = DynamoDBTodo(dynamodb_table(args.table, endpoint_url=args.endpoint_url))
+    checkpoint = load_checkpoint(args.checkpoint)
+    if args.output is None:
+        count = export(todo_db, sys.stdout.buffer, limit=args.limit, compress=args.gzip)
+    elif checkpoint is None:
+        with open(args.output, 'wb') as out:
+            count = export(todo_db, out, args.checkpoint,
+                           limit=args.limit, compress=args.gzip)
+    else:
+        with open(args.output, 'r+b') as out:
+            out.truncate(checkpoint['offset'])
+            out.seek(checkpoint['offset'])
+            count = export(todo_db, out, args.checkpoint, start_key=checkpoint['key'],
+                           limit=args.limit, compress=args.gzip)
+    print(f"exported {count} items", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import json
+import argparse
+
+from chalicelib.connection import dynamodb_table
+from chalicelib.db import DynamoDBTodo
+
+
+def rebuild_search_index(todo_db, args):
+    return todo_db.rebuild_search_index()
+
+
+def backfill_state_index(todo_db, args):
+    return todo_db.backfill_state_index()
+
+
+def backfill_updated_at(todo_db, args):
+    return todo_db.backfill_updated_at()
+
+
+def reconcile_stats(todo_db, args):
+    return todo_db.reconcile_stats()
+
+
+def enable_ttl(todo_db, args):
+    return todo_db.enable_ttl()
+
+
+COMMANDS = {
+    'rebuild-search-index': rebuild_search_index,
+    'backfill-state-index': backfill_state_index,
+    'backfill-updated-at': backfill_updated_at,
+    'reconcile-stats': reconcile_stats,
+    'enable-ttl': enable_ttl,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='DynamoDB テーブルの管理用のアイテムの再構築と、テーブルの設定を行います')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('-t', '--table', default=os.environ.get('APP_TABLE_NAME'))
+    parser.add_argument('--endpoint-url', default=os.environ.get('DYNAMO_DB_ENDPOINT'))
+    args = parser.parse_args()
+
+    todo_db = DynamoDBTodo(dynamodb_table(args.table, endpoint_url=args.endpoint_url))
+    result = COMMANDS[args.command](todo_db, args)
+    print(json.dumps(result, default=str))
+
+
+if __name__ == '__main__':
+    main()
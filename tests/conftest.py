@@ -8,6 +8,7 @@ from tests.mock.ddb_schema import MOCK_DDB_SCHEMA
 
 
 APP_TABLE_NAME = 'serverless-todos'
+CURSOR_SECRET = 'test-cursor-secret'
 
 
 @pytest.fixture()
@@ -18,6 +19,7 @@ def app():
 @pytest.fixture(autouse=True)
 def set_envs(monkeypatch):
     monkeypatch.setenv('APP_TABLE_NAME', APP_TABLE_NAME)
+    monkeypatch.setenv('CURSOR_SECRET', CURSOR_SECRET)
 
 
 @pytest.fixture(autouse=True)
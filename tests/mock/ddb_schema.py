@@ -6,10 +6,38 @@ MOCK_DDB_SCHEMA = {
     ],
     "AttributeDefinitions": [
         {"AttributeType": "S", "AttributeName": "username"},
-        {"AttributeType": "S", "AttributeName": "uid"}
+        {"AttributeType": "S", "AttributeName": "uid"},
+        {"AttributeType": "S", "AttributeName": "username_state"},
+        {"AttributeType": "N", "AttributeName": "updated_at"}
+    ],
+    "GlobalSecondaryIndexes": [
+        {
+            "IndexName": "state-index",
+            "KeySchema": [
+                {"KeyType": "HASH", "AttributeName": "username_state"},
+                {"KeyType": "RANGE", "AttributeName": "uid"}
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+            "ProvisionedThroughput": {
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5,
+            }
+        },
+        {
+            "IndexName": "updated-index",
+            "KeySchema": [
+                {"KeyType": "HASH", "AttributeName": "username"},
+                {"KeyType": "RANGE", "AttributeName": "updated_at"}
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+            "ProvisionedThroughput": {
+                "ReadCapacityUnits": 5,
+                "WriteCapacityUnits": 5,
+            }
+        }
     ],
     "ProvisionedThroughput": {
         "ReadCapacityUnits": 5,
         "WriteCapacityUnits": 5,
     }
-}
\ No newline at end of file
+}
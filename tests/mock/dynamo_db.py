@@ -1,4 +1,9 @@
+import time
+import zlib
+import threading
+
 import boto3
+from botocore.exceptions import ClientError
 
 
 class MockDynamoDB():
@@ -10,14 +15,17 @@ class MockDynamoDB():
         self.__ddb = ddb
         self.table = None
 
-    def create_table(self, *, TableName, KeySchema, AttributeDefinitions, ProvisionedThroughput):
+    def create_table(self, *, TableName, KeySchema, AttributeDefinitions, ProvisionedThroughput,
+                     GlobalSecondaryIndexes=()):
         """DynamoDBのテーブルを作成"""
+        kwargs = {'GlobalSecondaryIndexes': GlobalSecondaryIndexes} if GlobalSecondaryIndexes else {}
         self.table = MockDynamoDBTable(
             self.__ddb.create_table(
                 TableName=TableName,
                 KeySchema=KeySchema,
                 AttributeDefinitions=AttributeDefinitions,
-                ProvisionedThroughput=ProvisionedThroughput)
+                ProvisionedThroughput=ProvisionedThroughput,
+                **kwargs)
         )
         return self
 
@@ -39,3 +47,112 @@ class MockDynamoDBTable:
             self._table.put_item(Item=data) for data in items
         ]
         return self
+
+
+class MockSegmentedTable:
+    """Segment/TotalSegments を擬似的に再現する boto3.resource.Table のラッパー
+
+    moto.mock_dynamodb2 は scan の Segment/TotalSegments を無視してテーブル全体を返すため、
+    uid の crc32 をセグメント数で割った余りでアイテムを振り分け、
+    セグメントごとに Limit/ExclusiveStartKey によるページングを再現します。
+    テーブルのスナップショットは TotalSegments ごとに最初の scan で 1 度だけ取得し、
+    以降のページングではスナップショットを再利用します。
+    latency を指定した場合は scan ごとに待機し、ネットワークの往復時間を再現します。
+    """
+
+    def __init__(self, table, latency=0):
+        self._table = table
+        self._latency = latency
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+    def _scan_all(self, **kwargs):
+        items = []
+        while True:
+            response = self._table.scan(**kwargs)
+            items.extend(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def scan(self, Segment=None, TotalSegments=None, **kwargs):
+        if self._latency:
+            time.sleep(self._latency)
+        if TotalSegments is None:
+            return self._table.scan(**kwargs)
+
+        limit = kwargs.pop('Limit', None)
+        start_key = kwargs.pop('ExclusiveStartKey', None)
+        with self._lock:
+            if TotalSegments not in self._segments:
+                segments = [[] for _ in range(TotalSegments)]
+                for item in self._scan_all(**kwargs):
+                    segments[zlib.crc32(item['uid'].encode('utf-8')) % TotalSegments].append(item)
+                self._segments[TotalSegments] = [
+                    sorted(items, key=lambda item: (item['username'], item['uid']))
+                    for items in segments]
+        items = self._segments[TotalSegments][Segment]
+        if start_key is not None:
+            items = [item for item in items
+                     if (item['username'], item['uid']) > (start_key['username'], start_key['uid'])]
+        response = {'Items': items[:limit] if limit else items}
+        if limit and len(items) > limit:
+            last = response['Items'][-1]
+            response['LastEvaluatedKey'] = {'username': last['username'], 'uid': last['uid']}
+        return response
+
+
+class MockFaultyTable:
+    """DynamoDB のスロットリングや一時的な障害を再現する boto3.resource.Table のラッパー
+
+    query, scan, get_item, put_item, update_item, delete_item の呼び出しごとに errors の先頭を取り出し、
+    エラーコードの場合は botocore の ClientError を発生させ、None の場合は元のテーブルを呼び出します。
+    errors が空になったあとは常に元のテーブルを呼び出します。calls に呼び出した操作の名前を記録します。
+    """
+
+    OPERATIONS = ('query', 'scan', 'get_item', 'put_item', 'update_item', 'delete_item')
+
+    def __init__(self, table, errors):
+        self._table = table
+        self.errors = list(errors)
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._table, name)
+        if name not in self.OPERATIONS:
+            return attr
+
+        def _call(**kwargs):
+            self.calls.append(name)
+            code = self.errors.pop(0) if self.errors else None
+            if code is not None:
+                raise ClientError({'Error': {'Code': code, 'Message': code}}, name)
+            return attr(**kwargs)
+        return _call
+
+
+class MockLatencyTable:
+    """DynamoDB のネットワークの往復時間を再現する boto3.resource.Table のラッパー
+
+    query, scan, get_item, put_item, update_item, delete_item の呼び出しごとに latency 秒待機してから
+    元のテーブルを呼び出します。待機は time.sleep のため、スレッドで並行に呼び出した場合は重なります。
+    """
+
+    OPERATIONS = ('query', 'scan', 'get_item', 'put_item', 'update_item', 'delete_item')
+
+    def __init__(self, table, latency):
+        self._table = table
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._table, name)
+        if name not in self.OPERATIONS:
+            return attr
+
+        def _call(**kwargs):
+            time.sleep(self._latency)
+            return attr(**kwargs)
+        return _call
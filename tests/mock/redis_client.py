@@ -0,0 +1,21 @@
+class MockRedis:
+    """redis.Redis の get, set, delete のみをプロセス内の dict で再現するクライアント
+
+    値は Redis と同じく bytes で保持し、set の ex (有効期限の秒数) は記録のみ行います。
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def set(self, name, value, ex=None):
+        self.values[name] = value.encode('utf-8') if isinstance(value, str) else value
+        self.expires[name] = ex
+        return True
+
+    def delete(self, name):
+        self.expires.pop(name, None)
+        return int(self.values.pop(name, None) is not None)
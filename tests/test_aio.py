@@ -0,0 +1,110 @@
+import asyncio
+import operator
+
+import pytest
+from chalice import NotFoundError
+
+import app
+from chalicelib.aio import AsyncDynamoDBTodo, gather_bounded
+from chalicelib.db import DynamoDBTodo
+
+from tests.mock.dynamo_db import MockSegmentedTable
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+def _sorted(items):
+    return sorted(items, key=operator.itemgetter('uid'))
+
+
+class TestGatherBounded:
+
+    def test_Return_results_in_order_under_limit(self):
+        """gather_bounded: 同時に実行する数を limit 以下に制限し、結果を渡した順序で返すことができる"""
+        running = [0, 0]
+
+        async def _task(value):
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.01 * (5 - value % 5))
+            running[0] -= 1
+            return value
+
+        actual = asyncio.run(gather_bounded([_task(i) for i in range(10)], limit=3))
+        assert actual == list(range(10))
+        assert running[1] == 3
+
+    def test_Return_exceptions(self):
+        """gather_bounded: return_exceptions が True のケース、例外を結果として返すことができる"""
+        async def _task(value):
+            if value == 1:
+                raise ValueError(value)
+            return value
+
+        actual = asyncio.run(gather_bounded([_task(i) for i in range(3)], return_exceptions=True))
+        assert actual[0] == 0 and isinstance(actual[1], ValueError) and actual[2] == 2
+
+
+class TestAsyncDynamoDBTodo:
+
+    @staticmethod
+    def _run(todo, call):
+        async def _main():
+            async with AsyncDynamoDBTodo(todo, concurrency=4) as db:
+                return await call(db)
+        return asyncio.run(_main())
+
+    def test_Return_same_results_as_sync(self, mock):
+        """AsyncDynamoDBTodo: DynamoDBTodo と同じメソッドを await で呼び出し、同じ結果を返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        todo = app.get_app_db()
+        item = TESTDATA_DDB_ITEMS[0]
+
+        async def _call(db):
+            uid = await db.add_item(subject='subject', username=DEFAULT_USERNAME)
+            return uid, await db.get_item(item['uid'], username=item['username'])
+        uid, actual = self._run(todo, _call)
+        assert actual == item
+        assert todo.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'subject'
+
+    def test_Raise_exception_of_sync_method(self, mock):
+        """AsyncDynamoDBTodo: 同期のメソッドの例外を、await した呼び出し側に伝播させることができる"""
+        with pytest.raises(NotFoundError):
+            self._run(app.get_app_db(), lambda db: db.get_item('_NOT_EXIST_UID', username=DEFAULT_USERNAME))
+
+    def test_Iterate_generator_method(self, mock):
+        """AsyncDynamoDBTodo: ジェネレータのメソッドを async for で 1 件ずつ取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+
+        async def _call(db):
+            return [item async for item in db.iter_all_items()]
+        assert _sorted(self._run(app.get_app_db(), _call)) == _sorted(TESTDATA_DDB_ITEMS)
+
+    def test_Return_counts_by_state(self, mock):
+        """count_items_by_state: ステータスごとの Query を並行に行い、同期と同じ件数を返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        todo = app.get_app_db()
+        todo.backfill_state_index()
+        actual = self._run(todo, lambda db: db.count_items_by_state(username=DEFAULT_USERNAME))
+        assert actual == todo.count_items_by_state(username=DEFAULT_USERNAME)
+
+    def test_Return_items_by_users(self, mock):
+        """list_items_by_users, list_items_by_states: ユーザー、ステータスごとのリストを並行に取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        todo = app.get_app_db()
+        todo.backfill_state_index()
+        actual = self._run(todo, lambda db: db.list_items_by_users([DEFAULT_USERNAME, 'meow']))
+        assert {username: _sorted(items) for username, items in actual.items()} == {
+            username: _sorted(todo.list_items(username=username))
+            for username in (DEFAULT_USERNAME, 'meow')}
+        actual = self._run(todo, lambda db: db.list_items_by_states(['started', 'completed']))
+        assert {state: len(items) for state, items in actual.items()} == {'started': 2, 'completed': 3}
+
+    def test_Return_all_items_by_segments(self, mock):
+        """list_all_items: セグメントごとのスキャンを並行に行い、すべてのアイテムを重複なく取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        todo = DynamoDBTodo(MockSegmentedTable(mock.table._table))
+        actual = self._run(todo, lambda db: db.list_all_items(total_segments=4))
+        assert _sorted(actual) == _sorted(TESTDATA_DDB_ITEMS)
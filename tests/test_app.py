@@ -1,3 +1,8 @@
+import gzip
+import json
+import base64
+from decimal import Decimal
+
 import pytest
 from http import HTTPStatus
 
@@ -5,7 +10,13 @@ from chalice import BadRequestError
 from chalice.app import Request
 
 import app
+from chalicelib.compression import COMPRESSED_JSON_CONTENT_TYPE
+from chalicelib.cursor import Cursor
 from chalicelib.db import DynamoDBTodo
+from chalicelib.exceptions import (
+    GoneError, PreconditionFailedError, ServiceUnavailableError, TooManyRequestsError)
+from chalicelib.export import NDJSON
+from chalicelib.validates import Validates
 
 from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
 
@@ -34,15 +45,149 @@ class TestGetAppDB(TestApp):
 
 class TestGetTodos(TestApp):
 
-    def _monkeys(self, client, monkeypatch):
+    def _monkeys(self, client, monkeypatch, last_key=None):
         super().set_env(client, monkeypatch)
-        monkeypatch.setattr(DynamoDBTodo, 'list_items',
-                            lambda *_, **__: TESTDATA_DDB_ITEMS)
+        monkeypatch.setattr(DynamoDBTodo, 'list_items_page',
+                            lambda *_, **__: (TESTDATA_DDB_ITEMS, last_key))
+        monkeypatch.setattr(app, 'get_authorized_username',
+                            lambda *_, **__: 'default')
 
     def test_Return_todos_list(self, client, monkeypatch):
         """get_todos: すべてのアイテムを取得することができる"""
         self._monkeys(client, monkeypatch)
-        assert app.get_todos() == TESTDATA_DDB_ITEMS
+        assert app.get_todos() == {
+            'items': TESTDATA_DDB_ITEMS, 'next_cursor': None}
+
+    def test_Return_next_cursor_case_last_evaluated_key(self, client, monkeypatch):
+        """get_todos: 続きのページがあるケース、ExclusiveStartKey に復元できる next_cursor を受け取ることができる"""
+        last_key = {'username': 'default', 'uid': TESTDATA_DDB_ITEMS[0]['uid']}
+        self._monkeys(client, monkeypatch, last_key)
+        actual = app.get_todos()
+        assert Cursor.decode(actual['next_cursor'], 'default', Cursor.LIST) == last_key
+
+    def test_Pass_time_range_to_list_items_page(self, client, monkeypatch):
+        """get_todos: order、since、until、state を指定したケース、since、until を Unix 時刻 (ミリ秒) に変換して渡すことができる"""
+        self._monkeys(client, monkeypatch)
+        calls = []
+        monkeypatch.setattr(DynamoDBTodo, 'list_items_page',
+                            lambda *_, **kwargs: calls.append(kwargs) or ([], None))
+        monkeypatch.setattr(app.app.current_request, 'query_params', {
+            'order': 'desc', 'since': '2020-01-01T00:00:00Z', 'until': '1577923200000',
+            'state': 'started'})
+        app.get_todos()
+        assert (calls[0]['order'], calls[0]['since'], calls[0]['until'], calls[0]['state']) \
+            == ('desc', 1577836800000, 1577923200000, 'started')
+
+    def test_Return_items_case_ids(self, client, monkeypatch):
+        """get_todos: idsを指定したケース、指定したuidのTodoをまとめて受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        uids = [item['uid'] for item in TESTDATA_DDB_ITEMS]
+
+        def _get_items(self, uids, username, fields=None):
+            return {'items': [{'uid': uid} for uid in uids], 'missing': [], 'unprocessed': []}
+        monkeypatch.setattr(DynamoDBTodo, 'get_items', _get_items)
+        monkeypatch.setattr(app.app.current_request, 'query_params',
+                            {'ids': ','.join(uids)})
+        assert [item['uid'] for item in app.get_todos()['items']] == uids
+
+    def test_Pass_fields_case_fields_enabled(self, client, monkeypatch):
+        """get_todos: FIELDS_ENABLED が true のケース、fields を属性名のリストとして渡すことができる"""
+        self._monkeys(client, monkeypatch)
+        calls = []
+        monkeypatch.setattr(DynamoDBTodo, 'list_items_page',
+                            lambda *_, **kwargs: calls.append(kwargs) or ([], None))
+        monkeypatch.setattr(app.app.current_request, 'query_params', {'fields': 'subject,state'})
+        monkeypatch.setenv('FIELDS_ENABLED', 'true')
+        app.get_todos()
+        monkeypatch.setenv('FIELDS_ENABLED', 'false')
+        app.get_todos()
+        assert [call['fields'] for call in calls] == [['subject', 'state'], None]
+
+    def test_Raise_BadRequestError_case_bad_fields(self, client, monkeypatch):
+        """get_todos: FIELDS_ENABLED が true で fields が不正なケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app.app.current_request, 'query_params', {'fields': 'subject,password'})
+        monkeypatch.setenv('FIELDS_ENABLED', 'true')
+        with pytest.raises(BadRequestError):
+            app.get_todos()
+
+    @pytest.mark.parametrize('params', [
+        {'ids': ''},
+        {'limit': 'ten'},
+        {'limit': '0'},
+        {'limit': str(Validates.LIMIT_MAX_VALUE + 1)},
+        {'cursor': 'invalid.cursor'},
+        {'order': 'newest'},
+        {'since': 'yesterday'},
+        {'since': '2000', 'until': '1000'},
+        {'state': 'done'}])
+    def test_Raise_BadRequestError_case_bad_params(self, client, monkeypatch, params):
+        """get_todos: ids、limit、cursor、order、since、until または state が不正なケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app.app.current_request, 'query_params', params)
+        with pytest.raises(BadRequestError):
+            app.get_todos()
+
+
+class TestGetTodoCounts(TestApp):
+
+    def test_Return_counts(self, client, monkeypatch):
+        """get_todo_counts: ステータスごとの件数を受け取ることができる"""
+        super().set_env(client, monkeypatch)
+        counts = {'unstarted': 1, 'started': 2, 'completed': 3}
+        monkeypatch.setattr(DynamoDBTodo, 'count_items_by_state', lambda *_, **__: counts)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        assert app.get_todo_counts() == counts
+
+
+class TestExportAllTodos(TestApp):
+
+    def _monkeys(self, client, monkeypatch):
+        super().set_env(client, monkeypatch)
+
+        def _iter_scan_pages(self, limit=None, exclusive_start_key=None):
+            start = exclusive_start_key['offset'] if exclusive_start_key else 0
+            for offset in range(start, len(TESTDATA_DDB_ITEMS), limit):
+                items = TESTDATA_DDB_ITEMS[offset:offset + limit]
+                end = offset + limit
+                yield items, {'offset': end} if end < len(TESTDATA_DDB_ITEMS) else None
+        monkeypatch.setattr(DynamoDBTodo, 'iter_scan_pages', _iter_scan_pages)
+
+    def test_Return_ndjson(self, client, monkeypatch):
+        """export_all_todos: すべてのアイテムを NDJSON で受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        response = app.export_all_todos({'limit': '4'})
+        assert response.headers['Content-Type'] == NDJSON.CONTENT_TYPE
+        assert 'X-Next-Cursor' not in response.headers
+        assert response.body.encode('utf-8') == NDJSON.dumps(TESTDATA_DDB_ITEMS)
+
+    def test_Return_gzip_case_compress(self, client, monkeypatch):
+        """export_all_todos: compress=gzip のケース、gzip で圧縮された NDJSON を受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        response = app.export_all_todos({'limit': '4', 'compress': 'gzip'})
+        assert response.headers['Content-Type'] == NDJSON.GZIP_CONTENT_TYPE
+        assert gzip.decompress(response.body) == NDJSON.dumps(TESTDATA_DDB_ITEMS)
+
+    def test_Return_all_items_case_resume_from_next_cursor(self, client, monkeypatch):
+        """export_all_todos: サイズの上限に達したケース、X-Next-Cursor から再開してすべてのアイテムを受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app, 'EXPORT_MAX_BYTES', 1)
+        bodies = []
+        params = {'limit': '4'}
+        while True:
+            response = app.export_all_todos(params)
+            bodies.append(response.body)
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            params = {'limit': '4', 'cursor': response.headers['X-Next-Cursor']}
+        assert len(bodies) == 3
+        assert ''.join(bodies).encode('utf-8') == NDJSON.dumps(TESTDATA_DDB_ITEMS)
+
+    def test_Raise_BadRequestError_case_bad_compress(self, client, monkeypatch):
+        """export_all_todos: compress が不正なケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        with pytest.raises(BadRequestError):
+            app.export_all_todos({'compress': 'br'})
 
 
 class TestAddNewTodo(TestApp):
@@ -77,6 +222,16 @@ class TestAddNewTodo(TestApp):
         assert type(actual) == str
         assert len(actual) == 36
 
+    def test_Pass_idempotency_key(self, client, monkeypatch):
+        """add_new_todo: Idempotency-Key ヘッダーがあるケース、冪等キーとして渡すことができる"""
+        self._monkeys(client, monkeypatch)
+        calls = []
+        monkeypatch.setattr(DynamoDBTodo, 'add_item', lambda *_, **kwargs: calls.append(kwargs) or 'uid')
+        monkeypatch.setattr(Request, 'json_body', {'subject': 'subject'})
+        monkeypatch.setattr(app.app.current_request, 'headers', {'idempotency-key': 'key-1'})
+        assert app.add_new_todo() == 'uid'
+        assert calls[0]['idempotency_key'] == 'key-1'
+
     def test_Raise_BadRequestError_case_None_subject(self, client, monkeypatch):
         """add_new_todo: subjectが無いケース、例外を発生させることができる"""
         self._monkeys(client, monkeypatch)
@@ -100,29 +255,129 @@ class TestAddNewTodo(TestApp):
         with pytest.raises(BadRequestError):
             app.add_new_todo()
 
+    def test_Raise_BadRequestError_case_all_errors(self, client, monkeypatch):
+        """add_new_todo: 複数の属性が不正なケース、すべてのエラーを 1 つの例外で返すことができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(Request, 'json_body', {'subject': '', 'description': 1})
+        with pytest.raises(BadRequestError) as e:
+            app.add_new_todo()
+        assert 'subject length' in str(e.value)
+        assert 'description type' in str(e.value)
+
+
+class TestBatchTodos(TestApp):
+
+    def _monkeys(self, client, monkeypatch):
+        super().set_env(client, monkeypatch)
+
+        def _batch_write(self, operations, username):
+            return [{'op': o['op'], 'uid': o.get('uid', 'new'), 'status': 200}
+                    for o in operations]
+        monkeypatch.setattr(DynamoDBTodo, 'batch_write', _batch_write)
+        monkeypatch.setattr(app, 'get_authorized_username',
+                            lambda *_, **__: 'default')
+
+    def test_Return_results(self, client, monkeypatch):
+        """batch_todos: 操作ごとの結果を受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        json_body = {'operations': [
+            {'op': 'create', 'subject': 'subject'},
+            {'op': 'delete', 'uid': TESTDATA_DDB_ITEMS[0]['uid']}]}
+        monkeypatch.setattr(Request, 'json_body', json_body)
+        actual = app.batch_todos()
+        assert [r['op'] for r in actual['results']] == ['create', 'delete']
+
+    def test_Raise_BadRequestError_case_bad_operation(self, client, monkeypatch):
+        """batch_todos: いずれかの操作が不正なケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        json_body = {'operations': [
+            {'op': 'create', 'subject': 'subject'},
+            {'op': 'create'}]}
+        monkeypatch.setattr(Request, 'json_body', json_body)
+        with pytest.raises(BadRequestError):
+            app.batch_todos()
+
+    def test_Raise_BadRequestError_case_None_json_body(self, client, monkeypatch):
+        """batch_todos: json_bodyがNoneのケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        with pytest.raises(BadRequestError):
+            app.batch_todos()
+
 
 class TestGetTodo(TestApp):
 
-    def _monkeys(self, monkeypatch):
+    def _monkeys(self, client, monkeypatch, headers=None):
+        super().set_env(client, monkeypatch)
+
         def _get_item(self, uid, username):
             for item in TESTDATA_DDB_ITEMS:
                 if item['uid'] == uid and item['username'] == username:
-                    return item
+                    return dict(item, version=Decimal(3))
         monkeypatch.setattr(DynamoDBTodo, 'get_item', _get_item)
+        monkeypatch.setattr(app.app.current_request, 'headers', headers or {})
 
     @pytest.mark.parametrize('item', TESTDATA_DDB_ITEMS)
-    def test_Return_todo_dict(self, monkeypatch, item):
-        """get_todo: 取得に指定したuid、usernameのTodoを受け取ることができる"""
-        self._monkeys(monkeypatch)
+    def test_Return_todo_dict(self, client, monkeypatch, item):
+        """get_todo: 取得に指定したuid、usernameのTodoとETagを受け取ることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app, 'get_authorized_username',
+                            lambda *_, **__: item['username'])
+        actual = app.get_todo(uid=item['uid'])
+        assert actual.status_code == HTTPStatus.OK
+        assert actual.body == dict(item, version=3)
+        assert actual.headers['ETag'] == '"3"'
+
+    @pytest.mark.parametrize('if_none_match', ['"3"', 'W/"3"', '"1", "3"', '*'])
+    def test_Return_304_case_if_none_match(self, client, monkeypatch, if_none_match):
+        """get_todo: If-None-Match が ETag と一致するケース、本文のない304を受け取ることができる"""
+        item = TESTDATA_DDB_ITEMS[0]
+        self._monkeys(client, monkeypatch, {'if-none-match': if_none_match})
         monkeypatch.setattr(app, 'get_authorized_username',
                             lambda *_, **__: item['username'])
-        assert app.get_todo(uid=item['uid']) == item
+        actual = app.get_todo(uid=item['uid'])
+        assert actual.status_code == HTTPStatus.NOT_MODIFIED
+        assert actual.body == ''
+
+    def test_Return_200_case_if_none_match_not_match(self, client, monkeypatch):
+        """get_todo: If-None-Match が ETag と一致しないケース、Todoを受け取ることができる"""
+        item = TESTDATA_DDB_ITEMS[0]
+        self._monkeys(client, monkeypatch, {'if-none-match': '"2"'})
+        monkeypatch.setattr(app, 'get_authorized_username',
+                            lambda *_, **__: item['username'])
+        assert app.get_todo(uid=item['uid']).status_code == HTTPStatus.OK
+
+    @pytest.mark.parametrize('uid', ['#stats', '#tombstone#uid'])
+    def test_Raise_BadRequestError_case_reserved_uid(self, client, monkeypatch, uid):
+        """get_todo: 管理用のアイテムの接頭辞 # で始まるuidのケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        with pytest.raises(BadRequestError):
+            app.get_todo(uid=uid)
+
+
+class TestParseIfMatch(TestApp):
+
+    @pytest.mark.parametrize('headers, expected', [
+        ({}, None), ({'if-match': '*'}, None), ({'if-match': '"3"'}, 3)])
+    def test_Return_expected_version(self, client, monkeypatch, headers, expected):
+        """parse_if_match: If-Match から期待する version を受け取ることができる"""
+        super().set_env(client, monkeypatch)
+        monkeypatch.setattr(app.app.current_request, 'headers', headers)
+        assert app.parse_if_match(app.app.current_request) == expected
+
+    @pytest.mark.parametrize('if_match', ['W/"3"', '3', '"three"', '""'])
+    def test_Raise_PreconditionFailedError_case_malformed(self, client, monkeypatch, if_match):
+        """parse_if_match: この API が発行した ETag の形式でないケース、例外を発生させることができる"""
+        super().set_env(client, monkeypatch)
+        monkeypatch.setattr(app.app.current_request, 'headers', {'if-match': if_match})
+        with pytest.raises(PreconditionFailedError):
+            app.parse_if_match(app.app.current_request)
 
 
 class TestDeleteTodo(TestApp):
 
     def _monkeys(self, monkeypatch):
-        def _delete_item(self, uid, username):
+        def _delete_item(self, uid, username, **__):
             for item in TESTDATA_DDB_ITEMS:
                 if item['uid'] == uid and item['username'] == username:
                     return item['uid']
@@ -190,3 +445,135 @@ class TestUpdateTodo(TestApp):
         self._monkeys(client, monkeypatch)
         with pytest.raises(BadRequestError):
             app.update_todo("_uid")
+
+    def test_Raise_BadRequestError_case_bad_state(self, client, monkeypatch):
+        """update_todo: stateが不正なケース、更新せずに例外を発生させることができる"""
+        self._monkeys(client, monkeypatch, TESTDATA_DDB_ITEMS[0])
+        monkeypatch.setattr(Request, 'json_body', {'state': 'unknown_state'})
+        with pytest.raises(BadRequestError):
+            app.update_todo(TESTDATA_DDB_ITEMS[0]['uid'])
+
+
+class TestGetTodoStats(TestApp):
+
+    def test_Return_stats(self, client, monkeypatch):
+        """get_todo_stats: Todo の件数を受け取ることができる"""
+        super().set_env(client, monkeypatch)
+        stats = {'total': 6, 'unstarted': 1, 'started': 2, 'completed': 3}
+        monkeypatch.setattr(DynamoDBTodo, 'get_stats', lambda *_, **__: stats)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        assert app.get_todo_stats() == stats
+
+
+class TestGetTodoChanges(TestApp):
+
+    def _monkeys(self, client, monkeypatch, last_key=None):
+        super().set_env(client, monkeypatch)
+        calls = []
+
+        def _list_changes(self, **kwargs):
+            calls.append(kwargs)
+            return {'items': TESTDATA_DDB_ITEMS, 'deleted': ['deleted-uid'],
+                    'since': 1000, 'last_key': last_key}
+        monkeypatch.setattr(DynamoDBTodo, 'list_changes', _list_changes)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        return calls
+
+    def test_Return_changes_and_next_token(self, client, monkeypatch):
+        """get_todo_changes: 変更した Todo、削除した uid と、次回の since を含む next_token を受け取ることができる"""
+        calls = self._monkeys(client, monkeypatch)
+        actual = app.get_todo_changes()
+        assert (actual['items'], actual['deleted'], actual['has_more']) \
+            == (TESTDATA_DDB_ITEMS, ['deleted-uid'], False)
+        assert Cursor.decode(actual['next_token'], 'default', Cursor.CHANGES) == {'since': 1000}
+        monkeypatch.setattr(app.app.current_request, 'query_params', {'since': actual['next_token']})
+        app.get_todo_changes()
+        assert [call['since'] for call in calls] == [None, 1000]
+
+    def test_Raise_BadRequestError_case_next_token_as_cursor(self, client, monkeypatch):
+        """get_todos: GET /todos/changes の next_token を cursor に指定したケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        next_token = app.get_todo_changes()['next_token']
+        monkeypatch.setattr(app.app.current_request, 'query_params', {'cursor': next_token})
+        with pytest.raises(BadRequestError):
+            app.get_todos()
+
+    def test_Keep_since_case_has_more(self, client, monkeypatch):
+        """get_todo_changes: 続きのページがあるケース、同じ since と ExclusiveStartKey を next_token に含めることができる"""
+        last_key = {'username': 'default', 'uid': TESTDATA_DDB_ITEMS[0]['uid'], 'updated_at': 900}
+        calls = self._monkeys(client, monkeypatch, last_key)
+        actual = app.get_todo_changes()
+        assert actual['has_more'] is True
+        monkeypatch.setattr(app.app.current_request, 'query_params', {'since': actual['next_token']})
+        app.get_todo_changes()
+        assert (calls[1]['since'], calls[1]['next_since'], calls[1]['exclusive_start_key']) \
+            == (None, 1000, last_key)
+
+    def test_Return_status_code_410_case_gone(self, client, monkeypatch):
+        """get_todo_changes: since が削除の記録の保持期間より古いケース、410 を返すことができる"""
+        def _raise(*_, **__):
+            raise GoneError('since is older than the tombstone retention.')
+        monkeypatch.setattr(DynamoDBTodo, 'list_changes', _raise)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        assert client.get('/todos/changes').status_code == HTTPStatus.GONE
+
+    @pytest.mark.parametrize('params', [
+        {'since': 'invalid.token'},
+        {'limit': '0'}])
+    def test_Raise_BadRequestError_case_bad_params(self, client, monkeypatch, params):
+        """get_todo_changes: since または limit が不正なケース、例外を発生させることができる"""
+        self._monkeys(client, monkeypatch)
+        monkeypatch.setattr(app.app.current_request, 'query_params', params)
+        with pytest.raises(BadRequestError):
+            app.get_todo_changes()
+
+
+class TestHandleRetryableError(TestApp):
+
+    @pytest.mark.parametrize('error, status_code', [
+        (TooManyRequestsError('Database is throttling requests.', 2), HTTPStatus.TOO_MANY_REQUESTS),
+        (ServiceUnavailableError('Database is temporarily unavailable.', 3), HTTPStatus.SERVICE_UNAVAILABLE)])
+    def test_Return_retry_after(self, client, monkeypatch, error, status_code):
+        """handle_retryable_error: 再試行できないスロットリング、障害のケース、Retry-After ヘッダー付きのレスポンスを返すことができる"""
+        def _raise(*_, **__):
+            raise error
+        monkeypatch.setattr(DynamoDBTodo, 'count_items_by_state', _raise)
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        response = client.get('/todos/counts')
+        assert response.status_code == status_code
+        assert response.headers['Retry-After'] == str(error.retry_after)
+        assert response.json == {'Code': error.__class__.__name__, 'Message': str(error)}
+
+
+class TestCompressJsonResponse(TestApp):
+
+    @staticmethod
+    def _get(client, monkeypatch, min_bytes, accept_encoding='gzip, deflate',
+             accept=COMPRESSED_JSON_CONTENT_TYPE):
+        monkeypatch.setenv('COMPRESSION_MIN_BYTES', str(min_bytes))
+        monkeypatch.setattr(app, 'get_authorized_username', lambda *_, **__: 'default')
+        monkeypatch.setattr(DynamoDBTodo, 'list_items_page',
+                            lambda *_, **__: (TESTDATA_DDB_ITEMS, None))
+        return client.get('/todos', headers={'Accept': accept, 'Accept-Encoding': accept_encoding})
+
+    def test_Return_gzip_case_compression_enabled(self, client, monkeypatch):
+        """compress_json_response: COMPRESSION_ENABLED が true のケース、gzip で圧縮した JSON を返すことができる"""
+        monkeypatch.setenv('COMPRESSION_ENABLED', 'true')
+        response = self._get(client, monkeypatch, 1)
+        assert response.headers['Content-Type'] == COMPRESSED_JSON_CONTENT_TYPE
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept, Accept-Encoding'
+        body = json.loads(gzip.decompress(base64.b64decode(response.body)))
+        assert [item['uid'] for item in body['items']] == [item['uid'] for item in TESTDATA_DDB_ITEMS]
+
+    @pytest.mark.parametrize('enabled, min_bytes, accept_encoding, accept', [
+        ('false', 1, 'gzip', COMPRESSED_JSON_CONTENT_TYPE),
+        ('true', 1024 * 1024, 'gzip', COMPRESSED_JSON_CONTENT_TYPE),
+        ('true', 1, 'identity', COMPRESSED_JSON_CONTENT_TYPE),
+        ('true', 1, 'gzip', 'application/json')])
+    def test_Return_uncompressed(self, client, monkeypatch, enabled, min_bytes, accept_encoding, accept):
+        """compress_json_response: 無効、しきい値未満、gzip を許可しない、Accept がバイナリメディアタイプでないケース、圧縮せずに返すことができる"""
+        monkeypatch.setenv('COMPRESSION_ENABLED', enabled)
+        response = self._get(client, monkeypatch, min_bytes, accept_encoding, accept)
+        assert 'Content-Encoding' not in response.headers
+        assert len(response.json['items']) == len(TESTDATA_DDB_ITEMS)
@@ -0,0 +1,142 @@
+import io
+import json
+
+import pytest
+from chalice import BadRequestError
+
+from chalicelib.bulk_load import BulkLoader, TokenBucket, build_item, read_rows
+from chalicelib.db import DynamoDBTodo
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class TestBulkLoad:
+
+    @staticmethod
+    def _jsonl(rows):
+        return io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+
+
+class TestTokenBucket(TestBulkLoad):
+
+    def test_Sleep_case_tokens_exhausted(self):
+        """acquire: トークンが不足したケース、補充されるまで待機することができる"""
+        now = [0.0]
+        slept = []
+        bucket = TokenBucket(10, clock=lambda: now[0], sleep=slept.append)
+        assert bucket.acquire(10) == 0
+        assert bucket.acquire(5) == pytest.approx(0.5)
+        now[0] = 1.5
+        assert bucket.acquire(25) == pytest.approx(1.5)
+        assert slept == [pytest.approx(0.5), pytest.approx(1.5)]
+
+
+class TestReadRows(TestBulkLoad):
+
+    def test_Return_rows_case_jsonl(self):
+        """read_rows: JSONL のケース、不正な行も含め 1 行ずつ返すことができる"""
+        stream = io.StringIO('{"subject": "a"}\n\nnot json\n')
+        assert list(read_rows(stream, 'jsonl')) == [{'subject': 'a'}, {}, 'not json']
+
+    def test_Return_rows_case_csv(self):
+        """read_rows: CSV のケース、空の列を除いた行を返すことができる"""
+        stream = io.StringIO('subject,description,state\na,,started\nb,desc,\n')
+        assert list(read_rows(stream, 'csv')) == [
+            {'subject': 'a', 'state': 'started'}, {'subject': 'b', 'description': 'desc'}]
+
+    def test_Raise_ValueError_case_unknown_format(self):
+        """read_rows: 形式が不正なケース、例外を発生させることができる"""
+        with pytest.raises(ValueError):
+            list(read_rows(io.StringIO(''), 'xml'))
+
+
+class TestBuildItem(TestBulkLoad):
+
+    def test_Return_item_with_defaults(self):
+        """build_item: 省略された属性に uid と初期値を設定することができる"""
+        item = build_item({'subject': 'subject', 'version': '3'}, username='meow')
+        assert {key: item[key] for key in ('description', 'state', 'username', 'version')} \
+            == {'description': '', 'state': 'unstarted', 'username': 'meow', 'version': 3}
+        assert len(item['uid']) == 36
+
+    @pytest.mark.parametrize('row', [
+        'not json', {}, {'subject': 'subject', 'state': 'done'},
+        {'subject': 'subject', 'username': 'a'}, {'subject': 'subject', 'version': 'x'}])
+    def test_Raise_BadRequestError_case_invalid_row(self, row):
+        """build_item: 不正な行のケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            build_item(row)
+
+
+class TestBulkLoader(TestBulkLoad):
+
+    def test_Load_all_rows(self, mock):
+        """load: すべての行を uid を保持したまま書き込み、不正な行を報告することができる"""
+        db = DynamoDBTodo(mock.table._table)
+        errors = []
+        rows = TESTDATA_DDB_ITEMS + [{'subject': ''}]
+        result = BulkLoader(db, workers=3, batch_size=2,
+                            on_error=lambda *error: errors.append(error)).load(
+            read_rows(self._jsonl(rows)))
+        assert result == {'rows': 10, 'loaded': 9, 'invalid': 1, 'unprocessed': 0, 'offset': 10}
+        assert [offset for offset, _ in errors] == [9]
+        assert sorted(item['uid'] for item in db.list_all_items()) \
+            == sorted(item['uid'] for item in TESTDATA_DDB_ITEMS)
+        assert db.count_items_by_state(username=DEFAULT_USERNAME) \
+            == {'unstarted': 2, 'started': 2, 'completed': 3}
+
+    def test_Load_rows_case_offset(self, mock):
+        """load: offset を指定したケース、続きの行のみを書き込むことができる"""
+        db = DynamoDBTodo(mock.table._table)
+        result = BulkLoader(db, batch_size=4).load(
+            read_rows(self._jsonl(TESTDATA_DDB_ITEMS)), offset=5)
+        assert result == {'rows': 4, 'loaded': 4, 'invalid': 0, 'unprocessed': 0, 'offset': 9}
+        assert sorted(item['uid'] for item in db.list_all_items()) \
+            == sorted(item['uid'] for item in TESTDATA_DDB_ITEMS[5:])
+
+    def test_Report_offset_of_completed_batches(self, mock):
+        """load: バッチが完了するたびに、それまでのバッチがすべて完了した offset を報告することができる"""
+        progress = []
+        rows = [{'subject': f"subject {i}"} for i in range(60)]
+        BulkLoader(DynamoDBTodo(mock.table._table), workers=4, batch_size=10,
+                   on_progress=progress.append).load(rows)
+        offsets = [report['offset'] for report in progress]
+        assert offsets == sorted(offsets) and offsets[-1] == 60
+        assert all(offset % 10 == 0 for offset in offsets)
+
+    def test_Load_rows_case_stats_and_wcu(self, mock):
+        """load: 集計アイテムが有効で WCU を制限したケース、集計アイテムにも加算することができる"""
+        db = DynamoDBTodo(mock.table._table, stats=True)
+        BulkLoader(db, wcu_per_second=1000).load(read_rows(self._jsonl(TESTDATA_DDB_ITEMS)))
+        assert db.get_stats(username=DEFAULT_USERNAME) \
+            == {'total': 7, 'unstarted': 2, 'started': 2, 'completed': 3}
+        assert db.get_stats(username='meow') \
+            == {'total': 1, 'unstarted': 0, 'started': 0, 'completed': 1}
+
+    def test_Load_last_row_case_duplicated_uid_in_batch(self, mock):
+        """load: 同じバッチに同じ uid の行があるケース、最後の行を書き込み、前の行を不正な行として報告することができる"""
+        db = DynamoDBTodo(mock.table._table)
+        errors = []
+        item = TESTDATA_DDB_ITEMS[0]
+        rows = [item, dict(item, subject='second'), TESTDATA_DDB_ITEMS[1], dict(item, subject='last')]
+        result = BulkLoader(db, batch_size=25, on_error=lambda *error: errors.append(error)).load(
+            read_rows(self._jsonl(rows)))
+        assert result == {'rows': 4, 'loaded': 2, 'invalid': 2, 'unprocessed': 0, 'offset': 4}
+        assert [offset for offset, _ in errors] == [0, 1]
+        assert db.get_item(item['uid'], username=item['username'])['subject'] == 'last'
+
+    def test_Write_last_item_case_duplicated_uid(self, mock, monkeypatch):
+        """import_items: 同じ (username, uid) の Todo が複数あるケース、最後の Todo のみを書き込むことができる"""
+        db = DynamoDBTodo(mock.table._table)
+        client = mock.table._table.meta.client
+        batch_write_item = client.batch_write_item
+        requests = []
+        monkeypatch.setattr(client, 'batch_write_item', lambda RequestItems: requests.extend(
+            *RequestItems.values()) or batch_write_item(RequestItems=RequestItems))
+        item = build_item(TESTDATA_DDB_ITEMS[0], DEFAULT_USERNAME)
+        assert db.import_items([item, dict(item, subject='last')]) == []
+        assert len(requests) == 1
+        assert db.get_item(item['uid'], username=item['username'])['subject'] == 'last'
@@ -0,0 +1,148 @@
+import pytest
+from chalice import NotFoundError
+
+import app
+from chalicelib.cache import CachedDynamoDBTodo, TTLCache
+from chalicelib.db import DynamoDBTodo
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCache:
+
+    @staticmethod
+    def _db(mock, **kwargs):
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        return CachedDynamoDBTodo(DynamoDBTodo(mock.table._table), TTLCache(**kwargs))
+
+
+class TestTTLCache(TestCache):
+
+    def test_Return_value_and_count_hits(self):
+        """get: 登録したエントリを返し、ヒット/ミスを記録することができる"""
+        cache = TTLCache()
+        assert cache.get('key') is None
+        cache.set('key', 'value')
+        assert cache.get('key') == 'value'
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 1}
+
+    def test_Return_default_case_expired(self):
+        """get: 有効期限を過ぎたケース、ミスとしてエントリを削除することができる"""
+        clock = Clock()
+        cache = TTLCache(ttl=5, clock=clock)
+        cache.set('key', 'value')
+        clock.now = 4.9
+        assert cache.get('key') == 'value'
+        clock.now = 5.0
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_Evict_least_recently_used(self):
+        """set: 上限を超えたケース、最も長く参照されていないエントリを削除することができる"""
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert (cache.get('a'), cache.get('c')) == (1, 3)
+        assert cache.evictions == 1
+
+
+class TestCachedDynamoDBTodo(TestCache):
+
+    def test_Return_cached_item(self, mock, monkeypatch):
+        """get_item: 2 回目以降はキャッシュから item を返すことができる"""
+        db = self._db(mock)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        assert db.get_item(uid, username=DEFAULT_USERNAME) == TESTDATA_DDB_ITEMS[0]
+        monkeypatch.setattr(DynamoDBTodo, 'get_item', pytest.fail)
+        assert db.get_item(uid, username=DEFAULT_USERNAME) == TESTDATA_DDB_ITEMS[0]
+        assert (db.cache.hits, db.cache.misses) == (1, 1)
+
+    def test_Return_copy_of_cached_item(self, mock):
+        """get_item: 返した item を変更したケース、キャッシュに影響しないことができる"""
+        db = self._db(mock)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.get_item(uid, username=DEFAULT_USERNAME)['subject'] = 'changed'
+        assert db.get_item(uid, username=DEFAULT_USERNAME) == TESTDATA_DDB_ITEMS[0]
+
+    def test_Not_cache_case_not_found(self, mock):
+        """get_item: uid が存在しないケース、例外を発生させ、キャッシュしないことができる"""
+        db = self._db(mock)
+        with pytest.raises(NotFoundError):
+            db.get_item('_NOT_EXIST_UID', username=DEFAULT_USERNAME)
+        assert len(db.cache) == 0
+
+    def test_Return_cached_list_by_query(self, mock):
+        """list_items: username と query ごとにキャッシュすることができる"""
+        db = self._db(mock)
+        assert db.list_items(query='cat', username=DEFAULT_USERNAME) \
+            == db.list_items(query='cat', username=DEFAULT_USERNAME)
+        db.list_items(query='', username=DEFAULT_USERNAME)
+        db.list_items(query='cat', username='meow')
+        assert (db.cache.hits, db.cache.misses) == (1, 3)
+
+    def test_Invalidate_case_write(self, mock):
+        """add_item, update_item, delete_item: 書き込んだケース、キャッシュを無効化し最新の内容を返すことができる"""
+        db = self._db(mock)
+        before = db.list_items_page(username=DEFAULT_USERNAME)[0]
+        uid = db.add_item(subject='new subject', username=DEFAULT_USERNAME)
+        assert len(db.list_items_page(username=DEFAULT_USERNAME)[0]) == len(before) + 1
+
+        db.get_item(uid, username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='updated', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'updated'
+
+        db.delete_item(uid, username=DEFAULT_USERNAME)
+        with pytest.raises(NotFoundError):
+            db.get_item(uid, username=DEFAULT_USERNAME)
+        assert db.cache.hits == 0
+
+    def test_Invalidate_case_batch_write(self, mock):
+        """batch_write: 書き込んだケース、操作した Todo のキャッシュを無効化することができる"""
+        db = self._db(mock)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.get_item(uid, username=DEFAULT_USERNAME)
+        db.batch_write([{'op': 'update', 'uid': uid, 'subject': 'batch'}],
+                       username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'batch'
+
+    def test_Not_invalidate_other_users(self, mock):
+        """add_item: 書き込んだユーザー以外のキャッシュを無効化しないことができる"""
+        db = self._db(mock)
+        db.list_items(username='meow')
+        db.add_item(subject='new subject', username=DEFAULT_USERNAME)
+        db.list_items(username='meow')
+        assert db.cache.hits == 1
+
+    def test_Bound_generations_case_many_users(self, mock):
+        """invalidate: ユーザーが増えたケース、世代番号を maxsize 件までに抑え、古いリストを返さないことができる"""
+        db = self._db(mock, maxsize=2)
+        before = db.list_items(username=DEFAULT_USERNAME)
+        db._todo.add_item(subject='new subject', username=DEFAULT_USERNAME)
+        for username in ['a', 'b', 'c']:
+            db.invalidate(username)
+        assert len(db._generations) == 2
+        assert len(db.list_items(username=DEFAULT_USERNAME)) == len(before) + 1
+
+    def test_Return_wrapped_class_case_cache_enabled(self, monkeypatch):
+        """get_app_db: CACHE_ENABLED が true のケース、CachedDynamoDBTodo を返すことができる"""
+        monkeypatch.setattr(app, '_DB', None)
+        monkeypatch.setenv('CACHE_ENABLED', 'true')
+        monkeypatch.setenv('CACHE_TTL_SECONDS', '1.5')
+        db = app.get_app_db()
+        assert db.__class__ is CachedDynamoDBTodo
+        assert db.cache.ttl == 1.5
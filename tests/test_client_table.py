@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import boto3
+import pytest
+from boto3.dynamodb.types import TypeDeserializer
+from chalice import NotFoundError
+
+import app
+from chalicelib.client_table import ClientTable, TodoSerializer
+from chalicelib.db import DynamoDBTodo
+from chalicelib.exceptions import PreconditionFailedError
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class TestClientTable:
+
+    @staticmethod
+    def _db(mock, **kwargs):
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        table = ClientTable(boto3.client('dynamodb'), mock.table._table.name)
+        return DynamoDBTodo(table, **kwargs)
+
+
+class TestTodoSerializer(TestClientTable):
+
+    @pytest.mark.parametrize('value', [
+        'subject', '', True, 3, -3, Decimal('1.5'), None, ['a', 1], {'a': {'b': 'c'}}, {'a', 'b'}])
+    def test_Return_same_value_as_boto3(self, value):
+        """serialize, deserialize: boto3 と同じ AttributeValue に変換し、元の値に戻すことができる"""
+        attribute_value = TodoSerializer.serialize(value)
+        assert TypeDeserializer().deserialize(attribute_value) == value
+        assert TodoSerializer.deserialize(attribute_value) == value
+
+    def test_Return_int_case_integer_number(self):
+        """deserialize: 整数の N のケース、Decimal ではなく int を返すことができる"""
+        assert type(TodoSerializer.deserialize({'N': '3'})) is int
+        assert type(TodoSerializer.deserialize({'N': '3.0'})) is Decimal
+
+    @pytest.mark.parametrize('item', TESTDATA_DDB_ITEMS)
+    def test_Return_item(self, item):
+        """deserialize_item: serialize_item で変換したアイテムを元に戻すことができる"""
+        assert TodoSerializer.deserialize_item(TodoSerializer.serialize_item(item)) == item
+
+
+class TestClientTableDynamoDBTodo(TestClientTable):
+
+    def test_Return_items_same_as_resource(self, mock):
+        """list_items_page, get_item, get_items: resource と同じ Todo オブジェクトを返すことができる"""
+        db = self._db(mock)
+        resource = DynamoDBTodo(mock.table._table)
+        assert db.list_items_page(query='cat', username=DEFAULT_USERNAME, limit=3) \
+            == resource.list_items_page(query='cat', username=DEFAULT_USERNAME, limit=3)
+        uids = [item['uid'] for item in TESTDATA_DDB_ITEMS]
+        assert db.get_item(uids[0], username=DEFAULT_USERNAME) == TESTDATA_DDB_ITEMS[0]
+        assert db.get_items(uids, username=DEFAULT_USERNAME) \
+            == resource.get_items(uids, username=DEFAULT_USERNAME)
+        assert db.list_all_items() == TESTDATA_DDB_ITEMS
+
+    def test_Write_items(self, mock):
+        """add_item, update_item, delete_item: 低レベルクライアントで書き込むことができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        db.update_item(uid, state='completed', username=DEFAULT_USERNAME, expected_version=1)
+        item = db.get_item(uid, username=DEFAULT_USERNAME)
+        assert (item['state'], item['version']) == ('completed', 2)
+        with pytest.raises(PreconditionFailedError):
+            db.delete_item(uid, username=DEFAULT_USERNAME, expected_version=1)
+        db.delete_item(uid, username=DEFAULT_USERNAME, expected_version=2)
+        with pytest.raises(NotFoundError):
+            db.get_item(uid, username=DEFAULT_USERNAME)
+
+    def test_Write_items_case_batch_and_search_index(self, mock):
+        """batch_write, list_items: 転置索引が有効なケース、まとめて書き込み検索することができる"""
+        db = self._db(mock, search_index=True)
+        results = db.batch_write(
+            [{'op': 'create', 'subject': f"ハンバーガー {i}"} for i in range(30)],
+            username=DEFAULT_USERNAME)
+        assert {result['status'] for result in results} == {201}
+        assert sorted(item['uid'] for item in db.list_items(
+            query='ハンバーガー', username=DEFAULT_USERNAME)) \
+            == sorted(result['uid'] for result in results)
+
+    def test_Return_ClientTable_case_db_backend_client(self, monkeypatch):
+        """get_app_db: DB_BACKEND が client のケース、ClientTable を使用することができる"""
+        monkeypatch.setattr(app, '_DB', None)
+        monkeypatch.setenv('DB_BACKEND', 'client')
+        assert app.get_app_db()._table.__class__ is ClientTable
+
+    def test_Write_items_case_stats(self, mock):
+        """add_item, update_item, delete_item: 集計アイテムが有効なケース、トランザクションで書き込むことができる"""
+        db = self._db(mock, stats=True)
+        uid = db.add_item(subject='subject', username='meow')
+        db.update_item(uid, state='started', username='meow')
+        db.add_item(subject='subject', username='meow')
+        assert db.get_stats(username='meow') == {'total': 2, 'unstarted': 1, 'started': 1, 'completed': 0}
+        db.delete_item(uid, username='meow')
+        assert db.get_stats(username='meow') == {'total': 1, 'unstarted': 1, 'started': 0, 'completed': 0}
@@ -0,0 +1,203 @@
+import pytest
+from chalice import NotFoundError
+
+from chalicelib.cache import CachedDynamoDBTodo, TTLCache
+from chalicelib.coalesce import CoalescingDynamoDBTodo, InMemoryQueue, coalesce_updates
+from chalicelib.db import DynamoDBTodo
+from chalicelib.exceptions import PreconditionFailedError
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCoalesce:
+
+    @staticmethod
+    def _db(mock, clock, **kwargs):
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        todo = DynamoDBTodo(mock.table._table)
+        return todo, CoalescingDynamoDBTodo(todo, window=1.0, clock=clock, **kwargs)
+
+    @staticmethod
+    def _count_updates(monkeypatch):
+        calls = []
+        update_item = DynamoDBTodo.update_item
+        monkeypatch.setattr(DynamoDBTodo, 'update_item',
+                            lambda self, **kwargs: calls.append(kwargs) or update_item(self, **kwargs))
+        return calls
+
+
+class TestInMemoryQueue(TestCoalesce):
+
+    def test_Hide_received_until_delete_or_release(self):
+        """receive: 受信したメッセージを delete するまで見えなくし、release で再び受信することができる"""
+        queue = InMemoryQueue()
+        for n in range(3):
+            queue.send({'n': n})
+        first, second = queue.receive(max_messages=2)
+        assert [message for _, message in (first, second)] == [{'n': 0}, {'n': 1}]
+        assert len(queue) == 1
+        queue.delete([first[0]])
+        queue.release([second[0]])
+        assert [message for _, message in queue.receive()] == [{'n': 1}, {'n': 2}]
+        assert queue.receive() == []
+
+
+class TestCoalesceUpdates(TestCoalesce):
+
+    def test_Merge_by_attribute_case_last_writer_wins(self):
+        """coalesce_updates: (username, uid) ごとに属性単位の last-writer-wins でまとめることができる"""
+        received = [
+            (0, {'username': 'a', 'uid': '1', 'changes': {'subject': 's1', 'state': 'started'},
+                 'enqueued_at': 1.0, 'seq': 0}),
+            (1, {'username': 'a', 'uid': '2', 'changes': {'subject': 'other'}, 'enqueued_at': 1.5, 'seq': 1}),
+            (3, {'username': 'a', 'uid': '1', 'changes': {'description': 'd2'}, 'enqueued_at': 2.0, 'seq': 3}),
+            (2, {'username': 'a', 'uid': '1', 'changes': {'subject': 's2', 'description': 'd1'},
+                 'enqueued_at': 2.0, 'seq': 2})]
+        groups = coalesce_updates(received)
+        assert groups[('a', '1')] == {
+            'changes': {'subject': 's2', 'state': 'started', 'description': 'd2'},
+            'receipts': [0, 2, 3], 'enqueued_at': 1.0}
+        assert groups[('a', '2')]['changes'] == {'subject': 'other'}
+
+
+class TestCoalescingDynamoDBTodo(TestCoalesce):
+
+    def test_Write_once_case_updates_within_window(self, mock, monkeypatch):
+        """update_item: window 内の更新をまとめ、window の経過後に 1 回で書き込むことができる"""
+        clock = Clock()
+        todo, db = self._db(mock, clock)
+        calls = self._count_updates(monkeypatch)
+        item = TESTDATA_DDB_ITEMS[0]
+        for n, description in enumerate(['a', 'ab', 'abc']):
+            clock.now = n * 0.3
+            assert db.update_item(item['uid'], description=description, username=DEFAULT_USERNAME) == item['uid']
+        db.update_item(item['uid'], state='completed', username=DEFAULT_USERNAME)
+        assert calls == []
+        clock.now = 1.0
+        db.update_item(TESTDATA_DDB_ITEMS[1]['uid'], subject='other', username=DEFAULT_USERNAME)
+        assert calls == [{'uid': item['uid'], 'username': DEFAULT_USERNAME,
+                          'description': 'abc', 'state': 'completed'}]
+        stored = todo.get_item(item['uid'], username=DEFAULT_USERNAME)
+        assert (stored['description'], stored['state']) == ('abc', 'completed')
+        assert DynamoDBTodo.get_version(stored) == DynamoDBTodo.get_version(item) + 1
+        assert db.stats() == {'enqueued': 5, 'written': 1, 'dropped': 0, 'failed': 0, 'pending': 1}
+
+    def test_Read_your_writes_case_get_item(self, mock, monkeypatch):
+        """get_item: 書き込んでいない更新がある Todo の場合、その Todo のみ書き込んでから返すことができる"""
+        clock = Clock()
+        _, db = self._db(mock, clock)
+        calls = self._count_updates(monkeypatch)
+        uid, other = TESTDATA_DDB_ITEMS[0]['uid'], TESTDATA_DDB_ITEMS[1]['uid']
+        db.update_item(uid, subject='first', username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='second', username=DEFAULT_USERNAME)
+        db.update_item(other, subject='other', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'second'
+        assert [call['uid'] for call in calls] == [uid]
+        assert db.stats()['pending'] == 1
+
+    def test_Flush_user_case_other_methods(self, mock, monkeypatch):
+        """list_items: 呼び出したユーザーの書き込んでいない更新のみを書き込んでから委譲することができる"""
+        _, db = self._db(mock, Clock())
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.update_item(uid, subject='listed', username=DEFAULT_USERNAME)
+        other = next(item for item in TESTDATA_DDB_ITEMS if item['username'] != DEFAULT_USERNAME)
+        db.update_item(other['uid'], subject='other', username=other['username'])
+        calls = self._count_updates(monkeypatch)
+        items = {item['uid']: item for item in db.list_items(username=DEFAULT_USERNAME)}
+        assert items[uid]['subject'] == 'listed'
+        assert [call['uid'] for call in calls] == [uid]
+        db.count_items(other['username'], 'unstarted')
+        assert [call['uid'] for call in calls] == [uid, other['uid']]
+        assert len(db.queue) == 0
+
+    def test_Write_through_case_expected_version(self, mock):
+        """update_item: expected_version を指定したケース、まとめた更新を書き込んでから条件付きで書き込むことができる"""
+        _, db = self._db(mock, Clock())
+        item = TESTDATA_DDB_ITEMS[0]
+        db.update_item(item['uid'], subject='pending', username=DEFAULT_USERNAME)
+        with pytest.raises(PreconditionFailedError):
+            db.update_item(item['uid'], state='completed', username=DEFAULT_USERNAME,
+                           expected_version=DynamoDBTodo.get_version(item))
+        version = DynamoDBTodo.get_version(db.get_item(item['uid'], username=DEFAULT_USERNAME))
+        db.update_item(item['uid'], state='completed', username=DEFAULT_USERNAME, expected_version=version)
+        stored = db.get_item(item['uid'], username=DEFAULT_USERNAME)
+        assert (stored['subject'], stored['state']) == ('pending', 'completed')
+
+    def test_Discard_pending_case_delete_item(self, mock, monkeypatch):
+        """delete_item: 削除する Todo の書き込んでいない更新を、書き込まずに破棄することができる"""
+        _, db = self._db(mock, Clock())
+        calls = self._count_updates(monkeypatch)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.update_item(uid, subject='deleted', username=DEFAULT_USERNAME)
+        assert db.delete_item(uid, username=DEFAULT_USERNAME) == uid
+        assert calls == []
+        with pytest.raises(NotFoundError):
+            db.get_item(uid, username=DEFAULT_USERNAME)
+
+    def test_Raise_NotFoundError_case_not_exist_uid(self, mock):
+        """update_item: 存在しない uid の場合、キューに送信せずに例外を発生させることができる"""
+        _, db = self._db(mock, Clock())
+        with pytest.raises(NotFoundError):
+            db.update_item('_NOT_EXIST_UID', subject='subject', username=DEFAULT_USERNAME)
+        assert len(db.queue) == 0
+
+    def test_Drop_case_deleted_after_update(self, mock):
+        """flush: 更新のあとに他のコンテナで削除された uid の場合、書き込みを破棄し dropped に数えることができる"""
+        todo, db = self._db(mock, Clock())
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        assert db.update_item(uid, subject='subject', username=DEFAULT_USERNAME) == uid
+        todo.delete_item(uid, username=DEFAULT_USERNAME)
+        db.flush(force=True)
+        assert db.stats() == {'enqueued': 1, 'written': 0, 'dropped': 1, 'failed': 0, 'pending': 0}
+
+    def test_Release_messages_case_write_error(self, mock, monkeypatch):
+        """flush: 書き込みに失敗したケース、メッセージをキューに戻し自分の更新の場合のみ例外を発生させることができる"""
+        _, db = self._db(mock, Clock())
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.update_item(uid, subject='retried', username=DEFAULT_USERNAME)
+        update_item = DynamoDBTodo.update_item
+        monkeypatch.setattr(DynamoDBTodo, 'update_item', lambda *_, **__: 1 / 0)
+        db.flush(force=True)
+        assert len(db.queue) == 1
+        with pytest.raises(ZeroDivisionError):
+            db.flush(force=True, username=DEFAULT_USERNAME)
+        assert db.stats()['failed'] == 2
+        monkeypatch.setattr(DynamoDBTodo, 'update_item', update_item)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'retried'
+
+    def test_Isolate_write_error_case_other_user(self, mock, monkeypatch):
+        """list_items: 他のユーザーの更新の書き込みに失敗したケース、例外を発生させずに委譲することができる"""
+        clock = Clock()
+        _, db = self._db(mock, clock)
+        other = next(item for item in TESTDATA_DDB_ITEMS if item['username'] != DEFAULT_USERNAME)
+        db.update_item(other['uid'], subject='throttled', username=other['username'])
+        update_item = DynamoDBTodo.update_item
+        monkeypatch.setattr(DynamoDBTodo, 'update_item', lambda *_, **__: 1 / 0)
+        clock.now = 2.0
+        for _ in range(2):
+            assert db.list_items(username=DEFAULT_USERNAME)
+        assert db.stats()['failed'] == 2
+        monkeypatch.setattr(DynamoDBTodo, 'update_item', update_item)
+        assert db.get_item(other['uid'], username=other['username'])['subject'] == 'throttled'
+
+    def test_Invalidate_cache_case_wrapped_cache(self, mock):
+        """get_item: CachedDynamoDBTodo をラップしたケース、書き込みでキャッシュを無効化し最新の内容を返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = CoalescingDynamoDBTodo(
+            CachedDynamoDBTodo(DynamoDBTodo(mock.table._table), TTLCache()), clock=Clock())
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.get_item(uid, username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='cached', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'cached'
@@ -0,0 +1,76 @@
+import gzip
+import json
+import base64
+from decimal import Decimal
+
+import pytest
+from chalice import Response
+
+from chalicelib.compression import (
+    COMPRESSED_JSON_CONTENT_TYPE, accepts_binary, compress_response, parse_accept_encoding, select_encoding)
+
+
+class TestCompression:
+
+    @staticmethod
+    def _response(size):
+        return Response(body={'items': [{'subject': 'a' * size, 'version': Decimal(1)}]},
+                        headers={'Content-Type': 'application/json'})
+
+
+class TestSelectEncoding(TestCompression):
+
+    def test_Parse_q_values(self):
+        """parse_accept_encoding: エンコーディングごとの q 値を取得することができる"""
+        assert parse_accept_encoding('gzip;q=0.5, BR, identity;q=x') \
+            == {'gzip': 0.5, 'br': 1.0, 'identity': 0.0}
+        assert parse_accept_encoding(None) == {}
+
+    @pytest.mark.parametrize('header, expected', [
+        ('gzip, deflate, br', 'br'),
+        ('gzip;q=1.0, br;q=0.5', 'gzip'),
+        ('*', 'br'),
+        ('br;q=0, *;q=0.1', 'gzip'),
+        ('identity', None),
+        (None, None)])
+    def test_Return_best_encoding(self, header, expected):
+        """select_encoding: q 値が最も大きく、同じ場合は br を優先したエンコーディングを返すことができる"""
+        assert select_encoding(header, encodings=('br', 'gzip')) == expected
+
+
+class TestAcceptsBinary(TestCompression):
+
+    @pytest.mark.parametrize('accept, expected', [
+        (COMPRESSED_JSON_CONTENT_TYPE, True),
+        (f"{COMPRESSED_JSON_CONTENT_TYPE};q=0.9, application/json", True),
+        ('application/gzip', True),
+        (f"application/json, {COMPRESSED_JSON_CONTENT_TYPE}", False),
+        ('application/json', False),
+        ('*/*', False),
+        (None, False)])
+    def test_Return_whether_first_media_type_matches(self, accept, expected):
+        """accepts_binary: Accept ヘッダーの最初のメディアタイプがバイナリメディアタイプに一致するかを返すことができる"""
+        assert accepts_binary(accept, ['application/gzip', COMPRESSED_JSON_CONTENT_TYPE]) is expected
+
+
+class TestCompressResponse(TestCompression):
+
+    def test_Return_compressed_response(self):
+        """compress_response: しきい値以上のケース、圧縮した本文を base64 で返すことができる"""
+        response = compress_response(self._response(2000), 'gzip', min_bytes=1024)
+        assert response.headers['Content-Type'] == COMPRESSED_JSON_CONTENT_TYPE
+        assert response.headers['Content-Encoding'] == 'gzip'
+        encoded = response.to_dict([COMPRESSED_JSON_CONTENT_TYPE])
+        assert encoded['isBase64Encoded'] is True
+        body = json.loads(gzip.decompress(base64.b64decode(encoded['body'])))
+        assert body == {'items': [{'subject': 'a' * 2000, 'version': 1.0}]}
+        assert len(encoded['body']) < 2000
+
+    @pytest.mark.parametrize('response, accept_encoding', [
+        (TestCompression._response(10), 'gzip'),
+        (TestCompression._response(2000), 'identity'),
+        (Response(body=b'binary'), 'gzip'),
+        (Response(body='a' * 2000, headers={'Content-Encoding': 'gzip'}), 'gzip')])
+    def test_Return_response_as_is(self, response, accept_encoding):
+        """compress_response: しきい値未満、許可されない、バイト列、圧縮済みのケース、そのまま返すことができる"""
+        assert compress_response(response, accept_encoding, min_bytes=1024) is response
@@ -0,0 +1,49 @@
+import pytest
+
+import app
+from chalicelib.connection import client_config, dynamodb_client, DEFAULT_MAX_ATTEMPTS
+
+
+class TestConnection:
+    pass
+
+
+class TestClientConfig(TestConnection):
+
+    def test_Return_tuned_config(self):
+        """client_config: adaptive モードのリトライとタイムアウトを設定した Config を返すことができる"""
+        config = client_config()
+        assert config.retries == {'mode': 'adaptive', 'total_max_attempts': DEFAULT_MAX_ATTEMPTS}
+        assert config.connect_timeout < 60 and config.read_timeout < 60
+
+    @pytest.mark.parametrize('key, attribute, value, expected', [
+        ('DDB_CONNECT_TIMEOUT', 'connect_timeout', '0.5', 0.5),
+        ('DDB_READ_TIMEOUT', 'read_timeout', '10', 10.0),
+        ('DDB_MAX_POOL_CONNECTIONS', 'max_pool_connections', '64', 64)])
+    def test_Return_config_case_env(self, monkeypatch, key, attribute, value, expected):
+        """client_config: 環境変数を指定したケース、その値を設定することができる"""
+        monkeypatch.setenv(key, value)
+        assert getattr(client_config(), attribute) == expected
+
+
+class TestDynamoDBClient(TestConnection):
+
+    def test_Return_client_with_config(self):
+        """dynamodb_client: client_config の設定の低レベルクライアントを返すことができる"""
+        client = dynamodb_client()
+        assert client.meta.service_model.service_name == 'dynamodb'
+        assert client.meta.config.retries['mode'] == 'adaptive'
+
+    def test_Return_table_with_config(self, monkeypatch):
+        """get_app_db: client_config の設定の Table リソースを使用することができる"""
+        monkeypatch.setattr(app, '_DB', None)
+        table = app.get_app_db()._table
+        assert table.meta.client.meta.config.retries['mode'] == 'adaptive'
+
+    def test_Disable_botocore_retries_case_retry_policy_enabled(self, monkeypatch):
+        """get_app_db: RETRY_POLICY_ENABLED が true のケース、DDB_MAX_ATTEMPTS によらずクライアントの試行回数を 1 回にすることができる"""
+        monkeypatch.setattr(app, '_DB', None)
+        monkeypatch.setenv('RETRY_POLICY_ENABLED', 'true')
+        monkeypatch.setenv('DDB_MAX_ATTEMPTS', '5')
+        table = app.get_app_db()._table
+        assert table.meta.client.meta.config.retries == {'mode': 'adaptive', 'total_max_attempts': 1}
@@ -0,0 +1,93 @@
+import boto3
+import pytest
+from moto import mock_ssm
+
+from chalice import BadRequestError
+
+from chalicelib.cursor import Cursor
+from chalicelib.exceptions import CursorSecretError
+
+
+DEFAULT_USERNAME = 'default'
+LAST_EVALUATED_KEY = {
+    'username': DEFAULT_USERNAME,
+    'uid': '37dc42c4-a2df-4606-8b3c-eb6332ef9699'}
+
+
+class TestCursor:
+    pass
+
+
+class TestCursorEncode(TestCursor):
+
+    def test_Return_None_case_None_key(self):
+        """encode: LastEvaluatedKey が None のケース、None を返すことができる"""
+        assert Cursor.encode(None, DEFAULT_USERNAME, Cursor.LIST) is None
+
+    def test_Return_decodable_str(self):
+        """encode: decode で元の LastEvaluatedKey に復元できる文字列を返すことができる"""
+        cursor = Cursor.encode(LAST_EVALUATED_KEY, DEFAULT_USERNAME, Cursor.LIST)
+        assert type(cursor) == str
+        assert Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST) == LAST_EVALUATED_KEY
+
+
+class TestCursorDecode(TestCursor):
+
+    @pytest.mark.parametrize('cursor', [None, ''])
+    def test_Return_None_case_empty(self, cursor):
+        """decode: カーソルが空のケース、None を返すことができる"""
+        assert Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST) is None
+
+    def test_Raise_BadRequestError_case_tampered_payload(self):
+        """decode: payload が改ざんされたケース、例外を発生させることができる"""
+        payload, signature = Cursor.encode(
+            LAST_EVALUATED_KEY, DEFAULT_USERNAME, Cursor.LIST).split(Cursor.SEPARATOR)
+        tampered = Cursor.encode({'username': 'meow', 'uid': 'x'}, DEFAULT_USERNAME, Cursor.LIST)
+        tampered_payload = tampered.split(Cursor.SEPARATOR)[0]
+        with pytest.raises(BadRequestError):
+            Cursor.decode(f"{tampered_payload}{Cursor.SEPARATOR}{signature}",
+                          DEFAULT_USERNAME, Cursor.LIST)
+
+    def test_Raise_BadRequestError_case_another_user(self):
+        """decode: 別のユーザーが発行したカーソルのケース、例外を発生させることができる"""
+        cursor = Cursor.encode(LAST_EVALUATED_KEY, 'meow', Cursor.LIST)
+        with pytest.raises(BadRequestError):
+            Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST)
+
+    def test_Raise_BadRequestError_case_another_purpose(self):
+        """decode: 別の用途で発行したカーソルのケース、例外を発生させることができる"""
+        cursor = Cursor.encode({'since': 1000}, DEFAULT_USERNAME, Cursor.CHANGES)
+        with pytest.raises(BadRequestError):
+            Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST)
+
+    @pytest.mark.parametrize('cursor', ['invalid', 'a.b.c', '!!!.???'])
+    def test_Raise_BadRequestError_case_malformed(self, cursor):
+        """decode: 形式が不正なケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST)
+
+
+class TestCursorSecret(TestCursor):
+
+    def test_Raise_CursorSecretError_case_not_set(self, monkeypatch):
+        """encode, decode: CURSOR_SECRET と CURSOR_SECRET_PARAMETER がないケース、公開された値で署名せずに例外を発生させることができる"""
+        monkeypatch.delenv('CURSOR_SECRET')
+        monkeypatch.delenv('CURSOR_SECRET_PARAMETER', raising=False)
+        with pytest.raises(CursorSecretError):
+            Cursor.encode(LAST_EVALUATED_KEY, DEFAULT_USERNAME, Cursor.LIST)
+        with pytest.raises(CursorSecretError):
+            Cursor.decode('payload.signature', DEFAULT_USERNAME, Cursor.LIST)
+
+    def test_Sign_with_parameter_case_cursor_secret_parameter(self, monkeypatch):
+        """encode, decode: CURSOR_SECRET_PARAMETER のケース、SSM パラメータストアの値で署名することができる"""
+        monkeypatch.delenv('CURSOR_SECRET')
+        monkeypatch.setenv('CURSOR_SECRET_PARAMETER', '/serverless-todo-backend/test/cursor-secret')
+        monkeypatch.setattr(Cursor, '_parameters', {})
+        with mock_ssm():
+            boto3.client('ssm').put_parameter(
+                Name='/serverless-todo-backend/test/cursor-secret', Value='ssm-secret', Type='SecureString')
+            cursor = Cursor.encode(LAST_EVALUATED_KEY, DEFAULT_USERNAME, Cursor.LIST)
+            assert Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST) == LAST_EVALUATED_KEY
+        monkeypatch.setenv('CURSOR_SECRET', 'another-secret')
+        with pytest.raises(BadRequestError):
+            Cursor.decode(cursor, DEFAULT_USERNAME, Cursor.LIST)
@@ -1,9 +1,22 @@
 import operator
+import threading
 
 import pytest
-from chalice import NotFoundError
+from botocore.exceptions import EndpointConnectionError
+from chalice import BadRequestError, ConflictError, NotFoundError, UnprocessableEntityError
 
 import app
+from chalicelib.db import DynamoDBTodo, INITIAL_VERSION
+from chalicelib.exceptions import DatabaseConnectionError, GoneError, PreconditionFailedError, TooManyRequestsError
+from chalicelib.idempotency import IdempotencyKeys
+from chalicelib.retry import Backoff
+from chalicelib.search import SearchIndex, Tokenizer
+from chalicelib.stats import UserStats
+from chalicelib.sync import CHANGES_OVERLAP_MS, Tombstones, now_ms
+from chalicelib.uid import UUIDv7
+from chalicelib.validates import Validates
+
+from tests.mock.dynamo_db import MockSegmentedTable
 
 from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
 
@@ -22,6 +35,69 @@ class TestListAllItems(TestDB):
         assert app.get_app_db().list_all_items() == TESTDATA_DDB_ITEMS
 
 
+class TestParallelScan(TestDB):
+
+    @staticmethod
+    def _db(mock):
+        return DynamoDBTodo(MockSegmentedTable(mock.table._table))
+
+    @pytest.mark.parametrize('total_segments', [1, 2, 4, 16])
+    def test_Return_all_items_without_duplicates(self, mock, total_segments):
+        """parallel_scan: セグメント数によらず、すべてのアイテムを重複なく取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        actual = list(self._db(mock).parallel_scan(total_segments, Limit=2))
+        assert sorted(actual, key=operator.itemgetter('uid')) \
+            == sorted(TESTDATA_DDB_ITEMS, key=operator.itemgetter('uid'))
+
+    def test_Stop_case_generator_closed(self, mock):
+        """parallel_scan: ジェネレータを途中で閉じたケース、スレッドを残さずに終了することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        items = self._db(mock).parallel_scan(4, Limit=1)
+        next(items)
+        items.close()
+        assert threading.active_count() == 1
+
+    def test_Raise_case_segment_error(self, mock, monkeypatch):
+        """parallel_scan: スキャン中に例外が発生したケース、呼び出し側に例外を伝播させることができる"""
+        def _scan(*_, **__):
+            raise EndpointConnectionError(endpoint_url='http://127.0.0.1')
+        db = self._db(mock)
+        monkeypatch.setattr(db._table, 'scan', _scan)
+        with pytest.raises(DatabaseConnectionError):
+            db.list_all_items(total_segments=4)
+
+    def test_Return_all_items_case_list_all_items(self, mock):
+        """list_all_items: セグメント数を指定したケース、すべてのアイテムを取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        actual = self._db(mock).list_all_items(total_segments=4)
+        assert sorted(actual, key=operator.itemgetter('uid')) \
+            == sorted(TESTDATA_DDB_ITEMS, key=operator.itemgetter('uid'))
+
+
+class TestIterScanPages(TestDB):
+
+    def test_Return_all_items_by_pages(self, mock):
+        """iter_scan_pages: すべてのアイテムをページごとに取得し、最後のページで None を返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        pages = list(app.get_app_db().iter_scan_pages(limit=4))
+        assert [len(items) for items, _ in pages] == [4, 4, 1]
+        assert pages[-1][1] is None
+        actual = [item for items, _ in pages for item in items]
+        assert sorted(actual, key=operator.itemgetter('uid')) \
+            == sorted(TESTDATA_DDB_ITEMS, key=operator.itemgetter('uid'))
+
+    def test_Return_rest_items_case_resume_from_checkpoint(self, mock):
+        """iter_scan_pages: チェックポイントから再開するケース、残りのアイテムを取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        pages = app.get_app_db().iter_scan_pages(limit=4)
+        first, checkpoint = next(pages)
+        pages.close()
+        rest = [item for items, _ in app.get_app_db().iter_scan_pages(
+            limit=4, exclusive_start_key=checkpoint) for item in items]
+        assert sorted(first + rest, key=operator.itemgetter('uid')) \
+            == sorted(TESTDATA_DDB_ITEMS, key=operator.itemgetter('uid'))
+
+
 class TestListItems(TestDB):
 
     def test_Return_items_by_username(self, mock):
@@ -49,6 +125,147 @@ class TestListItems(TestDB):
         assert actual == expected
 
 
+class TestListItemsPage(TestDB):
+
+    def test_Return_items_and_last_evaluated_key_case_limit(self, mock):
+        """list_items_page: limit を指定したケース、limit 件のアイテムと LastEvaluatedKey を取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        items, last_key = app.get_app_db().list_items_page(
+            username=DEFAULT_USERNAME, limit=2)
+        assert len(items) == 2
+        assert last_key == {'username': DEFAULT_USERNAME, 'uid': items[-1]['uid']}
+
+    def test_Return_all_items_case_follow_last_evaluated_key(self, mock):
+        """list_items_page: LastEvaluatedKey を辿るケース、ユーザーdefaultのアイテムを重複なくすべて取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        actual = []
+        last_key = None
+        while True:
+            items, last_key = app.get_app_db().list_items_page(
+                username=DEFAULT_USERNAME, limit=3, exclusive_start_key=last_key)
+            actual.extend(items)
+            if last_key is None:
+                break
+        expected = [item for item in TESTDATA_DDB_ITEMS
+                    if item['username'] == DEFAULT_USERNAME]
+        assert sorted(actual, key=operator.itemgetter('uid')) \
+            == sorted(expected, key=operator.itemgetter('uid'))
+
+    def test_Return_projected_items_case_fields(self, mock):
+        """list_items_page: fields を指定したケース、uid と指定した属性のみを取得することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        items, _ = app.get_app_db().list_items_page(
+            query='cat', username=DEFAULT_USERNAME, fields=['subject', 'state'])
+        expected = [item for item in TESTDATA_DDB_ITEMS if item['username'] == DEFAULT_USERNAME
+                    and ('cat' in item['subject'] or 'cat' in item['description'])]
+        assert items == [{key: item[key] for key in ('uid', 'subject', 'state')}
+                         for item in sorted(expected, key=operator.itemgetter('uid'))]
+
+
+class TestListItemsTimeOrdered(TestDB):
+
+    BASE_MS = 1600000000000
+
+    def _put(self, mock, offsets):
+        """BASE_MS からのオフセット (秒) の作成日時を持つ UUIDv7 の Todo と、uuid4 の Todo を登録します"""
+        items = [{'uid': UUIDv7.generate(self.BASE_MS + offset * 1000),
+                  'subject': f"subject {offset}", 'description': '',
+                  'state': 'unstarted', 'username': DEFAULT_USERNAME}
+                 for offset in offsets]
+        mock.table.put_items(items + TESTDATA_DDB_ITEMS)
+        return [item['uid'] for item in items]
+
+    def test_Return_newest_first_case_order_desc(self, mock):
+        """list_items: order が desc のケース、UUIDv7 の Todo を作成日時の降順で取得することができる"""
+        uids = self._put(mock, range(5))
+        actual = app.get_app_db().list_items(username=DEFAULT_USERNAME, order='desc', limit=3)
+        assert [item['uid'] for item in actual] == uids[::-1][:3]
+
+    def test_Return_items_case_since_until(self, mock):
+        """list_items: since、until を指定したケース、範囲内に作成された Todo のみを取得することができる"""
+        uids = self._put(mock, range(5))
+        actual = app.get_app_db().list_items(
+            username=DEFAULT_USERNAME, order='asc',
+            since=self.BASE_MS + 1000, until=self.BASE_MS + 3000)
+        assert [item['uid'] for item in actual] == uids[1:4]
+
+    def test_Return_pages_case_order_desc(self, mock):
+        """list_items_page: order が desc のケース、LastEvaluatedKey を辿り降順に取得することができる"""
+        uids = self._put(mock, range(5))
+        actual = []
+        last_key = None
+        while True:
+            items, last_key = app.get_app_db().list_items_page(
+                username=DEFAULT_USERNAME, limit=2, exclusive_start_key=last_key, order='desc')
+            actual.extend(item['uid'] for item in items)
+            if last_key is None:
+                break
+        assert actual == uids[::-1]
+
+    def test_Return_legacy_items_case_no_order(self, mock):
+        """list_items: order、since、until がないケース、uuid4 の既存の Todo も取得することができる"""
+        uids = self._put(mock, range(2))
+        actual = {item['uid'] for item in app.get_app_db().list_items(username=DEFAULT_USERNAME)}
+        assert set(uids) < actual
+        assert {item['uid'] for item in TESTDATA_DDB_ITEMS
+                if item['username'] == DEFAULT_USERNAME} < actual
+
+
+class TestListItemsByState(TestDB):
+
+    @staticmethod
+    def _backfilled(mock):
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = app.get_app_db()
+        db.backfill_state_index()
+        return db
+
+    @staticmethod
+    def _uids(items, state=None, username=DEFAULT_USERNAME):
+        return sorted(item['uid'] for item in items
+                      if item['username'] == username and state in (None, item['state']))
+
+    @pytest.mark.parametrize('state', Validates.STATE_ENUM)
+    def test_Return_items_case_state(self, mock, state):
+        """list_items: state を指定したケース、そのステータスの Todo のみを取得することができる"""
+        db = self._backfilled(mock)
+        actual = db.list_items(username=DEFAULT_USERNAME, state=state)
+        assert self._uids(actual) == self._uids(TESTDATA_DDB_ITEMS, state)
+
+    def test_Return_items_case_state_updated(self, mock):
+        """list_items: state を更新したケース、更新後のステータスでのみ取得することができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert self._uids(db.list_items(username=DEFAULT_USERNAME, state='unstarted')) == [uid]
+        db.update_item(uid, state='completed', username=DEFAULT_USERNAME)
+        assert db.list_items(username=DEFAULT_USERNAME, state='unstarted') == []
+        assert self._uids(db.list_items(username=DEFAULT_USERNAME, state='completed')) == [uid]
+
+    def test_Return_items_case_state_and_order_desc(self, mock):
+        """list_items: state と order を指定したケース、そのステータスの Todo を作成日時の降順で取得することができる"""
+        db = app.get_app_db()
+        uids = [db.add_item(subject=f"subject {i}", username=DEFAULT_USERNAME) for i in range(4)]
+        db.update_item(uids[1], state='started', username=DEFAULT_USERNAME)
+        actual = db.list_items(username=DEFAULT_USERNAME, state='unstarted', order='desc')
+        assert [item['uid'] for item in actual] == [uids[3], uids[2], uids[0]]
+
+    def test_Return_counts_by_state(self, mock):
+        """count_items_by_state: ステータスごとの件数を取得することができる"""
+        db = self._backfilled(mock)
+        assert db.count_items_by_state(username=DEFAULT_USERNAME) \
+            == {'unstarted': 2, 'started': 2, 'completed': 3}
+        assert db.count_items_by_state(username='meow') \
+            == {'unstarted': 0, 'started': 0, 'completed': 1}
+
+    def test_Backfill_only_items_without_state_key(self, mock):
+        """backfill_state_index: state-index の属性を持たない Todo のみに属性を追加することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = app.get_app_db()
+        db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.backfill_state_index() == {'updated': len(TESTDATA_DDB_ITEMS)}
+        assert db.backfill_state_index() == {'updated': 0}
+
+
 class TestAddItem(TestDB):
 
     @pytest.mark.parametrize('item', TESTDATA_DDB_ITEMS)
@@ -60,6 +277,61 @@ class TestAddItem(TestDB):
             username=DEFAULT_USERNAME)
         assert type(actual) == str
         assert len(actual) == 36
+        assert UUIDv7.is_time_ordered(actual)
+
+    def test_Set_initial_version(self):
+        """add_item: 登録したitemのversionに初期値を設定することができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['version'] == INITIAL_VERSION
+
+    def test_Not_overwrite_case_uid_conflict(self, mock, monkeypatch):
+        """add_item: uid が衝突したケース、既存の item を上書きせずに uid を生成し直すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        existing = TESTDATA_DDB_ITEMS[0]
+        uids = iter([existing['uid'], UUIDv7.generate()])
+        monkeypatch.setattr(UUIDv7, 'generate', lambda *_: next(uids))
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=existing['username'])
+        assert uid != existing['uid']
+        assert db.get_item(existing['uid'], username=existing['username']) == existing
+
+    def test_Raise_ConflictError_case_uid_always_conflicts(self, mock, monkeypatch):
+        """add_item: 再試行しても uid が衝突するケース、例外を発生させることができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        monkeypatch.setattr(UUIDv7, 'generate', lambda *_: TESTDATA_DDB_ITEMS[0]['uid'])
+        with pytest.raises(ConflictError):
+            app.get_app_db().add_item(subject='subject', username=TESTDATA_DDB_ITEMS[0]['username'])
+
+    @pytest.mark.parametrize('stats', [False, True])
+    def test_Return_original_uid_case_same_idempotency_key(self, mock, stats):
+        """add_item: 同じ冪等キーで再送したケース、Todo を追加せずに最初の uid を返すことができる"""
+        db = DynamoDBTodo(mock.table._table, stats=stats)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1')
+        assert db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1') == uid
+        assert db.add_item(subject='subject', username='meow', idempotency_key='key-1') != uid
+        assert [item['uid'] for item in db.list_items(username=DEFAULT_USERNAME)] == [uid]
+        assert db.get_stats(username=DEFAULT_USERNAME)['total'] == 1
+
+    def test_Raise_UnprocessableEntityError_case_idempotency_key_reused(self, mock):
+        """add_item: 同じ冪等キーで異なる内容を送ったケース、例外を発生させることができる"""
+        db = DynamoDBTodo(mock.table._table)
+        db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1')
+        with pytest.raises(UnprocessableEntityError):
+            db.add_item(subject='another', username=DEFAULT_USERNAME, idempotency_key='key-1')
+
+    def test_Add_item_case_idempotency_key_expired(self, mock):
+        """add_item: 冪等キーの記録が期限切れのケース、新しい Todo を追加することができる"""
+        db = DynamoDBTodo(mock.table._table, idempotency_ttl=-1)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1')
+        assert db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1') != uid
+        assert len(db.list_all_items()) == 2
+
+    def test_Enable_ttl(self, mock):
+        """enable_ttl: 冪等キーの記録を削除する TTL を設定し、設定済みの場合は何もしないことができる"""
+        db = DynamoDBTodo(mock.table._table)
+        assert db.enable_ttl() == {'attribute': 'expires_at', 'updated': True}
+        assert db.enable_ttl() == {'attribute': 'expires_at', 'updated': False}
 
     # 以下の状況によりこのテストケースは現時点において実施しない (2020-11-30)
     #
@@ -85,6 +357,14 @@ class TestAddItem(TestDB):
                 description='',
                 username=DEFAULT_USERNAME)
 
+    @pytest.mark.parametrize('subject', [None, '', 1])
+    def test_Raise_BadRequestError_case_validate(self, mock, subject):
+        """add_item: validate を指定し subject が不正なケース、書き込まずに例外を発生させることができる"""
+        db = DynamoDBTodo(mock.table._table, validate=True)
+        with pytest.raises(BadRequestError):
+            db.add_item(subject=subject, username=DEFAULT_USERNAME)
+        assert db.list_all_items() == []
+
 
 class TestGetItem(TestDB):
 
@@ -101,6 +381,61 @@ class TestGetItem(TestDB):
             app.get_app_db().get_item("_NOT_EXIST_UID", username=DEFAULT_USERNAME)
 
 
+class TestGetItems(TestDB):
+
+    def test_Return_items_in_requested_order_and_missing(self, mock):
+        """get_items: 指定したuidの順序でitemを返し、存在しないuidをmissingとして返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        expected = [item for item in TESTDATA_DDB_ITEMS
+                    if item['username'] == DEFAULT_USERNAME][::-1]
+        uids = [item['uid'] for item in expected]
+        another_user_uid = TESTDATA_DDB_ITEMS[-1]['uid']
+        actual = app.get_app_db().get_items(
+            uids[:2] + ['_NOT_EXIST_UID', another_user_uid] + uids[2:] + uids[:1],
+            username=DEFAULT_USERNAME)
+        assert actual == {
+            'items': expected,
+            'missing': ['_NOT_EXIST_UID', another_user_uid],
+            'unprocessed': []}
+
+    def test_Return_all_items_case_over_chunk_size(self, mock):
+        """get_items: 100件を超えるケース、すべてのitemを返すことができる"""
+        db = app.get_app_db()
+        uids = [db.add_item(subject=f"subject {i}", username=DEFAULT_USERNAME)
+                for i in range(120)]
+        actual = db.get_items(uids, username=DEFAULT_USERNAME)
+        assert [item['uid'] for item in actual['items']] == uids
+
+    def test_Retry_case_unprocessed_keys(self, mock, monkeypatch):
+        """get_items: UnprocessedKeysが返るケース、リトライしてすべてのitemを返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = DynamoDBTodo(mock.table._table, backoff=Backoff(sleep=lambda _: None))
+        client = mock.table._table.meta.client
+        batch_get_item = client.batch_get_item
+
+        def _batch_get_item(RequestItems):
+            (table_name, request), = RequestItems.items()
+            keys = request['Keys']
+            response = batch_get_item(RequestItems={table_name: {'Keys': keys[:1]}})
+            if keys[1:]:
+                response['UnprocessedKeys'] = {table_name: {'Keys': keys[1:]}}
+            return response
+        monkeypatch.setattr(client, 'batch_get_item', _batch_get_item)
+
+        uids = [item['uid'] for item in TESTDATA_DDB_ITEMS
+                if item['username'] == DEFAULT_USERNAME]
+        actual = db.get_items(uids, username=DEFAULT_USERNAME)
+        assert [item['uid'] for item in actual['items']] == uids
+
+    def test_Return_projected_items_case_fields(self, mock):
+        """get_items: fields を指定したケース、uid と指定した属性のみを返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        uids = [item['uid'] for item in TESTDATA_DDB_ITEMS if item['username'] == DEFAULT_USERNAME]
+        actual = app.get_app_db().get_items(uids, username=DEFAULT_USERNAME, fields=['state'])
+        assert all(set(item) == {'uid', 'state'} for item in actual['items'])
+        assert [item['uid'] for item in actual['items']] == uids
+
+
 class TestDeleteItem(TestDB):
 
     @pytest.mark.parametrize("item", TESTDATA_DDB_ITEMS)
@@ -115,6 +450,20 @@ class TestDeleteItem(TestDB):
         with pytest.raises(NotFoundError):
             app.get_app_db().delete_item("_NOT_EXIST_UID", username=DEFAULT_USERNAME)
 
+    def test_Raise_NotFoundError_case_uid_not_exist_with_expected_version(self, mock):
+        """delete_item: expected_versionを指定し、uidが存在しないケース、例外を発生させることができる"""
+        with pytest.raises(NotFoundError):
+            app.get_app_db().delete_item(
+                "_NOT_EXIST_UID", username=DEFAULT_USERNAME, expected_version=1)
+
+    def test_Raise_PreconditionFailedError_case_expected_version_not_match(self):
+        """delete_item: expected_versionが一致しないケース、例外を発生させ、削除しないことができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        with pytest.raises(PreconditionFailedError):
+            db.delete_item(uid, username=DEFAULT_USERNAME, expected_version=2)
+        assert db.delete_item(uid, username=DEFAULT_USERNAME, expected_version=1) == uid
+
 
 class TestUpdateItem(TestDB):
 
@@ -164,3 +513,433 @@ class TestUpdateItem(TestDB):
         """update_item: uidが存在しないケース、例外を発生させることができる"""
         with pytest.raises(NotFoundError):
             app.get_app_db().update_item("_NOT_EXIST_UID", username=DEFAULT_USERNAME)
+
+    @pytest.mark.parametrize("item", TESTDATA_DDB_ITEMS)
+    def test_Keep_other_attributes_case_subject_only(self, mock, item):
+        """update_item: subjectを更新するケース、指定した属性のみを更新し、他の属性を保持することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        app.get_app_db().update_item(
+            uid=item['uid'],
+            subject=item['subject']+"_updated",
+            username=item['username'])
+        actual = app.get_app_db().get_item(uid=item['uid'], username=item['username'])
+        assert actual.pop('updated_at') > 0
+        assert actual == dict(item, subject=item['subject']+"_updated", version=1)
+
+    def test_Not_create_item_case_uid_not_exist(self, mock):
+        """update_item: uidが存在しないケース、例外を発生させ、アイテムを作成しないことができる"""
+        with pytest.raises(NotFoundError):
+            app.get_app_db().update_item(
+                "_NOT_EXIST_UID", subject="subject", username=DEFAULT_USERNAME)
+        with pytest.raises(NotFoundError):
+            app.get_app_db().get_item("_NOT_EXIST_UID", username=DEFAULT_USERNAME)
+
+    def test_Increment_version(self):
+        """update_item: 更新するたびに、versionを1加算することができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='subject_updated', username=DEFAULT_USERNAME)
+        db.update_item(uid, state='started', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['version'] == 3
+
+    def test_Return_uid_case_expected_version_match(self):
+        """update_item: expected_versionが一致するケース、更新したitemのuidを正常に返すことができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.update_item(uid, subject='subject_updated', username=DEFAULT_USERNAME,
+                              expected_version=1) == uid
+
+    @pytest.mark.parametrize('subject', [None, 'subject_updated'])
+    def test_Raise_PreconditionFailedError_case_expected_version_not_match(self, subject):
+        """update_item: expected_versionが一致しないケース、例外を発生させ、更新しないことができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        with pytest.raises(PreconditionFailedError):
+            db.update_item(uid, subject=subject, username=DEFAULT_USERNAME,
+                           expected_version=2)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'subject'
+
+    @pytest.mark.parametrize("item", TESTDATA_DDB_ITEMS)
+    def test_Return_uid_case_legacy_item_expected_version_0(self, mock, item):
+        """update_item: versionを持たないitemのケース、expected_version 0 として更新することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        assert app.get_app_db().update_item(
+            uid=item['uid'], state=item['state'], username=item['username'],
+            expected_version=0) == item['uid']
+
+
+class TestReservedRecords(TestDB):
+
+    @staticmethod
+    def _record_key(db, record_type):
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME, idempotency_key='key-1')
+        if record_type == 'stats':
+            return UserStats.key(DEFAULT_USERNAME)
+        if record_type == 'idempotency':
+            return IdempotencyKeys.key(DEFAULT_USERNAME, 'key-1')
+        if record_type == 'posting':
+            return {'username': SearchIndex.partition_key(DEFAULT_USERNAME, 'su'), 'uid': uid}
+        db.delete_item(uid, username=DEFAULT_USERNAME)
+        return Tombstones.key(DEFAULT_USERNAME, uid)
+
+    @pytest.mark.parametrize('record_type', ['stats', 'idempotency', 'posting', 'tombstone'])
+    def test_Raise_NotFoundError_case_reserved_record(self, mock, record_type):
+        """get_item, get_items, update_item, delete_item: 管理用のアイテムのキーのケース、Todo として読み書きしないことができる"""
+        db = DynamoDBTodo(mock.table._table, stats=True, search_index=True)
+        key = self._record_key(db, record_type)
+        record = mock.table._table.get_item(Key=key)['Item']
+        with pytest.raises(NotFoundError):
+            db.get_item(key['uid'], username=key['username'])
+        assert db.get_items([key['uid']], username=key['username'])['missing'] == [key['uid']]
+        assert db.get_items([key['uid']], username=key['username'], fields=['subject'])['items'] == []
+        for kwargs in {'subject': 'forged'}, {'state': 'completed'}, {}:
+            with pytest.raises(NotFoundError):
+                db.update_item(key['uid'], username=key['username'], **kwargs)
+        with pytest.raises((BadRequestError, NotFoundError)):
+            db.delete_item(key['uid'], username=key['username'])
+        assert mock.table._table.get_item(Key=key)['Item'] == record
+
+
+class TestBatchWrite(TestDB):
+
+    @staticmethod
+    def _db(mock, max_attempts=3):
+        return DynamoDBTodo(
+            mock.table._table,
+            backoff=Backoff(max_attempts=max_attempts, sleep=lambda _: None))
+
+    def test_Return_results_case_create_update_delete(self, mock):
+        """batch_write: create、update、deleteのケース、操作と同じ順序で結果を返し、書き込むことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = self._db(mock)
+        first, second = TESTDATA_DDB_ITEMS[0], TESTDATA_DDB_ITEMS[1]
+        results = db.batch_write([
+            {'op': 'create', 'subject': 'created'},
+            {'op': 'update', 'uid': first['uid'], 'state': 'started'},
+            {'op': 'delete', 'uid': second['uid']},
+        ], username=DEFAULT_USERNAME)
+        assert [(r['op'], r['status']) for r in results] \
+            == [('create', 201), ('update', 200), ('delete', 200)]
+        assert db.get_item(results[0]['uid'], username=DEFAULT_USERNAME)['subject'] == 'created'
+        assert db.get_item(first['uid'], username=DEFAULT_USERNAME)['state'] == 'started'
+        with pytest.raises(NotFoundError):
+            db.get_item(second['uid'], username=DEFAULT_USERNAME)
+
+    def test_Write_all_items_case_over_chunk_size(self, mock):
+        """batch_write: 25件を超えるケース、すべてのアイテムを書き込むことができる"""
+        db = self._db(mock)
+        results = db.batch_write(
+            [{'op': 'create', 'subject': f"subject {i}"} for i in range(60)],
+            username=DEFAULT_USERNAME)
+        assert all(r['status'] == 201 for r in results)
+        assert len(db.list_items(username=DEFAULT_USERNAME)) == 60
+
+    def test_Return_error_status_case_update_not_exist(self, mock):
+        """batch_write: 存在しないuidをupdateするケース、その操作のみ404を返すことができる"""
+        results = self._db(mock).batch_write([
+            {'op': 'update', 'uid': '_NOT_EXIST_UID', 'subject': 'subject'},
+            {'op': 'create', 'subject': 'created'},
+        ], username=DEFAULT_USERNAME)
+        assert [r['status'] for r in results] == [404, 201]
+
+    def test_Retry_case_unprocessed_items(self, mock, monkeypatch):
+        """batch_write: UnprocessedItemsが返るケース、リトライしてすべて書き込むことができる"""
+        db = self._db(mock)
+        client = mock.table._table.meta.client
+        batch_write_item = client.batch_write_item
+        calls = []
+
+        def _batch_write_item(RequestItems):
+            calls.append(RequestItems)
+            (table_name, requests), = RequestItems.items()
+            batch_write_item(RequestItems={table_name: requests[:1]})
+            return {'UnprocessedItems': {table_name: requests[1:]} if requests[1:] else {}}
+        monkeypatch.setattr(client, 'batch_write_item', _batch_write_item)
+
+        results = db.batch_write(
+            [{'op': 'create', 'subject': f"subject {i}"} for i in range(3)],
+            username=DEFAULT_USERNAME)
+        assert len(calls) == 3
+        assert all(r['status'] == 201 for r in results)
+        assert len(db.list_items(username=DEFAULT_USERNAME)) == 3
+
+    def test_Return_503_case_unprocessed_after_retries(self, mock, monkeypatch):
+        """batch_write: リトライの上限に達したケース、処理されなかった操作に503を返すことができる"""
+        db = self._db(mock, max_attempts=2)
+        client = mock.table._table.meta.client
+
+        def _batch_write_item(RequestItems):
+            return {'UnprocessedItems': RequestItems}
+        monkeypatch.setattr(client, 'batch_write_item', _batch_write_item)
+
+        results = db.batch_write(
+            [{'op': 'create', 'subject': 'subject'}], username=DEFAULT_USERNAME)
+        assert results[0]['status'] == 503
+
+    def test_Return_429_case_throttled_update(self, mock, monkeypatch):
+        """batch_write: update がスロットリングされたケース、その操作のみ429を返し、他の操作を書き込むことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = self._db(mock)
+
+        def _throttled(*_, **__):
+            raise TooManyRequestsError('Throttled by DynamoDB.')
+        monkeypatch.setattr(DynamoDBTodo, 'update_item', _throttled)
+        results = db.batch_write([
+            {'op': 'create', 'subject': 'created'},
+            {'op': 'update', 'uid': TESTDATA_DDB_ITEMS[0]['uid'], 'state': 'started'},
+            {'op': 'delete', 'uid': TESTDATA_DDB_ITEMS[1]['uid']},
+        ], username=DEFAULT_USERNAME)
+        assert [r['status'] for r in results] == [201, 429, 200]
+        assert db.get_item(results[0]['uid'], username=DEFAULT_USERNAME)['subject'] == 'created'
+
+    def test_Return_429_case_throttled_batch_write_item(self, mock, monkeypatch):
+        """batch_write: BatchWriteItem がスロットリングされたケース、まとめた操作に429を返し、書き込んだ操作の結果を返すことができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = self._db(mock)
+
+        def _throttled(RequestItems):
+            raise TooManyRequestsError('Throttled by DynamoDB.')
+        monkeypatch.setattr(mock.table._table.meta.client, 'batch_write_item', _throttled)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        results = db.batch_write([
+            {'op': 'update', 'uid': uid, 'subject': 'updated'},
+            {'op': 'create', 'subject': 'created'},
+        ], username=DEFAULT_USERNAME)
+        assert [r['status'] for r in results] == [200, 429]
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'updated'
+
+
+class TestSearchIndex(TestDB):
+
+    @staticmethod
+    def _db(mock):
+        return DynamoDBTodo(mock.table._table, search_index=True)
+
+    @staticmethod
+    def _search(db, query, username=DEFAULT_USERNAME):
+        return sorted(item['uid'] for item in db.list_items(query=query, username=username))
+
+    def test_Return_items_by_query(self, mock):
+        """list_items: 転置索引が有効なケース、クエリを含むアイテムのみを取得することができる"""
+        db = self._db(mock)
+        hamburger = db.add_item(subject='友達とハンバーガーを食べに行く', username=DEFAULT_USERNAME)
+        db.add_item(subject='ハンバーグを作る', username=DEFAULT_USERNAME)
+        db.add_item(subject='友達とハンバーガーを食べに行く', username='meow')
+        assert self._search(db, 'ハンバーガー') == [hamburger]
+        assert self._search(db, 'ＨＡＭＢＵＲＧＥＲ') == []
+
+    def test_Return_projected_items_case_fields(self, mock):
+        """list_items_page: 転置索引で検索し fields を指定したケース、Todo 本体を確認したあとに属性を取り出すことができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='Make cat tower', description='with boxes', username=DEFAULT_USERNAME)
+        items, _ = db.list_items_page(query='boxes', username=DEFAULT_USERNAME, fields=['subject'])
+        assert items == [{'uid': uid, 'subject': 'Make cat tower'}]
+
+    def test_Return_items_case_update_and_delete(self, mock):
+        """list_items: 更新、削除したケース、索引を更新し最新の内容で検索することができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='Make cat tower', username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='Make dog house', username=DEFAULT_USERNAME)
+        assert self._search(db, 'cat') == []
+        assert self._search(db, 'DOG') == [uid]
+        db.delete_item(uid, username=DEFAULT_USERNAME)
+        assert self._search(db, 'dog') == []
+        assert [item['record_type'] for item in mock.table._table.scan()['Items']] == ['tombstone']
+
+    def test_Return_items_case_batch_write(self, mock):
+        """list_items: batch_writeで追加したケース、索引を使って検索することができる"""
+        db = self._db(mock)
+        results = db.batch_write(
+            [{'op': 'create', 'subject': f"項目 {i}"} for i in range(3)],
+            username=DEFAULT_USERNAME)
+        assert self._search(db, '項目') == sorted(r['uid'] for r in results)
+
+    def test_Return_pages_case_limit(self, mock):
+        """list_items_page: 転置索引が有効なケース、limit件ずつ続きのページを取得することができる"""
+        db = self._db(mock)
+        uids = sorted(db.add_item(subject=f"subject {i}", username=DEFAULT_USERNAME)
+                      for i in range(5))
+        actual = []
+        last_key = None
+        while True:
+            items, last_key = db.list_items_page(
+                query='subject', username=DEFAULT_USERNAME, limit=2,
+                exclusive_start_key=last_key)
+            actual.extend(item['uid'] for item in items)
+            if last_key is None:
+                break
+        assert actual == uids
+
+    def test_Delete_stale_postings_case_item_not_exist(self, mock):
+        """list_items: ポスティングのみが残っているケース、検索結果から除き、ポスティングを削除することができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='stale posting', username=DEFAULT_USERNAME)
+        mock.table._table.delete_item(Key={'username': DEFAULT_USERNAME, 'uid': uid})
+        assert self._search(db, 'stale') == []
+        postings = mock.table._table.scan()['Items']
+        assert {posting['token'] for posting in postings} \
+            == Tokenizer.tokens('stale posting') - set(Tokenizer.query_tokens('stale'))
+
+    def test_Exclude_postings_from_list_all_items(self, mock):
+        """list_all_items: 転置索引が有効なケース、ポスティングを除いたTodoのみを取得することができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert [item['uid'] for item in db.list_all_items()] == [uid]
+
+    def test_Rebuild_search_index(self, mock):
+        """rebuild_search_index: 既存のデータのポスティングを登録し、古いポスティングを削除することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = self._db(mock)
+        mock.table._table.put_item(Item=SearchIndex(None).put_requests(
+            {'username': DEFAULT_USERNAME, 'uid': '_NOT_EXIST_UID', 'subject': 'x'}
+        )[0]['PutRequest']['Item'])
+        actual = db.rebuild_search_index()
+        assert actual['deleted'] == 1
+        assert self._search(db, 'cat tower') == [TESTDATA_DDB_ITEMS[0]['uid']]
+        assert db.rebuild_search_index()['deleted'] == 0
+
+
+class TestStats(TestDB):
+
+    @staticmethod
+    def _db(mock):
+        return DynamoDBTodo(mock.table._table, stats=True)
+
+    @staticmethod
+    def _stats(total=0, unstarted=0, started=0, completed=0):
+        return {'total': total, 'unstarted': unstarted, 'started': started, 'completed': completed}
+
+    def test_Return_stats_case_add_update_delete(self, mock):
+        """get_stats: 追加、ステータスの更新、削除したケース、集計アイテムの件数を更新することができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=2, unstarted=2)
+        db.update_item(uid, state='completed', username=DEFAULT_USERNAME)
+        db.update_item(uid, subject='updated', username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=2, unstarted=1, completed=1)
+        db.delete_item(uid, username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=1, unstarted=1)
+        assert db.get_stats(username='meow') == self._stats()
+
+    def test_Raise_PreconditionFailedError_case_version_mismatch(self, mock):
+        """update_item, delete_item: version が一致しないケース、集計アイテムを更新せずに例外を発生させることができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        with pytest.raises(PreconditionFailedError):
+            db.update_item(uid, state='started', username=DEFAULT_USERNAME, expected_version=2)
+        with pytest.raises(PreconditionFailedError):
+            db.delete_item(uid, username=DEFAULT_USERNAME, expected_version=2)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=1, unstarted=1)
+
+    def test_Return_stats_case_batch_write(self, mock):
+        """batch_write: 作成、削除したケース、集計アイテムの件数を更新することができる"""
+        db = self._db(mock)
+        results = db.batch_write(
+            [{'op': 'create', 'subject': f"subject {i}"} for i in range(30)],
+            username=DEFAULT_USERNAME)
+        db.batch_write(
+            [{'op': 'delete', 'uid': result['uid']} for result in results[:5]],
+            username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=25, unstarted=25)
+
+    def test_Return_stats_case_stats_disabled(self, mock):
+        """get_stats: 集計アイテムが無効なケース、GSI から集計した件数を取得することができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        db.update_item(uid, state='started', username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME) == self._stats(total=1, started=1)
+
+    def test_Return_stats_case_reconcile(self, mock):
+        """reconcile_stats: すべての Todo から集計アイテムを再構築し、Todo のないユーザーを 0 にすることができる"""
+        db = self._db(mock)
+        uid = db.add_item(subject='subject', username='nyan')
+        mock.table._table.delete_item(Key={'username': 'nyan', 'uid': uid})
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        assert db.reconcile_stats() == {'users': 4}
+        assert db.get_stats(username=DEFAULT_USERNAME) \
+            == self._stats(total=7, unstarted=2, started=2, completed=3)
+        assert db.get_stats(username='meow') == self._stats(total=1, completed=1)
+        assert db.get_stats(username='nyan') == self._stats()
+        assert db.list_all_items() == TESTDATA_DDB_ITEMS
+
+
+class TestListChanges(TestDB):
+
+    @staticmethod
+    def _uids(result):
+        return sorted(item['uid'] for item in result['items'])
+
+    def test_Return_changes_case_add_update_delete(self, mock):
+        """list_changes: 追加、更新、削除したケース、変更した Todo と削除した uid を取得することができる"""
+        db = app.get_app_db()
+        uids = [db.add_item(subject=f"subject {i}", username=DEFAULT_USERNAME) for i in range(3)]
+        db.update_item(uids[0], state='started', username=DEFAULT_USERNAME)
+        db.delete_item(uids[1], username=DEFAULT_USERNAME)
+        actual = db.list_changes(username=DEFAULT_USERNAME)
+        assert self._uids(actual) == sorted([uids[0], uids[2]])
+        assert actual['deleted'] == [uids[1]]
+        assert actual['last_key'] is None
+        assert db.list_changes(username='meow')['items'] == []
+
+    def test_Return_only_changes_after_since(self, mock):
+        """list_changes: since を指定したケース、since 以降に変更した Todo のみを取得することができる"""
+        db = app.get_app_db()
+        old = dict(TESTDATA_DDB_ITEMS[0], updated_at=now_ms() - 10 * CHANGES_OVERLAP_MS)
+        mock.table.put_items([old])
+        since = now_ms() - CHANGES_OVERLAP_MS
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        actual = db.list_changes(username=DEFAULT_USERNAME, since=since)
+        assert self._uids(actual) == [uid]
+        assert since <= actual['since'] <= now_ms() - CHANGES_OVERLAP_MS
+        assert self._uids(db.list_changes(username=DEFAULT_USERNAME)) == sorted([old['uid'], uid])
+
+    def test_Return_pages_case_limit(self, mock):
+        """list_changes: limit を指定したケース、同じ since のまま続きのページを取得することができる"""
+        db = app.get_app_db()
+        uids = [db.add_item(subject=f"subject {i}", username=DEFAULT_USERNAME) for i in range(5)]
+        first = db.list_changes(username=DEFAULT_USERNAME, limit=3)
+        assert first['last_key'] is not None
+        second = db.list_changes(
+            username=DEFAULT_USERNAME, limit=3,
+            exclusive_start_key=first['last_key'], next_since=first['since'])
+        assert second['last_key'] is None
+        assert second['since'] == first['since']
+        assert self._uids(first) + self._uids(second) == uids
+
+    def test_Raise_GoneError_case_since_older_than_tombstone_ttl(self, mock):
+        """list_changes: since が削除の記録の保持期間より古いケース、例外を発生させることができる"""
+        db = DynamoDBTodo(mock.table._table, tombstone_ttl=60)
+        with pytest.raises(GoneError):
+            db.list_changes(username=DEFAULT_USERNAME, since=now_ms() - 120 * 1000)
+        assert db.list_changes(username=DEFAULT_USERNAME, since=now_ms() - 30 * 1000)['items'] == []
+
+    def test_Leave_tombstone_case_batch_delete(self, mock):
+        """batch_write: delete したケース、削除の記録を残し、Todo の一覧から除外することができる"""
+        db = app.get_app_db()
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        db.batch_write([{'op': 'delete', 'uid': uid}], username=DEFAULT_USERNAME)
+        assert db.list_changes(username=DEFAULT_USERNAME)['deleted'] == [uid]
+        assert db.list_items(username=DEFAULT_USERNAME) == []
+        assert db.list_all_items() == []
+
+    def test_Not_read_tombstones_case_list_items_page(self, mock, monkeypatch):
+        """list_items_page: 削除の記録があるケース、削除の記録を読み取らずに limit 件の Todo を返すことができる"""
+        db = DynamoDBTodo(mock.table._table)
+        for uid in [db.add_item(subject='deleted', username=DEFAULT_USERNAME) for _ in range(3)]:
+            db.delete_item(uid, username=DEFAULT_USERNAME)
+        uids = sorted(db.add_item(subject='subject', username=DEFAULT_USERNAME) for _ in range(2))
+        query = mock.table._table.query
+        # moto は Limit を FilterExpression のあとに適用するため、FilterExpression を外して読み取るアイテムを確認します
+        monkeypatch.setattr(mock.table._table, 'query', lambda FilterExpression, **kwargs: query(**kwargs))
+        items, _ = db.list_items_page(username=DEFAULT_USERNAME, limit=2)
+        assert [item['uid'] for item in items] == uids
+
+    def test_Backfill_only_items_without_updated_at(self, mock):
+        """backfill_updated_at: updated_at を持たない Todo のみに属性を追加することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        db = app.get_app_db()
+        db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.backfill_updated_at() == {'updated': len(TESTDATA_DDB_ITEMS)}
+        assert db.backfill_updated_at() == {'updated': 0}
+        assert len(db.list_changes(username=DEFAULT_USERNAME)['items']) == 8
@@ -0,0 +1,36 @@
+import gzip
+import json
+from decimal import Decimal
+
+from chalicelib.export import NDJSON
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+class TestNDJSON:
+    pass
+
+
+class TestNDJSONDumps(TestNDJSON):
+
+    def test_Return_one_json_per_line(self):
+        """dumps: 1 行に 1 つの Todo オブジェクトを JSON として返すことができる"""
+        lines = NDJSON.dumps(TESTDATA_DDB_ITEMS).decode('utf-8').splitlines()
+        assert [json.loads(line) for line in lines] == TESTDATA_DDB_ITEMS
+
+    def test_Return_empty_bytes_case_no_items(self):
+        """dumps: アイテムがないケース、空のバイト列を返すことができる"""
+        assert NDJSON.dumps([]) == b''
+
+    def test_Return_number_case_decimal(self):
+        """dumps: Decimal を含むケース、数値として返すことができる"""
+        assert json.loads(NDJSON.dumps([{'version': Decimal('3')}])) == {'version': 3}
+
+
+class TestNDJSONDumpsGzip(TestNDJSON):
+
+    def test_Return_gzip_case_concatenated_pages(self):
+        """dumps_gzip: ページごとの戻り値を連結したケース、すべての行に伸長することができる"""
+        body = NDJSON.dumps_gzip(TESTDATA_DDB_ITEMS[:3]) \
+            + NDJSON.dumps_gzip(TESTDATA_DDB_ITEMS[3:])
+        assert gzip.decompress(body) == NDJSON.dumps(TESTDATA_DDB_ITEMS)
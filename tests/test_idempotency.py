@@ -0,0 +1,22 @@
+from chalicelib.idempotency import IdempotencyKeys
+
+
+class TestIdempotencyKeys:
+
+    def test_Return_fingerprint(self):
+        """fingerprint: 同じ内容のリクエストのみ同じハッシュを返すことができる"""
+        fingerprint = IdempotencyKeys.fingerprint('subject', 'description')
+        assert fingerprint == IdempotencyKeys.fingerprint('subject', 'description')
+        assert fingerprint != IdempotencyKeys.fingerprint('subject', 'description2')
+        assert fingerprint != IdempotencyKeys.fingerprint('subject', None)
+
+    def test_Ignore_expired_record(self, mock):
+        """get: 期限切れの記録のケース、TTL で削除される前でも None を返すことができる"""
+        now = [1000]
+        keys = IdempotencyKeys(mock.table._table, ttl=60, clock=lambda: now[0])
+        put = keys.put('meow', 'key-1', 'uid-1', 'fingerprint')
+        mock.table._table.put_item(Item=put['Item'])
+        record = keys.get('meow', 'key-1')
+        assert (record['todo_uid'], record['expires_at'], record['owner']) == ('uid-1', 1060, 'meow')
+        now[0] = 1061
+        assert keys.get('meow', 'key-1') is None
@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+import boto3
+import pytest
+from chalice import NotFoundError
+
+import app
+from chalicelib.cache import TTLCache
+from chalicelib.client_table import ClientTable
+from chalicelib.db import DynamoDBTodo
+from chalicelib.item_cache import ItemCacheTable, RedisItemStore, item_store
+
+from tests.mock.redis_client import MockRedis
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class TestItemCache:
+
+    @staticmethod
+    def _table(mock, store=None, client=False):
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        table = mock.table._table
+        if client:
+            table = ClientTable(boto3.client('dynamodb'), table.name)
+        return ItemCacheTable(table, TTLCache() if store is None else store)
+
+    @staticmethod
+    def _count_get_item(monkeypatch, table):
+        calls = []
+        get_item = table._table.get_item
+        monkeypatch.setattr(table._table, 'get_item', lambda **kwargs: calls.append(kwargs) or get_item(**kwargs))
+        return calls
+
+
+class TestItemStore(TestItemCache):
+
+    @pytest.mark.parametrize('backend, expected', [('none', type(None)), ('memory', TTLCache)])
+    def test_Return_store_case_backend(self, backend, expected):
+        """item_store: バックエンドごとの保存先を返すことができる"""
+        assert type(item_store(backend, ttl=1.5)) is expected
+
+    def test_Raise_ValueError_case_unknown_backend(self):
+        """item_store: ITEM_CACHE_BACKENDS に含まれないケース、例外を発生させることができる"""
+        with pytest.raises(ValueError):
+            item_store('memcached')
+
+    def test_Return_same_item_case_redis(self):
+        """RedisItemStore: 保存したアイテムを、Decimal を含めて元の値で返すことができる"""
+        client = MockRedis()
+        store = RedisItemStore(client, ttl=30)
+        item = dict(TESTDATA_DDB_ITEMS[0], version=Decimal(3))
+        store.set(('table', 'default', item['uid']), item)
+        assert store.get(('table', 'default', item['uid'])) == item
+        assert list(client.expires.values()) == [30]
+        store.delete(('table', 'default', item['uid']))
+        assert store.get(('table', 'default', item['uid'])) is None
+
+
+class TestItemCacheTable(TestItemCache):
+
+    @pytest.mark.parametrize('client', [False, True])
+    def test_Return_cached_item(self, mock, monkeypatch, client):
+        """get_item: 2 回目以降は DynamoDB を呼び出さずに store から返すことができる"""
+        table = self._table(mock, client=client)
+        calls = self._count_get_item(monkeypatch, table)
+        db = DynamoDBTodo(table)
+        item = TESTDATA_DDB_ITEMS[0]
+        assert db.get_item(item['uid'], username=item['username']) == item
+        assert db.get_item(item['uid'], username=item['username']) == item
+        assert len(calls) == 1
+
+    def test_Bypass_case_consistent_read(self, mock, monkeypatch):
+        """get_item: ConsistentRead を指定したケース、store を使わずに読み取ることができる"""
+        table = self._table(mock)
+        calls = self._count_get_item(monkeypatch, table)
+        key = {'username': DEFAULT_USERNAME, 'uid': TESTDATA_DDB_ITEMS[0]['uid']}
+        table.get_item(Key=key, ConsistentRead=True)
+        table.get_item(Key=key, ConsistentRead=True)
+        assert len(calls) == 2
+        assert len(table.store) == 0
+
+    @pytest.mark.parametrize('client', [False, True])
+    def test_Return_latest_item_case_write(self, mock, monkeypatch, client):
+        """add_item, update_item, delete_item: 書き込んだケース、最新の内容を返すことができる"""
+        table = self._table(mock, client=client)
+        db = DynamoDBTodo(table, stats=True)
+        uid = db.add_item(subject='subject', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'subject'
+        db.update_item(uid, subject='updated', username=DEFAULT_USERNAME)
+        assert db.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'updated'
+        assert db.get_stats(username=DEFAULT_USERNAME)['total'] == 1
+        db.delete_item(uid, username=DEFAULT_USERNAME)
+        with pytest.raises(NotFoundError):
+            db.get_item(uid, username=DEFAULT_USERNAME)
+        assert db.get_stats(username=DEFAULT_USERNAME)['total'] == 0
+
+    def test_Invalidate_case_batch_write(self, mock):
+        """batch_write: BatchWriteItem で削除したケース、store のアイテムを削除することができる"""
+        table = self._table(mock)
+        db = DynamoDBTodo(table)
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        db.get_item(uid, username=DEFAULT_USERNAME)
+        db.batch_write([{'op': 'delete', 'uid': uid}], username=DEFAULT_USERNAME)
+        assert table.store.get(table.cache_key({'username': DEFAULT_USERNAME, 'uid': uid})) is None
+
+    def test_Share_store_case_redis(self, mock):
+        """get_item: RedisItemStore を共有したケース、他のコンテナの書き込みを反映することができる"""
+        store = RedisItemStore(MockRedis())
+        first, second = DynamoDBTodo(self._table(mock, store)), DynamoDBTodo(self._table(mock, store))
+        uid = TESTDATA_DDB_ITEMS[0]['uid']
+        assert second.get_item(uid, username=DEFAULT_USERNAME)['subject'] == TESTDATA_DDB_ITEMS[0]['subject']
+        first.update_item(uid, subject='shared', username=DEFAULT_USERNAME)
+        assert second.get_item(uid, username=DEFAULT_USERNAME)['subject'] == 'shared'
+
+    def test_Check_latest_version_case_stale_memory_store(self, mock):
+        """delete_item: 他のコンテナの書き込みで store が古いケース、DynamoDB の version で If-Match を判定することができる"""
+        first = DynamoDBTodo(self._table(mock, TTLCache()))
+        second = DynamoDBTodo(self._table(mock, TTLCache()))
+        uid, other = TESTDATA_DDB_ITEMS[0]['uid'], TESTDATA_DDB_ITEMS[1]['uid']
+        version = DynamoDBTodo.get_version(first.get_item(uid, username=DEFAULT_USERNAME))
+        first.get_item(other, username=DEFAULT_USERNAME)
+        second.update_item(uid, subject='second', username=DEFAULT_USERNAME, expected_version=version)
+        assert first.delete_item(uid, username=DEFAULT_USERNAME, expected_version=version + 1) == uid
+        second.delete_item(other, username=DEFAULT_USERNAME)
+        with pytest.raises(NotFoundError):
+            first.delete_item(other, username=DEFAULT_USERNAME, expected_version=version + 1)
+
+    def test_Return_ItemCacheTable_case_item_cache_backend(self, monkeypatch):
+        """get_app_db: ITEM_CACHE_BACKEND が memory のケース、ItemCacheTable を使用することができる"""
+        monkeypatch.setattr(app, '_DB', None)
+        monkeypatch.setenv('ITEM_CACHE_BACKEND', 'memory')
+        monkeypatch.setenv('ITEM_CACHE_TTL_SECONDS', '2.5')
+        table = app.get_app_db()._table
+        assert table.__class__ is ItemCacheTable
+        assert table.store.ttl == 2.5
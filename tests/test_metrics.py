@@ -0,0 +1,99 @@
+import json
+import base64
+
+import app
+from chalicelib.db import DynamoDBTodo
+from chalicelib.metrics import MetricsRecorder, METRIC_UNITS
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+
+
+class TestMetrics:
+
+    @staticmethod
+    def _recorder(mock):
+        records = []
+        recorder = MetricsRecorder(namespace='Test', emit=records.append, clock=lambda: 0)
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        return recorder, records, DynamoDBTodo(mock.table._table, metrics=recorder)
+
+
+class TestMetricsRecorder(TestMetrics):
+
+    def test_Emit_emf_record(self, mock):
+        """finish: CloudWatch Embedded Metric Format のログを 1 行の JSON で出力することができる"""
+        recorder, records, db = self._recorder(mock)
+        recorder.start()
+        db.get_item(TESTDATA_DDB_ITEMS[0]['uid'], username=DEFAULT_USERNAME)
+        record = recorder.finish({'Method': 'GET', 'Route': '/todos/{uid}'})
+        assert json.loads(records[0]) == record
+        assert record['_aws'] == {
+            'Timestamp': 0,
+            'CloudWatchMetrics': [{
+                'Namespace': 'Test',
+                'Dimensions': [['Method', 'Route']],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, unit in METRIC_UNITS.items()]}]}
+        assert (record['Method'], record['Route']) == ('GET', '/todos/{uid}')
+        assert all(name in record for name in METRIC_UNITS)
+
+    def test_Record_dynamodb_calls(self, mock):
+        """instrument: DynamoDB の呼び出しごとの所要時間、消費キャパシティ、読み取り件数を記録することができる"""
+        recorder, records, db = self._recorder(mock)
+        recorder.start()
+        db.list_items(query='cat', username=DEFAULT_USERNAME)
+        db.get_item(TESTDATA_DDB_ITEMS[0]['uid'], username=DEFAULT_USERNAME)
+        record = recorder.finish()
+        assert [call['Operation'] for call in record['DynamoDBCallDetails']] == ['Query', 'GetItem']
+        assert record['DynamoDBCalls'] == 2
+        assert record['ItemsReturned'] < record['ItemsScanned']
+        assert record['ConsumedCapacity'] > 0
+        assert 0 < record['DynamoDBTime'] <= record['HandlerTime']
+
+    def test_Record_cold_start_only_first_request(self, mock):
+        """start: 最初のリクエストのみコールドスタートとして記録することができる"""
+        recorder, records, db = self._recorder(mock)
+        recorder.start()
+        assert recorder.finish()['ColdStart'] == 1
+        recorder.start()
+        assert recorder.finish()['ColdStart'] == 0
+
+    def test_Ignore_calls_outside_request(self, mock):
+        """finish: 計測中でないケース、呼び出しを記録せずに None を返すことができる"""
+        recorder, records, db = self._recorder(mock)
+        db.list_all_items()
+        assert recorder.finish() is None
+        assert records == []
+
+
+class TestRecordRequestMetrics(TestMetrics):
+
+    @staticmethod
+    def _authorization(username):
+        payload = base64.urlsafe_b64encode(
+            json.dumps({'cognito:username': username}).encode('utf-8')).decode('ascii')
+        return f"e30.{payload}."
+
+    def test_Emit_metrics_per_request(self, client, monkeypatch, mock):
+        """record_request_metrics: METRICS_ENABLED が true のケース、リクエストごとに EMF のログを出力することができる"""
+        records = []
+        monkeypatch.setattr(app, 'METRICS', MetricsRecorder(emit=records.append))
+        monkeypatch.setattr(app, '_DB', None)
+        monkeypatch.setenv('METRICS_ENABLED', 'true')
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        response = client.get('/todos?state=started',
+                              headers={'Authorization': self._authorization(DEFAULT_USERNAME)})
+        assert response.status_code == 200
+        record = json.loads(records[-1])
+        assert (record['Method'], record['Route'], record['StatusCode']) == ('GET', '/todos', 200)
+        assert record['DynamoDBCalls'] >= 1
+        assert record['HandlerTime'] >= record['DynamoDBTime'] + record['AuthTime']
+
+    def test_Not_emit_case_metrics_disabled(self, client, monkeypatch):
+        """record_request_metrics: METRICS_ENABLED が未設定のケース、ログを出力しないことができる"""
+        records = []
+        monkeypatch.setattr(app, 'METRICS', MetricsRecorder(emit=records.append))
+        client.get('/')
+        assert records == []
@@ -0,0 +1,165 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from chalicelib.db import DynamoDBTodo
+from chalicelib.exceptions import ServiceUnavailableError, TooManyRequestsError
+from chalicelib.retry import (
+    Backoff, CircuitBreaker, DecorrelatedJitter, RetryBudget, RetryPolicy, RetryingTable)
+
+from tests.mock.dynamo_db import MockFaultyTable
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+DEFAULT_USERNAME = 'default'
+THROTTLING = 'ProvisionedThroughputExceededException'
+
+
+class TestRetry:
+
+    @staticmethod
+    def _policy(max_attempts=3, budget=None, breaker=None):
+        slept = []
+        backoff = DecorrelatedJitter(base=0.01, cap=0.5, max_attempts=max_attempts, sleep=slept.append)
+        return RetryPolicy(backoff, budget, breaker), slept
+
+    @staticmethod
+    def _fail(codes):
+        calls = []
+
+        def _call():
+            calls.append(None)
+            if len(calls) <= len(codes):
+                raise ClientError({'Error': {'Code': codes[len(calls) - 1]}}, 'GetItem')
+            return 'ok'
+        return _call, calls
+
+
+class TestBackoff(TestRetry):
+
+    @pytest.mark.parametrize('base, cap', [(0.05, 2.0), (1.0, 1.5)])
+    def test_Return_delays_within_exponential_bound(self, base, cap):
+        """delays: attempt 回目の待機時間を 0 から min(cap, base * 2 ** attempt) の範囲で返すことができる"""
+        delays = list(Backoff(base=base, cap=cap, max_attempts=8).delays())
+        assert len(delays) == 8
+        for attempt, delay in enumerate(delays):
+            assert 0 <= delay <= min(cap, base * 2 ** attempt)
+
+    def test_Sleep_before_each_retry(self):
+        """attempts: 初回を除き、リトライの前に待機することができる"""
+        slept = []
+        attempts = list(Backoff(max_attempts=3, sleep=slept.append).attempts())
+        assert attempts == [0, 1, 2, 3]
+        assert len(slept) == 3
+
+
+class TestDecorrelatedJitter(TestRetry):
+
+    def test_Return_delays_within_previous_bound(self):
+        """delays: 待機時間を base から前回の待機時間の 3 倍 (上限 cap) の範囲で返すことができる"""
+        delays = list(DecorrelatedJitter(base=0.05, cap=1.0, max_attempts=20).delays())
+        assert len(delays) == 20
+        previous = 0.05
+        for delay in delays:
+            assert 0.05 <= delay <= min(1.0, previous * 3)
+            previous = delay
+
+
+class TestRetryBudget(TestRetry):
+
+    def test_Refuse_withdraw_case_budget_exhausted(self):
+        """withdraw: 予算を使い切ったケース、成功した呼び出しで補充されるまで再試行を拒否することができる"""
+        budget = RetryBudget(ratio=0.5, capacity=2)
+        assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+        budget.deposit()
+        assert budget.withdraw() is False
+        budget.deposit()
+        assert budget.withdraw() is True
+
+
+class TestCircuitBreaker(TestRetry):
+
+    def test_Open_and_half_open(self):
+        """allow: 連続した失敗で open になり、reset_timeout 後に 1 回のみ試行を許可することができる"""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        assert breaker.allow() and breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert not breaker.allow() and breaker.retry_after() == 10
+        now[0] = 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert [breaker.allow(), breaker.allow()] == [True, False]
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        now[0] = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestRetryPolicy(TestRetry):
+
+    def test_Retry_case_throttling(self):
+        """call: スロットリングと一時的な障害のケース、待機して再試行することができる"""
+        policy, slept = self._policy()
+        func, calls = self._fail([THROTTLING, 'InternalServerError'])
+        assert policy.call(func) == 'ok'
+        assert len(calls) == 3 and len(slept) == 2
+
+    @pytest.mark.parametrize('code, error', [
+        (THROTTLING, TooManyRequestsError), ('ServiceUnavailable', ServiceUnavailableError)])
+    def test_Raise_RetryableError_case_attempts_exhausted(self, code, error):
+        """call: 再試行の回数を使い切ったケース、Retry-After の秒数を持つ例外を発生させることができる"""
+        policy, slept = self._policy(max_attempts=2)
+        func, calls = self._fail([code] * 3)
+        with pytest.raises(error) as e:
+            policy.call(func)
+        assert len(calls) == 3
+        assert e.value.retry_after >= 1
+
+    def test_Raise_ClientError_case_not_retryable(self):
+        """call: 再試行できないエラーのケース、再試行せずにそのまま例外を発生させることができる"""
+        policy, slept = self._policy()
+        func, calls = self._fail(['ValidationException'])
+        with pytest.raises(ClientError):
+            policy.call(func)
+        assert len(calls) == 1 and slept == []
+
+    def test_Not_retry_case_budget_exhausted(self):
+        """call: 再試行の予算を使い切ったケース、再試行せずに例外を発生させることができる"""
+        policy, slept = self._policy(budget=RetryBudget(capacity=0))
+        func, calls = self._fail([THROTTLING])
+        with pytest.raises(TooManyRequestsError):
+            policy.call(func)
+        assert len(calls) == 1
+
+    def test_Raise_ServiceUnavailableError_case_circuit_open(self):
+        """call: サーキットブレーカーが open のケース、呼び出さずに例外を発生させることができる"""
+        policy, slept = self._policy(max_attempts=0, breaker=CircuitBreaker(failure_threshold=1))
+        func, calls = self._fail([THROTTLING])
+        with pytest.raises(TooManyRequestsError):
+            policy.call(func)
+        with pytest.raises(ServiceUnavailableError) as e:
+            policy.call(func)
+        assert len(calls) == 1
+        assert e.value.retry_after >= 1
+
+
+class TestRetryingTable(TestRetry):
+
+    def test_Retry_dynamodb_calls(self, mock):
+        """RetryingTable: DynamoDBTodo の呼び出しのスロットリングを再試行することができる"""
+        mock.table.put_items(TESTDATA_DDB_ITEMS)
+        table = MockFaultyTable(mock.table._table, [THROTTLING, THROTTLING])
+        policy, slept = self._policy()
+        db = DynamoDBTodo(table, retry_policy=policy)
+        assert isinstance(db._table, RetryingTable)
+        item = db.get_item(TESTDATA_DDB_ITEMS[0]['uid'], username=DEFAULT_USERNAME)
+        assert item['uid'] == TESTDATA_DDB_ITEMS[0]['uid']
+        assert table.calls == ['get_item'] * 3
+
+    def test_Raise_TooManyRequestsError_case_no_policy(self, mock):
+        """except_endpoint_connection_error: 再試行しないケース、スロットリングを 429 の例外に変換することができる"""
+        db = DynamoDBTodo(MockFaultyTable(mock.table._table, [THROTTLING]))
+        with pytest.raises(TooManyRequestsError):
+            db.list_items(username=DEFAULT_USERNAME)
@@ -0,0 +1,60 @@
+import pytest
+
+from chalicelib.search import SearchIndex, Tokenizer
+
+from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
+
+
+class TestSearch:
+    pass
+
+
+class TestTokenizer(TestSearch):
+
+    def test_Return_bigrams_case_japanese(self):
+        """tokens: 日本語のテキストを 2 文字ごとのトークンに分割することができる"""
+        assert Tokenizer.tokens('友達の家') == {'友達', '達の', 'の家'}
+
+    def test_Return_normalized_tokens(self):
+        """tokens: 全角/半角、大文字/小文字を正規化したトークンを返すことができる"""
+        assert Tokenizer.tokens('ＣＡＴ') == Tokenizer.tokens('cat') == {'ca', 'at'}
+
+    def test_Not_return_tokens_across_texts(self):
+        """tokens: テキストをまたぐトークンを生成しないことができる"""
+        assert Tokenizer.tokens('ab', 'cd') == {'ab', 'cd'}
+
+    @pytest.mark.parametrize('query', ['', 'a', 'Ａ'])
+    def test_Return_None_case_short_query(self, query):
+        """query_tokens: NGRAM 文字未満のクエリのケース、None を返すことができる"""
+        assert Tokenizer.query_tokens(query) is None
+
+    def test_Return_unique_tokens_in_order(self):
+        """query_tokens: 重複のないトークンを出現順に返すことができる"""
+        assert Tokenizer.query_tokens('abab') == ['ab', 'ba']
+
+
+class TestSearchIndex(TestSearch):
+
+    @pytest.mark.parametrize('item', TESTDATA_DDB_ITEMS)
+    def test_Return_put_requests_for_all_tokens(self, item):
+        """put_requests: subject と description のすべてのトークンのポスティングを返すことができる"""
+        requests = SearchIndex(None).put_requests(item)
+        tokens = {request['PutRequest']['Item']['token'] for request in requests}
+        assert tokens == Tokenizer.tokens(item['subject'], item['description'])
+
+    def test_Return_only_changed_tokens(self):
+        """diff_requests: 増減したトークンのポスティングのみを返すことができる"""
+        old_item = {'username': 'default', 'uid': 'uid', 'subject': 'abc'}
+        new_item = dict(old_item, subject='abd')
+        requests = SearchIndex(None).diff_requests(old_item, new_item)
+        assert [request['PutRequest']['Item']['token']
+                for request in requests if 'PutRequest' in request] == ['bd']
+        assert [request['DeleteRequest']['Key']['username']
+                for request in requests if 'DeleteRequest' in request] \
+            == [SearchIndex.partition_key('default', 'bc')]
+
+    @pytest.mark.parametrize('query, expected', [
+        ('CAT TOWER', True), ('ハンバーガー', False), ('store 🔨', True)])
+    def test_Return_match(self, query, expected):
+        """matches: 正規化した検索クエリを含むか判定することができる"""
+        assert SearchIndex.matches(TESTDATA_DDB_ITEMS[0], query) == expected
@@ -0,0 +1,33 @@
+import pytest
+
+from chalicelib.stats import UserStats
+
+
+class TestUserStats:
+
+    @pytest.mark.parametrize('old_state, new_state, expected', [
+        (None, 'unstarted', {'total': 1, 'unstarted': 1}),
+        ('unstarted', 'completed', {'unstarted': -1, 'completed': 1}),
+        ('started', None, {'total': -1, 'started': -1}),
+        ('started', 'started', {}),
+    ])
+    def test_Return_deltas(self, old_state, new_state, expected):
+        """deltas: ステータスの遷移から、加算する値を返すことができる"""
+        assert UserStats.deltas(old_state, new_state) == expected
+
+    def test_Return_update_params(self, mock):
+        """update: 集計アイテムに ADD で加算する UpdateItem のパラメータを返すことができる"""
+        stats = UserStats(mock.table._table)
+        mock.table._table.update_item(**{
+            key: value for key, value in stats.update('meow', {'total': 1, 'started': 1}).items()
+            if key != 'TableName'})
+        mock.table._table.update_item(**{
+            key: value for key, value in stats.update('meow', {'started': -1, 'completed': 1}).items()
+            if key != 'TableName'})
+        item = mock.table._table.get_item(Key=UserStats.key('meow'))['Item']
+        assert (item['record_type'], item['owner']) == (UserStats.RECORD_TYPE, 'meow')
+        assert UserStats.counts(item) == {'total': 1, 'unstarted': 0, 'started': 0, 'completed': 1}
+
+    def test_Return_zero_counts_case_no_item(self):
+        """counts: 集計アイテムがないケース、すべて 0 の件数を返すことができる"""
+        assert UserStats.counts(None) == {'total': 0, 'unstarted': 0, 'started': 0, 'completed': 0}
@@ -0,0 +1,19 @@
+from chalicelib.sync import Tombstones
+
+
+class TestTombstones:
+
+    def test_Return_tombstone_item(self, mock):
+        """item: 削除した uid と、TTL の期限を持つ削除の記録を返すことができる"""
+        tombstones = Tombstones(mock.table._table, ttl=60, clock=lambda: 1000)
+        item = tombstones.item('meow', 'uid-1', 999000)
+        assert item == {
+            'username': 'meow', 'uid': '#tombstone#uid-1', 'record_type': 'tombstone',
+            'deleted_uid': 'uid-1', 'updated_at': 999000, 'expires_at': 1060}
+        assert Tombstones.is_tombstone(item)
+        assert not Tombstones.is_tombstone({'username': 'meow', 'uid': 'uid-1'})
+
+    def test_Return_oldest_since(self, mock):
+        """oldest_since: 削除の記録の保持期間の始まりを Unix 時刻のミリ秒で返すことができる"""
+        tombstones = Tombstones(mock.table._table, ttl=60, clock=lambda: 1000)
+        assert tombstones.oldest_since() == 940000
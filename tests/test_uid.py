@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+
+from chalicelib.uid import UUIDv7, parse_timestamp
+
+
+class TestUid:
+    pass
+
+
+class TestUUIDv7(TestUid):
+
+    def test_Return_uuid_version_7(self):
+        """generate: RFC 9562 の version 7 の UUID を 36 文字の文字列で返すことができる"""
+        actual = UUIDv7.generate()
+        assert len(actual) == 36
+        assert uuid.UUID(actual).version == 7
+        assert uuid.UUID(actual).variant == uuid.RFC_4122
+
+    def test_Return_monotonic_uids(self):
+        """generate: 同じミリ秒に生成したケースも、生成した順序に並ぶ uid を返すことができる"""
+        uids = [UUIDv7.generate() for _ in range(5000)]
+        assert uids == sorted(uids)
+        assert len(set(uids)) == len(uids)
+
+    @pytest.mark.parametrize('timestamp_ms', [0, 1600000000000, 2 ** 48 - 2])
+    def test_Return_uid_within_bounds(self, timestamp_ms):
+        """generate, lower_bound, upper_bound: 指定した時刻の uid を、その時刻の範囲の中に返すことができる"""
+        uid = UUIDv7.generate(timestamp_ms)
+        assert UUIDv7.timestamp_ms(uid) == timestamp_ms
+        assert UUIDv7.lower_bound(timestamp_ms) <= uid <= UUIDv7.upper_bound(timestamp_ms)
+        assert uid < UUIDv7.lower_bound(timestamp_ms + 1)
+
+    def test_Return_False_case_uuid4(self):
+        """is_time_ordered: uuid4 のケース、False を返すことができる"""
+        assert UUIDv7.is_time_ordered(UUIDv7.generate())
+        assert not UUIDv7.is_time_ordered(str(uuid.uuid4()))
+
+
+class TestParseTimestamp(TestUid):
+
+    @pytest.mark.parametrize('value, expected', [
+        ('1577836800000', 1577836800000),
+        ('2020-01-01T00:00:00Z', 1577836800000),
+        ('2020-01-01T09:00:00+09:00', 1577836800000),
+        ('2020-01-01', 1577836800000)])
+    def test_Return_unix_time_ms(self, value, expected):
+        """parse_timestamp: Unix 時刻 (ミリ秒) または ISO 8601 を Unix 時刻 (ミリ秒) に変換することができる"""
+        assert parse_timestamp(value) == expected
+
+    @pytest.mark.parametrize('value', ['yesterday', '-1', ''])
+    def test_Raise_ValueError_case_bad_format(self, value):
+        """parse_timestamp: 形式が不正なケース、例外を発生させることができる"""
+        with pytest.raises(ValueError):
+            parse_timestamp(value)
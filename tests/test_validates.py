@@ -2,7 +2,8 @@ import pytest
 
 from chalice import BadRequestError
 
-from chalicelib.validates import Validates
+from chalicelib.validates import (
+    Validates, Field, Schema, TODO_CREATE_SCHEMA, TODO_UPDATE_SCHEMA, BATCH_SCHEMAS)
 
 from tests.testdata.ddb_items import TESTDATA_DDB_ITEMS
 from tests.testdata.non_str_types import TESTDATA_NON_STR_TYPES
@@ -138,4 +139,223 @@ class TestValidatesUsername(TestValidates):
     def test_Raise_BadRequestError_case_boundery_length(self, bad_length_username):
         """username: 文字の長さが境界値を超過しているケース、例外を発生させることができる"""
         with pytest.raises(BadRequestError):
-            Validates.username(bad_length_username)
\ No newline at end of file
+            Validates.username(bad_length_username)
+
+    @pytest.mark.parametrize('reserved_username', [
+        '#stats#default', '#idempotency#default', '#search#default#to', '#tombstone#uid'])
+    def test_Raise_BadRequestError_case_reserved_prefix(self, reserved_username):
+        """username: 管理用のアイテムの接頭辞 # で始まるケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.username(reserved_username)
+
+
+class TestValidatesLimit(TestValidates):
+
+    @pytest.mark.parametrize('limit', [
+        None, Validates.LIMIT_MIN_VALUE, Validates.LIMIT_MAX_VALUE])
+    def test_Pass_case_normal(self, limit):
+        """limit: None または境界値の限界 のケース、例外をパスできる"""
+        assert Validates.limit(limit) == None
+
+    @pytest.mark.parametrize('bad_type_limit', ['1', 1.0, [1]])
+    def test_Raise_BadRequestError_case_bad_type(self, bad_type_limit):
+        """limit: int以外の型 のケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.limit(bad_type_limit)
+
+    @pytest.mark.parametrize('bad_limit', [
+        Validates.LIMIT_MIN_VALUE - 1, Validates.LIMIT_MAX_VALUE + 1])
+    def test_Raise_BadRequestError_case_boundery_value(self, bad_limit):
+        """limit: 境界値を超過しているケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.limit(bad_limit)
+
+
+class TestValidatesSegments(TestValidates):
+
+    @pytest.mark.parametrize('segments', [
+        None, Validates.SEGMENTS_MIN_VALUE, Validates.SEGMENTS_MAX_VALUE])
+    def test_Pass_case_normal(self, segments):
+        """segments: None または境界値の限界 のケース、例外をパスできる"""
+        assert Validates.segments(segments) == None
+
+    @pytest.mark.parametrize('bad_segments', [
+        '4', Validates.SEGMENTS_MIN_VALUE - 1, Validates.SEGMENTS_MAX_VALUE + 1])
+    def test_Raise_BadRequestError_case_bad_value(self, bad_segments):
+        """segments: int以外の型、または境界値を超過しているケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.segments(bad_segments)
+
+
+class TestValidatesOrder(TestValidates):
+
+    @pytest.mark.parametrize('order', [None] + Validates.ORDER_ENUM)
+    def test_Pass_case_normal(self, order):
+        """order: None または Validates.ORDER_ENUM に含まれる場合、例外をパスできる"""
+        assert Validates.order(order) == None
+
+    @pytest.mark.parametrize('bad_order', ['ASC', 'newest', ''])
+    def test_Raise_BadRequestError_case_not_in_enum(self, bad_order):
+        """order: Validates.ORDER_ENUM に含まれない場合、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.order(bad_order)
+
+
+class TestValidatesTimeRange(TestValidates):
+
+    @pytest.mark.parametrize('since, until', [
+        (None, None), (0, None), (None, 0), (1000, 1000), (1000, 2000)])
+    def test_Pass_case_normal(self, since, until):
+        """time_range: since が until 以下のケース、例外をパスできる"""
+        assert Validates.time_range(since, until) == None
+
+    @pytest.mark.parametrize('since, until', [(2000, 1000), (-1, None), (None, 2 ** 48)])
+    def test_Raise_BadRequestError_case_bad_range(self, since, until):
+        """time_range: since が until より後、または範囲外のケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.time_range(since, until)
+
+
+class TestValidatesBatchOperations(TestValidates):
+
+    @pytest.mark.parametrize('operations', [
+        [{'op': 'create', 'subject': 'subject'}],
+        [{'op': 'create', 'subject': 'subject', 'description': 'description'},
+         {'op': 'update', 'uid': 'uid1', 'state': 'completed', 'expected_version': 1},
+         {'op': 'delete', 'uid': 'uid2'}],
+        [{'op': 'create', 'subject': 'subject'}] * Validates.BATCH_MAX_OPERATIONS])
+    def test_Pass_case_normal(self, operations):
+        """batch_operations: 通常 のケース、例外をパスできる"""
+        assert Validates.batch_operations(operations) == None
+
+    @pytest.mark.parametrize('operations', [
+        None,
+        {'op': 'create', 'subject': 'subject'},
+        [],
+        [{'op': 'create', 'subject': 'subject'}] * (Validates.BATCH_MAX_OPERATIONS + 1),
+        ['create'],
+        [{'op': 'upsert', 'subject': 'subject'}],
+        [{'op': 'create'}],
+        [{'op': 'update', 'subject': 'subject'}],
+        [{'op': 'update', 'uid': 'uid1', 'state': 'unknown_state'}],
+        [{'op': 'delete', 'uid': 'uid1', 'expected_version': '1'}],
+        [{'op': 'update', 'uid': 'uid1', 'state': 'started'}, {'op': 'delete', 'uid': 'uid1'}],
+        [{'op': 'update', 'uid': '#stats', 'state': 'started'}],
+        [{'op': 'delete', 'uid': '#tombstone#uid1'}]])
+    def test_Raise_BadRequestError_case_bad_operations(self, operations):
+        """batch_operations: いずれかの操作が不正なケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.batch_operations(operations)
+
+    def test_Raise_BadRequestError_case_all_errors(self):
+        """batch_operations: 複数の操作が不正なケース、すべてのエラーをインデックスつきで返すことができる"""
+        operations = [
+            {'op': 'create'},
+            {'op': 'create', 'subject': 'subject'},
+            {'op': 'update', 'uid': 'uid1', 'state': 'unknown_state', 'expected_version': -1}]
+        with pytest.raises(BadRequestError) as e:
+            Validates.batch_operations(operations)
+        errors = str(e.value).split(Schema.SEPARATOR)
+        assert [error.split(':')[0] for error in errors] == [
+            'operations[0]', 'operations[2]', 'operations[2]']
+
+
+class TestValidatesIds(TestValidates):
+
+    @pytest.mark.parametrize('ids', [
+        [item['uid'] for item in TESTDATA_DDB_ITEMS],
+        ['@'] * Validates.BATCH_GET_MAX_IDS])
+    def test_Pass_case_normal(self, ids):
+        """ids: 通常 のケース、例外をパスできる"""
+        assert Validates.ids(ids) == None
+
+    @pytest.mark.parametrize('ids', [
+        [],
+        ['@'] * (Validates.BATCH_GET_MAX_IDS + 1),
+        ['@' * (Validates.UID_MAX_LEN + 1)],
+        ['#stats'], ['#tombstone#uid']])
+    def test_Raise_BadRequestError_case_bad_ids(self, ids):
+        """ids: 件数またはuidが不正なケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.ids(ids)
+
+
+class TestValidatesFields(TestValidates):
+
+    @pytest.mark.parametrize('fields', [None, ['uid'], ['subject', 'state'], Validates.FIELDS_ENUM])
+    def test_Pass_case_normal(self, fields):
+        """fields: None または Validates.FIELDS_ENUM に含まれる属性名のケース、例外をパスできる"""
+        assert Validates.fields(fields) == None
+
+    @pytest.mark.parametrize('fields', [[], ['password'], ['subject', 'username_state']])
+    def test_Raise_BadRequestError_case_bad_fields(self, fields):
+        """fields: 空、または Validates.FIELDS_ENUM に含まれない属性名のケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.fields(fields)
+
+
+class TestValidatesIdempotencyKey(TestValidates):
+
+    @pytest.mark.parametrize('key', [None, 'a', '8e0f6c1a-2b3c-4d5e-8f90-123456789abc', '@' * Validates.IDEMPOTENCY_KEY_MAX_LEN])
+    def test_Pass_case_normal(self, key):
+        """idempotency_key: None または長さの範囲内の印字可能な ASCII 文字のケース、例外をパスできる"""
+        assert Validates.idempotency_key(key) == None
+
+    @pytest.mark.parametrize('key', ['', '@' * (Validates.IDEMPOTENCY_KEY_MAX_LEN + 1), 'キー', 'a\nb'])
+    def test_Raise_BadRequestError_case_bad_key(self, key):
+        """idempotency_key: 長さまたは文字が不正なケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            Validates.idempotency_key(key)
+
+
+class TestSchema(TestValidates):
+
+    @pytest.mark.parametrize('body', [
+        {'subject': 'subject'},
+        {'subject': 'subject', 'description': 'description'},
+        {'subject': '@' * Validates.SUBJECT_MAX_LEN, 'description': None, 'state': 'unknown_state'}])
+    def test_Pass_case_create(self, body):
+        """TODO_CREATE_SCHEMA: 通常 のケース、例外をパスできる"""
+        assert TODO_CREATE_SCHEMA.validate(body) == None
+
+    @pytest.mark.parametrize('body', [
+        None, [], {}, {'subject': None}, {'subject': ''}, {'subject': 1},
+        {'subject': '@' * (Validates.SUBJECT_MAX_LEN + 1)},
+        {'subject': 'subject', 'description': '@' * (Validates.DESCRIPTION_MAX_LEN + 1)}])
+    def test_Raise_BadRequestError_case_create(self, body):
+        """TODO_CREATE_SCHEMA: 本文または属性が不正なケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            TODO_CREATE_SCHEMA.validate(body)
+
+    @pytest.mark.parametrize('body', [{}, {'state': 'completed'}, {'subject': None, 'description': ''}])
+    def test_Pass_case_update(self, body):
+        """TODO_UPDATE_SCHEMA: すべての属性が任意 のケース、例外をパスできる"""
+        assert TODO_UPDATE_SCHEMA.validate(body) == None
+
+    @pytest.mark.parametrize('state', ['unknown_state', 1, ''])
+    def test_Raise_BadRequestError_case_update_state(self, state):
+        """TODO_UPDATE_SCHEMA: state が Validates.STATE_ENUM に含まれないケース、例外を発生させることができる"""
+        with pytest.raises(BadRequestError):
+            TODO_UPDATE_SCHEMA.validate({'state': state})
+
+    def test_Return_all_errors(self):
+        """errors: 複数の属性が不正なケース、すべてのエラーを属性の順に返すことができる"""
+        errors = TODO_UPDATE_SCHEMA.errors({'subject': '', 'description': 1, 'state': 'unknown_state'})
+        assert [error.split(' ')[:2] for error in errors] == [
+            ['subject', 'length'], ['description', 'type'], ['state', 'enum']]
+
+    def test_Return_same_message_as_validates(self):
+        """errors: Validates と同じ形式のエラーメッセージを返すことができる"""
+        with pytest.raises(BadRequestError) as e:
+            Validates.subject(1)
+        assert TODO_CREATE_SCHEMA.errors({'subject': 1}) == [str(e.value)]
+
+    @pytest.mark.parametrize('value', [True, -1, '1'])
+    def test_Return_error_case_bad_int(self, value):
+        """Field: int の属性に bool、負の数、文字列を指定したケース、エラーを返すことができる"""
+        assert Field('expected_version', kind=int, min_value=0).check(value) is not None
+
+    def test_Share_fields_with_batch_schemas(self):
+        """BATCH_SCHEMAS: create は TODO_CREATE_SCHEMA を、update は TODO_UPDATE_SCHEMA の属性を使用することができる"""
+        assert BATCH_SCHEMAS['create'] is TODO_CREATE_SCHEMA
+        assert set(TODO_UPDATE_SCHEMA.fields) <= set(BATCH_SCHEMAS['update'].fields)